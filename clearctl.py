@@ -532,6 +532,30 @@ def _doctor(args: argparse.Namespace) -> int:
     return 0 if ok else 1
 
 
+def _risk_batch(args: argparse.Namespace) -> int:
+    ensure_runtime_dirs()
+    # Imported here so the launcher itself stays free of the analytics stack
+    from modules.client_store import DbClientStore
+    from modules.risk_store import RiskResultStore
+    from modules.view_models import client_risk_batch
+
+    clients = DbClientStore().fetch_all_clients()
+    if not clients:
+        print(">> No clients to run.")
+        return 1
+    run = client_risk_batch(clients, interval=args.interval, workers=args.workers)
+    saved = RiskResultStore().save_run(run)
+    summary = run.summary()
+    phases = "  ".join(f"{name}={ms:.1f}ms" for name, ms in summary["timings_ms"].items())
+    print(
+        f">> Risk run {summary['run_id']} ({summary['interval']} vs {summary['benchmark']}): "
+        f"{summary['clients']} clients, {summary['accounts']} accounts, {summary['tickers']} tickers "
+        f"on {summary['workers']} worker(s)"
+    )
+    print(f">> Saved {saved} rows, {summary['errors']} without usable returns.  {phases}")
+    return 0
+
+
 def _add_start_args(parser: argparse.ArgumentParser) -> None:
     parser.add_argument("--api-port", type=int, default=DEFAULT_API_PORT)
     parser.add_argument("--ui-port", type=int, default=DEFAULT_UI_PORT)
@@ -571,6 +595,10 @@ def _parse_args() -> argparse.Namespace:
     doctor.add_argument("--web-tests", action="store_true", help="Also validate Playwright browsers.")
     doctor.add_argument("--yes", action="store_true")
 
+    risk = sub.add_parser("risk-batch", help="Compute risk metrics for every client and account.")
+    risk.add_argument("--interval", default="1M", choices=["1W", "1M", "3M", "6M", "1Y"])
+    risk.add_argument("--workers", type=int, default=None, help="Worker processes (default: every core).")
+
     return parser.parse_args()
 
 
@@ -589,6 +617,8 @@ def main() -> int:
         return _logs(args)
     if args.command == "doctor":
         return _doctor(args)
+    if args.command == "risk-batch":
+        return _risk_batch(args)
     return 1
 
 
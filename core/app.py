@@ -10,6 +10,7 @@ from modules.market_data.feed import MarketFeed
 from modules.client_mgr.manager import ClientManager
 from interfaces.settings import SettingsModule
 from interfaces.assistant import AssistantModule
+from modules.prefetch import start_prefetch, stop_prefetch
 
 class ClearApp:
     """
@@ -53,6 +54,8 @@ class ClearApp:
 
     def run(self):
         """The Main Event Loop."""
+        # Keep market data caches warm while the menus are open
+        start_prefetch()
 
         while self.running:
             # 1. Display Menu & Get Action
@@ -100,6 +103,8 @@ class ClearApp:
         InputSafe.pause()
 
     def shutdown(self):
+        # Daemon thread; don't hold up exit on an in-flight download
+        stop_prefetch(timeout=0.5)
         self.console.print("\n[bold red]>> Closing Session...[/bold red]")
         self.console.print("[dim]   Data saved.\n   Connections terminated.\n   Logs cleared from terminal.[/dim]\n")
         sys.exit(0)
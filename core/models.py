@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from core.database import Base
 
@@ -76,3 +76,18 @@ class Lot(Base):
     holding_id = Column(Integer, ForeignKey("holdings.id", ondelete="CASCADE"))
 
     holding = relationship("Holding", back_populates="lots")
+
+class RiskResult(Base):
+    __tablename__ = "risk_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, index=True)
+    run_at = Column(DateTime, index=True)
+    client_uid = Column(String, index=True)
+    account_uid = Column(String, index=True, nullable=True)
+    scope = Column(String)
+    interval = Column(String)
+    benchmark = Column(String)
+    points = Column(Integer, default=0)
+    metrics = Column(JSON, default=dict)
+    error = Column(String, nullable=True)
@@ -346,16 +346,53 @@ def compute_risk_metrics(
     if std_daily > 0:
         sharpe = (avg_daily - rf_daily) / std_daily * (ann_factor ** 0.5)
 
+    max_drawdown = calculate_max_drawdown(returns)
+    var_95, cvar_95 = calculate_var_cvar(returns, 0.95)
+    var_99, cvar_99 = calculate_var_cvar(returns, 0.99)
+
+    relative = compute_relative_metrics(
+        returns,
+        benchmark_returns,
+        risk_free_annual,
+        ann_factor=ann_factor,
+        avg_daily=avg_daily,
+        sharpe=sharpe,
+    )
+    return {
+        "mean_annual": mean_annual,
+        "vol_annual": vol_annual,
+        "sharpe": sharpe,
+        "sortino": relative.pop("sortino"),
+        "max_drawdown": max_drawdown,
+        "var_95": var_95,
+        "cvar_95": cvar_95,
+        "var_99": var_99,
+        "cvar_99": cvar_99,
+        **relative,
+    }
+
+
+def compute_relative_metrics(
+    returns: pd.Series,
+    benchmark_returns: Optional[pd.Series],
+    risk_free_annual: float,
+    ann_factor: float,
+    avg_daily: float,
+    sharpe: Optional[float],
+) -> Dict[str, Any]:
+    """
+    Sortino and the benchmark-relative part of compute_risk_metrics, given
+    the series' annualization factor, mean return and Sharpe ratio.
+    """
+    rf_daily = risk_free_annual / ann_factor
+    mean_annual = avg_daily * ann_factor
+
     downside = returns[returns < rf_daily]
     downside_std = float(downside.std(ddof=1)) if len(downside) > 1 else 0.0
     sortino = None
     if downside_std > 0:
         sortino = (avg_daily - rf_daily) / downside_std * (ann_factor ** 0.5)
 
-    max_drawdown = calculate_max_drawdown(returns)
-    var_95, cvar_95 = calculate_var_cvar(returns, 0.95)
-    var_99, cvar_99 = calculate_var_cvar(returns, 0.99)
-
     beta = None
     alpha_annual = None
     r_squared = None
@@ -390,15 +427,7 @@ def compute_risk_metrics(
             m_squared = risk_free_annual + sharpe * (benchmark_returns.std()) * (ann_factor ** 0.5) if sharpe is not None else None
 
     return {
-        "mean_annual": mean_annual,
-        "vol_annual": vol_annual,
-        "sharpe": sharpe,
         "sortino": sortino,
-        "max_drawdown": max_drawdown,
-        "var_95": var_95,
-        "cvar_95": cvar_95,
-        "var_99": var_99,
-        "cvar_99": cvar_99,
         "beta": beta,
         "alpha_annual": alpha_annual,
         "r_squared": r_squared,
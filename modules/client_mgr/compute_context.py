@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(value: Any) -> str:
+    """Stable digest of a JSON-like value (holdings, lot maps) for memo keys."""
+    text = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ComputeContext:
+    """
+    Memo and stage timer for one request (e.g. one dashboard build).
+
+    Valuations, price histories and return series are computed the first time
+    a key is asked for and reused for the rest of the request, so the
+    dashboard, risk and regime payloads share one copy of each input. The
+    context is not shared between requests; the process-wide caches stay
+    responsible for anything longer-lived.
+    """
+
+    def __init__(self, name: str = "request"):
+        self.name = name
+        self._memo: Dict[Hashable, Any] = {}
+        self._stages: Dict[str, float] = {}
+        self._order: List[str] = []
+        self._started = time.perf_counter()
+        self.hits = 0
+        self.misses = 0
+
+    def memo(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        if key in self._memo:
+            self.hits += 1
+            return self._memo[key]
+        self.misses += 1
+        value = compute()
+        self._memo[key] = value
+        return value
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Adds the wall time of the block to stage name (nested stages count in both)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if name not in self._stages:
+                self._order.append(name)
+            self._stages[name] = self._stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    # -------------------------------
+    # Shared inputs
+    # -------------------------------
+
+    def valuation(
+        self,
+        engine: Any,
+        holdings: Dict[str, float],
+        period: str,
+        interval: str,
+        panel: Any = None,
+    ) -> Tuple[float, Dict[str, Any]]:
+        key = ("valuation", fingerprint(holdings), period, interval)
+        return self.memo(
+            key,
+            lambda: engine.calculate_portfolio_value(
+                holdings,
+                history_period=period,
+                history_interval=interval,
+                panel=panel,
+            ),
+        )
+
+    def history(
+        self,
+        engine: Any,
+        holdings: Dict[str, float],
+        lot_map: Optional[Dict[str, List[Dict[str, Any]]]],
+        period: str,
+        interval: str,
+        panel: Any = None,
+    ) -> Any:
+        """Lot-weighted HistorySeries over the valuation for (holdings, period, interval)."""
+        key = ("history", fingerprint(holdings), fingerprint(lot_map or {}), period, interval)
+
+        def _compute() -> Any:
+            _, enriched = self.valuation(engine, holdings, period, interval, panel=panel)
+            return engine.portfolio_history(enriched_data=enriched, holdings=holdings, lot_map=lot_map)
+
+        return self.memo(key, _compute)
+
+    def returns(
+        self,
+        toolkit: Any,
+        holdings: Dict[str, float],
+        benchmark: str,
+        period: str,
+        interval: str,
+        panel: Any = None,
+    ) -> Tuple[Any, Any, str]:
+        key = ("returns", fingerprint(holdings), str(benchmark), period, interval)
+        return self.memo(
+            key,
+            lambda: toolkit._get_portfolio_and_benchmark_returns(
+                holdings,
+                benchmark_ticker=benchmark,
+                period=period,
+                interval=interval,
+                panel=panel,
+            ),
+        )
+
+    # -------------------------------
+    # Reporting
+    # -------------------------------
+
+    def breakdown(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 2),
+            "stages_ms": {name: round(self._stages[name], 2) for name in self._order},
+            "memo_hits": self.hits,
+            "memo_misses": self.misses,
+        }
+
+    def log(self, level: int = logging.INFO) -> Dict[str, Any]:
+        data = self.breakdown()
+        stages = " ".join(f"{name}={ms:.1f}ms" for name, ms in data["stages_ms"].items())
+        logger.log(
+            level,
+            "%s: %.1fms [%s] memo hits=%d misses=%d",
+            self.name,
+            data["total_ms"],
+            stages,
+            self.hits,
+            self.misses,
+        )
+        return data
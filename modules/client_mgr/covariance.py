@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.client_mgr.compute_context import fingerprint
+from modules.market_data.price_panel import PricePanel
+from utils.cache import shared_cache
+
+
+ESTIMATORS = ("sample", "ewma", "ledoit_wolf")
+
+# Rolling states live as long as their universe keeps being asked for; the
+# bar store stays the source of truth if one is evicted
+_COVARIANCE_CACHE = shared_cache(
+    "risk.covariance",
+    max_entries=64,
+    ttl_seconds=6 * 3600,
+    max_bytes=256 * 1024 * 1024,
+)
+
+
+def ledoit_wolf_shrink(sample: np.ndarray, fourth: float, count: int) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf shrinkage of an MLE (1/n) covariance towards mu * I.
+
+    fourth is sum_t ||x_t - mean||^4 over the count rows behind sample, which
+    is all the per-row information the shrinkage intensity needs:
+    sum_t ||x_t x_t' - S||^2 = fourth - n * ||S||^2.
+    """
+    n_assets = sample.shape[0]
+    mu = float(np.trace(sample)) / n_assets
+    frob = float(np.sum(sample * sample))
+    delta = frob - 2.0 * mu * float(np.trace(sample)) + mu * mu * n_assets
+    if count < 2 or delta <= 0:
+        return sample.copy(), 0.0
+    beta = max(0.0, (fourth - count * frob) / (count * count))
+    shrinkage = min(beta, delta) / delta
+    shrunk = (1.0 - shrinkage) * sample
+    shrunk[np.diag_indices(n_assets)] += shrinkage * mu
+    return shrunk, float(shrinkage)
+
+
+@dataclass(frozen=True)
+class CovarianceEstimate:
+    """Per-bar covariance of aligned returns for tickers, with what produced it."""
+
+    tickers: List[str]
+    matrix: np.ndarray
+    estimator: str
+    window: int
+    observations: int
+    shrinkage: float = 0.0
+    last_ts: Optional[pd.Timestamp] = None
+
+    def volatility(self) -> np.ndarray:
+        return np.sqrt(np.clip(np.diag(self.matrix), 0.0, None))
+
+    def correlation(self) -> np.ndarray:
+        vol = self.volatility()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = self.matrix / np.outer(vol, vol)
+        corr[~np.isfinite(corr)] = 0.0
+        np.fill_diagonal(corr, np.where(vol > 0, 1.0, 0.0))
+        return np.clip(corr, -1.0, 1.0)
+
+    def condition_number(self) -> float:
+        eigvals = np.linalg.eigvalsh(self.matrix)
+        low = float(eigvals.min())
+        return float(eigvals.max()) / low if low > 0 else float("inf")
+
+    def subset(self, tickers: Sequence[str]) -> "CovarianceEstimate":
+        pos = {t: i for i, t in enumerate(self.tickers)}
+        keep = [str(t).upper() for t in tickers if str(t).upper() in pos]
+        idx = [pos[t] for t in keep]
+        return CovarianceEstimate(
+            keep,
+            self.matrix[np.ix_(idx, idx)],
+            self.estimator,
+            self.window,
+            self.observations,
+            self.shrinkage,
+            self.last_ts,
+        )
+
+    def heatmap_payload(self, decimals: int = 4) -> Dict[str, Any]:
+        condition = self.condition_number() if self.tickers else 0.0
+        return {
+            "tickers": list(self.tickers),
+            "estimator": self.estimator,
+            "window": self.window,
+            "observations": self.observations,
+            "shrinkage": self.shrinkage,
+            "condition_number": condition if np.isfinite(condition) else None,
+            "volatility": np.round(self.volatility(), decimals + 2).tolist(),
+            "correlation": np.round(self.correlation(), decimals).tolist(),
+            "as_of": self.last_ts.isoformat() if self.last_ts is not None else None,
+        }
+
+
+class RollingCovariance:
+    """
+    Covariance state over the last window aligned return rows of tickers.
+
+    Keeps the window rows with their running sum and cross-product, plus a
+    RiskMetrics EWMA of r r' (decayed sum and decay, seeded with the window
+    sample covariance as ewma_vol_forecast seeds its variance). New rows cost
+    O(N^2) each; sample, EWMA and Ledoit-Wolf estimates then come from the
+    running sums without re-reading history. Sums are rebuilt from the
+    window every RESYNC_EVERY rows so add/subtract drift cannot accumulate.
+    sync() keeps the newest row provisional: the state before it is held and
+    restored on the next sync, so a revised partial bar replaces its value.
+    States are shared across requests, so sync() runs under one lock and
+    extend() ignores timestamped rows that are not past last_ts.
+    """
+
+    RESYNC_EVERY = 512
+
+    def __init__(self, tickers: Sequence[str], window: int = 252, lam: float = 0.94):
+        self.tickers = [str(t).upper() for t in tickers]
+        self.window = max(2, int(window))
+        self.lam = float(lam)
+        n = len(self.tickers)
+        self._rows: deque = deque()
+        self._sum = np.zeros(n)
+        self._cross = np.zeros((n, n))
+        self._ewma = np.zeros((n, n))
+        self._decay = 1.0
+        self._since_resync = 0
+        self.count = 0
+        self.last_ts: Optional[pd.Timestamp] = None
+        self._base: Optional[Tuple[Any, ...]] = None
+        self._tail: Optional[Tuple[pd.DatetimeIndex, np.ndarray]] = None
+        self._estimates: Dict[str, CovarianceEstimate] = {}
+        self._lock = threading.RLock()
+
+    def __sizeof__(self) -> int:
+        n = len(self.tickers)
+        held = 8 * (len(self._base[0]) * n + 2 * n * n + n) if self._base is not None else 0
+        return object.__sizeof__(self) + 8 * (len(self._rows) * n + 2 * n * n + n) + held
+
+    def extend(self, rows: np.ndarray, timestamps: Optional[Sequence[Any]] = None) -> int:
+        """
+        Adds a block of return rows (rows with a gap, or stamped at or before
+        last_ts, are skipped); last_ts moves to the timestamp of the last row
+        actually applied.
+        """
+        block = np.asarray(rows, dtype=np.float64).reshape(-1, len(self.tickers))
+        ok = np.isfinite(block).all(axis=1)
+        with self._lock:
+            if timestamps is not None:
+                stamps = pd.DatetimeIndex(timestamps)
+                if self.last_ts is not None:
+                    ok &= np.asarray(stamps > self.last_ts)
+            block = block[ok]
+            if not len(block):
+                return 0
+            if timestamps is not None:
+                self.last_ts = pd.Timestamp(stamps[ok][-1])
+            self._estimates.clear()
+            k = len(block)
+            weights = (1.0 - self.lam) * self.lam ** np.arange(k - 1, -1, -1)
+            self._ewma = self.lam ** k * self._ewma + (block * weights[:, None]).T @ block
+            self._decay *= self.lam ** k
+
+            self._rows.extend(block)
+            self._sum += block.sum(axis=0)
+            self._cross += block.T @ block
+            overflow = len(self._rows) - self.window
+            if overflow > 0:
+                old = np.array([self._rows.popleft() for _ in range(overflow)])
+                self._sum -= old.sum(axis=0)
+                self._cross -= old.T @ old
+            self.count += k
+            self._since_resync += k
+            if self._since_resync >= self.RESYNC_EVERY or k >= self.window:
+                self._resync()
+        return k
+
+    def _resync(self) -> None:
+        rows = np.array(self._rows)
+        self._sum = rows.sum(axis=0)
+        self._cross = rows.T @ rows
+        self._since_resync = 0
+
+    def _snapshot(self) -> Tuple[Any, ...]:
+        return (
+            list(self._rows),
+            self._sum.copy(),
+            self._cross.copy(),
+            self._ewma.copy(),
+            self._decay,
+            self._since_resync,
+            self.count,
+            self.last_ts,
+        )
+
+    def _rewind(self) -> None:
+        """Restores the state held before the provisional last row."""
+        if self._base is None:
+            return
+        rows, total, cross, ewma, decay, since, count, last_ts = self._base
+        with self._lock:
+            self._estimates.clear()
+            self._rows = deque(rows)
+            self._sum, self._cross, self._ewma = total.copy(), cross.copy(), ewma.copy()
+            self._decay, self._since_resync, self.count, self.last_ts = decay, since, count, last_ts
+
+    def sync(self, returns: pd.DataFrame) -> int:
+        """
+        Feeds rows of returns (columns are tickers) newer than last_ts; the
+        provisional last row is rewound and fed again with its current values.
+        """
+        if returns is None or returns.empty:
+            return 0
+        frame = returns.reindex(columns=self.tickers)
+        index = frame.index
+        if not isinstance(index, pd.DatetimeIndex):
+            return self.extend(frame.to_numpy(dtype=np.float64))
+        # Rewind, re-feed and snapshot must not interleave with another request's sync
+        with self._lock:
+            committed = self._base[-1] if self._base is not None else self.last_ts
+            if committed is not None:
+                frame = frame.iloc[int(index.searchsorted(committed, side="right")):]
+            rows, stamps = frame.to_numpy(dtype=np.float64), frame.index
+            tail = self._tail
+            if tail is not None and tail[0].equals(stamps) and np.array_equal(tail[1], rows, equal_nan=True):
+                # Nothing new and the provisional row is unchanged: keep the cached estimates
+                return 0
+            self._rewind()
+            if frame.empty:
+                return 0
+            added = self.extend(rows[:-1], stamps[:-1])
+            self._base = self._snapshot()
+            cut = int(stamps.searchsorted(self.last_ts, side="right")) if self.last_ts is not None else 0
+            self._tail = (stamps[cut:], rows[cut:].copy())
+            return added + self.extend(rows[-1:], stamps[-1:])
+
+    def estimate(self, estimator: str = "ledoit_wolf") -> Optional[CovarianceEstimate]:
+        """Estimate over the current window; reused until the next row arrives."""
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"estimator must be one of {', '.join(ESTIMATORS)}")
+        with self._lock:
+            cached = self._estimates.get(estimator)
+            if cached is not None:
+                return cached
+            n = len(self._rows)
+            if n < 2:
+                return None
+            mean = self._sum / n
+            scatter = self._cross - n * np.outer(mean, mean)
+            shrinkage = 0.0
+            if estimator == "sample":
+                matrix = scatter / (n - 1)
+            elif estimator == "ewma":
+                matrix = self._ewma + self._decay * (scatter / (n - 1))
+            else:
+                centered = np.array(self._rows) - mean
+                fourth = float(np.sum(np.sum(centered * centered, axis=1) ** 2))
+                matrix, shrinkage = ledoit_wolf_shrink(scatter / n, fourth, n)
+            matrix = (matrix + matrix.T) / 2.0
+            result = CovarianceEstimate(list(self.tickers), matrix, estimator, self.window, n, shrinkage, self.last_ts)
+            self._estimates[estimator] = result
+            return result
+
+
+def estimate_covariance(
+    returns: np.ndarray,
+    estimator: str = "ledoit_wolf",
+    lam: float = 0.94,
+) -> np.ndarray:
+    """One-shot estimate over a (dates x assets) return matrix (rows with a gap dropped)."""
+    matrix = np.asarray(returns, dtype=np.float64)
+    tickers = [str(i) for i in range(matrix.shape[1])]
+    state = RollingCovariance(tickers, window=max(2, matrix.shape[0]), lam=lam)
+    state.extend(matrix)
+    result = state.estimate(estimator)
+    if result is None:
+        raise ValueError("need at least two complete return rows")
+    return result.matrix
+
+
+def panel_covariance(
+    panel: Optional[PricePanel],
+    tickers: Iterable[str],
+    interval: str,
+    window: int = 252,
+    estimator: str = "ledoit_wolf",
+    period: Optional[str] = None,
+) -> Optional[CovarianceEstimate]:
+    """
+    Covariance of tickers' returns from panel, cached by (universe, window,
+    interval, period).
+
+    One rolling state per key serves every estimator and keeps each
+    estimate until a new bar arrives; later calls only feed it the panel
+    rows past its last bar, so a refresh with one new bar costs one O(N^2)
+    update. period is the panel's coverage: panels over different periods
+    hold different rows, so they never share a state.
+    """
+    if panel is None:
+        return None
+    universe = sorted({str(t).upper() for t in tickers if str(t).upper() in panel})
+    if len(universe) < 1:
+        return None
+    key = (fingerprint(universe), int(window), str(interval), str(period or ""))
+    state = _COVARIANCE_CACHE.get(key)
+    if state is None:
+        state = RollingCovariance(universe, window=window)
+    state.sync(panel.returns_frame()[universe])
+    _COVARIANCE_CACHE.set(key, state)
+    return state.estimate(estimator)
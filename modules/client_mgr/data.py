@@ -1,18 +1,15 @@
 from __future__ import annotations
 
-import io
-import contextlib
-import warnings
-import time
 from typing import Tuple, Optional, Dict, Any
 
 import pandas as pd
-import yfinance as yf
 from modules.client_mgr import calculations
+from modules.market_data.price_panel import PricePanel, load_price_panel
+from utils.cache import shared_cache
 
 # Cache for CAPM computations to avoid redundant API calls
-_CAPM_CACHE = {}  # key -> {"ts": int, "data": dict}
 _CAPM_TTL_SECONDS = 900  # 15 minutes
+_CAPM_CACHE = shared_cache("capm.metrics", max_entries=512, ttl_seconds=_CAPM_TTL_SECONDS)
 
 
 
@@ -21,60 +18,39 @@ def get_portfolio_and_benchmark_returns(
     benchmark_ticker: str,
     period: str,
     interval: str,
+    panel: Optional[PricePanel] = None,
 ) -> Tuple[Optional[pd.Series], Optional[pd.Series], str]:
+    """
+    Portfolio and benchmark return series for {ticker: qty}.
+
+    Reads closes from panel when given (it must cover the holdings and the
+    benchmark), otherwise from the shared panel for (period, interval).
+    """
     tickers = [t for t, q in holdings.items() if str(t).strip() and float(q or 0.0) != 0.0]
     if not tickers:
         return None, None, "No non-zero holdings"
 
-    download_list = sorted(set([str(t).upper() for t in tickers] + [benchmark_ticker]))
-    try:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=FutureWarning)
-            warnings.simplefilter("ignore", category=UserWarning)
-            with contextlib.redirect_stderr(io.StringIO()):
-                df = yf.download(
-                    download_list,
-                    period=period,
-                    interval=interval,
-                    progress=False,
-                    group_by="column",
-                    auto_adjust=True,
-                )
-    except Exception as exc:
-        return None, None, f"Market data error: {exc}"
-
-    if df is None or df.empty:
-        return None, None, "Market data empty"
+    if panel is None:
+        download_list = sorted(set([str(t).upper() for t in tickers] + [benchmark_ticker]))
+        try:
+            panel = load_price_panel(download_list, period=period, interval=interval)
+        except Exception as exc:
+            return None, None, f"Market data error: {exc}"
 
-    if isinstance(df.columns, pd.MultiIndex):
-        if "Close" in df.columns.levels[0]:
-            close = df["Close"].copy()
-        elif "Adj Close" in df.columns.levels[0]:
-            close = df["Adj Close"].copy()
-        else:
-            return None, None, "Close price not available"
-    else:
-        close = df.get("Close") or df.get("Adj Close")
-        if close is None:
-            return None, None, "Close price not available"
+    if panel is None or panel.empty:
+        return None, None, "Market data empty"
 
     bench = str(benchmark_ticker).upper()
-    if bench not in close.columns:
+    if bench not in panel:
         return None, None, f"Benchmark '{bench}' missing"
 
-    port_val = None
-    for t, qty in holdings.items():
-        t_norm = str(t).upper()
-        if t_norm == bench or t_norm not in close.columns:
-            continue
-        series = close[t_norm] * float(qty)
-        port_val = series if port_val is None else (port_val + series)
+    port_val = panel.weighted_values(holdings, exclude=[bench])
 
     if port_val is None:
         return None, None, "No overlapping price series"
 
     port_ret = port_val.pct_change().dropna()
-    bench_ret = close[bench].pct_change().dropna()
+    bench_ret = panel.frame()[bench].pct_change().dropna()
     meta = f"Period: {period} | Interval: {interval} | Points: {len(port_ret)}"
     return port_ret, bench_ret, meta
 
@@ -92,8 +68,6 @@ def compute_capm_metrics_from_holdings(
     Output keys:
     - beta, alpha_annual, r_squared, sharpe, vol_annual, points, error
     """
-    ts = int(time.time())
-
     if not holdings:
         return {"error": "No holdings", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
 
@@ -102,8 +76,8 @@ def compute_capm_metrics_from_holdings(
     key = (fp, str(benchmark_ticker).upper(), period, float(risk_free_annual))
 
     cached = _CAPM_CACHE.get(key)
-    if cached and (ts - int(cached.get("ts", 0))) <= _CAPM_TTL_SECONDS:
-        return cached["data"]
+    if cached is not None:
+        return cached
 
     try:
         port_ret, mkt_ret, meta = get_portfolio_and_benchmark_returns(
@@ -115,7 +89,7 @@ def compute_capm_metrics_from_holdings(
 
         if port_ret is None:
             data = {"error": meta, "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
-            _CAPM_CACHE[key] = {"ts": ts, "data": data}
+            _CAPM_CACHE.set(key, data)
             return data
 
         capm = calculations.compute_capm_metrics_from_returns(
@@ -130,11 +104,11 @@ def compute_capm_metrics_from_holdings(
             "risk_free_annual": float(risk_free_annual),
         })
 
-        _CAPM_CACHE[key] = {"ts": ts, "data": capm}
+        _CAPM_CACHE.set(key, capm)
         return capm
 
     except Exception as ex:
         data = {"error": f"CAPM compute error: {ex}", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
-        _CAPM_CACHE[key] = {"ts": ts, "data": data}
+        _CAPM_CACHE.set(key, data)
         return data
 
@@ -0,0 +1,536 @@
+from __future__ import annotations
+
+import concurrent.futures
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.client_mgr.calculations import annualization_factor_from_index
+from modules.client_mgr.compute_context import fingerprint
+from modules.client_mgr.holdings import normalize_ticker
+from modules.market_data.bar_store import PERIOD_DAYS
+from modules.market_data.price_panel import PricePanel, load_price_panel
+from modules.market_data.yfinance_client import YahooWrapper
+from utils.cache import shared_cache
+
+
+MARKET = "SPY"
+
+# Style factors as long/short ETF return spreads (short None = plain return)
+STYLE_FACTORS: Dict[str, Tuple[str, Optional[str]]] = {
+    "market": (MARKET, None),
+    "size": ("IWM", MARKET),
+    "value": ("IWD", "IWF"),
+    "momentum": ("MTUM", MARKET),
+}
+
+
+def _sector_factors() -> Dict[str, Tuple[str, Optional[str]]]:
+    """Each US sector ETF in excess of the market, so it does not restate the market factor."""
+    out: Dict[str, Tuple[str, Optional[str]]] = {}
+    for group in YahooWrapper.MACRO_TICKERS.get("US Sectors", {}).values():
+        for etf, name in group.items():
+            out[str(name)] = (str(etf).upper(), MARKET)
+    return out
+
+
+FACTORS: Dict[str, Tuple[str, Optional[str]]] = {**STYLE_FACTORS, **_sector_factors()}
+FACTOR_TICKERS = sorted({t for pair in FACTORS.values() for t in pair if t})
+
+# Loadings use daily bars over FACTOR_PERIOD whatever the dashboard interval,
+# so exposures stay comparable across views
+FACTOR_PERIOD = "2y"
+FACTOR_WINDOW = 252
+ROLLING_POINTS = 120
+
+# Ridge penalty relative to each factor's centered sum of squares (the
+# intercept is not penalized). The sector spreads add up to roughly zero
+# (the market is their cap-weighted sum), so without it the sector loadings
+# are barely identified and swing between windows.
+FACTOR_RIDGE = 0.01
+
+# Dashboards read factor bars from the store; missing series are downloaded
+# here in the background so a render never waits on them
+_WARM_LOCK = threading.Lock()
+_WARM_INFLIGHT: set = set()
+_WARM_EXECUTOR: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+_FACTOR_CACHE = shared_cache(
+    "risk.factors",
+    max_entries=64,
+    ttl_seconds=6 * 3600,
+    max_bytes=128 * 1024 * 1024,
+)
+
+
+def factor_returns(panel: PricePanel, factors: Mapping[str, Tuple[str, Optional[str]]] = FACTORS) -> pd.DataFrame:
+    """Factor return columns (long leg minus short leg) on the panel's return index; factors with a missing leg are left out."""
+    returns = panel.returns()
+    columns: Dict[str, np.ndarray] = {}
+    pos = {t: i for i, t in enumerate(panel.tickers)}
+    for name, (long, short) in factors.items():
+        if long not in pos or (short is not None and short not in pos):
+            continue
+        series = returns[:, pos[long]]
+        if short is not None:
+            series = series - returns[:, pos[short]]
+        columns[name] = series
+    return pd.DataFrame(columns, index=panel.index[1:])
+
+
+def _ridge_rows(f: np.ndarray, ridge: float) -> np.ndarray:
+    """Rows that, appended to [1, f], add ridge * centered sum of squares to each factor's diagonal."""
+    centered = f - f.mean(axis=0)
+    scale = np.sqrt(ridge * (centered * centered).sum(axis=0))
+    return np.column_stack([np.zeros(f.shape[1]), np.diag(scale)])
+
+
+def fit_loadings(
+    asset_returns: np.ndarray,
+    factor_rets: np.ndarray,
+    min_obs: Optional[int] = None,
+    ridge: float = FACTOR_RIDGE,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Ridge regression of every asset column on the factors (plus an
+    unpenalized intercept); ridge=0 is plain OLS.
+
+    Rows with a missing factor are dropped for every asset. Assets are
+    grouped by which remaining rows they have data for, and each group is
+    solved with one lstsq call over all its columns (the penalty enters as
+    extra rows), so a book with a common history costs a single solve.
+    Returns (alpha, loadings (assets x factors), r_squared, observations);
+    assets with fewer than min_obs rows get NaN.
+    """
+    y = np.asarray(asset_returns, dtype=np.float64)
+    f = np.asarray(factor_rets, dtype=np.float64)
+    n_assets, k = y.shape[1], f.shape[1]
+    min_obs = max(k + 2, int(min_obs or 2 * (k + 1)))
+    alpha = np.full(n_assets, np.nan)
+    loadings = np.full((n_assets, k), np.nan)
+    r_squared = np.full(n_assets, np.nan)
+    rows = np.isfinite(f).all(axis=1)
+    x = np.column_stack([np.ones(int(rows.sum())), f[rows]])
+    y = y[rows]
+    have = np.isfinite(y)
+    observations = have.sum(axis=0)
+    patterns: Dict[bytes, List[int]] = {}
+    for col in np.flatnonzero(observations >= min_obs):
+        patterns.setdefault(np.packbits(have[:, col]).tobytes(), []).append(int(col))
+    for cols in patterns.values():
+        mask = have[:, cols[0]]
+        xs, ys = x[mask], y[mask][:, cols]
+        if ridge > 0:
+            penalty = _ridge_rows(xs[:, 1:], ridge)
+            coef, *_ = np.linalg.lstsq(
+                np.vstack([xs, penalty]), np.vstack([ys, np.zeros((len(penalty), len(cols)))]), rcond=None
+            )
+        else:
+            coef, *_ = np.linalg.lstsq(xs, ys, rcond=None)
+        resid = ys - xs @ coef
+        centered = ys - ys.mean(axis=0)
+        total = (centered * centered).sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r_squared[cols] = np.where(total > 0, 1.0 - (resid * resid).sum(axis=0) / total, np.nan)
+        alpha[cols] = coef[0]
+        loadings[cols] = coef[1:].T
+    return alpha, loadings, r_squared, observations
+
+
+@dataclass(frozen=True)
+class FactorModel:
+    """Factor loadings of each ticker over the last window bars."""
+
+    tickers: List[str]
+    factors: List[str]
+    alpha: np.ndarray
+    loadings: np.ndarray
+    r_squared: np.ndarray
+    observations: np.ndarray
+    window: int
+    ann_factor: float
+    last_ts: Optional[pd.Timestamp] = None
+
+    def exposure(self, weights: Mapping[str, float]) -> Dict[str, Any]:
+        """Weight-averaged loadings (the loadings of a fixed-weight portfolio) over fitted tickers."""
+        pos = {t: i for i, t in enumerate(self.tickers)}
+        idx, w = [], []
+        for ticker, weight in weights.items():
+            i = pos.get(str(ticker).upper())
+            if i is not None and np.isfinite(self.alpha[i]) and weight:
+                idx.append(i)
+                w.append(float(weight))
+        if not idx:
+            return {"coverage": 0.0, "alpha_annual": None, "loadings": {}}
+        total = float(sum(abs(v) for v in weights.values() if v))
+        weight = np.array(w) / sum(w)
+        loadings = weight @ self.loadings[idx]
+        return {
+            "coverage": float(sum(abs(v) for v in w)) / total if total else 0.0,
+            "alpha_annual": float(weight @ self.alpha[idx]) * self.ann_factor,
+            "loadings": {name: float(value) for name, value in zip(self.factors, loadings)},
+        }
+
+    def rows(self) -> List[Dict[str, Any]]:
+        out = []
+        for i, ticker in enumerate(self.tickers):
+            if not np.isfinite(self.alpha[i]):
+                continue
+            out.append(
+                {
+                    "ticker": ticker,
+                    "alpha_annual": float(self.alpha[i]) * self.ann_factor,
+                    "r_squared": float(self.r_squared[i]),
+                    "observations": int(self.observations[i]),
+                    "loadings": {name: float(v) for name, v in zip(self.factors, self.loadings[i])},
+                }
+            )
+        return out
+
+
+class RollingFactorRegression:
+    """
+    Factor loadings of one or more return columns over a rolling window.
+
+    Keeps the window rows with running X'X and X'Y sums (X = [1, factors]).
+    A block of new rows turns into per-row sums with one cumulative sum of
+    the added minus dropped outer products, and the loadings at every new
+    row come from one batched solve, so a refresh with one new bar costs
+    one small update and one k x k solve. Loadings are recorded for the
+    last max_history rows. Sums are rebuilt from the window every
+    RESYNC_EVERY rows against drift. Solves carry the same ridge penalty as
+    fit_loadings. sync() keeps the newest row provisional: the state before
+    it is held and restored on the next sync, so a revised partial bar
+    replaces its loadings instead of being frozen. States are shared across
+    requests, so the whole of sync() runs under the instance lock.
+    """
+
+    RESYNC_EVERY = 512
+
+    def __init__(
+        self,
+        factors: Sequence[str],
+        columns: int = 1,
+        window: int = FACTOR_WINDOW,
+        max_history: int = 2520,
+        ridge: float = FACTOR_RIDGE,
+    ):
+        self.factors = list(factors)
+        self.ridge = float(ridge)
+        self.window = max(len(self.factors) + 3, int(window))
+        self.columns = int(columns)
+        k = len(self.factors) + 1
+        self._x: deque = deque()
+        self._y: deque = deque()
+        self._xtx = np.zeros((k, k))
+        self._xty = np.zeros((k, self.columns))
+        self._since_resync = 0
+        self.count = 0
+        self.last_ts: Optional[pd.Timestamp] = None
+        self.history: deque = deque(maxlen=max_history)
+        self._base: Optional[Tuple[Any, ...]] = None
+        self._lock = threading.RLock()
+
+    def __sizeof__(self) -> int:
+        k = len(self.factors) + 1
+        rows = len(self._x) * (k + self.columns)
+        size = 8 * (rows + k * k + k * self.columns + len(self.history) * k * self.columns)
+        if self._base is not None:
+            # The held rows and sums; history entries are shared with the live deque
+            size += 8 * (len(self._base[0]) * (k + self.columns) + k * k + k * self.columns)
+        return object.__sizeof__(self) + size
+
+    def _solve(self, xtx: np.ndarray, xty: np.ndarray) -> np.ndarray:
+        # Tiny ridge keeps collinear windows (e.g. a flat factor) solvable
+        ridge = 1e-12 * np.trace(xtx, axis1=-2, axis2=-1)[..., None, None] * np.eye(xtx.shape[-1])
+        if self.ridge > 0:
+            # Centered sum of squares per factor: S_jj - S_0j^2 / S_00
+            diag = np.diagonal(xtx, axis1=-2, axis2=-1)
+            centered = np.clip(diag[..., 1:] - xtx[..., 0, 1:] ** 2 / diag[..., :1], 0.0, None)
+            penalty = np.concatenate([np.zeros_like(diag[..., :1]), self.ridge * centered], axis=-1)
+            ridge = ridge + penalty[..., :, None] * np.eye(xtx.shape[-1])
+        return np.linalg.solve(xtx + ridge, xty)
+
+    def extend(self, factor_rows: np.ndarray, y_rows: np.ndarray, index: Optional[Sequence[Any]] = None) -> int:
+        """
+        Adds rows (a row with any gap is skipped); index labels the loadings
+        recorded in history, and last_ts moves to the last applied row's label.
+        """
+        f = np.asarray(factor_rows, dtype=np.float64).reshape(-1, len(self.factors))
+        y = np.asarray(y_rows, dtype=np.float64).reshape(-1, self.columns)
+        labels = list(index) if index is not None else [None] * len(f)
+        ok = np.isfinite(f).all(axis=1) & np.isfinite(y).all(axis=1)
+        if not ok.any():
+            return 0
+        x = np.column_stack([np.ones(int(ok.sum())), f[ok]])
+        y = y[ok]
+        labels = [label for label, keep in zip(labels, ok) if keep]
+        with self._lock:
+            if labels[-1] is not None:
+                self.last_ts = pd.Timestamp(labels[-1])
+            m, prior = len(x), len(self._x)
+            old_x = np.array(self._x).reshape(prior, x.shape[1])
+            old_y = np.array(self._y).reshape(prior, self.columns)
+            all_x = np.vstack([old_x, x])
+            all_y = np.vstack([old_y, y])
+            positions = np.arange(prior, prior + m)
+            dropped = positions - self.window
+            keep = dropped >= 0
+            drop_x = np.zeros_like(x)
+            drop_y = np.zeros_like(y)
+            drop_x[keep] = all_x[dropped[keep]]
+            drop_y[keep] = all_y[dropped[keep]]
+            xtx = self._xtx + np.cumsum(
+                np.einsum("ti,tj->tij", x, x) - np.einsum("ti,tj->tij", drop_x, drop_x), axis=0
+            )
+            xty = self._xty + np.cumsum(
+                np.einsum("ti,tj->tij", x, y) - np.einsum("ti,tj->tij", drop_x, drop_y), axis=0
+            )
+            counts = np.minimum(positions + 1, self.window)
+            ready = counts >= 2 * x.shape[1]
+            if ready.any():
+                coefs = self._solve(xtx[ready], xty[ready])
+                for label, coef in zip(np.asarray(labels, dtype=object)[ready], coefs):
+                    self.history.append((label, coef))
+            self._xtx, self._xty = xtx[-1], xty[-1]
+            self._x.extend(x)
+            self._y.extend(y)
+            while len(self._x) > self.window:
+                self._x.popleft()
+                self._y.popleft()
+            self.count += m
+            self._since_resync += m
+            if self._since_resync >= self.RESYNC_EVERY:
+                rx, ry = np.array(self._x), np.array(self._y)
+                self._xtx, self._xty = rx.T @ rx, rx.T @ ry
+                self._since_resync = 0
+        return m
+
+    def _rewind(self) -> None:
+        """Restores the state held before the provisional last row."""
+        if self._base is None:
+            return
+        x, y, xtx, xty, since, count, last_ts, history = self._base
+        with self._lock:
+            self._x, self._y = deque(x), deque(y)
+            self._xtx, self._xty = xtx.copy(), xty.copy()
+            self._since_resync, self.count, self.last_ts = since, count, last_ts
+            self.history.clear()
+            self.history.extend(history)
+
+    def sync(self, factor_frame: pd.DataFrame, y_frame: pd.DataFrame) -> int:
+        """
+        Feeds aligned rows newer than last_ts; the provisional last row is
+        rewound and fed again with its current values.
+        """
+        frame = pd.concat([factor_frame[self.factors], y_frame], axis=1, join="inner")
+        values = frame.to_numpy(dtype=np.float64)
+        k = len(self.factors)
+        if not isinstance(frame.index, pd.DatetimeIndex):
+            return self.extend(values[:, :k], values[:, k:], frame.index)
+        # Rewind, re-feed and snapshot must not interleave with another request's sync
+        with self._lock:
+            self._rewind()
+            start = int(frame.index.searchsorted(self.last_ts, side="right")) if self.last_ts is not None else 0
+            values, index = values[start:], frame.index[start:]
+            if not len(values):
+                return 0
+            added = self.extend(values[:-1, :k], values[:-1, k:], index[:-1])
+            self._base = (
+                list(self._x),
+                list(self._y),
+                self._xtx.copy(),
+                self._xty.copy(),
+                self._since_resync,
+                self.count,
+                self.last_ts,
+                list(self.history),
+            )
+            return added + self.extend(values[-1:, :k], values[-1:, k:], index[-1:])
+
+    def loadings(self) -> Optional[np.ndarray]:
+        """(1 + factors) x columns coefficients over the current window (intercept first)."""
+        with self._lock:
+            if len(self._x) < 2 * (len(self.factors) + 1):
+                return None
+            return self._solve(self._xtx, self._xty)
+
+
+def _universe(tickers: Iterable[str]) -> List[str]:
+    return sorted({normalize_ticker(t) for t in tickers if normalize_ticker(t)})
+
+
+def panel_factor_model(
+    panel: Optional[PricePanel],
+    tickers: Iterable[str],
+    window: int = FACTOR_WINDOW,
+) -> Optional[FactorModel]:
+    """Loadings of tickers over the last window bars of panel, cached per (universe, window) until a new bar."""
+    if panel is None or panel.empty:
+        return None
+    universe = [t for t in _universe(tickers) if t in panel]
+    factors = factor_returns(panel)
+    if not universe or factors.empty:
+        return None
+    last_ts = panel.index[-1]
+    key = ("model", fingerprint(universe), int(window))
+    cached = _FACTOR_CACHE.get(key)
+    if cached is not None and cached.last_ts == last_ts and cached.factors == list(factors.columns):
+        return cached
+    factors = factors.iloc[-int(window):]
+    assets = panel.returns_frame()[universe].iloc[-int(window):]
+    alpha, loadings, r_squared, observations = fit_loadings(assets.to_numpy(), factors.to_numpy())
+    model = FactorModel(
+        tickers=universe,
+        factors=list(factors.columns),
+        alpha=alpha,
+        loadings=loadings,
+        r_squared=r_squared,
+        observations=observations,
+        window=int(window),
+        ann_factor=annualization_factor_from_index(assets),
+        last_ts=last_ts,
+    )
+    _FACTOR_CACHE.set(key, model)
+    return model
+
+
+def portfolio_rolling_loadings(
+    panel: Optional[PricePanel],
+    holdings: Mapping[str, float],
+    window: int = FACTOR_WINDOW,
+    exclude: Iterable[str] = (),
+) -> Optional[RollingFactorRegression]:
+    """Rolling loadings of the holdings' value-weighted return, cached per (holdings, window) and fed only new bars."""
+    if panel is None or panel.empty:
+        return None
+    values = panel.weighted_values(
+        {normalize_ticker(t): float(q or 0.0) for t, q in holdings.items() if normalize_ticker(t)},
+        exclude=[str(t).upper() for t in exclude],
+    )
+    factors = factor_returns(panel)
+    if values is None or factors.empty:
+        return None
+    returns = values.pct_change().iloc[1:].to_frame("portfolio")
+    key = ("rolling", fingerprint(holdings), int(window))
+    state = _FACTOR_CACHE.get(key)
+    if state is None or state.factors != list(factors.columns):
+        state = RollingFactorRegression(list(factors.columns), columns=1, window=window)
+    state.sync(factors, returns)
+    _FACTOR_CACHE.set(key, state)
+    return state
+
+
+def _warm_one(symbols: Tuple[str, ...]) -> None:
+    try:
+        YahooWrapper.get_history_frame(symbols, period=FACTOR_PERIOD, interval="1d")
+    except Exception:
+        pass
+    finally:
+        with _WARM_LOCK:
+            _WARM_INFLIGHT.difference_update(symbols)
+
+
+def warm_factor_bars(symbols: Iterable[str]) -> int:
+    """Queues a background download of symbols' daily bars; returns how many were queued."""
+    global _WARM_EXECUTOR
+    with _WARM_LOCK:
+        pending = tuple(sorted({str(s).upper() for s in symbols} - _WARM_INFLIGHT))
+        if not pending:
+            return 0
+        _WARM_INFLIGHT.update(pending)
+        if _WARM_EXECUTOR is None:
+            _WARM_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="factor-bars")
+        executor = _WARM_EXECUTOR
+    executor.submit(_warm_one, pending)
+    return len(pending)
+
+
+def stored_factor_panel(tickers: Iterable[str]) -> Tuple[Optional[PricePanel], List[str]]:
+    """
+    Daily closes of tickers and the factor ETFs over FACTOR_PERIOD from the
+    bar store (no network), and the factor ETFs it has no bars for (holdings
+    are stored by the dashboard's own panel).
+    """
+    symbols = sorted(set(_universe(tickers)) | set(FACTOR_TICKERS))
+    start = datetime.now() - timedelta(days=PERIOD_DAYS[FACTOR_PERIOD])
+    try:
+        frame = YahooWrapper.bar_store().stored_frame(symbols, interval="1d", start=start)
+        panel = PricePanel.from_frame(frame, symbols)
+    except Exception:
+        panel = None
+    if panel is None:
+        return None, list(FACTOR_TICKERS)
+    # Only closes are needed; drop the OHLCV source frame
+    panel = PricePanel(panel.index, panel.tickers, panel.values)
+    return panel, [s for s in FACTOR_TICKERS if s not in panel]
+
+
+def factor_payload(
+    holdings: Mapping[str, float],
+    exclude: Iterable[str] = (),
+    window: int = FACTOR_WINDOW,
+    panel: Optional[PricePanel] = None,
+    fetch: bool = False,
+) -> Dict[str, Any]:
+    """
+    Factor exposures for the risk dashboards: per-holding loadings, the
+    value-weighted portfolio exposure and its rolling loadings.
+
+    Without a panel, bars come from the bar store only and series it lacks
+    are downloaded in the background for the next render; fetch=True
+    downloads them first instead.
+    """
+    skip = {str(t).upper() for t in exclude}
+    quantities = {
+        normalize_ticker(t): float(q or 0.0)
+        for t, q in (holdings or {}).items()
+        if normalize_ticker(t) and normalize_ticker(t) not in skip and float(q or 0.0)
+    }
+    if not quantities:
+        return {"error": "No holdings available for factor analysis."}
+    if panel is None and fetch:
+        try:
+            panel = load_price_panel(list(quantities) + FACTOR_TICKERS, period=FACTOR_PERIOD, interval="1d")
+        except Exception:
+            panel = None
+    elif panel is None:
+        panel, missing = stored_factor_panel(quantities)
+        if missing:
+            warm_factor_bars(missing)
+            if panel is None or MARKET not in panel:
+                return {"error": "Factor history is loading; refresh shortly."}
+    model = panel_factor_model(panel, quantities, window=window)
+    if model is None:
+        return {"error": "Insufficient market data"}
+    prices = panel.filled()[-1]
+    pos = {t: i for i, t in enumerate(panel.tickers)}
+    weights = {
+        t: qty * prices[pos[t]]
+        for t, qty in quantities.items()
+        if t in pos and np.isfinite(prices[pos[t]])
+    }
+    payload: Dict[str, Any] = {
+        "factors": model.factors,
+        "definitions": {name: list(FACTORS[name]) for name in model.factors},
+        "window": model.window,
+        "as_of": model.last_ts.isoformat() if model.last_ts is not None else None,
+        "exposure": model.exposure(weights),
+        "holdings": model.rows(),
+        "rolling": [],
+    }
+    rolling = portfolio_rolling_loadings(panel, quantities, window=window)
+    if rolling is not None:
+        payload["rolling"] = [
+            {
+                "date": pd.Timestamp(label).isoformat() if label is not None else None,
+                "loadings": {name: float(value) for name, value in zip(model.factors, coef[1:, 0])},
+            }
+            for label, coef in list(rolling.history)[-ROLLING_POINTS:]
+        ]
+    return payload
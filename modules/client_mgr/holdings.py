@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+from bisect import bisect_left
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
+
 
 Timestamp = Optional[datetime]
 PriceLookup = Callable[[datetime], Optional[float]]
@@ -41,6 +44,75 @@ def parse_timestamp(raw: Any) -> Optional[datetime]:
     return None
 
 
+# Lengths of the naive ISO forms NumPy parses the same way datetime.fromisoformat
+# does: date, date+HH:MM, date+HH:MM:SS, and with microseconds
+_ISO_LENGTHS = {10, 16, 19, 26}
+_MIN_DATETIME64 = np.datetime64("0001-01-01", "us")
+
+
+def _fast_iso_timestamps(values: List[Any]) -> Optional[np.ndarray]:
+    """One NumPy parse when every value is a plain naive ISO string; None otherwise."""
+    if values and all(type(v) is str for v in values) and set(map(len, values)) <= _ISO_LENGTHS:
+        text = "".join(values)
+        # Offsets, "Z" and NaT spellings go through parse_timestamp instead
+        if text.count("-") == 2 * len(values) and not any(c in text for c in "+Zz"):
+            try:
+                parsed = np.array(values, dtype="datetime64[us]")
+            except ValueError:
+                return None
+            if not np.isnat(parsed).any() and parsed.min() >= _MIN_DATETIME64:
+                return parsed
+    return None
+
+
+def parse_timestamps(raw_values: Iterable[Any]) -> Optional[np.ndarray]:
+    """
+    parse_timestamp over a whole sequence.
+
+    Returns datetime64[us] for naive timestamps (plain ISO strings are parsed
+    by NumPy in one call), an object array of datetimes when any value is
+    timezone-aware, or None if any value does not parse.
+    """
+    values = list(raw_values)
+    fast = _fast_iso_timestamps(values)
+    if fast is not None:
+        return fast
+    parsed = [parse_timestamp(v) for v in values]
+    if any(ts is None for ts in parsed):
+        return None
+    if any(ts.tzinfo is not None for ts in parsed):
+        return np.array(parsed, dtype=object)
+    return np.array(parsed, dtype="datetime64[us]")
+
+
+def parse_timestamp_column(raw_values: Iterable[Any]) -> np.ndarray:
+    """
+    parse_timestamp per value as datetime64[us], NaT where a value does not parse.
+
+    Plain ISO strings are parsed by NumPy in one call even when other values
+    (LEGACY, None, other formats) need parse_timestamp. Timezone-aware values
+    keep their wall-clock time.
+    """
+    values = list(raw_values)
+    out = np.full(len(values), np.datetime64("NaT", "us"))
+    plain = [i for i, v in enumerate(values) if type(v) is str and len(v) in _ISO_LENGTHS]
+    fast = _fast_iso_timestamps([values[i] for i in plain]) if plain else None
+    if fast is not None:
+        out[plain] = fast
+        if len(plain) == len(values):
+            return out
+        rest = np.ones(len(values), dtype=bool)
+        rest[plain] = False
+        pending = np.flatnonzero(rest).tolist()
+    else:
+        pending = range(len(values))
+    for idx in pending:
+        ts = parse_timestamp(values[idx])
+        if ts is not None:
+            out[idx] = np.datetime64(ts.replace(tzinfo=None), "us")
+    return out
+
+
 def format_timestamp(ts: datetime) -> str:
     return ts.strftime("%Y-%m-%dT%H:%M:%S")
 
@@ -69,16 +141,54 @@ def select_nearest_price(
     series: Iterable[Tuple[datetime, float]],
     target: datetime,
 ) -> Optional[float]:
-    points = [(ts, price) for ts, price in series if isinstance(ts, datetime)]
+    points = sorted(
+        ((ts, price) for ts, price in series if isinstance(ts, datetime)),
+        key=lambda item: item[0],
+    )
     if not points:
         return None
-    nearest = min(points, key=lambda item: abs(item[0] - target))
+    pos = bisect_left([ts for ts, _ in points], target)
+    # Only the neighbours around the insertion point can be nearest
+    candidates = points[max(0, pos - 1):pos + 1]
+    nearest = min(candidates, key=lambda item: abs(item[0] - target))
     try:
         return float(nearest[1])
     except Exception:
         return None
 
 
+def nearest_prices(
+    index: Any,
+    values: Any,
+    targets: Any,
+    max_gap: Optional[timedelta] = None,
+) -> np.ndarray:
+    """
+    Vectorized select_nearest_price for many targets against one sorted series.
+
+    index/targets are datetime-like arrays (index ascending). Returns a float
+    array aligned with targets; NaN where the series is empty or the nearest
+    point is further than max_gap. Ties resolve to the earlier point.
+    """
+    idx = np.asarray(index, dtype="datetime64[ns]")
+    vals = np.asarray(values, dtype=float)
+    tgt = np.asarray(targets, dtype="datetime64[ns]")
+    out = np.full(tgt.shape, np.nan)
+    if idx.size == 0 or tgt.size == 0:
+        return out
+    pos = np.searchsorted(idx, tgt, side="left")
+    left = np.clip(pos - 1, 0, idx.size - 1)
+    right = np.clip(pos, 0, idx.size - 1)
+    left_gap = np.abs(tgt - idx[left])
+    right_gap = np.abs(idx[right] - tgt)
+    pick = np.where(left_gap <= right_gap, left, right)
+    out = vals[pick]
+    if max_gap is not None:
+        gap = np.minimum(left_gap, right_gap)
+        out = np.where(gap <= np.timedelta64(max_gap), out, np.nan)
+    return out
+
+
 def build_lot_entry(
     qty: float,
     basis: Optional[float],
@@ -20,8 +20,9 @@ from modules.client_mgr.holdings import (
     parse_timestamp,
 )
 from modules.client_mgr.data_handler import DataHandler
-from modules.client_mgr.valuation import ValuationEngine
-from modules.client_mgr.toolkit import FinancialToolkit, RegimeRenderer
+from modules.client_mgr.valuation import IncrementalValuation, ValuationEngine
+from modules.client_mgr.toolkit import FinancialToolkit
+from modules.client_mgr.regime_views import RegimeRenderer
 from modules.client_mgr.regime import RegimeModels
 from modules.client_mgr.tools import Tools
 from modules.client_mgr.tax import TaxEngine
@@ -57,6 +58,8 @@ class ClientManager:
         self._tax_engine: Optional[TaxEngine] = None
         self._trackers: Optional[GlobalTrackers] = None
         self._list_val_cache = {}
+        # account_id -> IncrementalValuation backing the list view totals
+        self._list_valuations: Dict[str, IncrementalValuation] = {}
         self._settings_file = os.path.join(os.getcwd(), "config", "settings.json")
 
     @property
@@ -86,6 +89,7 @@ class ClientManager:
         """Entry point for the Manager module."""
         while True:
             # 1. Prepare Data for List View
+            self._refresh_list_values(self.clients)
             val_map = {}
             for c in self.clients:
                 val_map[c.client_id] = self._get_cached_list_value(c)
@@ -157,6 +161,42 @@ class ClientManager:
                 holdings[ticker] = holdings.get(ticker, 0.0) + float(qty or 0.0)
         return tuple(sorted((t, round(q, 6)) for t, q in holdings.items()))
 
+    def _refresh_list_values(self, clients: List[Client], ttl_seconds: int = 30) -> None:
+        """Values every client whose list cache is stale in one batch over their ticker union."""
+        self._prune_list_caches()
+        now = time.time()
+        stale = []
+        for client in clients:
+            cache = self._list_val_cache.get(client.client_id)
+            fp = self._client_holdings_fingerprint(client)
+            if not cache or cache.get("fp") != fp or (now - cache.get("ts", 0)) >= ttl_seconds:
+                stale.append((client, fp))
+        if not stale:
+            return
+
+        ShellRenderer.set_busy(0.8)
+        result = self.valuation_engine.value_accounts(
+            [(c.client_id, acc.account_id, acc.holdings) for c, _ in stale for acc in c.accounts],
+            history_period="1mo",
+            history_interval="1d",
+            books=self._list_valuations,
+        )
+        for client, fp in stale:
+            self._list_val_cache[client.client_id] = {
+                "fp": fp,
+                "ts": now,
+                "value": result.clients.get(client.client_id, 0.0),
+            }
+
+    def _prune_list_caches(self) -> None:
+        """Drops list caches and valuation books of clients/accounts that no longer exist."""
+        client_ids = {c.client_id for c in self.clients}
+        account_ids = {acc.account_id for c in self.clients for acc in c.accounts}
+        for cid in [cid for cid in self._list_val_cache if cid not in client_ids]:
+            del self._list_val_cache[cid]
+        for aid in [aid for aid in self._list_valuations if aid not in account_ids]:
+            del self._list_valuations[aid]
+
     def _get_cached_list_value(self, client: Client, ttl_seconds: int = 30) -> float:
         cache = self._list_val_cache.get(client.client_id)
         now = time.time()
@@ -165,12 +205,15 @@ class ClientManager:
             if cache.get("fp") == fp and (now - cache.get("ts", 0)) < ttl_seconds:
                 return float(cache.get("value", 0.0) or 0.0)
 
+        # Past the TTL only holdings whose quote or quantity moved are repriced
         total = 0.0
         for acc in client.accounts:
             ShellRenderer.set_busy(0.8)
-            v, _ = self.valuation_engine.calculate_portfolio_value(
-                acc.holdings, history_period="1mo", history_interval="1d"
-            )
+            book = self._list_valuations.get(acc.account_id)
+            if book is None:
+                book = IncrementalValuation(self.valuation_engine, history_period="1mo", history_interval="1d")
+                self._list_valuations[acc.account_id] = book
+            v, _ = book.update(acc.holdings)
             total += float(v or 0.0)
         self._list_val_cache[client.client_id] = {"fp": fp, "ts": now, "value": total}
         return total
@@ -674,6 +717,7 @@ class ClientManager:
         client = next((c for c in self.clients if c.client_id == cid), None)
         if client and InputSafe.get_yes_no(f"Delete {client.name}?"):
             self.clients.remove(client)
+            self._prune_list_caches()
             self.console.print("[green]Deleted.[/green]")
         InputSafe.pause()
 
@@ -6,9 +6,10 @@ from typing import Optional
 
 import numpy as np
 import pandas as pd
-import yfinance as yf
 
 from modules.client_mgr import calculations
+from modules.market_data.bar_store import BarStore
+from modules.market_data.yfinance_client import YahooWrapper
 
 
 class RegimeModels:
@@ -283,12 +284,16 @@ class RegimeModels:
         if not symbol:
             return {"error": "Missing ticker"}
 
+        bench_symbol = str(benchmark_ticker).upper() if benchmark_ticker else ""
+        symbols = [symbol, bench_symbol] if bench_symbol else [symbol]
         try:
-            df = yf.download(symbol, period=period, interval=interval, progress=False, auto_adjust=True)
+            frame = YahooWrapper.get_history_frame(symbols, period=period, interval=interval)
         except Exception as exc:
             return {"error": f"Failed to fetch data: {exc}"}
 
-        if df is None or df.empty or "Close" not in df.columns:
+        bars = BarStore.split_frame(frame, symbols)
+        df = bars.get(symbol)
+        if df is None or df.empty:
             return {"error": "No historical data available"}
 
         returns = df["Close"].pct_change().dropna()
@@ -306,19 +311,9 @@ class RegimeModels:
             return snap
 
         bench_returns = pd.Series(dtype=float)
-        if benchmark_ticker:
-            try:
-                bench = yf.download(
-                    str(benchmark_ticker).upper(),
-                    period=period,
-                    interval=interval,
-                    progress=False,
-                    auto_adjust=True,
-                )
-                if bench is not None and not bench.empty and "Close" in bench.columns:
-                    bench_returns = bench["Close"].pct_change().dropna()
-            except Exception:
-                bench_returns = pd.Series(dtype=float)
+        bench = bars.get(bench_symbol)
+        if bench is not None and not bench.empty:
+            bench_returns = bench["Close"].pct_change().dropna()
 
         metrics = calculations.compute_core_metrics(returns, bench_returns)
 
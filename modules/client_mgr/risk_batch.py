@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.client_mgr.calculations import compute_risk_metrics
+from modules.client_mgr.data import get_portfolio_and_benchmark_returns
+from modules.client_mgr.holdings import normalize_ticker
+from modules.client_mgr.regime import RegimeModels
+from modules.client_mgr.toolkit import FinancialToolkit
+from modules.client_mgr.toolkit_payloads import TOOLKIT_INTERVAL, TOOLKIT_PERIOD
+from modules.market_data.price_panel import PricePanel, load_price_panel
+
+
+DEFAULT_BENCHMARK = "SPY"
+RISK_FREE_ANNUAL = 0.04
+
+# Jobs per pool task: enough to amortize pickling, small enough to balance
+# uneven books across workers
+_TASKS_PER_WORKER = 4
+
+# (client_id, account_id or None for the client rollup, holdings)
+RiskJob = Tuple[str, Optional[str], Dict[str, float]]
+
+# Set once per worker process by _init_worker and never written afterwards;
+# the segment is kept open for as long as the panel views it
+_WORKER_PANEL: Optional[PricePanel] = None
+_WORKER_SHM: Optional[shared_memory.SharedMemory] = None
+
+
+@dataclass
+class RiskBatchRun:
+    """
+    Risk metrics for every client and account from one batch job.
+
+    rows holds one entry per job (scope "client" or "account") with the
+    compute_risk_metrics output plus the multi-model dashboard block
+    (metrics["multi_model"]), the number of return points and an error
+    string when the job had no usable returns. timings holds milliseconds
+    per phase. run_at is timezone-aware UTC.
+    """
+
+    run_id: str
+    run_at: datetime
+    interval: str
+    benchmark: str
+    rows: List[Dict[str, Any]]
+    timings: Dict[str, float]
+    workers: int = 1
+    tickers: int = 0
+
+    @property
+    def errors(self) -> int:
+        return sum(1 for row in self.rows if row.get("error"))
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "run_at": self.run_at.isoformat(),
+            "interval": self.interval,
+            "benchmark": self.benchmark,
+            "clients": sum(1 for row in self.rows if row["scope"] == "client"),
+            "accounts": sum(1 for row in self.rows if row["scope"] == "account"),
+            "errors": self.errors,
+            "tickers": self.tickers,
+            "workers": self.workers,
+            "timings_ms": dict(self.timings),
+        }
+
+
+def _clean_metric(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value
+    return number if math.isfinite(number) else None
+
+
+def multi_model_block(returns: pd.Series, metrics: Dict[str, Any], interval: str) -> Dict[str, Any]:
+    """Risk profile and Markov regime, as FinancialToolkit._run_multi_model_dashboard shows them."""
+    profile = FinancialToolkit.assess_risk_profile({**metrics, "points": int(len(returns))})
+    snap = RegimeModels.compute_markov_snapshot(
+        returns.tolist(),
+        horizon=1,
+        label=interval,
+        interval=interval,
+        timestamps=list(returns.index),
+    )
+    if "error" in snap:
+        return {"risk_profile": profile, "regime": None}
+    return {
+        "risk_profile": profile,
+        "regime": {
+            "model": snap.get("model"),
+            "current_regime": snap.get("current_regime"),
+            "confidence": _clean_metric(snap.get("confidence")),
+            "stability": _clean_metric(snap.get("stability")),
+            "expected_next": snap.get("expected_next"),
+            "samples": snap.get("samples"),
+        },
+    }
+
+
+def risk_row(
+    panel: Optional[PricePanel],
+    job: RiskJob,
+    benchmark: str,
+    period: str,
+    interval: str,
+    risk_free_annual: float = RISK_FREE_ANNUAL,
+) -> Dict[str, Any]:
+    """compute_risk_metrics and the multi-model block for one job, reading closes from panel only."""
+    client_id, account_id, holdings = job
+    row: Dict[str, Any] = {
+        "client_id": client_id,
+        "account_id": account_id,
+        "scope": "client" if account_id is None else "account",
+        "points": 0,
+        "metrics": {},
+        "error": None,
+    }
+    if panel is None:
+        row["error"] = "Market data empty"
+        return row
+    try:
+        returns, benchmark_returns, meta = get_portfolio_and_benchmark_returns(
+            holdings, benchmark, period=period, interval=interval, panel=panel
+        )
+        if returns is None or returns.empty or len(returns) < 2:
+            row["error"] = meta if returns is None else "Insufficient market data"
+            return row
+        metrics = compute_risk_metrics(returns, benchmark_returns, risk_free_annual)
+        models = multi_model_block(returns, metrics, interval)
+    except Exception as exc:
+        row["error"] = f"Risk computation failed: {exc}"
+        return row
+    row["metrics"] = {key: _clean_metric(value) for key, value in metrics.items()}
+    row["metrics"]["multi_model"] = models
+    row["points"] = int(len(returns))
+    return row
+
+
+def _init_worker(index: np.ndarray, tickers: List[str], shm_name: str, shape: Tuple[int, int]) -> None:
+    global _WORKER_PANEL, _WORKER_SHM
+    _WORKER_SHM = shared_memory.SharedMemory(name=shm_name)
+    values = np.ndarray(shape, dtype=np.float64, buffer=_WORKER_SHM.buf)
+    values.setflags(write=False)
+    _WORKER_PANEL = PricePanel(pd.DatetimeIndex(index), tickers, values)
+
+
+def _run_chunk(
+    jobs: Sequence[RiskJob],
+    benchmark: str,
+    period: str,
+    interval: str,
+    risk_free_annual: float,
+) -> List[Dict[str, Any]]:
+    return [risk_row(_WORKER_PANEL, job, benchmark, period, interval, risk_free_annual) for job in jobs]
+
+
+def _chunks(jobs: List[RiskJob], count: int) -> List[List[RiskJob]]:
+    size = max(1, math.ceil(len(jobs) / max(1, count)))
+    return [jobs[i:i + size] for i in range(0, len(jobs), size)]
+
+
+def risk_jobs(accounts: Iterable[Tuple[Any, Any, Dict[str, float]]]) -> List[RiskJob]:
+    """
+    One job per account plus one per client over its summed holdings.
+
+    Clients come first, then their accounts, in input order.
+    """
+    per_client: Dict[str, List[Tuple[str, Dict[str, float]]]] = {}
+    for client_id, account_id, holdings in accounts:
+        per_client.setdefault(str(client_id), []).append((str(account_id), dict(holdings or {})))
+    jobs: List[RiskJob] = []
+    for client_id, rows in per_client.items():
+        combined: Dict[str, float] = {}
+        for _, holdings in rows:
+            for ticker, qty in holdings.items():
+                try:
+                    combined[ticker] = combined.get(ticker, 0.0) + float(qty or 0.0)
+                except (TypeError, ValueError):
+                    continue
+        jobs.append((client_id, None, combined))
+        jobs.extend((client_id, account_id, holdings) for account_id, holdings in rows)
+    return jobs
+
+
+def _ticker_union(jobs: Iterable[RiskJob]) -> List[str]:
+    union: set[str] = set()
+    for _, _, holdings in jobs:
+        for raw, qty in holdings.items():
+            try:
+                if float(qty or 0.0) == 0.0:
+                    continue
+            except (TypeError, ValueError):
+                continue
+            ticker = normalize_ticker(raw)
+            if ticker:
+                union.add(ticker)
+    return sorted(union)
+
+
+def run_risk_batch(
+    accounts: Iterable[Tuple[Any, Any, Dict[str, float]]],
+    interval: str = "1M",
+    benchmark: str = DEFAULT_BENCHMARK,
+    workers: Optional[int] = None,
+    panel: Optional[PricePanel] = None,
+    risk_free_annual: float = RISK_FREE_ANNUAL,
+    run_id: Optional[str] = None,
+) -> RiskBatchRun:
+    """\
+    Risk metric set for (client_id, account_id, holdings) triples.
+
+    One price panel over the union of tickers plus the benchmark is loaded
+    (or passed in) and its closes copied once into a shared memory segment
+    that every worker maps read-only at pool start; jobs are then sent in
+    chunks and only the jobs and their rows are pickled. interval is a
+    toolkit interval ("1W".."1Y") and maps to the same period and bar size
+    the risk dashboard uses. workers defaults to every core; 1 runs in this
+    process. run_id defaults to a fresh id.
+    """
+    interval = str(interval or "1M").upper()
+    period = TOOLKIT_PERIOD.get(interval, "1y")
+    bar_interval = TOOLKIT_INTERVAL.get(interval, "1d")
+    bench = str(benchmark or DEFAULT_BENCHMARK).upper()
+    run_at = datetime.now(timezone.utc)
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    jobs = risk_jobs(accounts)
+    union = _ticker_union(jobs)
+    mark = time.perf_counter()
+    timings["collect"] = (mark - started) * 1000
+
+    if panel is None and union:
+        try:
+            panel = load_price_panel(union + [bench], period=period, interval=bar_interval)
+        except Exception:
+            panel = None
+    now = time.perf_counter()
+    timings["panel"], mark = (now - mark) * 1000, now
+
+    count = max(1, int(workers or os.cpu_count() or 1))
+    chunks = _chunks(jobs, count * _TASKS_PER_WORKER)
+    count = min(count, len(chunks)) or 1
+    rows: List[Dict[str, Any]] = []
+    if count == 1 or panel is None:
+        count = 1
+        for chunk in chunks:
+            rows.extend(risk_row(panel, job, bench, period, bar_interval, risk_free_annual) for job in chunk)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, panel.values.nbytes))
+        try:
+            np.ndarray(panel.values.shape, dtype=np.float64, buffer=shm.buf)[:] = panel.values
+            # spawn rather than fork: the API calls this from a threaded server
+            with ProcessPoolExecutor(
+                max_workers=count,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(panel.index.to_numpy(), panel.tickers, shm.name, panel.values.shape),
+            ) as pool:
+                futures = [
+                    pool.submit(_run_chunk, chunk, bench, period, bar_interval, risk_free_annual)
+                    for chunk in chunks
+                ]
+                for future in futures:
+                    rows.extend(future.result())
+        finally:
+            shm.close()
+            shm.unlink()
+    timings["compute"] = (time.perf_counter() - mark) * 1000
+    timings["total"] = (time.perf_counter() - started) * 1000
+
+    return RiskBatchRun(
+        run_id=run_id or uuid.uuid4().hex,
+        run_at=run_at,
+        interval=interval,
+        benchmark=bench,
+        rows=rows,
+        timings={k: round(v, 2) for k, v in timings.items()},
+        workers=count,
+        tickers=len(union),
+    )
@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import bisect
+import json
+import math
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from modules.client_mgr.calculations import compute_relative_metrics
+
+
+_SECONDS_PER_YEAR = 365.25 * 24 * 60 * 60
+ROLLING_RISK_PATH = os.path.join("data", "rolling_risk.json")
+
+
+def _window_quantile(ordered: Sequence[float], q: float) -> float:
+    """Linear-interpolated quantile of a sorted sequence (pandas' default)."""
+    pos = (len(ordered) - 1) * q
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+class RollingRiskState:
+    """
+    Risk metrics for one return series, kept up to date one bar at a time.
+
+    Holds the running state behind calculations.py's full-array metrics:
+    Welford mean/variance, compounded wealth with its running peak and worst
+    drawdown, and the EWMA variance recursion. It also keeps the last window
+    returns in arrival order plus a sorted copy for rolling VaR/CVaR. update()
+    costs the same whatever the series length (the sorted window is
+    O(log window) to search and a short memmove to edit). Every metric matches
+    the batch function over the same bars; VaR/CVaR cover the window only.
+
+    sync() keeps the newest bar provisional: the state before it is held in
+    _base and re-applied on the next sync, so a partial bar that is later
+    revised (a live session's last close) replaces its earlier value.
+    """
+
+    def __init__(self, window: int = 252, lam: float = 0.94):
+        self.window = max(2, int(window))
+        self.lam = float(lam)
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.wealth = 1.0
+        self.peak: Optional[float] = None
+        self.max_drawdown = 0.0
+        # EWMA seeded with the sample variance, as ewma_vol_forecast does:
+        # var_n = decay * var_0 + ewma_sum with decay = lam ** n
+        self._ewma_sum = 0.0
+        self._decay = 1.0
+        self._recent: deque = deque()
+        self._sorted: List[float] = []
+        self.first_ts: Optional[pd.Timestamp] = None
+        self.last_ts: Optional[pd.Timestamp] = None
+        self._delta_sum = 0.0
+        self._delta_count = 0
+        self._base: Optional[Dict[str, Any]] = None
+
+    def update(self, value: float, ts: Any = None) -> bool:
+        """Adds one return; non-finite values and bars at or before last_ts are skipped."""
+        r = float(value)
+        if not math.isfinite(r):
+            return False
+        if ts is not None:
+            stamp = pd.Timestamp(ts)
+            if self.last_ts is not None:
+                if stamp <= self.last_ts:
+                    return False
+                self._delta_sum += (stamp - self.last_ts).total_seconds()
+                self._delta_count += 1
+            else:
+                self.first_ts = stamp
+            self.last_ts = stamp
+
+        self.count += 1
+        delta = r - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (r - self.mean)
+
+        self.wealth *= 1.0 + r
+        if self.peak is None or self.wealth > self.peak:
+            self.peak = self.wealth
+        if self.peak:
+            self.max_drawdown = min(self.max_drawdown, (self.wealth - self.peak) / self.peak)
+
+        self._ewma_sum = self.lam * self._ewma_sum + (1.0 - self.lam) * r * r
+        self._decay *= self.lam
+
+        self._recent.append(r)
+        bisect.insort(self._sorted, r)
+        if len(self._recent) > self.window:
+            old = self._recent.popleft()
+            del self._sorted[bisect.bisect_left(self._sorted, old)]
+        return True
+
+    def extend(self, values: Iterable[float], timestamps: Optional[Iterable[Any]] = None) -> int:
+        stamps = iter(timestamps) if timestamps is not None else None
+        added = 0
+        for value in values:
+            added += self.update(value, next(stamps) if stamps is not None else None)
+        return added
+
+    def sync(self, returns: pd.Series) -> int:
+        """
+        Feeds the bars of returns newer than last_ts, so an intraday refresh
+        only adds the new ones; the provisional last bar is rewound and fed
+        again with its current value. Returns how many bars are newer than the
+        previous last_ts. A series without a DatetimeIndex is appended whole.
+        """
+        if returns is None or returns.empty:
+            return 0
+        index = returns.index
+        if not isinstance(index, pd.DatetimeIndex):
+            return self.extend(returns.to_numpy())
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        previous = self.last_ts
+        if self._base is not None:
+            self._load(self._base)
+        start = int(index.searchsorted(self.last_ts, side="right")) if self.last_ts is not None else 0
+        values, stamps = returns.to_numpy()[start:], index[start:]
+        if not len(values):
+            return 0
+        self.extend(values[:-1], stamps[:-1])
+        self._base = self._snapshot()
+        self.extend(values[-1:], stamps[-1:])
+        if previous is None:
+            return len(values)
+        return len(values) - int(stamps.searchsorted(previous, side="right"))
+
+    def covers(self, returns: pd.Series) -> bool:
+        """
+        True when the state was fed from the first bar of returns and still
+        holds every bar in its VaR window, so its metrics equal the batch
+        functions over returns.
+        """
+        if self.first_ts is None or returns is None or returns.empty:
+            return False
+        if not isinstance(returns.index, pd.DatetimeIndex):
+            return False
+        first = returns.index[0]
+        if first.tzinfo is not None:
+            first = first.tz_localize(None)
+        return first == self.first_ts and len(self._recent) == self.count
+
+    # -------------------------------
+    # Metrics
+    # -------------------------------
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else float("nan")
+
+    @property
+    def ann_factor(self) -> float:
+        """Periods per year from the average bar spacing (252 without timestamps)."""
+        if not self._delta_count or self._delta_sum <= 0:
+            return 252.0
+        return _SECONDS_PER_YEAR / (self._delta_sum / self._delta_count)
+
+    @property
+    def ewma_variance(self) -> float:
+        seed = self.variance if self.count > 1 else 0.0
+        return self._decay * seed + self._ewma_sum
+
+    def ewma_forecast(self, steps: int = 6) -> List[float]:
+        """Same path as ewma_vol_forecast over every bar seen so far."""
+        if self.count < 2:
+            return []
+        var = self.ewma_variance
+        forecast = []
+        for _ in range(steps):
+            var = self.lam * var
+            forecast.append(math.sqrt(var))
+        return forecast
+
+    def var_cvar(self, confidence_level: float) -> Tuple[float, float]:
+        """Historical VaR/CVaR over the last window returns."""
+        if not self._sorted:
+            return 0.0, 0.0
+        var = _window_quantile(self._sorted, 1.0 - confidence_level)
+        tail = self._sorted[: bisect.bisect_right(self._sorted, var)]
+        cvar = sum(tail) / len(tail) if tail else float("nan")
+        return float(var), float(cvar)
+
+    def metrics(self, risk_free_annual: float = 0.0) -> Dict[str, Any]:
+        ann = self.ann_factor
+        std = math.sqrt(self.variance) if self.count > 1 else 0.0
+        sharpe = None
+        if std > 0:
+            sharpe = (self.mean - risk_free_annual / ann) / std * math.sqrt(ann)
+        var_95, cvar_95 = self.var_cvar(0.95)
+        var_99, cvar_99 = self.var_cvar(0.99)
+        return {
+            "points": self.count,
+            "window": len(self._recent),
+            "mean_annual": self.mean * ann,
+            "vol_annual": std * math.sqrt(ann),
+            "sharpe": sharpe,
+            "max_drawdown": self.max_drawdown,
+            "current_drawdown": (self.wealth - self.peak) / self.peak if self.peak else 0.0,
+            "var_95": var_95,
+            "cvar_95": cvar_95,
+            "var_99": var_99,
+            "cvar_99": cvar_99,
+            "ewma_vol": math.sqrt(self.ewma_variance) if self.count > 1 else None,
+            "vol_forecast": self.ewma_forecast(),
+            "last_ts": self.last_ts.isoformat() if self.last_ts is not None else None,
+        }
+
+    def risk_metrics(
+        self,
+        returns: pd.Series,
+        benchmark_returns: Optional[pd.Series],
+        risk_free_annual: float,
+    ) -> Dict[str, Any]:
+        """
+        compute_risk_metrics' output for returns when covers(returns) holds.
+
+        Mean, volatility, Sharpe, drawdown and VaR/CVaR come from the running
+        state; Sortino (its threshold moves with the annualization factor) and
+        the benchmark-relative figures are still computed over the arrays.
+        """
+        core = self.metrics(risk_free_annual)
+        relative = compute_relative_metrics(
+            returns,
+            benchmark_returns,
+            risk_free_annual,
+            ann_factor=self.ann_factor,
+            avg_daily=self.mean,
+            sharpe=core["sharpe"],
+        )
+        return {
+            "mean_annual": core["mean_annual"],
+            "vol_annual": core["vol_annual"],
+            "sharpe": core["sharpe"],
+            "sortino": relative.pop("sortino"),
+            "max_drawdown": core["max_drawdown"],
+            "var_95": core["var_95"],
+            "cvar_95": core["cvar_95"],
+            "var_99": core["var_99"],
+            "cvar_99": core["cvar_99"],
+            **relative,
+        }
+
+    # -------------------------------
+    # Checkpointing
+    # -------------------------------
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            "window": self.window,
+            "lam": self.lam,
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self._m2,
+            "wealth": self.wealth,
+            "peak": self.peak,
+            "max_drawdown": self.max_drawdown,
+            "ewma_sum": self._ewma_sum,
+            "decay": self._decay,
+            "recent": list(self._recent),
+            "first_ts": self.first_ts.isoformat() if self.first_ts is not None else None,
+            "last_ts": self.last_ts.isoformat() if self.last_ts is not None else None,
+            "delta_sum": self._delta_sum,
+            "delta_count": self._delta_count,
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        state = self._snapshot()
+        state["base"] = self._base
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "RollingRiskState":
+        obj = cls(window=state.get("window", 252), lam=state.get("lam", 0.94))
+        obj._load(state)
+        base = state.get("base")
+        obj._base = dict(base) if base else None
+        return obj
+
+    def _load(self, state: Dict[str, Any]) -> None:
+        self.count = int(state.get("count", 0))
+        self.mean = float(state.get("mean", 0.0))
+        self._m2 = float(state.get("m2", 0.0))
+        self.wealth = float(state.get("wealth", 1.0))
+        peak = state.get("peak")
+        self.peak = float(peak) if peak is not None else None
+        self.max_drawdown = float(state.get("max_drawdown", 0.0))
+        self._ewma_sum = float(state.get("ewma_sum", 0.0))
+        self._decay = float(state.get("decay", 1.0))
+        self._recent = deque(float(v) for v in (state.get("recent") or [])[-self.window:])
+        self._sorted = sorted(self._recent)
+        first_ts = state.get("first_ts")
+        self.first_ts = pd.Timestamp(first_ts) if first_ts else None
+        last_ts = state.get("last_ts")
+        self.last_ts = pd.Timestamp(last_ts) if last_ts else None
+        self._delta_sum = float(state.get("delta_sum", 0.0))
+        self._delta_count = int(state.get("delta_count", 0))
+
+
+class RollingRiskBook:
+    """
+    RollingRiskState per series key, with checkpoint/restore to one JSON file.
+
+    The least recently used series is dropped past max_entries. checkpoint()
+    writes through a temp file so a crash never leaves a half-written file.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = ROLLING_RISK_PATH,
+        window: int = 252,
+        lam: float = 0.94,
+        max_entries: int = 512,
+    ):
+        self.path = path
+        self.window = int(window)
+        self.lam = float(lam)
+        self.max_entries = max(1, int(max_entries))
+        self._states: "OrderedDict[str, RollingRiskState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, key: str) -> Optional[RollingRiskState]:
+        with self._lock:
+            return self._states.get(str(key))
+
+    def sync(self, key: str, returns: pd.Series) -> RollingRiskState:
+        """State for key after feeding the bars of returns it has not seen."""
+        key = str(key)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = RollingRiskState(window=self.window, lam=self.lam)
+                self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+            state.sync(returns)
+            return state
+
+    def reset(self, key: str, returns: pd.Series, window: Optional[int] = None) -> RollingRiskState:
+        """Replaces key's state with a new one (window at least window) fed all of returns."""
+        key = str(key)
+        state = RollingRiskState(window=max(self.window, int(window or 0)), lam=self.lam)
+        state.sync(returns)
+        with self._lock:
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+        return state
+
+    def checkpoint(self, path: Optional[str] = None) -> bool:
+        target = path or self.path
+        if not target:
+            return False
+        with self._lock:
+            payload = {key: state.to_state() for key, state in self._states.items()}
+        directory = os.path.dirname(target)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{target}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, target)
+        return True
+
+    def restore(self, path: Optional[str] = None) -> int:
+        """Loads checkpointed series not already live; returns how many were added."""
+        source = path or self.path
+        if not source or not os.path.exists(source):
+            return 0
+        try:
+            with open(source, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        added = 0
+        with self._lock:
+            for key, state in (payload or {}).items():
+                if key in self._states:
+                    continue
+                self._states[key] = RollingRiskState.from_state(state)
+                added += 1
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+        return added
+
+
+# Process-wide book behind the risk dashboard's rolling panel
+ROLLING_RISK = RollingRiskBook()
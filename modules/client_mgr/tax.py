@@ -1,10 +1,40 @@
 import json
 import os
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 from modules.client_mgr.client_model import Client, Account
-from modules.client_mgr.holdings import parse_timestamp
+from modules.client_mgr.holdings import parse_timestamp, parse_timestamp_column
+
+
+_TERMS = ("short_term", "long_term", "unknown_term")
+_DAY_US = 86_400 * 1_000_000
+
+
+@dataclass
+class LotColumns:
+    """
+    Priced lots of many accounts as parallel arrays.
+
+    account indexes the account list the columns were built from; acquired
+    is datetime64[us] with NaT where the lot timestamp is unknown. Lots of
+    tickers without a positive price are left out, as in the per-lot loop.
+    """
+
+    account: np.ndarray
+    qty: np.ndarray
+    basis: np.ndarray
+    price: np.ndarray
+    acquired: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.qty.size)
+
+    def gains(self) -> np.ndarray:
+        return (self.price - self.basis) * self.qty
 
 
 class TaxEngine:
@@ -57,93 +87,159 @@ class TaxEngine:
         price_map: Dict[str, Any],
         client_tax_profile: Dict[str, Any],
     ) -> Dict[str, Any]:
-        settings = account.tax_settings or {}
-        rules = self._get_rules_for_account(account, client_tax_profile or {})
-        rates = rules.get("rates", {}) if isinstance(rules, dict) else {}
-        long_term_days = int(rules.get("long_term_days", 365) or 365)
-        apply_withholding = bool(rules.get("apply_withholding_to_gains", False))
+        return self.estimate_accounts_unrealized_tax([(account, client_tax_profile or {})], price_map)[0]
 
-        withholding_rate = settings.get("withholding_rate")
-        tax_exempt = bool(settings.get("tax_exempt", False))
-        account_ccy = settings.get("account_currency", "USD") or "USD"
+    def estimate_client_unrealized_tax(self, client: Client, price_map: Dict[str, Any]) -> Dict[str, Any]:
+        accounts = self.estimate_accounts_unrealized_tax(
+            [(account, client.tax_profile or {}) for account in client.accounts],
+            price_map,
+        )
+        return self._client_rollup(client, accounts)
 
-        totals = {
-            "short_term": 0.0,
-            "long_term": 0.0,
-            "unknown_term": 0.0
-        }
-        tax_total = 0.0
-        warnings: List[str] = []
+    def estimate_clients_unrealized_tax(
+        self,
+        clients: Iterable[Client],
+        price_map: Dict[str, Any],
+        now: Optional[datetime] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Firm-wide: every client's rollup from one columnar pass over all lots."""
+        clients = list(clients)
+        pairs = [(account, client.tax_profile or {}) for client in clients for account in client.accounts]
+        results = self.estimate_accounts_unrealized_tax(pairs, price_map, now=now)
+        out: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+        for client in clients:
+            count = len(client.accounts)
+            out[client.client_id] = self._client_rollup(client, results[offset:offset + count])
+            offset += count
+        return out
 
-        if not account.lots:
-            warnings.append("No lot history; tax estimates require lots.")
-
-        for raw_ticker, lots in (account.lots or {}).items():
-            ticker = str(raw_ticker).strip().upper()
-            info = price_map.get(ticker, {}) if isinstance(price_map, dict) else {}
-            price = float(info.get("price", 0.0) or 0.0)
-            if price <= 0:
-                warnings.append(f"Missing price for {ticker}")
-                continue
-            for lot in lots or []:
-                if not isinstance(lot, dict):
-                    continue
-                qty = float(lot.get("qty", 0.0) or 0.0)
-                basis = float(lot.get("basis", 0.0) or 0.0)
-                gain = (price - basis) * qty
-                ts = self._parse_timestamp(lot.get("timestamp"))
-                if ts is None:
-                    totals["unknown_term"] += gain
+    # -------------------------------
+    # Columnar estimate
+    # -------------------------------
+
+    def lot_columns(
+        self,
+        accounts: Sequence[Account],
+        price_map: Dict[str, Any],
+    ) -> Tuple[LotColumns, List[List[str]]]:
+        """Flattens the lots of accounts (in account/ticker/lot order) plus per-account warnings."""
+        prices = price_map if isinstance(price_map, dict) else {}
+        warnings: List[List[str]] = [[] for _ in accounts]
+        owner: List[int] = []
+        qty: List[Any] = []
+        basis: List[Any] = []
+        lot_price: List[float] = []
+        stamps: List[Any] = []
+        for idx, account in enumerate(accounts):
+            if not account.lots:
+                warnings[idx].append("No lot history; tax estimates require lots.")
+            for raw_ticker, lots in (account.lots or {}).items():
+                ticker = str(raw_ticker).strip().upper()
+                info = prices.get(ticker, {})
+                price = float(info.get("price", 0.0) or 0.0)
+                if price <= 0:
+                    warnings[idx].append(f"Missing price for {ticker}")
                     continue
-                holding_days = (datetime.now() - ts).days
-                if holding_days >= long_term_days:
-                    totals["long_term"] += gain
-                else:
-                    totals["short_term"] += gain
-
-        if tax_exempt:
-            tax_total = 0.0
-        else:
-            short_rate = rates.get("short_term")
-            long_rate = rates.get("long_term")
-            ordinary_rate = rates.get("ordinary_income")
-            withhold_rate = rates.get("withholding_default") if apply_withholding else None
-
-            def _rate(val, fallback):
-                if val is None:
-                    return fallback
-                try:
-                    return float(val)
-                except Exception:
-                    return fallback
-
-            short_rate = _rate(short_rate, ordinary_rate)
-            long_rate = _rate(long_rate, ordinary_rate)
-
-            if short_rate is not None:
-                tax_total += totals["short_term"] * (short_rate / 100.0)
-            if long_rate is not None:
-                tax_total += totals["long_term"] * (long_rate / 100.0)
-            if withhold_rate is not None:
-                tax_total += (totals["short_term"] + totals["long_term"]) * (float(withhold_rate) / 100.0)
+                entries = [lot for lot in lots or [] if isinstance(lot, dict)]
+                owner.extend([idx] * len(entries))
+                lot_price.extend([price] * len(entries))
+                qty.extend([lot.get("qty", 0.0) or 0.0 for lot in entries])
+                basis.extend([lot.get("basis", 0.0) or 0.0 for lot in entries])
+                stamps.extend([lot.get("timestamp") for lot in entries])
+        columns = LotColumns(
+            account=np.asarray(owner, dtype=np.int64),
+            qty=np.asarray(qty, dtype=float),
+            basis=np.asarray(basis, dtype=float),
+            price=np.asarray(lot_price, dtype=float),
+            acquired=parse_timestamp_column(stamps),
+        )
+        return columns, warnings
 
-        total_gain = totals["short_term"] + totals["long_term"] + totals["unknown_term"]
-        effective_rate = (tax_total / total_gain * 100.0) if total_gain != 0 else None
+    @staticmethod
+    def _rate(val: Any, fallback: Optional[float]) -> Optional[float]:
+        if val is None:
+            return fallback
+        try:
+            return float(val)
+        except Exception:
+            return fallback
 
-        if rates and all(rates.get(k) is None for k in rates.keys()):
-            warnings.append("Tax rates missing for jurisdiction.")
+    def estimate_accounts_unrealized_tax(
+        self,
+        accounts: Sequence[Tuple[Account, Dict[str, Any]]],
+        price_map: Dict[str, Any],
+        now: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """\
+        Unrealized gain and estimated tax for (account, client_tax_profile) pairs.
 
-        return {
-            "currency": account_ccy,
-            "total_unrealized": total_gain,
-            "estimated_tax": tax_total if tax_total != 0 else (0.0 if tax_exempt else None),
-            "effective_rate": effective_rate,
-            "by_term": totals,
-            "warnings": warnings,
-            "jurisdiction": (settings.get("jurisdiction") or client_tax_profile.get("tax_country") or "DEFAULT"),
-        }
+        All lots are classified short/long/unknown in one pass against a single
+        as-of time (now, default datetime.now()) and each account's
+        long_term_days; per-term totals are summed per account in lot order and
+        rates are applied per account from its jurisdiction's rules.
+        """
+        account_list = [account for account, _ in accounts]
+        n = len(account_list)
+        columns, warnings = self.lot_columns(account_list, price_map)
 
-    def estimate_client_unrealized_tax(self, client: Client, price_map: Dict[str, Any]) -> Dict[str, Any]:
+        rules = [self._get_rules_for_account(account, profile or {}) for account, profile in accounts]
+        long_term_days = np.array([int(r.get("long_term_days", 365) or 365) for r in rules], dtype=np.int64)
+
+        as_of = np.datetime64(now or datetime.now(), "us")
+        known = ~np.isnat(columns.acquired)
+        holding_days = np.zeros(len(columns), dtype=np.int64)
+        holding_days[known] = (as_of - columns.acquired[known]).astype(np.int64) // _DAY_US
+        term = np.where(~known, 2, np.where(holding_days >= long_term_days[columns.account], 1, 0))
+        # bincount adds weights in array order, i.e. the per-lot loop's order
+        sums = np.bincount(columns.account * 3 + term, weights=columns.gains(), minlength=3 * n).reshape(n, 3)
+        short, long, unknown = sums[:, 0], sums[:, 1], sums[:, 2]
+
+        # Per-account rate columns; NaN marks a rate that does not apply
+        short_rate = np.full(n, np.nan)
+        long_rate = np.full(n, np.nan)
+        withhold_rate = np.full(n, np.nan)
+        exempt = np.zeros(n, dtype=bool)
+        for idx, ((account, _), rule) in enumerate(zip(accounts, rules)):
+            exempt[idx] = bool((account.tax_settings or {}).get("tax_exempt", False))
+            rates = rule.get("rates", {}) if isinstance(rule, dict) else {}
+            ordinary = rates.get("ordinary_income")
+            sr = self._rate(rates.get("short_term"), ordinary)
+            lr = self._rate(rates.get("long_term"), ordinary)
+            if sr is not None:
+                short_rate[idx] = sr
+            if lr is not None:
+                long_rate[idx] = lr
+            if bool(rule.get("apply_withholding_to_gains", False)) and rates.get("withholding_default") is not None:
+                withhold_rate[idx] = float(rates.get("withholding_default"))
+
+        with np.errstate(invalid="ignore"):
+            tax = np.zeros(n)
+            tax = np.where(np.isnan(short_rate), tax, tax + short * (short_rate / 100.0))
+            tax = np.where(np.isnan(long_rate), tax, tax + long * (long_rate / 100.0))
+            tax = np.where(np.isnan(withhold_rate), tax, tax + (short + long) * (withhold_rate / 100.0))
+        tax = np.where(exempt, 0.0, tax)
+        total_gain = short + long + unknown
+
+        results: List[Dict[str, Any]] = []
+        rows = zip(accounts, rules, short.tolist(), long.tolist(), unknown.tolist(), tax.tolist(), total_gain.tolist())
+        for idx, ((account, profile), rule, st, lt, ut, tax_total, gain) in enumerate(rows):
+            settings = account.tax_settings or {}
+            rates = rule.get("rates", {}) if isinstance(rule, dict) else {}
+            if rates and all(rates.get(k) is None for k in rates.keys()):
+                warnings[idx].append("Tax rates missing for jurisdiction.")
+            results.append({
+                "currency": settings.get("account_currency", "USD") or "USD",
+                "total_unrealized": gain,
+                "estimated_tax": tax_total if tax_total != 0 else (0.0 if exempt[idx] else None),
+                "effective_rate": (tax_total / gain * 100.0) if gain != 0 else None,
+                "by_term": {"short_term": st, "long_term": lt, "unknown_term": ut},
+                "warnings": warnings[idx],
+                "jurisdiction": (settings.get("jurisdiction") or (profile or {}).get("tax_country") or "DEFAULT"),
+            })
+        return results
+
+    def _client_rollup(self, client: Client, accounts: List[Dict[str, Any]]) -> Dict[str, Any]:
         totals = {
             "short_term": 0.0,
             "long_term": 0.0,
@@ -153,12 +249,7 @@ class TaxEngine:
         warnings: List[str] = []
         currency = (client.tax_profile or {}).get("reporting_currency", "USD") or "USD"
 
-        for account in client.accounts:
-            acct = self.estimate_account_unrealized_tax(
-                account,
-                price_map,
-                client.tax_profile or {},
-            )
+        for acct in accounts:
             term = acct.get("by_term", {})
             totals["short_term"] += float(term.get("short_term", 0.0) or 0.0)
             totals["long_term"] += float(term.get("long_term", 0.0) or 0.0)
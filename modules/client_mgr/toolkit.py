@@ -1,10 +1,5 @@
 import numpy as np
 import pandas as pd
-import yfinance as yf
-import time
-import io
-import warnings
-import contextlib
 import logging
 import os
 import json
@@ -25,11 +20,18 @@ from modules.client_mgr.toolkit_payloads import (
 )
 from modules.client_mgr.toolkit_runs import ToolkitRunMixin
 from modules.client_mgr.valuation import ValuationEngine
+from modules.client_mgr.data import _CAPM_CACHE, get_portfolio_and_benchmark_returns
+from modules.market_data.price_panel import PricePanel, load_price_panel
 from modules.client_mgr.toolkit_ai import build_ai_panel
-
-# Cache for CAPM computations to avoid redundant API calls
-_CAPM_CACHE = {}  # key -> {"ts": int, "data": dict}
-_CAPM_TTL_SECONDS = 900  # 15 minutes
+from utils.cache import shared_cache
+
+# Pattern payloads keyed by interval + return-series fingerprint (shared across clients)
+_PATTERN_CACHE = shared_cache(
+    "toolkit.patterns",
+    max_entries=256,
+    ttl_seconds=900,
+    max_bytes=64 * 1024 * 1024,
+)
 
 # Metric glossary for Tools output (plain-language context).
 
@@ -68,7 +70,7 @@ class FinancialToolkit(ToolkitPayloadsMixin, ToolkitRunMixin, ToolkitMenuMixin):
         self.console = Console()
         self.valuation = ValuationEngine()
         self.benchmark_ticker = "SPY" # Using S&P 500 ETF as standard benchmark
-        self._pattern_cache = {}
+        self._pattern_cache = _PATTERN_CACHE
         self._settings_file = os.path.join(os.getcwd(), "config", "settings.json")
         tool_settings = self._load_tool_settings()
         self.perm_entropy_order = tool_settings["perm_entropy_order"]
@@ -239,62 +241,15 @@ class FinancialToolkit(ToolkitPayloadsMixin, ToolkitRunMixin, ToolkitMenuMixin):
         benchmark_ticker: str,
         period: str,
         interval: str,
+        panel: Optional[PricePanel] = None,
     ) -> Tuple[Optional[pd.Series], Optional[pd.Series], str]:
-        tickers = [t for t, q in holdings.items() if str(t).strip() and float(q or 0.0) != 0.0]
-        if not tickers:
-            return None, None, "No non-zero holdings"
-
-        download_list = sorted(set([str(t).upper() for t in tickers] + [benchmark_ticker]))
-        try:
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", category=FutureWarning)
-                warnings.simplefilter("ignore", category=UserWarning)
-                with contextlib.redirect_stderr(io.StringIO()):
-                    df = yf.download(
-                        download_list,
-                        period=period,
-                        interval=interval,
-                        progress=False,
-                        group_by="column",
-                        auto_adjust=True,
-                    )
-        except Exception as exc:
-            return None, None, f"Market data error: {exc}"
-
-        if df is None or df.empty:
-            return None, None, "Market data empty"
-
-        if isinstance(df.columns, pd.MultiIndex):
-            if "Close" in df.columns.levels[0]:
-                close = df["Close"].copy()
-            elif "Adj Close" in df.columns.levels[0]:
-                close = df["Adj Close"].copy()
-            else:
-                return None, None, "Close price not available"
-        else:
-            close = df.get("Close") or df.get("Adj Close")
-            if close is None:
-                return None, None, "Close price not available"
-
-        bench = str(benchmark_ticker).upper()
-        if bench not in close.columns:
-            return None, None, f"Benchmark '{bench}' missing"
-
-        port_val = None
-        for t, qty in holdings.items():
-            t_norm = str(t).upper()
-            if t_norm == bench or t_norm not in close.columns:
-                continue
-            series = close[t_norm] * float(qty)
-            port_val = series if port_val is None else (port_val + series)
-
-        if port_val is None:
-            return None, None, "No overlapping price series"
-
-        port_ret = port_val.pct_change().dropna()
-        bench_ret = close[bench].pct_change().dropna()
-        meta = f"Period: {period} | Interval: {interval} | Points: {len(port_ret)}"
-        return port_ret, bench_ret, meta
+        return get_portfolio_and_benchmark_returns(
+            holdings,
+            benchmark_ticker=benchmark_ticker,
+            period=period,
+            interval=interval,
+            panel=panel,
+        )
 
     def _compute_risk_metrics(
         self,
@@ -322,8 +277,6 @@ class FinancialToolkit(ToolkitPayloadsMixin, ToolkitRunMixin, ToolkitMenuMixin):
         Output keys:
         - beta, alpha_annual, r_squared, sharpe, vol_annual, points, error
         """
-        ts = int(time.time())
-
         if not holdings:
             return {"error": "No holdings", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
 
@@ -332,75 +285,40 @@ class FinancialToolkit(ToolkitPayloadsMixin, ToolkitRunMixin, ToolkitMenuMixin):
         key = (fp, str(benchmark_ticker).upper(), period, float(risk_free_annual))
 
         cached = _CAPM_CACHE.get(key)
-        if cached and (ts - int(cached.get("ts", 0))) <= _CAPM_TTL_SECONDS:
-            return cached["data"]
+        if cached is not None:
+            return cached
 
         try:
             tickers = [t for t, q in fp if q != 0.0]
             if not tickers:
                 data = {"error": "No non-zero holdings", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
-                _CAPM_CACHE[key] = {"ts": ts, "data": data}
+                _CAPM_CACHE.set(key, data)
                 return data
 
             download_list = sorted(set(tickers + [str(benchmark_ticker).upper()]))
 
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", category=FutureWarning)
-                warnings.simplefilter("ignore", category=UserWarning)
-                with contextlib.redirect_stderr(io.StringIO()):
-                    df = yf.download(
-                        download_list,
-                        period=period,
-                        interval="1d",
-                        progress=False,
-                        group_by="column",
-                        auto_adjust=True,
-                    )
-                    if df is None or df.empty:
-                        data = {"error": "No market data returned", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
-                        _CAPM_CACHE[key] = {"ts": ts, "data": data}
-                        return data
-
-            # Handle possible MultiIndex: prefer "Close"
-            if isinstance(df.columns, pd.MultiIndex):
-                if ("Close" in df.columns.levels[0]):
-                    close = df["Close"].copy()
-                elif ("Adj Close" in df.columns.levels[0]):
-                    close = df["Adj Close"].copy()
-                else:
-                    data = {"error": "Close price not available", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
-                    _CAPM_CACHE[key] = {"ts": ts, "data": data}
-                    return data
-            else:
-                close = df.get("Close") or df.get("Adj Close")
-                if close is None:
-                    data = {"error": "Close price not available", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
-                    _CAPM_CACHE[key] = {"ts": ts, "data": data}
-                    return data
+            panel = load_price_panel(download_list, period=period, interval="1d")
+            if panel is None or panel.empty:
+                data = {"error": "No market data returned", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
+                _CAPM_CACHE.set(key, data)
+                return data
 
             bench = str(benchmark_ticker).upper()
-            if bench not in close.columns:
+            if bench not in panel:
                 data = {"error": f"Benchmark '{bench}' missing", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
-                _CAPM_CACHE[key] = {"ts": ts, "data": data}
+                _CAPM_CACHE.set(key, data)
                 return data
 
             # Portfolio value series: sum(close[t] * qty)
-            port_val = None
-            for t, q in fp:
-                if t == bench or q == 0.0:
-                    continue
-                if t not in close.columns:
-                    continue
-                series = close[t] * float(q)
-                port_val = series if port_val is None else (port_val + series)
+            port_val = panel.weighted_values({t: q for t, q in fp if q != 0.0}, exclude=[bench])
 
             if port_val is None:
                 data = {"error": "No overlapping price series for holdings", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
-                _CAPM_CACHE[key] = {"ts": ts, "data": data}
+                _CAPM_CACHE.set(key, data)
                 return data
 
             port_ret = port_val.pct_change().dropna()
-            mkt_ret = close[bench].pct_change().dropna()
+            mkt_ret = panel.frame()[bench].pct_change().dropna()
 
             capm = calculations.compute_capm_metrics_from_returns(
                 port_ret,
@@ -414,12 +332,12 @@ class FinancialToolkit(ToolkitPayloadsMixin, ToolkitRunMixin, ToolkitMenuMixin):
                 "risk_free_annual": float(risk_free_annual),
             })
 
-            _CAPM_CACHE[key] = {"ts": ts, "data": capm}
+            _CAPM_CACHE.set(key, capm)
             return capm
 
         except Exception as ex:
             data = {"error": f"CAPM compute error: {ex}", "beta": None, "alpha_annual": None, "r_squared": None, "sharpe": None, "vol_annual": None, "points": 0}
-            _CAPM_CACHE[key] = {"ts": ts, "data": data}
+            _CAPM_CACHE.set(key, data)
             return data
 
     @staticmethod
@@ -59,8 +59,9 @@ class ToolkitMenuMixin:
             self.console.print("[4] Portfolio Regime Snapshot")
             self.console.print("[5] Portfolio Diagnostics")
             self.console.print("[6] Pattern Analysis")
+            self.console.print("[7] Stress Scenarios")
             self.console.print(
-                f"[7] Change Interval (Current: {self._selected_interval})"
+                f"[8] Change Interval (Current: {self._selected_interval})"
             )
             self.console.print("[0] Return to Client Dashboard")
 
@@ -73,7 +74,8 @@ class ToolkitMenuMixin:
                     "4": "Portfolio Regime Snapshot",
                     "5": "Portfolio Diagnostics",
                     "6": "Pattern Analysis",
-                    "7": f"Change Interval (Current: {self._selected_interval})",
+                    "7": "Stress Scenarios",
+                    "8": f"Change Interval (Current: {self._selected_interval})",
                     "0": "Return to Client Dashboard",
                 },
             )
@@ -95,6 +97,8 @@ class ToolkitMenuMixin:
             elif choice == "6":
                 self._run_pattern_suite()
             elif choice == "7":
+                self._run_stress_scenarios()
+            elif choice == "8":
                 updated = self._get_interval_or_select(force=True)
                 if updated:
                     self._selected_interval = updated
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional
 
 import pandas as pd
 
+from modules.client_mgr.compute_context import ComputeContext, fingerprint
+from modules.client_mgr.factors import factor_payload
 from modules.client_mgr.regime import RegimeModels
+from modules.client_mgr.rolling_risk import ROLLING_RISK
+from modules.client_mgr.stress import position_quantities, resolve_scenarios, run_stress_test
+from modules.client_mgr.var_engine import forward_var_payload
+from modules.market_data.price_panel import PricePanel
 
 
 TOOLKIT_PERIOD = {"1W": "1mo", "1M": "6mo", "3M": "1y", "6M": "2y", "1Y": "5y"}
@@ -24,6 +30,8 @@ class ToolkitPayloadsMixin:
             int(returns.index[-1].timestamp())
             if isinstance(returns.index, pd.DatetimeIndex)
             else len(returns),
+            len(returns),
+            int(pd.util.hash_pandas_object(returns, index=True).sum()),
         )
         cached = self._pattern_cache.get(key)
         if cached:
@@ -39,15 +47,20 @@ class ToolkitPayloadsMixin:
         label: str,
         scope: str = "Portfolio",
         benchmark_ticker: Optional[str] = None,
+        panel: Optional[PricePanel] = None,
+        context: Optional[ComputeContext] = None,
     ) -> Dict[str, Any]:
         interval = str(interval or self._selected_interval or "1M").upper()
         period = TOOLKIT_PERIOD.get(interval, "1y")
         benchmark = benchmark_ticker or self.benchmark_ticker
-        returns, benchmark_returns, meta = self._get_portfolio_and_benchmark_returns(
+        ctx = context or ComputeContext()
+        returns, benchmark_returns, meta = ctx.returns(
+            self,
             holdings,
-            benchmark_ticker=benchmark,
-            period=period,
-            interval=TOOLKIT_INTERVAL.get(interval, "1d"),
+            benchmark,
+            period,
+            TOOLKIT_INTERVAL.get(interval, "1d"),
+            panel=panel,
         )
         if returns is None or returns.empty:
             return {
@@ -57,13 +70,34 @@ class ToolkitPayloadsMixin:
                 "scope": scope,
                 "label": label,
             }
-        metrics = self._compute_risk_metrics(
-            returns,
-            benchmark_returns=benchmark_returns,
-            risk_free_annual=0.04,
-        )
+        # Running state per (holdings, benchmark, interval): a refresh feeds only new bars
+        key = f"{fingerprint(holdings)}:{benchmark}:{interval}"
+        rolling = ROLLING_RISK.get(key)
+        if rolling is not None and rolling.covers(returns):
+            rolling = ROLLING_RISK.sync(key, returns)
+        if rolling is not None and rolling.covers(returns):
+            metrics = rolling.risk_metrics(returns, benchmark_returns, risk_free_annual=0.04)
+        else:
+            # First build, or the window start moved on: batch metrics and a new state
+            metrics = self._compute_risk_metrics(
+                returns,
+                benchmark_returns=benchmark_returns,
+                risk_free_annual=0.04,
+            )
+            # Headroom so intraday bars stay inside the state's VaR window
+            rolling = ROLLING_RISK.reset(key, returns, window=2 * len(returns))
         metrics["points"] = int(len(returns))
         profile = self.assess_risk_profile(metrics)
+        forward_var = ctx.memo(
+            ("forward_var", fingerprint(holdings), str(benchmark), interval),
+            lambda: forward_var_payload(
+                panel,
+                holdings,
+                exclude=[benchmark],
+                interval=TOOLKIT_INTERVAL.get(interval, "1d"),
+                period=period,
+            ),
+        )
         return {
             "label": label,
             "scope": scope,
@@ -77,8 +111,34 @@ class ToolkitPayloadsMixin:
             if benchmark_returns is not None
             else [],
             "distribution": self._distribution_from_returns(returns),
+            "rolling": rolling.metrics(risk_free_annual=0.04),
+            "forward_var": forward_var,
         }
 
+    def build_factor_payload(
+        self,
+        holdings: Dict[str, float],
+        label: str,
+        scope: str = "Portfolio",
+        benchmark_ticker: Optional[str] = None,
+        context: Optional[ComputeContext] = None,
+        fetch: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Multi-factor loadings (market, size, value, momentum, sectors) of the
+        holdings, from stored bars unless fetch is set.
+        """
+        benchmark = benchmark_ticker or self.benchmark_ticker
+        ctx = context or ComputeContext()
+        payload = dict(
+            ctx.memo(
+                ("factors", fingerprint(holdings), str(benchmark), bool(fetch)),
+                lambda: factor_payload(holdings, exclude=[benchmark], fetch=fetch),
+            )
+        )
+        payload.update(label=label, scope=scope)
+        return payload
+
     def build_regime_snapshot_payload(
         self,
         holdings: Dict[str, float],
@@ -86,20 +146,15 @@ class ToolkitPayloadsMixin:
         interval: str,
         label: str,
         scope: str = "Portfolio",
+        panel: Optional[PricePanel] = None,
+        context: Optional[ComputeContext] = None,
     ) -> Dict[str, Any]:
         interval = str(interval or self._selected_interval or "1M").upper()
         period = TOOLKIT_PERIOD.get(interval, "1y")
-        _, enriched = self.valuation.calculate_portfolio_value(
-            holdings,
-            history_period=period,
-            history_interval=TOOLKIT_INTERVAL.get(interval, "1d"),
-        )
-        _, history = self.valuation.generate_portfolio_history_series(
-            enriched_data=enriched,
-            holdings=holdings,
-            interval=interval,
-            lot_map=lot_map,
-        )
+        bar_interval = TOOLKIT_INTERVAL.get(interval, "1d")
+        ctx = context or ComputeContext()
+        _, enriched = ctx.valuation(self.valuation, holdings, period, bar_interval, panel=panel)
+        history = ctx.history(self.valuation, holdings, lot_map, period, bar_interval, panel=panel).values.tolist()
         if not history:
             has_holdings = any(
                 float(qty or 0.0) > 0 for qty in (holdings or {}).values()
@@ -199,3 +254,24 @@ class ToolkitPayloadsMixin:
             "wave_surface": wave_surface,
             "fft_surface": fft_surface,
         }
+
+    def build_stress_payload(
+        self,
+        scenarios: Optional[Iterable[str]] = None,
+        custom: Optional[Iterable[Mapping[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """Scenario P&L for this client's accounts from stored prices (no downloads)."""
+        accounts = list(self.client.accounts or [])
+        result = run_stress_test(
+            (
+                (self.client.client_id, account.account_id, position_quantities(account.holdings, account.lots))
+                for account in accounts
+            ),
+            resolve_scenarios(scenarios, custom),
+            benchmark=self.benchmark_ticker,
+        )
+        labels = {account.account_id: account.account_name for account in accounts}
+        labels[self.client.client_id] = self.client.name
+        payload = result.to_payload(labels)
+        payload["label"] = self.client.name
+        return payload
@@ -3,9 +3,11 @@ from __future__ import annotations
 from typing import Any, Dict, List
 
 from rich.align import Align
+from rich.console import Group
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.table import Table
+from rich.text import Text
 from rich import box
 
 from interfaces.shell import ShellRenderer
@@ -137,6 +139,10 @@ class ToolkitRunMixin:
         if ai_panel:
             self.console.print(ai_panel)
         self.console.print(RiskRenderer.render_capm_context(capm, self.benchmark_ticker))
+        # An explicit CAPM run downloads the factor ETFs; the dashboards then read them from the store
+        factors = self.build_factor_payload(consolidated_holdings, label=self.client.name, fetch=True)
+        if not factors.get("error"):
+            self.console.print(self._render_factor_exposure(factors))
 
         if beta and beta > 1.2:
             self.console.print(
@@ -370,6 +376,59 @@ class ToolkitRunMixin:
         self.console.print(RiskRenderer.render_risk_dashboard_context(interval, meta))
         InputSafe.pause()
 
+    def _run_stress_scenarios(self) -> None:
+        """Revalue the client's accounts under the historical stress scenarios."""
+        self.console.clear()
+        print("\x1b[3J", end="")
+        self.console.print("[bold blue]STRESS SCENARIOS[/bold blue]")
+
+        ShellRenderer.set_busy(1.0)
+        payload = self.build_stress_payload()
+        if not payload.get("value"):
+            self.console.print("[yellow]No stored prices for this client's holdings.[/yellow]")
+            InputSafe.pause()
+            return
+
+        scenarios = payload.get("scenarios", [])
+        table = Table(box=box.SIMPLE_HEAVY, expand=False)
+        table.add_column("Scope", style="bold white")
+        table.add_column("Value", justify="right")
+        for scenario in scenarios:
+            table.add_column(scenario["name"], justify="right")
+
+        def _cells(row: Dict[str, Any]) -> List[str]:
+            cells = []
+            for scenario in scenarios:
+                pnl = row["pnl"].get(scenario["key"], 0.0)
+                pct = row["pnl_pct"].get(scenario["key"])
+                color = "red" if pnl < 0 else "green"
+                pct_text = f" ({pct:+.1%})" if pct is not None else ""
+                cells.append(f"[{color}]{pnl:,.0f}{pct_text}[/{color}]")
+            return cells
+
+        for row in payload.get("clients", []):
+            table.add_row(row.get("label") or "Client", f"{row['value']:,.0f}", *_cells(row))
+        for row in payload.get("accounts", []):
+            table.add_row(f"  {row.get('label') or 'Account'}", f"{row['value']:,.0f}", *_cells(row))
+        table.add_section()
+        for row in payload.get("sectors", [])[:8]:
+            table.add_row(f"[dim]{row['sector']}[/dim]", f"{row['value']:,.0f}", *_cells(row))
+        self.console.print(table)
+
+        notes = [
+            f"{scenario['name']}: {scenario['coverage']:.0%} of exposure from stored history, "
+            "rest beta-mapped to the market move"
+            for scenario in scenarios
+            if scenario.get("start")
+        ]
+        if payload.get("unpriced"):
+            notes.append(f"No stored price: {', '.join(payload['unpriced'])}")
+        if payload.get("as_of"):
+            notes.append(f"Prices as of {payload['as_of'][:10]}")
+        if notes:
+            self.console.print(Panel("\n".join(notes), border_style="dim", box=box.ROUNDED))
+        InputSafe.pause()
+
     def _run_pattern_suite(self) -> None:
         """Pattern analysis is using existing return series."""
         while True:
@@ -481,6 +540,29 @@ class ToolkitRunMixin:
                 self.console.print(PatternRenderer.render_vol_forecast_panel(payload))
             InputSafe.pause()
 
+    @staticmethod
+    def _render_factor_exposure(factors: Dict[str, Any]) -> Panel:
+        exposure = factors.get("exposure", {}) or {}
+        table = Table(box=box.SIMPLE_HEAVY, expand=False)
+        table.add_column("Factor", style="bold white")
+        table.add_column("Loading", justify="right")
+        for name, value in (exposure.get("loadings") or {}).items():
+            color = "green" if value >= 0 else "red"
+            table.add_row(name, f"[{color}]{value:+.2f}[/{color}]")
+        alpha = exposure.get("alpha_annual")
+        footer = (
+            f"Alpha (annual) {alpha:+.2%} | coverage {exposure.get('coverage', 0.0):.0%} | "
+            f"{factors.get('window')} daily bars"
+            if alpha is not None
+            else "No fitted holdings."
+        )
+        return Panel(
+            Group(table, Text(footer, style="dim")),
+            title="[bold]Multi-Factor Exposure[/bold]",
+            border_style="cyan",
+            box=box.ROUNDED,
+        )
+
     def _render_regime_context(self, snap: Dict[str, Any]) -> Panel:
         interval = snap.get("interval", "N/A")
         scope = snap.get("scope_label", "Portfolio")
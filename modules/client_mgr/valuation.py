@@ -1,14 +1,129 @@
 from __future__ import annotations
 
 import concurrent.futures
+import threading
 import time
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
 
 from modules.market_data.finnhub_client import FinnhubWrapper
 from modules.market_data.yfinance_client import YahooWrapper
-import yfinance as yf
-from modules.client_mgr.holdings import normalize_ticker, parse_timestamp, select_nearest_price
+from modules.market_data.providers import get_provider
+from modules.client_mgr.holdings import nearest_prices, normalize_ticker, parse_timestamp, parse_timestamps
+from modules.market_data.frame_ops import close_panel
+from modules.market_data.price_panel import PricePanel
+from utils.upstream import UpstreamUnavailable, patient
+
+
+@dataclass(frozen=True)
+class HistorySeries:
+    """
+    Portfolio value history in columnar form.
+
+    timestamps is datetime64[us] (an object array of datetimes for
+    timezone-aware histories, empty for index-aligned fallbacks) and values is
+    float64. Callers convert to lists or chart points only at the edge.
+    """
+
+    timestamps: np.ndarray
+    values: np.ndarray
+
+    @classmethod
+    def empty(cls, values: Optional[np.ndarray] = None) -> "HistorySeries":
+        return cls(
+            np.empty(0, dtype="datetime64[us]"),
+            np.empty(0, dtype=float) if values is None else values,
+        )
+
+    @classmethod
+    def from_lists(cls, dates: Any, values: Any) -> "HistorySeries":
+        """Wraps (dates, values) lists; arrays are used as they are."""
+        if not isinstance(dates, np.ndarray):
+            dates = np.array(list(dates or []), dtype=object)
+        if not isinstance(values, np.ndarray):
+            values = ValuationEngine._float_array(list(values or []))
+        return cls(dates, values)
+
+    def __len__(self) -> int:
+        return int(self.values.size)
+
+    def tail(self, count: int) -> "HistorySeries":
+        """The last count points (as views)."""
+        values = self.values[-count:] if self.values.size > count else self.values
+        stamps = self.timestamps[-values.size:] if self.timestamps.size and values.size else self.timestamps[:0]
+        return HistorySeries(stamps, values)
+
+    def to_lists(self) -> Tuple[List[datetime], List[float]]:
+        if self.timestamps.dtype == object:
+            dates = self.timestamps.tolist()
+        else:
+            dates = self.timestamps.astype(object).tolist()
+        return dates, self.values.tolist()
+
+    def epoch_seconds(self) -> List[Optional[int]]:
+        """int(dt.timestamp()) per point (naive timestamps are local time); None past the timestamps."""
+        count = min(self.timestamps.size, self.values.size)
+        stamps = self.timestamps[:count]
+        if stamps.dtype != object and not time.daylight:
+            # Fixed local offset: shift the whole column at once, truncating
+            # toward zero like int() does
+            whole, frac = np.divmod(stamps.astype(np.int64), 1_000_000)
+            seconds = whole + time.timezone
+            seconds = np.where((seconds < 0) & (frac > 0), seconds + 1, seconds)
+            out: List[Optional[int]] = seconds.tolist()
+        else:
+            out = []
+            for ts in (stamps.tolist() if stamps.dtype == object else stamps.astype(object).tolist()):
+                try:
+                    out.append(int(ts.timestamp()))
+                except Exception:
+                    out.append(None)
+        out.extend([None] * (self.values.size - count))
+        return out
+
+    def to_points(self) -> List[Dict[str, Any]]:
+        """The {"ts", "value"} list the dashboard APIs return."""
+        # "+ 0.0" folds -0.0 into 0.0 as float(value or 0.0) did
+        values = (self.values + 0.0).tolist()
+        return [{"ts": ts, "value": value} for ts, value in zip(self.epoch_seconds(), values)]
+
+
+@dataclass
+class BatchValuation:
+    """
+    Market values for many accounts priced from one union of tickers.
+
+    accounts and clients map ids to totals (a client's total is the sum of
+    its accounts); timings holds milliseconds per phase. throttled lists
+    tickers left unpriced because the upstream was rate limited or down,
+    as opposed to tickers it has no data for.
+    """
+
+    accounts: Dict[str, float]
+    clients: Dict[str, float]
+    quotes: Dict[str, Dict[str, Any]]
+    timings: Dict[str, float]
+    positions: int = 0
+    throttled: List[str] = field(default_factory=list)
+
+    @property
+    def tickers(self) -> int:
+        return len(self.quotes)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "accounts": len(self.accounts),
+            "clients": len(self.clients),
+            "positions": self.positions,
+            "tickers": self.tickers,
+            "throttled": list(self.throttled),
+            "timings_ms": dict(self.timings),
+        }
+
 
 class ValuationEngine:
     """\
@@ -20,6 +135,11 @@ class ValuationEngine:
         - Support a separate manual/off-market valuation stream (estimated).
     """
 
+    # Historical backfill: tolerance for non-trading days around a lot date,
+    # and how far back Yahoo serves 1m bars
+    BACKFILL_PAD_DAYS = 5
+    INTRADAY_LOOKBACK_DAYS = 7
+
     def __init__(
         self,
         logger: Any = None
@@ -146,48 +266,181 @@ class ValuationEngine:
         t = self._normalize_ticker(ticker)
         if not t or not isinstance(timestamp, datetime):
             return None
+        return self.get_historical_prices({t: [timestamp]}).get(t, [None])[0]
 
-        day_start = datetime(timestamp.year, timestamp.month, timestamp.day)
-        day_end = day_start + timedelta(days=1)
-        interval = "1m" if timestamp.time() != datetime.min.time() else "1d"
+    @staticmethod
+    def _download_closes(ticker: str, start: datetime, end: datetime, interval: str) -> Optional[pd.Series]:
+        try:
+            hist = get_provider().download(
+                ticker,
+                start=start,
+                end=end,
+                interval=interval,
+                progress=False,
+                auto_adjust=True,
+            )
+        except UpstreamUnavailable:
+            raise
+        except Exception:
+            return None
 
-        def _fetch(interval_value: str) -> Optional[float]:
-            try:
-                hist = yf.download(
-                    t,
-                    start=day_start,
-                    end=day_end,
-                    interval=interval_value,
-                    progress=False,
-                    auto_adjust=True,
+        close = close_panel(hist)
+        if close is None or close.empty:
+            return None
+        closes = (close[ticker] if ticker in close.columns else close.iloc[:, 0]).dropna()
+        if closes.empty:
+            return None
+        idx = pd.DatetimeIndex(closes.index)
+        if idx.tz is not None:
+            idx = idx.tz_localize(None)
+        return pd.Series(closes.to_numpy(dtype=float), index=idx).sort_index()
+
+    def _resolve_ticker_prices(self, ticker: str, stamps: List[datetime]) -> List[Optional[float]]:
+        targets = pd.DatetimeIndex(stamps)
+        days = targets.normalize()
+        prices = np.full(len(stamps), np.nan)
+
+        # One daily download covering every lot date (padded for weekends/holidays)
+        daily = self._download_closes(
+            ticker,
+            start=days.min().to_pydatetime() - timedelta(days=self.BACKFILL_PAD_DAYS),
+            end=days.max().to_pydatetime() + timedelta(days=self.BACKFILL_PAD_DAYS + 1),
+            interval="1d",
+        )
+        if daily is not None:
+            prices = nearest_prices(
+                daily.index.normalize(),
+                daily.to_numpy(),
+                days,
+                max_gap=timedelta(days=self.BACKFILL_PAD_DAYS),
+            )
+
+        # Intraday lots recent enough for minute bars get one 1m download on top
+        cutoff = datetime.now() - timedelta(days=self.INTRADAY_LOOKBACK_DAYS)
+        intraday = np.asarray((targets != days) & (targets >= cutoff))
+        if intraday.any():
+            recent = targets[intraday]
+            minute = self._download_closes(
+                ticker,
+                start=recent.normalize().min().to_pydatetime(),
+                end=recent.normalize().max().to_pydatetime() + timedelta(days=1),
+                interval="1m",
+            )
+            if minute is not None:
+                refined = nearest_prices(minute.index, minute.to_numpy(), recent, max_gap=timedelta(days=1))
+                prices[intraday] = np.where(np.isnan(refined), prices[intraday], refined)
+
+        return [None if np.isnan(p) else float(p) for p in prices]
+
+    def get_historical_prices(
+        self,
+        requests: Dict[str, Iterable[datetime]],
+        throttled: Optional[Set[str]] = None,
+    ) -> Dict[str, List[Optional[float]]]:
+        """\
+        Bulk nearest-close lookup for many (ticker, timestamp) pairs.
+
+        Each ticker is downloaded once at 1d over the range covering all of its
+        timestamps (plus one 1m download for intraday timestamps from the last
+        INTRADAY_LOOKBACK_DAYS); every timestamp is then resolved with a
+        sorted search. Results keep the input order; None where no bar is
+        within BACKFILL_PAD_DAYS. Downloads queue for rate-limit tokens
+        (upstream.patient); tickers still refused by the upstream are added
+        to throttled instead of being reported as having no data.
+        """
+        work: Dict[str, List[Optional[datetime]]] = {}
+        for raw, stamps in (requests or {}).items():
+            t = self._normalize_ticker(raw)
+            if t:
+                work.setdefault(t, []).extend(
+                    ts.replace(tzinfo=None) if isinstance(ts, datetime) else None for ts in stamps
                 )
-            except Exception:
-                return None
-
-            if hist is None or hist.empty or "Close" not in hist.columns:
-                return None
-
-            closes = hist["Close"].dropna()
-            if closes.empty:
-                return None
 
-            if interval_value == "1d":
-                return float(closes.iloc[-1])
-
-            idx = closes.index
-            if hasattr(idx, "tz"):
-                idx = idx.tz_localize(None)
-                closes = closes.copy()
-                closes.index = idx
-
-            series = list(zip(list(idx), list(closes)))
-            return select_nearest_price(series, timestamp)
+        results: Dict[str, List[Optional[float]]] = {t: [None] * len(v) for t, v in work.items()}
+
+        def _resolve(t: str) -> List[Optional[float]]:
+            positions = [i for i, ts in enumerate(work[t]) if ts is not None]
+            if not positions:
+                return results[t]
+            with patient():
+                resolved = self._resolve_ticker_prices(t, [work[t][i] for i in positions])
+            out = list(results[t])
+            for i, price in zip(positions, resolved):
+                out[i] = price
+            return out
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            future_to_ticker = {executor.submit(_resolve, t): t for t in work}
+            for future in concurrent.futures.as_completed(future_to_ticker):
+                t = future_to_ticker[future]
+                try:
+                    results[t] = future.result()
+                except UpstreamUnavailable as ex:
+                    self._log("warning", f"Historical backfill throttled for {t}: {ex}")
+                    if throttled is not None:
+                        throttled.add(t)
+                except Exception as ex:
+                    self._log("warning", f"Historical backfill failed for {t}: {ex}")
+        return results
 
-        price = _fetch(interval)
-        if price is None and interval != "1d":
-            price = _fetch("1d")
+    def backfill_lot_basis(
+        self,
+        lots_by_ticker: Dict[str, List[Dict[str, Any]]],
+        overwrite: bool = False,
+    ) -> Dict[str, int]:
+        """\
+        Fills lot cost basis from historical closes in place.
 
-        return price
+        Only lots with a parseable timestamp are considered; unless overwrite
+        is set, lots that already carry a positive basis are left alone.
+        Lots of tickers the upstream refused (rate limited or down) count as
+        throttled rather than unresolved, so a retry can pick them up.
+        """
+        targets: Dict[str, List[Tuple[Dict[str, Any], datetime]]] = {}
+        for raw, lots in (lots_by_ticker or {}).items():
+            t = self._normalize_ticker(raw)
+            for lot in lots or []:
+                if not isinstance(lot, dict):
+                    continue
+                try:
+                    basis = float(lot.get("basis") or 0.0)
+                except (TypeError, ValueError):
+                    basis = 0.0
+                if basis > 0 and not overwrite:
+                    continue
+                ts = parse_timestamp(lot.get("timestamp"))
+                if t and ts is not None:
+                    targets.setdefault(t, []).append((lot, ts))
+
+        throttled: Set[str] = set()
+        prices = self.get_historical_prices(
+            {t: [ts for _, ts in pairs] for t, pairs in targets.items()},
+            throttled=throttled,
+        )
+        updated = 0
+        unresolved = 0
+        throttled_lots = 0
+        for t, pairs in targets.items():
+            if t in throttled:
+                throttled_lots += len(pairs)
+                continue
+            for (lot, _), price in zip(pairs, prices.get(t, [])):
+                if price is None or price <= 0:
+                    unresolved += 1
+                    continue
+                lot["basis"] = float(price)
+                source = str(lot.get("source") or "").strip().upper()
+                if source and "HISTORICAL" not in source:
+                    lot["source"] = f"{source}+HISTORICAL"
+                elif not source:
+                    lot["source"] = "HISTORICAL"
+                updated += 1
+        return {
+            "tickers": len(targets),
+            "updated": updated,
+            "unresolved": unresolved,
+            "throttled": throttled_lots,
+        }
 
     def get_detailed_data(self, ticker: str, period: str = "1mo", interval: str = "1d") -> Dict[str, Any]:
         """\
@@ -195,9 +448,11 @@ class ValuationEngine:
         Prefers Yahoo for history, falls back to Finnhub for price-only.
         """
         t = self._normalize_ticker(ticker)
+        throttled = False
 
         try:
             data = self.yahoo.get_detailed_quote(t, period=period, interval=interval)
+            throttled = isinstance(data, dict) and bool(data.get("throttled"))
             if isinstance(data, dict) and "error" not in data:
                 # Ensure key consistency
                 data["ticker"] = data.get("ticker", t)
@@ -211,6 +466,9 @@ class ValuationEngine:
 
         # Fallback: Finnhub price-only
         q = self.get_quote_data(t)
+        if throttled and not q.get("price"):
+            # Unpriced because Yahoo refused the call, not because the ticker has no data
+            return {"ticker": t, "error": f"Market data throttled for {t}", "throttled": True}
         return {
             "ticker": t,
             "name": t,
@@ -230,20 +488,59 @@ class ValuationEngine:
     # Portfolio valuation
     # -------------------------------
 
+    def _enrich_holding(self, ticker: str, qty: float, data: Dict[str, Any]) -> Dict[str, Any]:
+        price = float(data.get("price", 0.0) or 0.0)
+        pct = float(data.get("pct", 0.0) or 0.0)
+        return {
+            "ticker": ticker,
+            "name": data.get("name", ticker),
+            "sector": data.get("sector", "N/A"),
+            "quantity": qty,
+            "price": price,
+            "market_value": price * qty,
+            "change": float(data.get("change", 0.0) or 0.0),
+            "pct": pct,
+            "change_pct": pct,  # manager reads change_pct in a few places
+            "history": data.get("history", []) or [],
+            "history_dates": data.get("history_dates", []) or [],
+            "mkt_cap": data.get("mkt_cap", None),
+        }
+
+    def _normalized_quantities(self, holdings: Dict[str, float]) -> Dict[str, float]:
+        quantities: Dict[str, float] = {}
+        for raw, qty in (holdings or {}).items():
+            t = self._normalize_ticker(raw)
+            if not t or t in quantities:
+                continue
+            try:
+                quantities[t] = float(holdings.get(t, qty) or 0.0)
+            except Exception:
+                quantities[t] = 0.0
+        return quantities
+
     def calculate_portfolio_value(
         self,
         holdings: Dict[str, float],
         history_period: str = "1mo",
         history_interval: str = "1d",
+        batch: bool = True,
+        panel: Optional[PricePanel] = None,
     ) -> Tuple[float, Dict[str, Any]]:
         """\
-        Threaded calculation of market-priced holdings.
+        Calculation of market-priced holdings.
+
+        With batch=True all unique tickers are priced through chunked
+        multi-ticker history reads (metadata from cache); tickers Yahoo cannot
+        resolve fall back to the per-ticker path. batch=False uses the
+        threaded per-ticker lookup for every holding. A panel loaded for the
+        same period/interval prices the tickers it covers without another read.
 
         Returns:
             (total_market_value, enriched_holdings)
 
         enriched_holdings[ticker] includes:
             - quantity, price, market_value, change, pct, change_pct, history, sector, name
+            - throttled (only when the upstream refused to price it)
         """
         total_value = 0.0
         enriched_holdings: Dict[str, Any] = {}
@@ -251,57 +548,152 @@ class ValuationEngine:
         if not holdings:
             return 0.0, enriched_holdings
 
-        tickers = [self._normalize_ticker(t) for t in list(holdings.keys()) if str(t).strip()]
-        unique_tickers = sorted(set(tickers))
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_ticker = {
-                executor.submit(self.get_detailed_data, t, history_period, history_interval): t
-                for t in unique_tickers
-            }
+        quantities = self._normalized_quantities(holdings)
+        unique_tickers = sorted(quantities.keys())
+        throttled: Set[str] = set()
+        quotes = self.fetch_quotes(
+            unique_tickers, history_period, history_interval, batch=batch, panel=panel, throttled=throttled
+        )
 
-            for future in concurrent.futures.as_completed(future_to_ticker):
-                t = future_to_ticker[future]
-                data: Dict[str, Any] = {}
-                try:
-                    data = future.result()
-                except Exception as ex:
-                    self._log("warning", f"Detailed quote failed for {t}: {ex}")
-                    data = {"price": 0.0, "change": 0.0, "pct": 0.0, "history": [], "sector": "N/A", "name": t}
+        for t in unique_tickers:
+            entry = self._enrich_holding(t, quantities.get(t, 0.0), quotes.get(t, {}))
+            if t in throttled:
+                entry["throttled"] = True
+            total_value += entry["market_value"]
+            enriched_holdings[t] = entry
 
-                qty = 0.0
-                try:
-                    if t in holdings:
-                        qty = float(holdings.get(t, 0.0) or 0.0)
-                    else:
-                        for k, v in holdings.items():
-                            if self._normalize_ticker(k) == t:
-                                qty = float(v or 0.0)
-                                break
-                except Exception:
-                    qty = 0.0
+        return total_value, enriched_holdings
 
-                price = float(data.get("price", 0.0) or 0.0)
-                mkt_val = price * qty
-                total_value += mkt_val
+    def fetch_quotes(
+        self,
+        tickers: List[str],
+        history_period: str = "1mo",
+        history_interval: str = "1d",
+        batch: bool = True,
+        panel: Optional[PricePanel] = None,
+        throttled: Optional[Set[str]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Detailed quotes for normalized tickers, as calculate_portfolio_value
+        prices them (panel, then batched reads, then the per-ticker path).
 
-                pct = float(data.get("pct", 0.0) or 0.0)
-                enriched_holdings[t] = {
-                    "ticker": t,
-                    "name": data.get("name", t),
-                    "sector": data.get("sector", "N/A"),
-                    "quantity": qty,
-                    "price": price,
-                    "market_value": mkt_val,
-                    "change": float(data.get("change", 0.0) or 0.0),
-                    "pct": pct,
-                    "change_pct": pct,  # manager reads change_pct in a few places
-                    "history": data.get("history", []) or [],
-                    "history_dates": data.get("history_dates", []) or [],
-                    "mkt_cap": data.get("mkt_cap", None),
-                }
+        Per-ticker lookups queue for rate-limit tokens (upstream.patient).
+        Tickers the upstream still refuses are left out of the result
+        (so incremental books keep their last quote) and added to throttled.
+        """
+        quotes: Dict[str, Dict[str, Any]] = {}
+        if panel is not None:
+            quotes = panel.quotes(tickers)
+            known_meta = YahooWrapper.get_cached_metadata_many(list(quotes))
+            for t, data in quotes.items():
+                if known_meta.get(t):
+                    data.update(known_meta[t])
+            YahooWrapper.refresh_metadata_async(list(quotes))
+        pending = [t for t in tickers if t not in quotes]
+        if batch and pending:
+            try:
+                quotes.update(self.yahoo.get_detailed_quotes(
+                    pending,
+                    period=history_period,
+                    interval=history_interval,
+                ))
+            except Exception as ex:
+                self._log("warning", f"Batched quote fetch failed: {ex}")
+        remaining = [t for t in tickers if t not in quotes]
+
+        def _patient_detailed(t: str) -> Dict[str, Any]:
+            with patient():
+                return self.get_detailed_data(t, history_period, history_interval)
+
+        if remaining:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+                future_to_ticker = {executor.submit(_patient_detailed, t): t for t in remaining}
+
+                for future in concurrent.futures.as_completed(future_to_ticker):
+                    t = future_to_ticker[future]
+                    try:
+                        data = future.result()
+                    except UpstreamUnavailable:
+                        data = {"throttled": True}
+                    except Exception as ex:
+                        self._log("warning", f"Detailed quote failed for {t}: {ex}")
+                        data = {"price": 0.0, "change": 0.0, "pct": 0.0, "history": [], "sector": "N/A", "name": t}
+                    if data.get("throttled"):
+                        self._log("warning", f"Detailed quote throttled for {t}")
+                        if throttled is not None:
+                            throttled.add(t)
+                        continue
+                    quotes[t] = data
+        return quotes
+
+    def value_accounts(
+        self,
+        accounts: Iterable[Tuple[Any, Any, Dict[str, float]]],
+        history_period: str = "1mo",
+        history_interval: str = "1d",
+        books: Optional[Dict[str, "IncrementalValuation"]] = None,
+    ) -> BatchValuation:
+        """\
+        Values (client_id, account_id, holdings) triples in one pass.
 
-        return total_value, enriched_holdings
+        The union of tickers is quoted once, then each account is summed in
+        the same order calculate_portfolio_value uses, so its total matches a
+        per-account call. With books (account_id -> IncrementalValuation) the
+        fan-out goes through them and only changed holdings are repriced.
+        """
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+
+        rows: List[Tuple[str, str, Dict[str, float], Dict[str, float]]] = []
+        union: set[str] = set()
+        positions = 0
+        for client_id, account_id, holdings in accounts:
+            quantities = self._normalized_quantities(holdings or {})
+            rows.append((str(client_id), str(account_id), holdings or {}, quantities))
+            union.update(quantities)
+            positions += len(quantities)
+        mark = time.perf_counter()
+        timings["collect"] = (mark - started) * 1000
+
+        throttled: Set[str] = set()
+        quotes = (
+            self.fetch_quotes(sorted(union), history_period, history_interval, throttled=throttled)
+            if union
+            else {}
+        )
+        now = time.perf_counter()
+        timings["fetch"], mark = (now - mark) * 1000, now
+
+        prices = {t: self._float_or_zero(quotes.get(t, {}).get("price")) for t in union}
+        now = time.perf_counter()
+        timings["price"], mark = (now - mark) * 1000, now
+
+        account_totals: Dict[str, float] = {}
+        client_totals: Dict[str, float] = {}
+        for client_id, account_id, holdings, quantities in rows:
+            if books is not None:
+                book = books.get(account_id)
+                if book is None:
+                    book = IncrementalValuation(self, history_period, history_interval)
+                    books[account_id] = book
+                total, _ = book.update(holdings, quotes=quotes)
+            else:
+                total = 0.0
+                for t in sorted(quantities):
+                    total += prices[t] * quantities[t]
+            account_totals[account_id] = total
+            client_totals[client_id] = client_totals.get(client_id, 0.0) + float(total or 0.0)
+        timings["fan_out"] = (time.perf_counter() - mark) * 1000
+        timings["total"] = (time.perf_counter() - started) * 1000
+
+        return BatchValuation(
+            accounts=account_totals,
+            clients=client_totals,
+            quotes=quotes,
+            timings={k: round(v, 2) for k, v in timings.items()},
+            positions=positions,
+            throttled=sorted(throttled),
+        )
 
     # -------------------------------
     # Manual / off-market valuation
@@ -391,58 +783,12 @@ class ValuationEngine:
         """\
         Reconstructs the portfolio's aggregate history (for a main dashboard chart).
         """
-        from modules.client_mgr.manager import INTERVAL_POINTS
-
-        points = INTERVAL_POINTS.get(interval, 22)
-
-        if not enriched_data or not holdings:
-            return []
-
-        dates, values = self.generate_portfolio_history_series(
+        return self.portfolio_history(
             enriched_data=enriched_data,
             holdings=holdings,
             interval=interval,
             lot_map=lot_map,
-        )
-        if values:
-            return values
-
-        histories: List[List[float]] = []
-        quantities: List[float] = []
-
-        for t, info in enriched_data.items():
-            hist = info.get("history", []) or []
-            if not hist:
-                continue
-            try:
-                qty = float(info.get("quantity", holdings.get(t, 0.0)) or 0.0)
-            except Exception:
-                qty = 0.0
-            histories.append([float(x) for x in hist if x is not None])
-            quantities.append(qty)
-
-        if not histories:
-            return []
-
-        min_len = min(len(h) for h in histories if h)
-        if min_len <= 0:
-            return []
-
-        out: List[float] = []
-        idx = 0
-        while idx < min_len:
-            total = 0.0
-            j = 0
-            while j < len(histories):
-                try:
-                    total += histories[j][idx] * quantities[j]
-                except Exception:
-                    pass
-                j += 1
-            out.append(total)
-            idx += 1
-
-        return out
+        ).values.tolist()
 
     def generate_portfolio_history_series(
         self,
@@ -454,19 +800,41 @@ class ValuationEngine:
         """
         Returns a (dates, values) series using actual history timestamps when available.
         """
+        return self.portfolio_history(
+            enriched_data=enriched_data,
+            holdings=holdings,
+            interval=interval,
+            lot_map=lot_map,
+        ).to_lists()
+
+    def portfolio_history(
+        self,
+        enriched_data: Dict[str, Any],
+        holdings: Dict[str, float],
+        interval: str = "1M",
+        lot_map: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+    ) -> HistorySeries:
+        """
+        Columnar form of generate_portfolio_history_series.
+
+        Lot-weighted values on the history timestamps when they line up;
+        otherwise an index-aligned sum of history * quantity with no timestamps.
+        """
         if not enriched_data or not holdings:
-            return [], []
+            return HistorySeries.empty()
 
-        lot_series = self._generate_lot_weighted_history_series(
+        series = self._lot_weighted_history(
             enriched_data=enriched_data,
             holdings=holdings,
             lot_map=lot_map,
         )
-        if lot_series[1]:
-            return lot_series
+        if len(series):
+            return series
+        return HistorySeries.empty(self._index_aligned_history(enriched_data, holdings))
 
-        # Fallback: index-aligned aggregation (no timestamp alignment).
-        histories: List[List[float]] = []
+    def _index_aligned_history(self, enriched_data: Dict[str, Any], holdings: Dict[str, float]) -> np.ndarray:
+        """Fallback: sum of history[i] * quantity over tickers, truncated to the shortest history."""
+        histories: List[np.ndarray] = []
         quantities: List[float] = []
 
         for t, info in enriched_data.items():
@@ -477,31 +845,40 @@ class ValuationEngine:
                 qty = float(info.get("quantity", holdings.get(t, 0.0)) or 0.0)
             except Exception:
                 qty = 0.0
-            histories.append([float(x) for x in hist if x is not None])
+            histories.append(np.array([x for x in hist if x is not None], dtype=float))
             quantities.append(qty)
 
         if not histories:
-            return [], []
+            return np.empty(0, dtype=float)
 
-        min_len = min(len(h) for h in histories if h)
+        min_len = min(h.size for h in histories if h.size)
         if min_len <= 0:
-            return [], []
-
-        out: List[float] = []
-        idx = 0
-        while idx < min_len:
-            total = 0.0
-            j = 0
-            while j < len(histories):
-                try:
-                    total += histories[j][idx] * quantities[j]
-                except Exception:
-                    pass
-                j += 1
-            out.append(total)
-            idx += 1
+            return np.empty(0, dtype=float)
 
-        return [], out
+        # One row per ticker, added in order so sums round as before
+        out = np.zeros(min_len, dtype=float)
+        for hist, qty in zip(histories, quantities):
+            if hist.size:
+                out += hist[:min_len] * qty
+        return out
+
+    @staticmethod
+    def _float_or_zero(value: Any) -> float:
+        try:
+            return float(value or 0.0)
+        except Exception:
+            return 0.0
+
+    @classmethod
+    def _float_array(cls, values: List[Any]) -> np.ndarray:
+        """Element-wise _float_or_zero; None/unparseable become 0.0, real NaNs stay NaN."""
+        try:
+            arr = np.asarray(values, dtype=float)
+            if not np.isnan(arr).any():
+                return arr
+        except (TypeError, ValueError):
+            pass
+        return np.array([cls._float_or_zero(v) for v in values], dtype=float)
 
     def _generate_lot_weighted_history_series(
         self,
@@ -509,105 +886,218 @@ class ValuationEngine:
         holdings: Dict[str, float],
         lot_map: Optional[Dict[str, List[Dict[str, Any]]]],
     ) -> Tuple[List[datetime], List[float]]:
-        if not lot_map:
-            return [], []
+        return self._lot_weighted_history(enriched_data, holdings, lot_map).to_lists()
+
+    def _lot_weighted_history(
+        self,
+        enriched_data: Dict[str, Any],
+        holdings: Dict[str, float],
+        lot_map: Optional[Dict[str, List[Dict[str, Any]]]],
+    ) -> HistorySeries:
+        """
+        Portfolio value on the union of history timestamps, valuing each ticker
+        at its lot quantity held as of each timestamp (holdings when it has no lots).
 
-        series_by_ticker: Dict[str, Dict[datetime, float]] = {}
-        all_dates: set[datetime] = set()
+        Prices are forward-filled per ticker on the shared grid. Timestamps before
+        a ticker's first price skip it, and timestamps with no price at all are
+        dropped. Lot quantities are cumulative sums looked up with searchsorted.
+        """
+        if not lot_map:
+            return HistorySeries.empty()
 
+        # ticker -> (timestamps, prices); a later alias of the same ticker wins
+        series_by_ticker: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        stamps: List[np.ndarray] = []
         for raw_ticker, info in enriched_data.items():
             prices = info.get("history", []) or []
             dates = info.get("history_dates", []) or []
             if not prices or not dates or len(prices) != len(dates):
                 continue
-
-            parsed_dates: List[datetime] = []
-            for d in dates:
-                ts = self._parse_timestamp(d)
-                if ts is None:
-                    parsed_dates = []
-                    break
-                parsed_dates.append(ts)
-
-            if not parsed_dates or len(parsed_dates) != len(prices):
+            parsed = parse_timestamps(dates)
+            if parsed is None:
                 continue
+            values = self._float_array(prices)
+            series_by_ticker[self._normalize_ticker(raw_ticker)] = (parsed, values)
+            stamps.append(parsed)
+
+        if not series_by_ticker:
+            return HistorySeries.empty()
+
+        # Timezone-aware histories fall back to comparing datetime objects
+        as_object = any(arr.dtype == object for arr in stamps)
+        if as_object:
+            stamps = [arr.astype(object) for arr in stamps]
+            series_by_ticker = {t: (d.astype(object), v) for t, (d, v) in series_by_ticker.items()}
+        grid = np.unique(np.concatenate(stamps))
+        earliest = grid[0]
+
+        lots_by_ticker: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for raw_ticker, lots in (lot_map or {}).items():
+            entries = [lot for lot in lots or [] if isinstance(lot, dict)]
+            if not entries:
+                continue
+            lot_ts = [self._parse_timestamp(lot.get("timestamp")) for lot in entries]
+            when = np.array(
+                [earliest if ts is None else ts for ts in lot_ts],
+                dtype=object if as_object else "datetime64[us]",
+            )
+            qty = self._float_array([lot.get("qty") for lot in entries])
+            order = np.argsort(when, kind="stable")
+            lots_by_ticker[self._normalize_ticker(raw_ticker)] = (when[order], np.cumsum(qty[order]))
 
+        holdings_map: Dict[str, float] = {}
+        for raw_ticker, qty in (holdings or {}).items():
             ticker = self._normalize_ticker(raw_ticker)
-            series = {}
-            for ts, price in zip(parsed_dates, prices):
-                try:
-                    series[ts] = float(price or 0.0)
-                except Exception:
-                    series[ts] = 0.0
-            series_by_ticker[ticker] = series
-            all_dates.update(parsed_dates)
+            holdings_map[ticker] = holdings_map.get(ticker, 0.0) + self._float_or_zero(qty)
+
+        total = np.zeros(grid.size, dtype=float)
+        any_price = np.zeros(grid.size, dtype=bool)
+        rows = np.arange(grid.size)
+        # Accumulated one ticker column at a time, in ticker order, so the sums
+        # round exactly like a per-date loop would
+        for ticker, (dates, values) in series_by_ticker.items():
+            pos = np.searchsorted(grid, dates)
+            # Duplicate timestamps keep their last price
+            rev_pos, first_rev = np.unique(pos[::-1], return_index=True)
+            point_values = np.full(grid.size, np.nan)
+            point_values[rev_pos] = values[::-1][first_rev]
+            has_point = np.zeros(grid.size, dtype=bool)
+            has_point[rev_pos] = True
+            last = np.maximum.accumulate(np.where(has_point, rows, -1))
+            priced = last >= 0
+            price = point_values[np.maximum(last, 0)]
+
+            if ticker in lots_by_ticker:
+                when, cum_qty = lots_by_ticker[ticker]
+                held = np.searchsorted(when, grid, side="right")
+                qty = np.where(held > 0, cum_qty[np.maximum(held - 1, 0)], 0.0)
+            else:
+                qty = np.full(grid.size, holdings_map.get(ticker, 0.0))
 
-        if not series_by_ticker or not all_dates:
-            return [], []
+            total = np.where(priced, total + price * qty, total)
+            any_price |= priced
 
-        sorted_dates = sorted(all_dates)
-        earliest_date = sorted_dates[0]
+        return HistorySeries(grid[any_price], total[any_price])
 
-        lots_by_ticker: Dict[str, List[Tuple[datetime, float]]] = {}
-        for raw_ticker, lots in (lot_map or {}).items():
-            ticker = self._normalize_ticker(raw_ticker)
-            entries: List[Tuple[datetime, float]] = []
-            for lot in lots or []:
-                if not isinstance(lot, dict):
-                    continue
-                try:
-                    qty = float(lot.get("qty", 0.0) or 0.0)
-                except Exception:
-                    qty = 0.0
-                ts = self._parse_timestamp(lot.get("timestamp"))
-                if ts is None:
-                    ts = earliest_date
-                entries.append((ts, qty))
-            if entries:
-                entries.sort(key=lambda x: x[0])
-                lots_by_ticker[ticker] = entries
 
-        holdings_map: Dict[str, float] = {}
-        for raw_ticker, qty in (holdings or {}).items():
-            ticker = self._normalize_ticker(raw_ticker)
-            try:
-                holdings_map[ticker] = holdings_map.get(ticker, 0.0) + float(qty or 0.0)
-            except Exception:
-                holdings_map[ticker] = holdings_map.get(ticker, 0.0)
-
-        # Forward-fill prices per ticker to honor real timestamps
-        price_paths: Dict[str, List[Optional[float]]] = {}
-        for ticker, series in series_by_ticker.items():
-            last_price = None
-            path: List[Optional[float]] = []
-            for dt in sorted_dates:
-                if dt in series:
-                    last_price = series.get(dt, 0.0)
-                path.append(last_price)
-            price_paths[ticker] = path
-
-        out: List[float] = []
-        kept_dates: List[datetime] = []
-        for idx, dt in enumerate(sorted_dates):
-            total = 0.0
-            any_price = False
-            for ticker in series_by_ticker.keys():
-                price = price_paths.get(ticker, [None])[idx]
-                if price is None:
-                    continue
-                any_price = True
-                if ticker in lots_by_ticker:
-                    qty = 0.0
-                    for ts, q in lots_by_ticker[ticker]:
-                        if ts <= dt:
-                            qty += q
-                        else:
-                            break
-                else:
-                    qty = holdings_map.get(ticker, 0.0)
-                total += price * qty
-            if any_price:
-                out.append(total)
-                kept_dates.append(dt)
+class IncrementalValuation:
+    """\
+    Stateful valuation of one book that reprices only what changed.
+
+    Each holding keeps the entry it was last valued at together with the
+    stamp of the quote behind it (last bar timestamp plus the priced fields).
+    update() re-enriches a holding only when its stamp or quantity moved,
+    drops holdings that disappeared, and adjusts the total by the difference.
+    Between resyncs the running total can differ from a fresh sum of the
+    entries (what calculate_portfolio_value returns) by float rounding; it is
+    re-summed from scratch every RESYNC_EVERY delta updates, or on resync(),
+    so that error stays bounded rather than accumulating.
+    """
+
+    RESYNC_EVERY = 512
 
-        return kept_dates, out
+    def __init__(
+        self,
+        engine: Optional[ValuationEngine] = None,
+        history_period: str = "1mo",
+        history_interval: str = "1d",
+    ):
+        self.engine = engine or ValuationEngine()
+        self.history_period = history_period
+        self.history_interval = history_interval
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # ticker -> (quantity, quote stamp, quote)
+        self._state: Dict[str, Tuple[float, Tuple[Any, ...], Dict[str, Any]]] = {}
+        self._total = 0.0
+        self._deltas = 0
+        self._lock = threading.Lock()
+        self.stats = {"updates": 0, "repriced": 0, "unchanged": 0, "removed": 0, "resyncs": 0}
+
+    @property
+    def total(self) -> float:
+        return self._total
+
+    @staticmethod
+    def quote_stamp(quote: Dict[str, Any]) -> Tuple[Any, ...]:
+        dates = quote.get("history_dates") or []
+        return (
+            dates[-1] if dates else None,
+            len(quote.get("history") or []),
+            quote.get("price"),
+            quote.get("change"),
+            quote.get("pct"),
+            quote.get("name"),
+            quote.get("sector"),
+            quote.get("mkt_cap"),
+        )
+
+    def update(
+        self,
+        holdings: Dict[str, float],
+        quotes: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> Tuple[float, Dict[str, Any]]:
+        """\
+        Revalues the book against holdings; same return shape as calculate_portfolio_value.
+
+        Without quotes every holding is re-quoted through the engine (cache
+        hits for unchanged tickers). With quotes (e.g. a tick of changed
+        prices) held tickers missing from it keep their previous quote and
+        only new tickers are fetched.
+        """
+        quantities = self.engine._normalized_quantities(holdings)
+        tickers = sorted(quantities)
+        if quotes is None:
+            quotes = self.engine.fetch_quotes(tickers, self.history_period, self.history_interval)
+        else:
+            quotes = {self.engine._normalize_ticker(t): q for t, q in quotes.items()}
+            missing = [t for t in tickers if t not in quotes and t not in self._state]
+            if missing:
+                quotes.update(self.engine.fetch_quotes(missing, self.history_period, self.history_interval))
+
+        with self._lock:
+            self.stats["updates"] += 1
+            added = False
+            for t in [t for t in self._entries if t not in quantities]:
+                self._total -= self._entries.pop(t)["market_value"]
+                self._state.pop(t, None)
+                self.stats["removed"] += 1
+                self._deltas += 1
+
+            for t in tickers:
+                qty = quantities[t]
+                previous = self._state.get(t)
+                quote = quotes.get(t)
+                if quote is None:
+                    quote = previous[2] if previous else {}
+                stamp = self.quote_stamp(quote)
+                if previous is not None and previous[0] == qty and previous[1] == stamp:
+                    self.stats["unchanged"] += 1
+                    continue
+                entry = self.engine._enrich_holding(t, qty, quote)
+                old = self._entries.get(t)
+                added = added or old is None
+                self._total += entry["market_value"] - (old["market_value"] if old else 0.0)
+                self._entries[t] = entry
+                self._state[t] = (qty, stamp, quote)
+                self.stats["repriced"] += 1
+                self._deltas += 1
+
+            # New tickers were appended; keep calculate_portfolio_value's sorted order
+            if added:
+                self._entries = {t: self._entries[t] for t in tickers}
+            if self._deltas >= self.RESYNC_EVERY:
+                self._resync()
+            return self._total, dict(self._entries)
+
+    def resync(self) -> float:
+        with self._lock:
+            return self._resync()
+
+    def _resync(self) -> float:
+        total = 0.0
+        for entry in self._entries.values():
+            total += entry["market_value"]
+        self._total = total
+        self._deltas = 0
+        self.stats["resyncs"] += 1
+        return total
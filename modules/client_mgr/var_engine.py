@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+from modules.client_mgr.covariance import panel_covariance
+from modules.market_data.price_panel import PricePanel
+
+
+# Simulated shocks are generated chunk_size paths at a time; the default keeps
+# one chunk's (paths x assets) matrix under this many bytes
+_CHUNK_BYTES = 32 * 1024 * 1024
+# Shocks are simulated in single precision: half the draw and matmul cost, and
+# far below the sampling error of any VaR estimate
+_SIM_DTYPE = np.float32
+
+VAR_METHODS = ("parametric", "historical", "monte_carlo")
+
+# Horizons are trading days; bars at or above one day are used as they are,
+# finer panels are resampled to daily closes first
+_DAILY_INTERVALS = ("1d", "5d", "1wk", "1mo", "3mo")
+
+
+@dataclass(frozen=True)
+class VaRResult:
+    """
+    One VaR/CVaR estimate for the book over horizon trading days.
+
+    var and cvar are P&L in currency (negative is a loss), like the return
+    quantiles calculate_var_cvar reports; var_pct/cvar_pct divide by the
+    book value when it is positive.
+    """
+
+    method: str
+    confidence: float
+    horizon: int
+    var: float
+    cvar: float
+    value: float
+    paths: int = 0
+
+    @property
+    def var_pct(self) -> Optional[float]:
+        return self.var / self.value if self.value > 0 else None
+
+    @property
+    def cvar_pct(self) -> Optional[float]:
+        return self.cvar / self.value if self.value > 0 else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "confidence": self.confidence,
+            "horizon": self.horizon,
+            "var": self.var,
+            "cvar": self.cvar,
+            "var_pct": self.var_pct,
+            "cvar_pct": self.cvar_pct,
+            "paths": self.paths,
+        }
+
+
+def _tail(pnl: np.ndarray, confidence: float) -> tuple[float, float]:
+    var = float(np.quantile(pnl, 1.0 - confidence))
+    tail = pnl[pnl <= var]
+    return var, float(tail.mean()) if tail.size else var
+
+
+class VaREngine:
+    """\
+    Forward-looking VaR/CVaR for a book of N assets.
+
+    returns is a (dates x assets) matrix of simple returns (rows with a gap
+    are dropped) and values the current position values in currency.
+    Three methods, each for any confidence and horizon:
+        - parametric: variance-covariance, normal P&L scaled by sqrt(horizon).
+        - historical: filtered historical simulation; each day's returns are
+          standardized by their EWMA volatility and rescaled to today's, and
+          multi-day P&L is bootstrapped from those daily scenarios.
+        - monte_carlo: log-returns drawn from the covariance (normal or
+          Student-t), compounded per asset; one draw serves every horizon.
+    Simulations run in chunks of chunk_size paths from one seedable
+    generator, so memory stays bounded whatever the path count. covariance,
+    when given (e.g. a Ledoit-Wolf estimate from covariance.py), replaces
+    the sample covariance in the parametric and Monte Carlo methods.
+    """
+
+    def __init__(
+        self,
+        returns: Any,
+        values: Sequence[float],
+        lam: float = 0.94,
+        covariance: Optional[np.ndarray] = None,
+    ):
+        matrix = np.asarray(returns, dtype=np.float64)
+        if matrix.ndim != 2:
+            raise ValueError("returns must be a (dates x assets) matrix")
+        self.values = np.asarray(values, dtype=np.float64)
+        if matrix.shape[1] != self.values.shape[0]:
+            raise ValueError("values must have one entry per returns column")
+        self.returns = matrix[np.isfinite(matrix).all(axis=1)]
+        if self.returns.shape[0] < 2:
+            raise ValueError("need at least two complete return rows")
+        self.lam = float(lam)
+        self.value = float(self.values.sum())
+        self.covariance: Optional[np.ndarray] = None
+        if covariance is not None:
+            self.covariance = np.atleast_2d(np.asarray(covariance, dtype=np.float64))
+            if self.covariance.shape != (matrix.shape[1], matrix.shape[1]):
+                raise ValueError("covariance must be (assets x assets)")
+        self._cov: Optional[np.ndarray] = self.covariance
+        self._factor: Optional[np.ndarray] = None
+        self._scenarios: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_panel(
+        cls,
+        panel: PricePanel,
+        holdings: Mapping[str, float],
+        exclude: Iterable[str] = (),
+        lam: float = 0.94,
+        estimator: Optional[str] = None,
+        interval: str = "1d",
+        period: Optional[str] = None,
+    ) -> Optional["VaREngine"]:
+        """
+        Engine over the panel's returns for holdings ({ticker: qty}) valued at the last close.
+
+        estimator ("sample", "ewma", "ledoit_wolf") takes the covariance from
+        the cached covariance service for the panel's interval and period.
+        """
+        skip = {str(t).upper() for t in exclude}
+        qty: Dict[str, float] = {}
+        for raw, amount in holdings.items():
+            ticker = str(raw).upper()
+            try:
+                amount = float(amount or 0.0)
+            except (TypeError, ValueError):
+                continue
+            if ticker in skip or ticker not in panel or amount == 0.0:
+                continue
+            qty[ticker] = qty.get(ticker, 0.0) + amount
+        if not qty or len(panel) < 3:
+            return None
+        tickers = sorted(qty)
+        cols = [panel.tickers.index(t) for t in tickers]
+        last = panel.filled()[-1, cols]
+        values = np.array([qty[t] for t in tickers]) * last
+        if not np.isfinite(values).all():
+            return None
+        covariance = None
+        if estimator:
+            estimate = panel_covariance(panel, tickers, interval, estimator=estimator, period=period)
+            if estimate is not None and estimate.tickers == tickers:
+                covariance = estimate.matrix
+        try:
+            return cls(panel.returns()[:, cols], values, lam=lam, covariance=covariance)
+        except ValueError:
+            return None
+
+    # -------------------------------
+    # Parametric
+    # -------------------------------
+
+    def parametric(self, confidence: float = 0.95, horizon: int = 1) -> VaRResult:
+        mu = self.returns.mean(axis=0) @ self.values
+        if self._cov is None:
+            self._cov = np.atleast_2d(np.cov(self.returns, rowvar=False, ddof=1))
+        sd = float(np.sqrt(max(self.values @ self._cov @ self.values, 0.0)))
+        z = NormalDist().inv_cdf(1.0 - confidence)
+        scale = np.sqrt(horizon)
+        var = horizon * mu + z * sd * scale
+        cvar = horizon * mu - sd * scale * NormalDist().pdf(z) / (1.0 - confidence)
+        return VaRResult("parametric", confidence, horizon, float(var), float(cvar), self.value)
+
+    # -------------------------------
+    # Filtered historical simulation
+    # -------------------------------
+
+    def _filtered_scenarios(self) -> np.ndarray:
+        """Daily book P&L for each historical day, rescaled to today's volatility."""
+        if self._scenarios is None:
+            rets = self.returns
+            var = rets.var(axis=0, ddof=1)
+            sigma = np.empty_like(rets)
+            for t in range(rets.shape[0]):
+                sigma[t] = np.sqrt(var)
+                var = self.lam * var + (1.0 - self.lam) * rets[t] ** 2
+            current = np.sqrt(var)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                standardized = np.where(sigma > 0, rets / sigma, 0.0)
+            self._scenarios = (standardized * current) @ self.values
+        return self._scenarios
+
+    def historical_pnl(
+        self,
+        horizons: Sequence[int] = (1, 10),
+        paths: int = 10_000,
+        seed: Optional[int] = None,
+        chunk_size: int = 100_000,
+    ) -> Dict[int, np.ndarray]:
+        """1-day P&L is the scenario set itself; longer horizons sum bootstrapped days."""
+        daily = self._filtered_scenarios()
+        rng = np.random.default_rng(seed)
+        out: Dict[int, np.ndarray] = {}
+        for horizon in sorted(set(int(h) for h in horizons)):
+            if horizon <= 1:
+                out[horizon] = daily
+                continue
+            pnl = np.empty(paths)
+            for start in range(0, paths, chunk_size):
+                size = min(chunk_size, paths - start)
+                picks = rng.integers(0, daily.shape[0], size=(size, horizon))
+                pnl[start:start + size] = daily[picks].sum(axis=1)
+            out[horizon] = pnl
+        return out
+
+    # -------------------------------
+    # Monte Carlo
+    # -------------------------------
+
+    def _shock_factor(self) -> np.ndarray:
+        """(rank x assets) matrix F with F.T @ F equal to the log-return covariance."""
+        if self._factor is None:
+            if self.covariance is not None:
+                # Daily log and simple returns share a covariance to second order
+                cov = self.covariance
+            else:
+                cov = np.atleast_2d(np.cov(np.log1p(self.returns), rowvar=False, ddof=1))
+            eigvals, eigvecs = np.linalg.eigh(cov)
+            keep = eigvals > max(eigvals.max(), 0.0) * 1e-12
+            # Only the non-degenerate directions: rank <= dates - 1 for short histories
+            self._factor = np.ascontiguousarray((eigvecs[:, keep] * np.sqrt(eigvals[keep])).T)
+        return self._factor
+
+    def monte_carlo_pnl(
+        self,
+        horizons: Sequence[int] = (1, 10),
+        paths: int = 100_000,
+        seed: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        dist: str = "normal",
+        df: float = 5.0,
+    ) -> Dict[int, np.ndarray]:
+        """Simulated book P&L per horizon; dist is "normal" or "t" (unit-variance Student-t)."""
+        if dist not in ("normal", "t"):
+            raise ValueError("dist must be 'normal' or 't'")
+        factor = self._shock_factor().astype(_SIM_DTYPE)
+        mu = np.log1p(self.returns).mean(axis=0).astype(_SIM_DTYPE)
+        values = self.values.astype(_SIM_DTYPE)
+        assets = values.shape[0]
+        if chunk_size is None:
+            itemsize = np.dtype(_SIM_DTYPE).itemsize
+            chunk_size = max(1_000, _CHUNK_BYTES // (itemsize * max(assets, factor.shape[0])))
+        rng = np.random.default_rng(seed)
+        steps = sorted(set(int(h) for h in horizons))
+        out = {h: np.empty(paths) for h in steps}
+        for start in range(0, paths, chunk_size):
+            size = min(chunk_size, paths - start)
+            shocks = rng.standard_normal((size, factor.shape[0]), dtype=_SIM_DTYPE) @ factor
+            if dist == "t":
+                shocks *= np.sqrt((df - 2.0) / rng.chisquare(df, size)).astype(_SIM_DTYPE)[:, None]
+            # iid days: an h-day log-return is h * mu + sqrt(h) * shock
+            for horizon in steps:
+                simulated = shocks * _SIM_DTYPE(np.sqrt(horizon))
+                simulated += _SIM_DTYPE(horizon) * mu
+                np.expm1(simulated, out=simulated)
+                out[horizon][start:start + size] = simulated @ values
+        return out
+
+    # -------------------------------
+    # All methods
+    # -------------------------------
+
+    def run(
+        self,
+        methods: Sequence[str] = VAR_METHODS,
+        confidences: Sequence[float] = (0.95, 0.99),
+        horizons: Sequence[int] = (1, 10),
+        paths: int = 100_000,
+        seed: Optional[int] = None,
+        dist: str = "normal",
+    ) -> List[VaRResult]:
+        results: List[VaRResult] = []
+        for method in methods:
+            if method == "parametric":
+                for horizon in horizons:
+                    results.extend(self.parametric(c, horizon) for c in confidences)
+                continue
+            if method == "historical":
+                pnl = self.historical_pnl(horizons, paths=paths, seed=seed)
+            elif method == "monte_carlo":
+                pnl = self.monte_carlo_pnl(horizons, paths=paths, seed=seed, dist=dist)
+            else:
+                raise ValueError(f"unknown VaR method: {method}")
+            for horizon in horizons:
+                for confidence in confidences:
+                    var, cvar = _tail(pnl[int(horizon)], confidence)
+                    results.append(
+                        VaRResult(method, confidence, int(horizon), var, cvar, self.value, paths=len(pnl[int(horizon)]))
+                    )
+        return results
+
+
+def forward_var_payload(
+    panel: Optional[PricePanel],
+    holdings: Mapping[str, float],
+    exclude: Iterable[str] = (),
+    paths: int = 20_000,
+    seed: Optional[int] = 7,
+    estimator: Optional[str] = "ledoit_wolf",
+    interval: str = "1d",
+    period: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    VaR/CVaR rows for every method at 95/99% over 1 and 10 trading days, or
+    an error. Intraday panels (e.g. the 1W view's 60m bars) are resampled to
+    daily closes first so horizons stay in days.
+    """
+    if panel is None:
+        return {"error": "Market data empty", "rows": []}
+    source_interval = str(interval)
+    if source_interval not in _DAILY_INTERVALS:
+        panel = panel.resample("D")
+        interval = "1d"
+    engine = VaREngine.from_panel(
+        panel, holdings, exclude=exclude, estimator=estimator, interval=interval, period=period
+    )
+    if engine is None:
+        return {"error": "Insufficient market data", "rows": [], "source_interval": source_interval}
+    return {
+        "horizon_unit": "days",
+        "source_interval": source_interval,
+        "value": engine.value,
+        "assets": int(engine.values.shape[0]),
+        "observations": int(engine.returns.shape[0]),
+        "covariance": estimator if engine.covariance is not None else "sample",
+        "rows": [result.to_dict() for result in engine.run(paths=paths, seed=seed)],
+    }
@@ -0,0 +1,551 @@
+from __future__ import annotations
+
+import calendar
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+Downloader = Callable[..., pd.DataFrame]
+
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+# Calendar days covered by each yfinance period string.
+PERIOD_DAYS = {
+    "1d": 1,
+    "5d": 5,
+    "1mo": 31,
+    "3mo": 92,
+    "6mo": 183,
+    "1y": 366,
+    "2y": 731,
+    "5y": 1827,
+    "10y": 3653,
+}
+
+# Short periods are counted in trading sessions, not calendar days.
+SESSION_PERIODS = {"1d": 1, "5d": 5}
+
+# How long stored bars are trusted before a tail top-up is attempted.
+REFRESH_SECONDS = {
+    "1m": 60,
+    "2m": 60,
+    "5m": 120,
+    "15m": 120,
+    "30m": 300,
+    "60m": 300,
+    "90m": 300,
+    "1h": 300,
+    "1d": 900,
+    "5d": 3600,
+    "1wk": 3600,
+    "1mo": 3600,
+    "3mo": 3600,
+}
+
+# Full downloads fetch this period so shorter windows are reads of the same
+# stored series (the dashboard's 1M/3M/6M/1Y views all slice 5y of daily bars).
+BASE_PERIODS = {"1d": "5y"}
+
+# Relative close difference on the overlapping bar of a tail fetch beyond which
+# stored history is treated as adjusted on an older basis (split/dividend).
+ADJUSTMENT_TOLERANCE = 1e-4
+
+# Coarser bars are resampled from stored daily bars instead of downloaded.
+# Labels follow Yahoo: weeks start Monday, months/quarters on their first day.
+DERIVED_INTERVALS = {"1wk": "W-MON", "1mo": "MS", "3mo": "QS"}
+
+# Yahoo only serves intraday bars this far back; older stored bars are pruned.
+MAX_LOOKBACK_DAYS = {
+    "1m": 7,
+    "2m": 60,
+    "5m": 60,
+    "15m": 60,
+    "30m": 60,
+    "60m": 730,
+    "90m": 60,
+    "1h": 730,
+}
+
+
+def _utc_epoch(dt: datetime) -> int:
+    return int(calendar.timegm(dt.timetuple()))
+
+
+def _from_epoch(ts: int) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(seconds=int(ts))
+
+
+class BarStore:
+    """
+    Persistent OHLCV store keyed by (symbol, interval).
+
+    Bars are kept in a local SQLite file. Reads only reach the network for
+    symbols that were never stored, whose stored coverage is shorter than the
+    requested period, or whose last fetch is older than the interval refresh
+    window; in the last case only the tail since the last complete stored bar
+    is fetched. That bar is compared with the downloaded one, and a mismatch
+    (a split or dividend re-adjusted the history) refetches the full series.
+    Full downloads use the interval's base period (base_periods) and derived
+    intervals are resampled from daily bars, so switching windows or
+    weekly/monthly granularity is local once a series is stored.
+    """
+
+    DEFAULT_PATH = os.path.join("data", "market_bars.db")
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        downloader: Optional[Downloader] = None,
+        base_periods: Optional[Dict[str, str]] = None,
+        derived_intervals: Optional[Dict[str, str]] = None,
+    ):
+        self.path = path or self.DEFAULT_PATH
+        self._downloader = downloader
+        self.base_periods = dict(BASE_PERIODS if base_periods is None else base_periods)
+        self.derived_intervals = dict(DERIVED_INTERVALS if derived_intervals is None else derived_intervals)
+        self._lock = threading.Lock()
+        self._ready = False
+        self.stats = {"reads": 0, "full_fetches": 0, "tail_fetches": 0, "store_hits": 0, "derived": 0, "readjusted": 0}
+
+    # -------------------------------
+    # Storage
+    # -------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            self._init_schema(conn)
+        return conn
+
+    def _init_schema(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if self._ready:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bars (
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    open REAL,
+                    high REAL,
+                    low REAL,
+                    close REAL,
+                    volume REAL,
+                    PRIMARY KEY (symbol, interval, ts)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bar_series (
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    covered_from INTEGER NOT NULL,
+                    last_ts INTEGER NOT NULL,
+                    fetched_at INTEGER NOT NULL,
+                    PRIMARY KEY (symbol, interval)
+                )
+                """
+            )
+            conn.commit()
+            self._ready = True
+
+    def _series_state(
+        self, conn: sqlite3.Connection, symbols: List[str], interval: str
+    ) -> Dict[str, Tuple[int, int, int]]:
+        if not symbols:
+            return {}
+        marks = ",".join("?" for _ in symbols)
+        rows = conn.execute(
+            f"SELECT symbol, covered_from, last_ts, fetched_at FROM bar_series "
+            f"WHERE interval = ? AND symbol IN ({marks})",
+            [interval, *symbols],
+        ).fetchall()
+        return {row[0]: (int(row[1]), int(row[2]), int(row[3])) for row in rows}
+
+    def _tail_anchors(
+        self, conn: sqlite3.Connection, symbols: List[str], interval: str
+    ) -> Dict[str, Tuple[int, float]]:
+        """(ts, close) of each symbol's last complete bar, the one before the newest."""
+        anchors: Dict[str, Tuple[int, float]] = {}
+        for sym in symbols:
+            rows = conn.execute(
+                "SELECT ts, close FROM bars WHERE symbol = ? AND interval = ? ORDER BY ts DESC LIMIT 2",
+                (sym, interval),
+            ).fetchall()
+            if rows:
+                ts, close = rows[-1]
+                anchors[sym] = (int(ts), float("nan") if close is None else float(close))
+        return anchors
+
+    def _purge(self, conn: sqlite3.Connection, symbols: List[str], interval: str) -> None:
+        with self._lock:
+            conn.executemany(
+                "DELETE FROM bars WHERE symbol = ? AND interval = ?", [(s, interval) for s in symbols]
+            )
+            conn.executemany(
+                "DELETE FROM bar_series WHERE symbol = ? AND interval = ?", [(s, interval) for s in symbols]
+            )
+            conn.commit()
+
+    @staticmethod
+    def _readjusted(frames: Dict[str, pd.DataFrame], anchors: Dict[str, Tuple[int, float]]) -> List[str]:
+        """Symbols whose downloaded close on the anchor bar differs from the stored one."""
+        out: List[str] = []
+        for sym, frame in frames.items():
+            anchor = anchors.get(sym)
+            if anchor is None or frame.empty:
+                continue
+            stamp = pd.Timestamp(_from_epoch(anchor[0]))
+            if stamp not in frame.index:
+                continue
+            fresh = float(frame["Close"].loc[stamp])
+            stored = anchor[1]
+            if not (np.isfinite(fresh) and np.isfinite(stored)) or stored == 0:
+                continue
+            if abs(fresh / stored - 1.0) > ADJUSTMENT_TOLERANCE:
+                out.append(sym)
+        return out
+
+    def _write(
+        self,
+        conn: sqlite3.Connection,
+        interval: str,
+        frames: Dict[str, pd.DataFrame],
+        covered_from: Optional[int],
+        now_ts: int,
+    ) -> None:
+        with self._lock:
+            for sym, frame in frames.items():
+                if frame.empty:
+                    continue
+                ts = (frame.index.values.astype("datetime64[s]").astype(np.int64)).tolist()
+                cols = [frame[f].to_numpy(dtype=float, na_value=np.nan).tolist() for f in FIELDS]
+                conn.executemany(
+                    "INSERT OR REPLACE INTO bars "
+                    "(symbol, interval, ts, open, high, low, close, volume) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(sym, interval, t, *vals) for t, *vals in zip(ts, *cols)],
+                )
+                first_ts, last_ts = int(ts[0]), int(ts[-1])
+                prior = conn.execute(
+                    "SELECT covered_from, last_ts FROM bar_series WHERE symbol = ? AND interval = ?",
+                    (sym, interval),
+                ).fetchone()
+                start = first_ts if covered_from is None else min(first_ts, covered_from)
+                if prior:
+                    start = min(start, int(prior[0]))
+                    last_ts = max(last_ts, int(prior[1]))
+                conn.execute(
+                    "INSERT OR REPLACE INTO bar_series "
+                    "(symbol, interval, covered_from, last_ts, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                    (sym, interval, start, last_ts, now_ts),
+                )
+            lookback = MAX_LOOKBACK_DAYS.get(interval)
+            if lookback:
+                cutoff = now_ts - lookback * 86400
+                conn.execute("DELETE FROM bars WHERE interval = ? AND ts < ?", (interval, cutoff))
+                conn.execute(
+                    "UPDATE bar_series SET covered_from = ? WHERE interval = ? AND covered_from < ?",
+                    (cutoff, interval, cutoff),
+                )
+            conn.commit()
+
+    def _read(
+        self,
+        conn: sqlite3.Connection,
+        symbols: List[str],
+        interval: str,
+        start_ts: int,
+    ) -> pd.DataFrame:
+        marks = ",".join("?" for _ in symbols)
+        rows = conn.execute(
+            f"SELECT symbol, ts, open, high, low, close, volume FROM bars "
+            f"WHERE interval = ? AND ts >= ? AND symbol IN ({marks}) ORDER BY ts",
+            [interval, start_ts, *symbols],
+        ).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        long = pd.DataFrame(rows, columns=["symbol", "ts", *FIELDS])
+        long["ts"] = pd.to_datetime(long["ts"], unit="s")
+        wide = long.pivot(index="ts", columns="symbol", values=list(FIELDS))
+        wide.index.name = "Date"
+        wide.columns.names = ["Price", "Ticker"]
+        return wide
+
+    # -------------------------------
+    # Fetching
+    # -------------------------------
+
+    def _download(self, symbols: List[str], **kwargs) -> pd.DataFrame:
+        downloader = self._downloader
+        if downloader is None:
+            import yfinance as yf
+
+            downloader = yf.download
+        return downloader(
+            symbols,
+            progress=False,
+            group_by="column",
+            auto_adjust=True,
+            **kwargs,
+        )
+
+    @staticmethod
+    def split_frame(data: pd.DataFrame, symbols: Iterable[str]) -> Dict[str, pd.DataFrame]:
+        """Splits a yf.download frame into per-symbol OHLCV frames (naive index)."""
+        out: Dict[str, pd.DataFrame] = {}
+        if data is None or data.empty:
+            return out
+        frame = data
+        if getattr(frame.index, "tz", None) is not None:
+            frame = frame.copy()
+            frame.index = frame.index.tz_localize(None)
+        symbols = list(symbols)
+        if isinstance(frame.columns, pd.MultiIndex):
+            fields = set(frame.columns.get_level_values(0))
+            if "Close" not in fields:
+                return out
+            for sym in symbols:
+                if sym not in frame["Close"].columns:
+                    continue
+                sub = pd.DataFrame(
+                    {
+                        f: frame[f][sym] if f in fields else np.nan
+                        for f in FIELDS
+                    },
+                    index=frame.index,
+                )
+                sub = sub[sub["Close"].notna()]
+                if not sub.empty:
+                    out[sym] = sub
+        elif len(symbols) == 1 and "Close" in frame.columns:
+            sub = pd.DataFrame(
+                {f: frame[f] if f in frame.columns else np.nan for f in FIELDS},
+                index=frame.index,
+            )
+            sub = sub[sub["Close"].notna()]
+            if not sub.empty:
+                out[symbols[0]] = sub
+        return out
+
+    @staticmethod
+    def _period_start(period: str, now: datetime) -> int:
+        key = str(period or "").lower()
+        if key == "max":
+            return 0
+        if key == "ytd":
+            return _utc_epoch(datetime(now.year, 1, 1))
+        sessions = SESSION_PERIODS.get(key)
+        if sessions is not None:
+            # Pad for weekends/holidays; trimmed to sessions on read.
+            return _utc_epoch(now - timedelta(days=sessions + 4))
+        days = PERIOD_DAYS.get(key, 366)
+        return _utc_epoch(now - timedelta(days=days))
+
+    @staticmethod
+    def _trim_sessions(frame: pd.DataFrame, sessions: int) -> pd.DataFrame:
+        if frame.empty:
+            return frame
+        close = frame["Close"]
+        days = close.index.normalize()
+        keep = pd.DataFrame(False, index=frame.index, columns=close.columns)
+        for sym in close.columns:
+            valid = close[sym].notna().to_numpy()
+            last_days = np.unique(days[valid])[-sessions:]
+            keep[sym] = valid & np.isin(days, last_days)
+        mask = pd.concat({f: keep for f in FIELDS}, axis=1)
+        trimmed = frame.where(mask[frame.columns].to_numpy())
+        return trimmed[keep.any(axis=1).to_numpy()]
+
+    @staticmethod
+    def resample_ohlcv(frame: pd.DataFrame, rule: str) -> pd.DataFrame:
+        """Aggregates a yf.download-style frame into coarser bars labelled by bucket start."""
+        if frame is None or frame.empty:
+            return frame
+        how = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+        fields = [f for f in FIELDS if f in frame.columns.get_level_values(0)]
+        parts = {}
+        for field in fields:
+            resampler = frame[field].resample(rule, label="left", closed="left")
+            agg = getattr(resampler, how[field])
+            parts[field] = agg(min_count=1) if field == "Volume" else agg()
+        out = pd.concat(parts, axis=1)
+        out.columns.names = frame.columns.names
+        out.index.name = frame.index.name
+        # Buckets with no closes at all (holidays, gaps) are not bars
+        return out[out["Close"].notna().any(axis=1).to_numpy()]
+
+    def get_frame(
+        self,
+        symbols: Iterable[str],
+        period: str = "1y",
+        interval: str = "1d",
+        force_refresh: bool = False,
+    ) -> pd.DataFrame:
+        """
+        Returns stored bars for symbols shaped like yf.download(group_by="column").
+
+        Missing or under-covered series are downloaded for the full period; stale
+        series only fetch bars since their last complete stored bar, and are
+        downloaded in full when that bar's close was re-adjusted upstream.
+        Failed downloads are logged and the stored (possibly stale) bars are
+        served; the error is re-raised only when nothing is stored to serve.
+        """
+        syms = sorted({str(s or "").strip().upper() for s in symbols if str(s or "").strip()})
+        if not syms:
+            return pd.DataFrame()
+        interval = str(interval or "1d")
+        rule = self.derived_intervals.get(interval)
+        if rule:
+            daily = self.get_frame(syms, period=period, interval="1d", force_refresh=force_refresh)
+            self.stats["derived"] += 1
+            return self.resample_ohlcv(daily, rule)
+        now = datetime.now()
+        now_ts = _utc_epoch(now)
+        start_ts = self._period_start(period, now)
+        fetch_period, fetch_start = period, start_ts
+        base = self.base_periods.get(interval)
+        if base and self._period_start(base, now) < start_ts:
+            fetch_period, fetch_start = base, self._period_start(base, now)
+        refresh = REFRESH_SECONDS.get(interval, 300)
+        lookback = MAX_LOOKBACK_DAYS.get(interval)
+
+        conn = self._connect()
+        try:
+            state = self._series_state(conn, syms, interval)
+            full: List[str] = []
+            stale: List[str] = []
+            errors: List[Exception] = []
+            for sym in syms:
+                entry = state.get(sym)
+                if entry is None or entry[0] > start_ts:
+                    full.append(sym)
+                    continue
+                covered_from, last_ts, fetched_at = entry
+                if not force_refresh and (now_ts - fetched_at) < refresh:
+                    self.stats["store_hits"] += 1
+                    continue
+                if lookback and (now_ts - last_ts) > lookback * 86400:
+                    full.append(sym)
+                    continue
+                stale.append(sym)
+
+            # Tails start at the last complete bar so the overlap can be checked.
+            anchors = self._tail_anchors(conn, stale, interval)
+            tails: Dict[str, List[str]] = {}
+            for sym in stale:
+                if sym not in anchors:
+                    full.append(sym)
+                    continue
+                tail_start = _from_epoch(anchors[sym][0]).strftime("%Y-%m-%d")
+                tails.setdefault(tail_start, []).append(sym)
+
+            for tail_start, group in tails.items():
+                self.stats["tail_fetches"] += 1
+                try:
+                    data = self._download(group, start=tail_start, interval=interval)
+                    frames = self.split_frame(data, group)
+                    readjusted = self._readjusted(frames, anchors)
+                    if readjusted:
+                        # Stored bars are on an older adjustment basis; replace them whole.
+                        self.stats["readjusted"] += len(readjusted)
+                        self._purge(conn, readjusted, interval)
+                        full.extend(readjusted)
+                        frames = {s: f for s, f in frames.items() if s not in readjusted}
+                    self._write(conn, interval, frames, None, now_ts)
+                    untouched = [s for s in group if s not in frames]
+                    if untouched:
+                        # Nothing new upstream (e.g. market closed); trust the store again.
+                        with self._lock:
+                            conn.executemany(
+                                "UPDATE bar_series SET fetched_at = ? WHERE symbol = ? AND interval = ?",
+                                [(now_ts, s, interval) for s in untouched],
+                            )
+                            conn.commit()
+                except Exception as exc:
+                    logger.warning("Tail download failed for %s (%s): %s", ",".join(group), interval, exc)
+                    errors.append(exc)
+
+            if full:
+                self.stats["full_fetches"] += 1
+                try:
+                    data = self._download(full, period=fetch_period, interval=interval)
+                    self._write(conn, interval, self.split_frame(data, full), fetch_start, now_ts)
+                except Exception as exc:
+                    logger.warning("Download failed for %s (%s): %s", ",".join(full), interval, exc)
+                    errors.append(exc)
+
+            self.stats["reads"] += 1
+            frame = self._read(conn, syms, interval, start_ts)
+        finally:
+            conn.close()
+        if errors and frame.empty:
+            # Callers must not mistake a throttled or failed download for a symbol without data
+            raise errors[0]
+
+        sessions = SESSION_PERIODS.get(str(period or "").lower())
+        if sessions is not None:
+            frame = self._trim_sessions(frame, sessions)
+        return frame
+
+    def stored_frame(
+        self,
+        symbols: Iterable[str],
+        interval: str = "1d",
+        start: Optional[datetime] = None,
+    ) -> pd.DataFrame:
+        """
+        Bars already on disk for symbols since start (all stored bars by
+        default), shaped like get_frame; never downloads.
+        """
+        syms = sorted({str(s or "").strip().upper() for s in symbols if str(s or "").strip()})
+        if not syms:
+            return pd.DataFrame()
+        start_ts = _utc_epoch(start) if start is not None else 0
+        conn = self._connect()
+        try:
+            self.stats["reads"] += 1
+            return self._read(conn, syms, str(interval or "1d"), start_ts)
+        finally:
+            conn.close()
+
+    def last_timestamp(self, symbol: str, interval: str = "1d") -> Optional[datetime]:
+        conn = self._connect()
+        try:
+            state = self._series_state(conn, [str(symbol or "").strip().upper()], interval)
+        finally:
+            conn.close()
+        entry = next(iter(state.values()), None)
+        if entry is None:
+            return None
+        return _from_epoch(entry[1])
+
+    def summary(self) -> Dict[str, object]:
+        """Row/series counts and fetch counters for diagnostics."""
+        if not os.path.exists(self.path):
+            return {"status": "missing", "series": 0, "bars": 0, **self.stats}
+        try:
+            conn = self._connect()
+            try:
+                series = int(conn.execute("SELECT COUNT(*) FROM bar_series").fetchone()[0])
+                bars = int(conn.execute("SELECT COUNT(*) FROM bars").fetchone()[0])
+            finally:
+                conn.close()
+        except Exception:
+            return {"status": "error", "series": 0, "bars": 0, **self.stats}
+        return {"status": "ready", "series": series, "bars": bars, **self.stats}
@@ -9,6 +9,8 @@ from xml.etree import ElementTree
 
 import requests
 
+from utils.upstream import guarded_request
+
 USER_AGENT = "ClearNews/1.0 (+local)"
 
 
@@ -33,7 +35,7 @@ class RSSCollector(Collector):
     def fetch(self) -> CollectorResult:
         items: List[Dict[str, object]] = []
         try:
-            resp = requests.get(self.url, timeout=8, headers={"User-Agent": USER_AGENT})
+            resp = guarded_request(requests.get, self.url, timeout=8, headers={"User-Agent": USER_AGENT})
             if resp.status_code != 200:
                 return CollectorResult(self.name, [])
             root = ElementTree.fromstring(resp.content)
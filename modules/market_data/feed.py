@@ -199,7 +199,7 @@ class MarketFeed:
 
         macro_status = "Not loaded"
         if YahooWrapper._SNAPSHOT_CACHE:
-            latest_ts = max(int(ts or 0) for ts, _ in YahooWrapper._SNAPSHOT_CACHE.values())
+            latest_ts = int(max(YahooWrapper._SNAPSHOT_CACHE.timestamps()))
             age = max(0, int(time.time()) - latest_ts)
             macro_status = f"Cached {age}s ago"
 
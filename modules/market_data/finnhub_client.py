@@ -1,33 +1,42 @@
 import os
-import finnhub
 import time
 from rich.console import Console
 
+from modules.market_data.providers import get_provider
+from modules.market_data.singleflight import flight_group
+from utils.cache import shared_cache
+from utils.upstream import UpstreamUnavailable
+
 class FinnhubWrapper:
-    _CACHE = {}
     _TTL = 30  # 30 seconds
+    _CACHE = shared_cache("finnhub.quotes", max_entries=4096, ttl_seconds=_TTL)
+    _FLIGHTS = flight_group("finnhub")
 
     def __init__(self):
         self.console = Console()
         self.api_key = os.getenv("FINNHUB_API_KEY")
-        self.client = finnhub.Client(api_key=self.api_key) if self.api_key else None
+        # Live provider quotes through finnhub.Client; replay serves them offline
+        self.provider = get_provider()
 
     def _now(self):
         return int(time.time())
 
     def get_quote(self, symbol: str):
         """Fetches real-time quote for a single stock ticker with caching."""
-        if not self.client:
+        if not self.provider.quotes_available():
             return {"error": "API Key Missing"}
 
         sym = symbol.upper()
-        cache = FinnhubWrapper._CACHE.get(sym)
-        if cache and (self._now() - cache[0]) < FinnhubWrapper._TTL:
-            return cache[1]
+        cached = FinnhubWrapper._CACHE.get(sym)
+        if cached:
+            return cached
+
+        return FinnhubWrapper._FLIGHTS.do(("quote", sym), self._fetch_quote, sym)
 
+    def _fetch_quote(self, sym: str):
         try:
-            data = self.client.quote(sym)
-            if data["c"] == 0 and data["d"] == 0:
+            data = self.provider.quote(sym)
+            if not data or (data["c"] == 0 and data["d"] == 0):
                 return None
 
             result = {
@@ -37,7 +46,10 @@ class FinnhubWrapper:
                 "high": data["h"],
                 "low": data["l"]
             }
-            FinnhubWrapper._CACHE[sym] = (self._now(), result)
+            FinnhubWrapper._CACHE.set(sym, result)
             return result
+        except UpstreamUnavailable:
+            # Breaker open or rate budget spent: the last quote beats an empty row
+            return FinnhubWrapper._CACHE.get(sym, allow_stale=True)
         except Exception:
             return None
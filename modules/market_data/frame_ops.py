@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def close_panel(frame: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """
+    Close prices (symbols as columns) from a yf.download-style frame.
+
+    Prefers "Close" over "Adj Close"; returns None when neither is present.
+    """
+    if frame is None or frame.empty:
+        return None
+    if isinstance(frame.columns, pd.MultiIndex):
+        fields = frame.columns.get_level_values(0)
+        for field in ("Close", "Adj Close"):
+            if field in fields:
+                return frame[field].copy()
+        return None
+    for field in ("Close", "Adj Close"):
+        if field in frame.columns:
+            return frame[[field]].copy()
+    return None
+
+
+def weighted_value_series(
+    close: pd.DataFrame,
+    weights: Mapping[str, float],
+    exclude: Iterable[str] = (),
+) -> Optional[pd.Series]:
+    """
+    sum(close[t] * weights[t]) over the columns present, as one matrix product.
+
+    A missing price in any contributing column makes that row NaN, matching
+    plain Series addition. Returns None when no weighted column overlaps.
+    """
+    skip = {str(s).upper() for s in exclude}
+    qty: Dict[str, float] = {}
+    for sym, weight in weights.items():
+        key = str(sym).upper()
+        if key in skip or key not in close.columns:
+            continue
+        qty[key] = qty.get(key, 0.0) + float(weight)
+    if not qty:
+        return None
+    cols = list(qty.keys())
+    values = close[cols].to_numpy(dtype=float)
+    total = values @ np.fromiter(qty.values(), dtype=float, count=len(qty))
+    return pd.Series(total, index=close.index)
+
+
+def _field_panel(frame: pd.DataFrame, field: str, symbols: List[str]) -> pd.DataFrame:
+    if field not in frame.columns.get_level_values(0):
+        return pd.DataFrame(np.nan, index=frame.index, columns=symbols)
+    return frame[field].reindex(columns=symbols).astype(float)
+
+
+def summarize_columns(
+    frame: Optional[pd.DataFrame],
+    symbols: List[str],
+    volume: str = "last",
+) -> Tuple[pd.DataFrame, Dict[str, List[float]], List[str]]:
+    """
+    Per-symbol snapshot stats for a yf.download-style frame in one pass.
+
+    Returns (stats, histories, missing): stats is indexed by symbol with
+    price/start/change/pct/high/low/volume columns, histories maps each symbol
+    to its non-NaN closes, and missing lists symbols without any close.
+    volume="last" keeps the last reported volume, "sum" totals it.
+    """
+    if frame is None or frame.empty:
+        return pd.DataFrame(columns=["price", "start", "change", "pct", "high", "low", "volume"]), {}, list(symbols)
+    if not isinstance(frame.columns, pd.MultiIndex):
+        if len(symbols) != 1:
+            return pd.DataFrame(columns=["price", "start", "change", "pct", "high", "low", "volume"]), {}, list(symbols)
+        frame = pd.concat({symbols[0]: frame}, axis=1).swaplevel(0, 1, axis=1)
+
+    close = close_panel(frame)
+    if close is None:
+        return pd.DataFrame(columns=["price", "start", "change", "pct", "high", "low", "volume"]), {}, list(symbols)
+    close = close.reindex(columns=symbols).astype(float)
+
+    values = close.to_numpy()
+    valid = ~np.isnan(values)
+    has_data = valid.any(axis=0)
+    rows = np.arange(values.shape[0])[:, None]
+    # Row of the first/last valid close per column
+    first_idx = np.where(valid, rows, values.shape[0]).min(axis=0)
+    last_idx = np.where(valid, rows, -1).max(axis=0)
+    cols = np.arange(values.shape[1])
+    price = np.where(has_data, values[np.clip(last_idx, 0, None), cols], np.nan)
+    start = np.where(has_data, values[np.clip(first_idx, 0, values.shape[0] - 1), cols], np.nan)
+    change = price - start
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(start != 0, change / start * 100.0, 0.0)
+
+    high = _field_panel(frame, "High", symbols).max(axis=0).to_numpy()
+    low = _field_panel(frame, "Low", symbols).min(axis=0).to_numpy()
+    vol_panel = _field_panel(frame, "Volume", symbols)
+    if volume == "sum":
+        vol = vol_panel.sum(axis=0, min_count=1).to_numpy()
+    else:
+        vol = vol_panel.ffill().iloc[-1].to_numpy() if len(vol_panel) else np.full(len(symbols), np.nan)
+
+    stats = pd.DataFrame(
+        {
+            "price": price,
+            "start": start,
+            "change": change,
+            "pct": pct,
+            "high": np.where(np.isnan(high), price, high),
+            "low": np.where(np.isnan(low), price, low),
+            "volume": np.nan_to_num(vol, nan=0.0),
+        },
+        index=pd.Index(symbols),
+    )
+    stats = stats[has_data]
+    histories = {
+        sym: values[valid[:, i], i].tolist()
+        for i, sym in enumerate(symbols)
+        if has_data[i]
+    }
+    missing = [sym for i, sym in enumerate(symbols) if not has_data[i]]
+    return stats, histories, missing
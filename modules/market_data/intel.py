@@ -15,6 +15,7 @@ from modules.market_data.collectors import (
     DEFAULT_SOURCES,
     NEWS_CATEGORIES,
 )
+from utils.upstream import UpstreamUnavailable, guarded_request
 
 
 @dataclass
@@ -608,7 +609,7 @@ class WeatherIntel:
             "timezone": "UTC",
         }
         try:
-            resp = requests.get(self.BASE_URL, params=params, timeout=8)
+            resp = guarded_request(requests.get, self.BASE_URL, upstream="open-meteo", params=params, timeout=8)
             if resp.status_code != 200:
                 return {"error": f"Open-Meteo HTTP {resp.status_code}"}
             payload = resp.json()
@@ -669,7 +670,7 @@ class ConflictIntel:
             "sort": "HybridRel",
         }
         try:
-            resp = requests.get(self.BASE_URL, params=params, timeout=8)
+            resp = guarded_request(requests.get, self.BASE_URL, upstream="gdelt", params=params, timeout=8)
             if resp.status_code != 200:
                 self._record_fail()
                 return {"error": f"GDELT HTTP {resp.status_code}"}
@@ -684,6 +685,8 @@ class ConflictIntel:
             except Exception:
                 self._record_fail()
                 return {"error": "GDELT returned invalid JSON."}
+        except UpstreamUnavailable as exc:
+            return {"error": f"GDELT fetch skipped: {exc}", "cooldown": True}
         except Exception as exc:
             self._record_fail()
             return {"error": f"GDELT fetch failed: {exc}"}
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import concurrent.futures
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+MetadataFetcher = Callable[[str], Optional[Dict[str, Any]]]
+
+
+def placeholder_metadata(symbol: str) -> Dict[str, Any]:
+    return {"name": symbol, "sector": "N/A", "industry": "N/A", "mkt_cap": None}
+
+
+class MetadataStore:
+    """
+    Persistent ticker metadata (name/sector/industry/market cap) kept apart
+    from price data.
+
+    Entries older than ttl_seconds are still served but flagged stale so
+    callers can queue a background refresh; lookups never hit the network.
+    Symbols whose lookup failed are not re-queued for miss_ttl_seconds.
+    """
+
+    DEFAULT_PATH = os.path.join("data", "ticker_metadata.db")
+    DEFAULT_TTL_SECONDS = 7 * 86400
+    DEFAULT_MISS_TTL_SECONDS = 15 * 60
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        fetcher: Optional[MetadataFetcher] = None,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_workers: int = 4,
+        miss_ttl_seconds: int = DEFAULT_MISS_TTL_SECONDS,
+    ):
+        self.path = path or self.DEFAULT_PATH
+        self.ttl_seconds = int(ttl_seconds)
+        self.miss_ttl_seconds = int(miss_ttl_seconds)
+        self._fetcher = fetcher
+        self._max_workers = max(1, int(max_workers))
+        self._lock = threading.Lock()
+        self._ready = False
+        self._inflight: Set[str] = set()
+        # symbol -> time before which a failed lookup is not retried
+        self._misses: Dict[str, float] = {}
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.stats = {"refreshed": 0, "failed": 0, "queued": 0, "batches": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS ticker_metadata (
+                            symbol TEXT PRIMARY KEY,
+                            name TEXT,
+                            sector TEXT,
+                            industry TEXT,
+                            mkt_cap REAL,
+                            updated_at INTEGER NOT NULL
+                        )
+                        """
+                    )
+                    conn.commit()
+                    self._ready = True
+        return conn
+
+    @staticmethod
+    def _normalize(symbols: Iterable[str]) -> List[str]:
+        return sorted({str(s or "").strip().upper() for s in symbols if str(s or "").strip()})
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, Tuple[Dict[str, Any], bool]]:
+        """Returns symbol -> (metadata, is_fresh) for every stored symbol."""
+        syms = self._normalize(symbols)
+        if not syms:
+            return {}
+        out: Dict[str, Tuple[Dict[str, Any], bool]] = {}
+        now = int(time.time())
+        conn = self._connect()
+        try:
+            # SQLite caps bound parameters; query in slices.
+            for i in range(0, len(syms), 500):
+                part = syms[i:i + 500]
+                marks = ",".join("?" for _ in part)
+                rows = conn.execute(
+                    f"SELECT symbol, name, sector, industry, mkt_cap, updated_at "
+                    f"FROM ticker_metadata WHERE symbol IN ({marks})",
+                    part,
+                ).fetchall()
+                for sym, name, sector, industry, mkt_cap, updated_at in rows:
+                    meta = {
+                        "name": name or sym,
+                        "sector": sector or "N/A",
+                        "industry": industry or "N/A",
+                        "mkt_cap": mkt_cap,
+                    }
+                    out[sym] = (meta, (now - int(updated_at or 0)) < self.ttl_seconds)
+        finally:
+            conn.close()
+        return out
+
+    def put_many(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        now = int(time.time())
+        rows = [
+            (
+                str(sym).strip().upper(),
+                meta.get("name"),
+                meta.get("sector"),
+                meta.get("industry"),
+                meta.get("mkt_cap"),
+                now,
+            )
+            for sym, meta in entries.items()
+        ]
+        conn = self._connect()
+        try:
+            with self._lock:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO ticker_metadata "
+                    "(symbol, name, sector, industry, mkt_cap, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.commit()
+        finally:
+            conn.close()
+
+    def stale_symbols(self, symbols: Iterable[str]) -> List[str]:
+        """Symbols that are missing or past their TTL."""
+        syms = self._normalize(symbols)
+        stored = self.get_many(syms)
+        return [s for s in syms if s not in stored or not stored[s][1]]
+
+    # -------------------------------
+    # Background refresh
+    # -------------------------------
+
+    def _refresh_batch(self, symbols: List[str]) -> None:
+        found: Dict[str, Dict[str, Any]] = {}
+        missed: List[str] = []
+        try:
+            for symbol in symbols:
+                try:
+                    meta = self._fetcher(symbol) if self._fetcher else None
+                except Exception:
+                    meta = None
+                if meta:
+                    found[symbol] = meta
+                else:
+                    missed.append(symbol)
+            self.put_many(found)
+        except Exception:
+            missed = list(symbols)
+            found = {}
+        finally:
+            retry_at = time.time() + self.miss_ttl_seconds
+            with self._lock:
+                for symbol in missed:
+                    self._misses[symbol] = retry_at
+                for symbol in found:
+                    self._misses.pop(symbol, None)
+                self._inflight.difference_update(symbols)
+            self.stats["refreshed"] += len(found)
+            self.stats["failed"] += len(missed)
+
+    def _without_recent_misses(self, symbols: List[str]) -> List[str]:
+        now = time.time()
+        with self._lock:
+            for sym in [s for s, until in self._misses.items() if until <= now]:
+                del self._misses[sym]
+            return [s for s in symbols if s not in self._misses]
+
+    def refresh_async(self, symbols: Iterable[str], only_stale: bool = True) -> int:
+        """
+        Queues metadata lookups on a small background pool.
+
+        Returns the number of symbols queued; symbols already in flight or
+        whose last lookup failed within miss_ttl_seconds are skipped, and with
+        only_stale=True fresh entries are left alone. Pending symbols are
+        split into one batch per worker, each persisted with a single write.
+        """
+        if self._fetcher is None:
+            return 0
+        syms = self._without_recent_misses(self._normalize(symbols))
+        if only_stale:
+            syms = self.stale_symbols(syms)
+        with self._lock:
+            pending = [s for s in syms if s not in self._inflight]
+            self._inflight.update(pending)
+            if pending and self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="ticker-metadata",
+                )
+            executor = self._executor
+        if not pending:
+            return 0
+        size = -(-len(pending) // self._max_workers)
+        for i in range(0, len(pending), size):
+            executor.submit(self._refresh_batch, pending[i:i + size])
+            self.stats["batches"] += 1
+        self.stats["queued"] += len(pending)
+        return len(pending)
+
+    def summary(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {"status": "missing", "symbols": 0, "stale": 0, **self.stats}
+        try:
+            conn = self._connect()
+            try:
+                total = int(conn.execute("SELECT COUNT(*) FROM ticker_metadata").fetchone()[0])
+                cutoff = int(time.time()) - self.ttl_seconds
+                stale = int(
+                    conn.execute(
+                        "SELECT COUNT(*) FROM ticker_metadata WHERE updated_at < ?", (cutoff,)
+                    ).fetchone()[0]
+                )
+            finally:
+                conn.close()
+        except Exception:
+            return {"status": "error", "symbols": 0, "stale": 0, **self.stats}
+        with self._lock:
+            inflight = len(self._inflight)
+            misses = len(self._misses)
+        return {
+            "status": "ready",
+            "symbols": total,
+            "stale": stale,
+            "inflight": inflight,
+            "misses": misses,
+            **self.stats,
+        }
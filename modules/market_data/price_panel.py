@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.market_data.bar_store import BarStore
+from modules.market_data.frame_ops import close_panel, weighted_value_series
+from modules.market_data.yfinance_client import YahooWrapper
+from utils.cache import shared_cache
+
+
+# Short-lived: one dashboard render (and anything else inside the same minute)
+# shares a panel; the bar store stays the source of truth.
+_PANEL_TTL_SECONDS = 60
+_PANEL_CACHE = shared_cache(
+    "price.panels",
+    max_entries=64,
+    ttl_seconds=_PANEL_TTL_SECONDS,
+    max_bytes=128 * 1024 * 1024,
+)
+
+
+class PricePanel:
+    """
+    Close prices for N tickers on one shared date index.
+
+    values is a float64 (dates x tickers) matrix with NaN where a ticker has no
+    bar. frame(), column() and window() are views on it; the forward-filled
+    matrix and the simple/log return matrices are computed once per panel and
+    reused by every caller. source keeps the OHLCV frame the panel was built
+    from so quotes can be derived without another read.
+    """
+
+    def __init__(
+        self,
+        index: pd.Index,
+        tickers: Iterable[str],
+        values: np.ndarray,
+        source: Optional[pd.DataFrame] = None,
+    ):
+        self.index = index
+        self.tickers: List[str] = [str(t).upper() for t in tickers]
+        self.values = np.asarray(values, dtype=np.float64)
+        if self.values.shape != (len(index), len(self.tickers)):
+            raise ValueError("values must be shaped (len(index), len(tickers))")
+        self.source = source
+        self._pos = {t: i for i, t in enumerate(self.tickers)}
+        self._filled: Optional[np.ndarray] = None
+        self._returns: Optional[np.ndarray] = None
+        self._log_returns: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_frame(cls, frame: Optional[pd.DataFrame], tickers: Optional[Iterable[str]] = None) -> Optional["PricePanel"]:
+        """
+        Builds a panel from a yf.download-style frame; None without closes.
+
+        tickers names the column of a single-ticker (flat) frame.
+        """
+        close = close_panel(frame)
+        if close is None or close.empty:
+            return None
+        if not isinstance(frame.columns, pd.MultiIndex):
+            names = [str(t).upper() for t in (tickers or [])]
+            if len(names) != 1:
+                return None
+            close.columns = names
+        else:
+            # Tickers without bars are left out, as in the frame itself
+            close.columns = [str(c).upper() for c in close.columns]
+        index = close.index
+        if getattr(index, "tz", None) is not None:
+            index = index.tz_localize(None)
+        return cls(index, list(close.columns), close.to_numpy(dtype=np.float64), source=frame)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, ticker: object) -> bool:
+        return str(ticker).upper() in self._pos
+
+    def __sizeof__(self) -> int:
+        size = object.__sizeof__(self) + self.values.nbytes
+        for arr in (self._filled, self._returns, self._log_returns):
+            if arr is not None:
+                size += arr.nbytes
+        if self.source is not None:
+            size += int(self.source.memory_usage(index=True, deep=False).sum())
+        return size
+
+    @property
+    def empty(self) -> bool:
+        return self.values.size == 0 or not np.isfinite(self.values).any()
+
+    # -------------------------------
+    # Views
+    # -------------------------------
+
+    def column(self, ticker: str, filled: bool = False) -> np.ndarray:
+        """Closes for one ticker (a view on the panel matrix)."""
+        matrix = self.filled() if filled else self.values
+        return matrix[:, self._pos[str(ticker).upper()]]
+
+    def series(self, ticker: str) -> pd.Series:
+        """Closes for one ticker with its missing bars dropped."""
+        return pd.Series(self.column(ticker), index=self.index, name=str(ticker).upper()).dropna()
+
+    def frame(self, filled: bool = False) -> pd.DataFrame:
+        matrix = self.filled() if filled else self.values
+        return pd.DataFrame(matrix, index=self.index, columns=self.tickers, copy=False)
+
+    def filled(self) -> np.ndarray:
+        """Forward-filled closes (leading gaps stay NaN)."""
+        if self._filled is None:
+            values = self.values
+            rows = np.arange(values.shape[0])[:, None]
+            last = np.where(np.isnan(values), 0, rows)
+            np.maximum.accumulate(last, axis=0, out=last)
+            # Leading gaps point at row 0, which is itself NaN
+            self._filled = values[last, np.arange(values.shape[1])]
+        return self._filled
+
+    def returns(self) -> np.ndarray:
+        """Simple returns of the forward-filled closes; one row shorter than the panel."""
+        if self._returns is None:
+            prices = self.filled()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self._returns = prices[1:] / prices[:-1] - 1.0
+        return self._returns
+
+    def log_returns(self) -> np.ndarray:
+        if self._log_returns is None:
+            prices = self.filled()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self._log_returns = np.log(prices[1:] / prices[:-1])
+        return self._log_returns
+
+    def returns_frame(self, log: bool = False) -> pd.DataFrame:
+        matrix = self.log_returns() if log else self.returns()
+        return pd.DataFrame(matrix, index=self.index[1:], columns=self.tickers, copy=False)
+
+    def window(self, start: Any) -> "PricePanel":
+        """Rows on or after start (a timestamp) or the last start rows (an int), as a view."""
+        if isinstance(start, (int, np.integer)):
+            pos = max(0, len(self.index) - int(start))
+        else:
+            pos = int(self.index.searchsorted(pd.Timestamp(start)))
+        return PricePanel(self.index[pos:], self.tickers, self.values[pos:], source=None)
+
+    def resample(self, rule: str) -> "PricePanel":
+        """Last close per calendar bucket (e.g. "W-FRI", "ME"), forward-filled within the bucket."""
+        if not isinstance(self.index, pd.DatetimeIndex) or not len(self.index):
+            return self
+        positions = pd.Series(np.arange(len(self.index)), index=self.index).resample(rule).last().dropna()
+        rows = positions.to_numpy(dtype=np.int64)
+        # Rows keep their own timestamps rather than the bucket labels
+        return PricePanel(self.index[rows], self.tickers, self.filled()[rows], source=None)
+
+    # -------------------------------
+    # Analytics helpers
+    # -------------------------------
+
+    def weighted_values(self, weights: Mapping[str, float], exclude: Iterable[str] = ()) -> Optional[pd.Series]:
+        """sum(close[t] * weights[t]) per row; NaN propagates like plain Series addition."""
+        return weighted_value_series(self.frame(), weights, exclude=exclude)
+
+    def quotes(self, symbols: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Detailed quote payloads (as YahooWrapper builds them) from the source bars."""
+        if self.source is None:
+            return {}
+        wanted = [str(s).upper() for s in symbols if str(s).upper() in self._pos]
+        bars = BarStore.split_frame(self.source, wanted)
+        out: Dict[str, Dict[str, Any]] = {}
+        for sym in wanted:
+            data = YahooWrapper._quote_from_history(sym, bars.get(sym))
+            if data is not None:
+                out[sym] = data
+        return YahooWrapper._fill_pending_metadata(out)
+
+
+def load_price_panel(tickers: Iterable[str], period: str, interval: str) -> Optional[PricePanel]:
+    """
+    Shared panel for (tickers, period, interval) from the bar store.
+
+    Returns None when no closes are available. Panels are cached briefly so
+    every analytic in one render reads the same matrix.
+    """
+    symbols = tuple(sorted({str(t or "").strip().upper() for t in tickers if str(t or "").strip()}))
+    if not symbols:
+        return None
+    key = (symbols, str(period), str(interval))
+    cached = _PANEL_CACHE.get(key)
+    if cached is not None:
+        return cached
+    frame = YahooWrapper.get_history_frame(symbols, period=period, interval=interval)
+    panel = PricePanel.from_frame(frame, symbols)
+    if panel is not None:
+        _PANEL_CACHE.set(key, panel)
+    return panel
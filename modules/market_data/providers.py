@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import random
+import threading
+import time
+import warnings
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Protocol
+
+import numpy as np
+import pandas as pd
+
+from utils.upstream import get_upstream
+
+
+OHLCV_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183,
+    "1y": 366, "2y": 731, "5y": 1827, "10y": 3653, "ytd": 366, "max": 3653,
+}
+
+INTERVAL_STEPS = {
+    "1m": timedelta(minutes=1), "2m": timedelta(minutes=2), "5m": timedelta(minutes=5),
+    "15m": timedelta(minutes=15), "30m": timedelta(minutes=30), "60m": timedelta(hours=1),
+    "90m": timedelta(minutes=90), "1h": timedelta(hours=1), "1d": timedelta(days=1),
+    "5d": timedelta(days=5), "1wk": timedelta(weeks=1), "1mo": timedelta(days=30),
+    "3mo": timedelta(days=91),
+}
+
+
+class ProviderError(RuntimeError):
+    """Raised by providers for upstream failures (real or injected)."""
+
+
+class MarketDataProvider(Protocol):
+    name: str
+    # Directory for provider-specific local stores (None = default data/ paths)
+    storage_dir: Optional[str]
+
+    def download(self, tickers: Any, **kwargs: Any) -> pd.DataFrame:
+        """OHLCV bars shaped like yf.download(group_by="column")."""
+        ...
+
+    def ticker_info(self, symbol: str) -> Dict[str, Any]:
+        """Yahoo Ticker.info-style metadata (shortName, sector, industry, marketCap)."""
+        ...
+
+    def quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Finnhub-style quote dict (c, d, dp, h, l) or None."""
+        ...
+
+    def quotes_available(self) -> bool:
+        ...
+
+
+def _symbol_list(tickers: Any) -> List[str]:
+    if isinstance(tickers, str):
+        tickers = tickers.replace(",", " ").split()
+    return [str(t).strip().upper() for t in tickers if str(t).strip()]
+
+
+class LiveProvider:
+    """Yahoo Finance for bars/metadata and Finnhub (when keyed) for quotes."""
+
+    name = "live"
+    storage_dir: Optional[str] = None
+
+    def __init__(self, finnhub_api_key: Optional[str] = None):
+        self.finnhub_api_key = finnhub_api_key if finnhub_api_key is not None else os.getenv("FINNHUB_API_KEY")
+        self._finnhub_client = None
+
+    @staticmethod
+    def _yf_download(tickers: Any, **kwargs: Any) -> pd.DataFrame:
+        import yfinance as yf
+
+        buf = io.StringIO()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=FutureWarning)
+            warnings.simplefilter("ignore", category=UserWarning)
+            # Redirect stderr to swallow the progress bars and error logs
+            with contextlib.redirect_stderr(buf):
+                return yf.download(tickers, **kwargs)
+
+    @staticmethod
+    def _yf_info(symbol: str) -> Dict[str, Any]:
+        import yfinance as yf
+
+        buf = io.StringIO()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=FutureWarning)
+            warnings.simplefilter("ignore", category=UserWarning)
+            with contextlib.redirect_stderr(buf):
+                return getattr(yf.Ticker(symbol), "info", {}) or {}
+
+    def download(self, tickers: Any, **kwargs: Any) -> pd.DataFrame:
+        # yf.download reports network trouble as an empty frame rather than an
+        # error. One unknown symbol can legitimately come back empty, so only an
+        # empty multi-symbol batch counts against the breaker.
+        batch = len(_symbol_list(tickers)) > 1
+        return get_upstream("yahoo").call(
+            self._yf_download,
+            tickers,
+            is_failure=lambda frame: batch and (frame is None or frame.empty),
+            **kwargs,
+        )
+
+    def ticker_info(self, symbol: str) -> Dict[str, Any]:
+        return get_upstream("yahoo").call(self._yf_info, symbol, is_failure=lambda info: False)
+
+    def quotes_available(self) -> bool:
+        return bool(self.finnhub_api_key)
+
+    def quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        if not self.finnhub_api_key:
+            return None
+        if self._finnhub_client is None:
+            import finnhub
+
+            self._finnhub_client = finnhub.Client(api_key=self.finnhub_api_key)
+        return get_upstream("finnhub").call(self._finnhub_client.quote, symbol, is_failure=lambda q: False)
+
+
+class ReplayProvider:
+    """
+    Offline provider serving bars, metadata and quotes from local files.
+
+    Layout under root:
+        bars/<interval>/<SYMBOL>.csv   OHLCV with a datetime index column
+        metadata.json                  {SYMBOL: {shortName, sector, ...}}
+
+    Symbols without a recording get a deterministic synthetic random walk
+    (seeded by symbol) when synthetic=True. latency_ms/jitter_ms add a sleep
+    per call and error_rate makes that fraction of calls raise ProviderError,
+    so load tests can exercise slow or flaky upstreams.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        synthetic: bool = True,
+        seed: Optional[int] = None,
+        now: Optional[datetime] = None,
+    ):
+        self.root = root or os.path.join("data", "replay")
+        self.storage_dir = self.root
+        self.latency_ms = max(0.0, float(latency_ms))
+        self.jitter_ms = max(0.0, float(jitter_ms))
+        self.error_rate = min(1.0, max(0.0, float(error_rate)))
+        self.synthetic = synthetic
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._now = now
+        self._bars: Dict[tuple, Optional[pd.DataFrame]] = {}
+        self._bars_lock = threading.Lock()
+        self._metadata: Optional[Dict[str, Dict[str, Any]]] = None
+        self.stats = {"calls": 0, "errors": 0}
+
+    # -------------------------------
+    # Fault injection
+    # -------------------------------
+
+    def _simulate(self, op: str) -> None:
+        with self._rng_lock:
+            self.stats["calls"] += 1
+            delay = self.latency_ms + (self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if fail:
+                self.stats["errors"] += 1
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if fail:
+            raise ProviderError(f"Injected replay failure ({op})")
+
+    # -------------------------------
+    # Bars
+    # -------------------------------
+
+    def _clock(self) -> datetime:
+        return self._now or datetime.now()
+
+    def _bar_path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, "bars", interval, f"{symbol}.csv")
+
+    def _synthetic_bars(self, symbol: str, interval: str) -> pd.DataFrame:
+        step = INTERVAL_STEPS.get(interval, timedelta(days=1))
+        end = pd.Timestamp(self._clock()).floor("min")
+        if step >= timedelta(days=1):
+            index = pd.bdate_range(end=end.normalize(), periods=2600)
+        else:
+            # Intraday bars over the last 60 sessions, 09:30-16:00
+            days = pd.bdate_range(end=end.normalize(), periods=60)
+            per_day = max(1, int(timedelta(hours=6, minutes=30) / step))
+            offsets = pd.to_timedelta(np.arange(per_day) * step.total_seconds(), unit="s")
+            index = pd.DatetimeIndex(
+                [d + pd.Timedelta(hours=9, minutes=30) + o for d in days for o in offsets]
+            )
+            if (index <= end).any():
+                index = index[index <= end]
+        rng = np.random.default_rng(zlib.crc32(f"{symbol}:{interval}".encode()))
+        steps = rng.normal(0.0003, 0.015 if step >= timedelta(days=1) else 0.002, len(index))
+        close = (20 + (zlib.crc32(symbol.encode()) % 480)) * np.exp(np.cumsum(steps))
+        spread = np.abs(rng.normal(0, 0.005, len(index))) * close
+        return pd.DataFrame(
+            {
+                "Open": np.concatenate([[close[0]], close[:-1]]),
+                "High": close + spread,
+                "Low": close - spread,
+                "Close": close,
+                "Volume": rng.integers(10_000, 5_000_000, len(index)).astype(float),
+            },
+            index=index,
+        )
+
+    def _load_bars(self, symbol: str, interval: str) -> Optional[pd.DataFrame]:
+        key = (symbol, interval)
+        with self._bars_lock:
+            if key in self._bars:
+                return self._bars[key]
+        path = self._bar_path(symbol, interval)
+        frame: Optional[pd.DataFrame] = None
+        if os.path.exists(path):
+            frame = pd.read_csv(path, index_col=0, parse_dates=True)
+            frame = frame[[c for c in OHLCV_FIELDS if c in frame.columns]].sort_index()
+        elif self.synthetic:
+            frame = self._synthetic_bars(symbol, interval)
+        with self._bars_lock:
+            self._bars[key] = frame
+        return frame
+
+    def download(self, tickers: Any, **kwargs: Any) -> pd.DataFrame:
+        self._simulate("download")
+        interval = str(kwargs.get("interval") or "1d")
+        start = kwargs.get("start")
+        end = kwargs.get("end")
+        period = kwargs.get("period")
+        if start is None and period is None:
+            period = "1mo"
+
+        pieces: Dict[str, pd.DataFrame] = {}
+        for sym in _symbol_list(tickers):
+            bars = self._load_bars(sym, interval)
+            if bars is None or bars.empty:
+                continue
+            if start is not None:
+                bars = bars[bars.index >= pd.Timestamp(start)]
+            elif period in ("1d", "5d") and interval not in ("1d", "5d", "1wk", "1mo", "3mo"):
+                sessions = bars.index.normalize().unique()[-PERIOD_DAYS[period]:]
+                bars = bars[bars.index.normalize().isin(sessions)]
+            else:
+                days = PERIOD_DAYS.get(str(period), 31)
+                bars = bars[bars.index > bars.index[-1] - pd.Timedelta(days=days)]
+            if end is not None:
+                bars = bars[bars.index < pd.Timestamp(end)]
+            if not bars.empty:
+                pieces[sym] = bars
+
+        if not pieces:
+            return pd.DataFrame()
+        frame = pd.concat(pieces, axis=1).swaplevel(0, 1, axis=1)
+        frame = frame.reindex(columns=pd.MultiIndex.from_product([list(OHLCV_FIELDS), list(pieces)]))
+        frame.columns.names = ["Price", "Ticker"]
+        return frame
+
+    # -------------------------------
+    # Metadata + quotes
+    # -------------------------------
+
+    def ticker_info(self, symbol: str) -> Dict[str, Any]:
+        self._simulate("ticker_info")
+        if self._metadata is None:
+            path = os.path.join(self.root, "metadata.json")
+            try:
+                with open(path, "r", encoding="utf-8") as handle:
+                    payload = json.load(handle)
+                self._metadata = payload if isinstance(payload, dict) else {}
+            except Exception:
+                self._metadata = {}
+        sym = str(symbol or "").strip().upper()
+        info = self._metadata.get(sym)
+        if info is None and self.synthetic:
+            info = {"shortName": sym, "sector": "Synthetic", "industry": "Replay", "marketCap": None}
+        return dict(info or {})
+
+    def quotes_available(self) -> bool:
+        return True
+
+    def quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        self._simulate("quote")
+        bars = self._load_bars(str(symbol or "").strip().upper(), "1d")
+        if bars is None or len(bars) < 2:
+            return None
+        last, prev = bars.iloc[-1], bars.iloc[-2]
+        change = float(last["Close"] - prev["Close"])
+        return {
+            "c": float(last["Close"]),
+            "d": change,
+            "dp": (change / float(prev["Close"]) * 100.0) if prev["Close"] else 0.0,
+            "h": float(last["High"]),
+            "l": float(last["Low"]),
+        }
+
+
+def record_frame(frame: pd.DataFrame, root: str, interval: str) -> List[str]:
+    """
+    Writes a yf.download-style frame into a replay directory.
+
+    Returns the symbols written, so live sessions can be captured once and
+    replayed offline later.
+    """
+    if frame is None or frame.empty:
+        return []
+    written: List[str] = []
+    target = os.path.join(root, "bars", interval)
+    os.makedirs(target, exist_ok=True)
+    if isinstance(frame.columns, pd.MultiIndex):
+        symbols = list(dict.fromkeys(frame.columns.get_level_values(1)))
+        for sym in symbols:
+            bars = frame.xs(sym, axis=1, level=1).dropna(how="all")
+            if bars.empty:
+                continue
+            bars.to_csv(os.path.join(target, f"{str(sym).upper()}.csv"))
+            written.append(str(sym).upper())
+    return written
+
+
+_PROVIDER: Optional[MarketDataProvider] = None
+_PROVIDER_LOCK = threading.Lock()
+
+
+def provider_from_env() -> MarketDataProvider:
+    """
+    Builds the provider selected by CLEAR_MARKET_PROVIDER (live | replay).
+
+    Replay reads CLEAR_REPLAY_DIR, CLEAR_REPLAY_LATENCY_MS and
+    CLEAR_REPLAY_ERROR_RATE.
+    """
+    kind = os.getenv("CLEAR_MARKET_PROVIDER", "live").strip().lower()
+    if kind == "replay":
+        return ReplayProvider(
+            root=os.getenv("CLEAR_REPLAY_DIR") or None,
+            latency_ms=float(os.getenv("CLEAR_REPLAY_LATENCY_MS", "0") or 0),
+            error_rate=float(os.getenv("CLEAR_REPLAY_ERROR_RATE", "0") or 0),
+        )
+    return LiveProvider()
+
+
+def get_provider() -> MarketDataProvider:
+    global _PROVIDER
+    with _PROVIDER_LOCK:
+        if _PROVIDER is None:
+            _PROVIDER = provider_from_env()
+        return _PROVIDER
+
+
+def set_provider(provider: Optional[MarketDataProvider]) -> None:
+    """Swaps the process-wide provider (None re-reads the environment on next use)."""
+    global _PROVIDER
+    with _PROVIDER_LOCK:
+        _PROVIDER = provider
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key onto one in-flight execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait on the same future and receive its result (or error).
+    Nothing is cached after completion; TTL caching stays with the callers.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            with self._lock:
+                self._stats["errors"] += 1
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._stats)
+            data["inflight"] = len(self._inflight)
+        calls = data["calls"]
+        data["coalesced_ratio"] = round(data["coalesced"] / calls, 4) if calls else 0.0
+        return data
+
+
+_GROUPS: Dict[str, SingleFlight] = {}
+_GROUPS_LOCK = threading.Lock()
+
+
+def flight_group(name: str) -> SingleFlight:
+    """Returns the process-wide SingleFlight registered under name."""
+    with _GROUPS_LOCK:
+        group = _GROUPS.get(name)
+        if group is None:
+            group = SingleFlight(name)
+            _GROUPS[name] = group
+        return group
+
+
+def singleflight_summary() -> Dict[str, Dict[str, Any]]:
+    with _GROUPS_LOCK:
+        groups = dict(_GROUPS)
+    return {name: group.stats() for name, group in sorted(groups.items())}
@@ -13,7 +13,9 @@ from rich.table import Table
 from rich.text import Text
 from rich import box
 
+from utils.cache import shared_cache
 from utils.system import SystemHost
+from utils.upstream import guarded_request
 from utils.scroll_text import build_scrolling_line
 from utils.charts import ChartRenderer
 from modules.market_data.flight_registry import get_operator_info
@@ -116,8 +118,10 @@ class TrackerProviders:
         ):
             return TrackerProviders._OPENSKY_TOKEN
         try:
-            resp = requests.post(
+            resp = guarded_request(
+                requests.post,
                 TrackerProviders._OPENSKY_TOKEN_URL,
+                upstream="opensky",
                 data={
                     "grant_type": "client_credentials",
                     "client_id": client_id,
@@ -240,7 +244,7 @@ class TrackerProviders:
                 warnings.append(f"Flight feed file failed: {data_path}: {exc}")
         for url in urls:
             try:
-                resp = requests.get(url, timeout=8)
+                resp = guarded_request(requests.get, url, timeout=8)
                 if resp.status_code != 200:
                     warnings.append(f"Flight feed HTTP {resp.status_code} ({url})")
                     continue
@@ -386,8 +390,10 @@ class TrackerProviders:
         try:
             refreshed = False
             while True:
-                resp = requests.get(
+                resp = guarded_request(
+                    requests.get,
                     TrackerProviders._OPENSKY_URL,
+                    upstream="opensky",
                     timeout=8,
                     auth=auth,
                     headers=headers or None,
@@ -478,7 +484,7 @@ class TrackerProviders:
 
         try:
             if rows is None:
-                resp = requests.get(url, timeout=8)
+                resp = guarded_request(requests.get, url, timeout=8)
                 if resp.status_code != 200:
                     warnings.append(f"Shipping HTTP {resp.status_code}")
                     return [], warnings
@@ -574,7 +580,7 @@ class GlobalTrackers:
         "history": {},
         "path_history": {},
         "id_index": {},
-        "route_cache": {},
+        "route_cache": shared_cache("trackers.routes", max_entries=4096, ttl_seconds=900),
         "last_seen": {},
     }
     _HISTORY_WINDOW_SEC = 900
@@ -1,14 +1,21 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 
 import time
-import io
-import warnings
+import threading
+import concurrent.futures
+import os
 import logging
-import contextlib
 
-from typing import Dict, List, Tuple, Any
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+
+from modules.market_data.bar_store import BarStore
+from modules.market_data.frame_ops import summarize_columns
+from modules.market_data.providers import get_provider
+from modules.market_data.metadata_store import MetadataStore, placeholder_metadata
+from modules.market_data.singleflight import SingleFlight, flight_group
+from utils.cache import TTLCache, shared_cache
+from utils.upstream import UpstreamUnavailable, get_upstream
 
 # Suppress yfinance and urllib3 warnings/logs
 logging.getLogger("yfinance").setLevel(logging.CRITICAL)
@@ -244,35 +251,58 @@ class YahooWrapper:
     }
 
     # Failure cache (avoid repeated lag on known-bad tickers)
-    _BAD_SYMBOL_UNTIL: Dict[str, int] = {}
     _BAD_TTL_SECONDS = 1800  # 30 minutes
+    _BAD_SYMBOL_UNTIL: TTLCache = shared_cache("yahoo.bad_symbols", max_entries=4096, ttl_seconds=_BAD_TTL_SECONDS)
 
     # Last missing symbols from the most recent snapshot call
     _LAST_MISSING: List[str] = []
 
     # Snapshot cache (period, interval) -> (ts, results)
-    _SNAPSHOT_CACHE: Dict[Tuple[str, str], Tuple[int, List[Dict[str, Any]]]] = {}
     _SNAPSHOT_TTL_SECONDS = 120  # Cache Macro view for 2 mins
+    _SNAPSHOT_CACHE: TTLCache = shared_cache("yahoo.snapshots", max_entries=32, ttl_seconds=_SNAPSHOT_TTL_SECONDS)
 
     # Detailed quote cache (ticker, period, interval) -> (ts, data)
-    _DETAILED_CACHE: Dict[Tuple[str, str, str], Tuple[int, Dict[str, Any]]] = {}
     _DETAILED_TTL_SECONDS = 60 
+    _DETAILED_CACHE: TTLCache = shared_cache(
+        "yahoo.detailed_quotes",
+        max_entries=4096,
+        ttl_seconds=_DETAILED_TTL_SECONDS,
+        max_bytes=256 * 1024 * 1024,
+    )
 
     # Global RAM cache for ultra-fast refresh (within same run)
-    _FAST_CACHE: Dict[str, Tuple[int, Any]] = {}
     _FAST_TTL = 10 
+    _FAST_CACHE: TTLCache = shared_cache("yahoo.fast", max_entries=4096, ttl_seconds=_FAST_TTL)
+
+    # Persistent OHLCV store (survives restarts, tops up only missing bars)
+    _BAR_STORE: Optional[BarStore] = None
+    _OWN_BAR_STORE: Optional[BarStore] = None
+
+    # Ticker metadata: RAM cache in front of the persistent multi-day store
+    _META_TTL_SECONDS = 3600
+    _META_CACHE: TTLCache = shared_cache("yahoo.metadata", max_entries=16384, ttl_seconds=_META_TTL_SECONDS)
+    _METADATA_STORE: Optional[MetadataStore] = None
+    _OWN_METADATA_STORE: Optional[MetadataStore] = None
+
+    # Macro snapshot chunks download concurrently; chunks that overrun their own deadline
+    # are merged into the snapshot cache when they land
+    _MACRO_CHUNK_SIZE = 20
+    _MACRO_CHUNK_DEADLINE = 8.0
+    _MACRO_WORKERS = 4
+    _MACRO_EXECUTOR: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    _MACRO_LOCK = threading.Lock()
+
+    # Coalesces concurrent identical fetches (quotes, history, macro snapshot)
+    _FLIGHTS: SingleFlight = flight_group("yahoo")
 
 
     @classmethod
     def _get_fast_cache(cls, key: str):
-        data = cls._FAST_CACHE.get(key)
-        if data and (cls._now() - data[0]) < cls._FAST_TTL:
-            return data[1]
-        return None
+        return cls._FAST_CACHE.get(key)
 
     @classmethod
     def _set_fast_cache(cls, key: str, val: Any):
-        cls._FAST_CACHE[key] = (cls._now(), val)
+        cls._FAST_CACHE.set(key, val)
 
     @staticmethod
     def _now() -> int:
@@ -283,8 +313,7 @@ class YahooWrapper:
         sym = str(symbol or "").strip().upper()
         if not sym:
             return True
-        until = int(cls._BAD_SYMBOL_UNTIL.get(sym, 0) or 0)
-        return cls._now() < until
+        return sym in cls._BAD_SYMBOL_UNTIL
 
     @classmethod
     def _mark_bad(cls, symbol: str, ttl_seconds: int = None) -> None:
@@ -292,12 +321,18 @@ class YahooWrapper:
         if not sym:
             return
         ttl = int(ttl_seconds if ttl_seconds is not None else cls._BAD_TTL_SECONDS)
-        cls._BAD_SYMBOL_UNTIL[sym] = cls._now() + max(60, ttl)
+        cls._BAD_SYMBOL_UNTIL.set(sym, cls._now() + max(60, ttl), ttl=max(60, ttl))
+
+    @staticmethod
+    def _upstream_available() -> bool:
+        """False while the Yahoo circuit breaker is open; empty results then say nothing about symbols."""
+        return get_upstream("yahoo").available()
 
     @staticmethod
     def _silent_download(tickers, **kwargs) -> pd.DataFrame:
         """
-        Wraps yf.download to suppress stderr/stdout noise.
+        Downloads bars through the active market data provider (yf.download
+        with stderr/stdout noise suppressed when live).
         Forces threads=True for speed unless explicitly disabled.
         """
         # Ensure threading is enabled for speed unless caller forbids it
@@ -308,20 +343,197 @@ class YahooWrapper:
         if "ignore_tz" not in kwargs:
             kwargs["ignore_tz"] = True
 
-        buf = io.StringIO()
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=FutureWarning)
-            warnings.simplefilter("ignore", category=UserWarning)
-            # Redirect stderr to swallow the progress bars and error logs
-            with contextlib.redirect_stderr(buf):
-                return yf.download(tickers, **kwargs)
+        return get_provider().download(tickers, **kwargs)
+
+    @staticmethod
+    def _provider_path(filename: str) -> Optional[str]:
+        """Local store path for the active provider (None = default under data/)."""
+        storage_dir = getattr(get_provider(), "storage_dir", None)
+        return os.path.join(storage_dir, filename) if storage_dir else None
 
     @classmethod
     def get_last_missing_symbols(cls) -> List[str]:
         return list(cls._LAST_MISSING)
 
+    # ----------------------- History Store -----------------------
+
+    @classmethod
+    def bar_store(cls) -> BarStore:
+        path = cls._provider_path("market_bars.db") or BarStore.DEFAULT_PATH
+        store = cls._BAR_STORE
+        # Stores built here follow provider switches; injected stores are kept as-is
+        if store is None or (store is cls._OWN_BAR_STORE and store.path != path):
+            store = BarStore(path=path, downloader=cls._silent_download)
+            cls._BAR_STORE = cls._OWN_BAR_STORE = store
+        return store
+
+    @classmethod
+    def get_history_frame(
+        cls,
+        tickers: Iterable[str],
+        period: str = "1y",
+        interval: str = "1d",
+    ) -> pd.DataFrame:
+        """
+        OHLCV history for one or more tickers in yf.download(group_by="column")
+        layout, served from the persistent bar store with incremental top-ups.
+        """
+        symbols = tuple(sorted({str(t or "").strip().upper() for t in tickers if str(t or "").strip()}))
+        return cls._FLIGHTS.do(
+            ("bars", symbols, str(period), str(interval)),
+            cls.bar_store().get_frame,
+            symbols,
+            period=period,
+            interval=interval,
+        )
+
+    # ----------------------- Ticker Metadata -----------------------
+
+    @classmethod
+    def metadata_store(cls) -> MetadataStore:
+        path = cls._provider_path("ticker_metadata.db") or MetadataStore.DEFAULT_PATH
+        store = cls._METADATA_STORE
+        if store is None or (store is cls._OWN_METADATA_STORE and store.path != path):
+            store = MetadataStore(path=path, fetcher=cls._lookup_info)
+            cls._METADATA_STORE = cls._OWN_METADATA_STORE = store
+        return store
+
+    @staticmethod
+    def _lookup_info(symbol: str) -> Optional[Dict[str, Any]]:
+        """Name/sector/industry/market cap via Ticker.info (slow network call)."""
+        try:
+            # Ticker info fetching can be slow; the live provider wraps it heavily
+            info = get_provider().ticker_info(symbol)
+        except Exception:
+            return None
+        if not info:
+            return None
+        return {
+            "name": info.get("shortName") or info.get("longName") or symbol,
+            "sector": info.get("sector") or "N/A",
+            "industry": info.get("industry") or "N/A",
+            "mkt_cap": info.get("marketCap"),
+        }
+
+    @classmethod
+    def get_cached_metadata_many(cls, symbols: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Metadata for symbols already known locally (RAM cache, then the
+        persistent store). Never touches the network; stale store entries are
+        returned as-is and queued for a background refresh.
+        """
+        syms = {str(s or "").strip().upper() for s in symbols}
+        syms.discard("")
+        out: Dict[str, Dict[str, Any]] = {}
+        for sym in syms:
+            meta = cls._META_CACHE.get(sym)
+            if meta is not None:
+                out[sym] = meta
+        missing = syms - set(out)
+        if not missing:
+            return out
+        try:
+            stored = cls.metadata_store().get_many(missing)
+        except Exception:
+            return out
+        stale = []
+        for sym, (meta, fresh) in stored.items():
+            out[sym] = meta
+            cls._META_CACHE.set(sym, meta)
+            if not fresh:
+                stale.append(sym)
+        if stale:
+            cls.metadata_store().refresh_async(stale)
+        return out
+
+    @classmethod
+    def get_cached_metadata(cls, symbol: str) -> Optional[Dict[str, Any]]:
+        sym = str(symbol or "").strip().upper()
+        return cls.get_cached_metadata_many([sym]).get(sym)
+
+    @classmethod
+    def fetch_metadata(cls, symbol: str) -> Dict[str, Any]:
+        """Blocking lookup that also persists the result; quote paths use the cached variants."""
+        sym = str(symbol or "").strip().upper()
+        meta = cls._lookup_info(sym)
+        if meta is None:
+            return placeholder_metadata(sym)
+        cls._META_CACHE.set(sym, meta)
+        try:
+            cls.metadata_store().put_many({sym: meta})
+        except Exception:
+            pass
+        return meta
+
+    @classmethod
+    def refresh_metadata_async(cls, symbols: Iterable[str]) -> int:
+        """Queues missing/stale symbols for a background lookup without blocking callers."""
+        try:
+            return cls.metadata_store().refresh_async(symbols)
+        except Exception:
+            return 0
+
     # ----------------------- Detailed Quote -----------------------
 
+    @staticmethod
+    def _quote_from_history(sym: str, hist: Optional[pd.DataFrame]) -> Optional[Dict[str, Any]]:
+        """Builds the detailed quote payload (price fields + history) from OHLCV bars."""
+        if hist is None or hist.empty or ("Close" not in hist.columns):
+            return None
+
+        closes = hist["Close"].dropna()
+        if closes.empty:
+            return None
+
+        current = float(closes.iloc[-1])
+        start = float(closes.iloc[0])
+        change = current - start
+        pct = (change / start) * 100 if start != 0 else 0.0
+
+        high = float(hist["High"].max()) if "High" in hist.columns and not hist["High"].dropna().empty else current
+        low = float(hist["Low"].min()) if "Low" in hist.columns and not hist["Low"].dropna().empty else current
+        volume = float(hist["Volume"].sum()) if "Volume" in hist.columns and not hist["Volume"].dropna().empty else 0.0
+
+        return {
+            "ticker": sym,
+            "name": sym,
+            "sector": "N/A",
+            "mkt_cap": None,
+            # Placeholder name/sector until _with_metadata applies the real ones
+            "meta_pending": True,
+            "price": float(current),
+            "change": float(change),
+            "pct": float(pct),
+            "high": float(high),
+            "low": float(low),
+            "volume": int(volume),
+            "history": closes.tolist(),
+            "history_dates": [
+                (idx.to_pydatetime().replace(tzinfo=None) if hasattr(idx, "to_pydatetime") else idx).strftime("%Y-%m-%d %H:%M:%S")
+                for idx in closes.index
+            ],
+        }
+
+    @staticmethod
+    def _with_metadata(data: Dict[str, Any], meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Copy of a quote with known metadata applied in place of its placeholders."""
+        if not meta or not data.get("meta_pending"):
+            return data
+        merged = dict(data)
+        merged.update(meta)
+        merged.pop("meta_pending", None)
+        return merged
+
+    @classmethod
+    def _fill_pending_metadata(cls, quotes: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Cached quotes still carrying placeholders pick up metadata that has arrived since."""
+        pending = [sym for sym, q in quotes.items() if q.get("meta_pending")]
+        if pending:
+            known = cls.get_cached_metadata_many(pending)
+            for sym in pending:
+                quotes[sym] = cls._with_metadata(quotes[sym], known.get(sym))
+        return quotes
+
     def get_detailed_quote(self, ticker: str, period: str = "1d", interval: str = "15m") -> Dict[str, Any]:
         sym = str(ticker or "").strip().upper()
         if not sym:
@@ -335,81 +547,120 @@ class YahooWrapper:
         
         # Check L1 (Fast RAM)
         fast_hit = YahooWrapper._get_fast_cache(fast_key)
-        if fast_hit: return fast_hit
+        if fast_hit:
+            return YahooWrapper._fill_pending_metadata({sym: fast_hit})[sym]
 
         # Check L2 (TTL Cache)
         cached = YahooWrapper._DETAILED_CACHE.get(cache_key)
         if cached:
-            ts, data = cached
-            if (YahooWrapper._now() - int(ts or 0)) <= YahooWrapper._DETAILED_TTL_SECONDS:
-                return data
-
+            return YahooWrapper._fill_pending_metadata({sym: cached})[sym]
+
+        # Concurrent callers for the same quote share one fetch
+        return YahooWrapper._FLIGHTS.do(
+            ("quote", sym, str(period), str(interval)),
+            self._fetch_detailed_quote,
+            sym,
+            period,
+            interval,
+        )
+
+    def _fetch_detailed_quote(self, sym: str, period: str, interval: str) -> Dict[str, Any]:
+        cache_key = (sym, str(period), str(interval))
+        fast_key = f"dq::{sym}:{period}:{interval}"
         try:
-            # We use Ticker.history() for single symbols as it's cleaner than download()
-            buf = io.StringIO()
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", category=FutureWarning)
-                warnings.simplefilter("ignore", category=UserWarning)
-                with contextlib.redirect_stderr(buf):
-                    stock = yf.Ticker(sym)
-                    hist = stock.history(period=period, interval=interval, auto_adjust=True)
-
-            if hist is None or hist.empty or ("Close" not in hist.columns):
+            # History comes from the bar store; only the tail since the last stored bar is fetched
+            frame = YahooWrapper.get_history_frame([sym], period=period, interval=interval)
+            data = YahooWrapper._quote_from_history(sym, BarStore.split_frame(frame, [sym]).get(sym))
+            if data is None:
+                if not YahooWrapper._upstream_available():
+                    stale = YahooWrapper._DETAILED_CACHE.get(cache_key, allow_stale=True)
+                    return stale or {"error": f"Market data unavailable for {sym}", "throttled": True}
                 YahooWrapper._mark_bad(sym)
                 return {"error": f"No history returned for {sym}"}
 
-            closes = hist["Close"].dropna()
-            if closes.empty:
-                YahooWrapper._mark_bad(sym)
-                return {"error": f"No close series returned for {sym}"}
-
-            current = float(closes.iloc[-1])
-            start = float(closes.iloc[0])
-            change = current - start
-            pct = (change / start) * 100 if start != 0 else 0.0
-
-            high = float(hist["High"].max()) if "High" in hist.columns and not hist["High"].dropna().empty else current
-            low = float(hist["Low"].min()) if "Low" in hist.columns and not hist["Low"].dropna().empty else current
-            volume = float(hist["Volume"].sum()) if "Volume" in hist.columns and not hist["Volume"].dropna().empty else 0.0
-
-            name = sym
-            sector = "N/A"
-            mkt_cap = None
-            try:
-                # Ticker info fetching can be slow, wrap heavily
-                info = getattr(stock, "info", {}) or {}
-                name = info.get("shortName") or info.get("longName") or sym
-                sector = info.get("sector") or "N/A"
-                mkt_cap = info.get("marketCap")
-            except Exception:
-                pass
-
-            data = {
-                "ticker": sym,
-                "name": name,
-                "sector": sector,
-                "mkt_cap": mkt_cap,
-                "price": float(current),
-                "change": float(change),
-                "pct": float(pct),
-                "high": float(high),
-                "low": float(low),
-                "volume": int(volume),
-                "history": closes.tolist(),
-                "history_dates": [
-                    (idx.to_pydatetime().replace(tzinfo=None) if hasattr(idx, "to_pydatetime") else idx).strftime("%Y-%m-%d %H:%M:%S")
-                    for idx in closes.index
-                ],
-            }
+            # Metadata never blocks the price path; unknown symbols are looked up in the background
+            meta = YahooWrapper.get_cached_metadata(sym)
+            if meta:
+                data = YahooWrapper._with_metadata(data, meta)
+            else:
+                YahooWrapper.refresh_metadata_async([sym])
 
-            YahooWrapper._DETAILED_CACHE[cache_key] = (YahooWrapper._now(), data)
+            YahooWrapper._DETAILED_CACHE.set(cache_key, data)
             YahooWrapper._set_fast_cache(fast_key, data)
             return data
 
         except Exception as e:
-            YahooWrapper._mark_bad(sym)
+            # Throttling or a transient failure says nothing about the symbol; serve the last quote
+            stale = YahooWrapper._DETAILED_CACHE.get(cache_key, allow_stale=True)
+            if stale:
+                return stale
+            if isinstance(e, UpstreamUnavailable):
+                return {"error": str(e), "throttled": True}
             return {"error": str(e)}
 
+    def get_detailed_quotes(
+        self,
+        tickers: Iterable[str],
+        period: str = "1mo",
+        interval: str = "1d",
+        chunk_size: int = 20,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Batched counterpart of get_detailed_quote for many tickers.
+
+        Cache misses are resolved with chunked multi-ticker history reads instead
+        of one request per symbol. Metadata comes only from the metadata cache;
+        unknown symbols get placeholders flagged meta_pending and are looked up
+        in the background, and cached quotes pick the metadata up once known.
+        Symbols that return no data are omitted from the result, except that
+        the last cached quote is served while the Yahoo breaker is open or a
+        chunk's download fails.
+        """
+        requested = sorted({str(t or "").strip().upper() for t in tickers if str(t or "").strip()})
+        results: Dict[str, Dict[str, Any]] = {}
+        pending: List[str] = []
+
+        for sym in requested:
+            if YahooWrapper._is_bad(sym):
+                continue
+            fast_hit = YahooWrapper._get_fast_cache(f"dq::{sym}:{period}:{interval}")
+            if fast_hit:
+                results[sym] = fast_hit
+                continue
+            cached = YahooWrapper._DETAILED_CACHE.get((sym, str(period), str(interval)))
+            if cached:
+                results[sym] = cached
+                continue
+            pending.append(sym)
+
+        known_meta = YahooWrapper.get_cached_metadata_many(pending)
+        for chunk in YahooWrapper._chunk(pending, chunk_size):
+            try:
+                frame = YahooWrapper.get_history_frame(chunk, period=period, interval=interval)
+            except Exception:
+                for sym in chunk:
+                    stale = YahooWrapper._DETAILED_CACHE.get((sym, str(period), str(interval)), allow_stale=True)
+                    if stale:
+                        results[sym] = stale
+                continue
+            bars = BarStore.split_frame(frame, chunk)
+            for sym in chunk:
+                data = YahooWrapper._quote_from_history(sym, bars.get(sym))
+                if data is None:
+                    if not YahooWrapper._upstream_available():
+                        stale = YahooWrapper._DETAILED_CACHE.get((sym, str(period), str(interval)), allow_stale=True)
+                        if stale:
+                            results[sym] = stale
+                    continue
+                data = YahooWrapper._with_metadata(data, known_meta.get(sym))
+                YahooWrapper._DETAILED_CACHE.set((sym, str(period), str(interval)), data)
+                YahooWrapper._set_fast_cache(f"dq::{sym}:{period}:{interval}", data)
+                results[sym] = data
+
+        YahooWrapper._fill_pending_metadata(results)
+        YahooWrapper.refresh_metadata_async(results.keys())
+        return results
+
     # ----------------------- Macro Snapshot -----------------------
 
     @staticmethod
@@ -425,13 +676,30 @@ class YahooWrapper:
         if fast_hit: return fast_hit
 
         # L2 Cache
-        cached = YahooWrapper._SNAPSHOT_CACHE.get(key)
-        if cached:
-            ts, data = cached
-            if (YahooWrapper._now() - int(ts or 0)) <= YahooWrapper._SNAPSHOT_TTL_SECONDS:
-                return data
+        cached = YahooWrapper._SNAPSHOT_CACHE.get_entry(key)
+        if cached is not None:
+            return cached[1]
+
+        # Concurrent callers share one download per (period, interval)
+        return YahooWrapper._FLIGHTS.do(
+            ("macro", str(period), str(interval)),
+            self._fetch_macro_snapshot,
+            period,
+            interval,
+        )
 
-        # Prepare Ticker List
+    @classmethod
+    def _macro_executor(cls) -> concurrent.futures.ThreadPoolExecutor:
+        with cls._MACRO_LOCK:
+            if cls._MACRO_EXECUTOR is None:
+                cls._MACRO_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=cls._MACRO_WORKERS,
+                    thread_name_prefix="yahoo-macro",
+                )
+            return cls._MACRO_EXECUTOR
+
+    @staticmethod
+    def _macro_ticker_meta() -> Dict[str, Dict[str, str]]:
         ticker_meta: Dict[str, Dict[str, str]] = {}
         
         # Nested dict parsing
@@ -445,95 +713,172 @@ class YahooWrapper:
                             "category": cat, 
                             "subcategory": subcat
                         }
+        return ticker_meta
 
+    @staticmethod
+    def _macro_records(
+        data: pd.DataFrame,
+        symbols: List[str],
+        ticker_meta: Dict[str, Dict[str, str]],
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Turns one downloaded chunk into snapshot records; returns (records, missing)."""
+        stats, histories, missing = summarize_columns(data, symbols, volume="last")
+        results: List[Dict[str, Any]] = []
+        default = {"category": "Other", "subcategory": ""}
+        for sym, price, change, pct, high, low, vol in zip(
+            stats.index,
+            stats["price"].to_numpy(),
+            stats["change"].to_numpy(),
+            stats["pct"].to_numpy(),
+            stats["high"].to_numpy(),
+            stats["low"].to_numpy(),
+            stats["volume"].to_numpy(),
+        ):
+            meta = ticker_meta.get(sym, default)
+            results.append({
+                "ticker": sym,
+                "name": meta.get("name", sym),
+                "category": meta.get("category", "Other"),
+                "subcategory": meta.get("subcategory", ""),
+                "price": float(price),
+                "change": float(change),
+                "pct": float(pct),
+                "high": float(high),
+                "low": float(low),
+                "volume": int(vol),
+                "history": histories[sym],
+            })
+        return results, missing
+
+    @staticmethod
+    def _download_macro_chunk(chunk: List[str], period: str, interval: str) -> pd.DataFrame:
+        return YahooWrapper._silent_download(
+            chunk,
+            period=period,
+            interval=interval,
+            progress=False,
+            group_by="column",
+            auto_adjust=True,
+            threads=True
+        )
+
+    @classmethod
+    def _merge_macro_records(
+        cls,
+        period: str,
+        interval: str,
+        records: List[Dict[str, Any]],
+        order: Dict[str, int],
+    ) -> None:
+        """Folds a late chunk into the cached snapshot once its download lands."""
+        if not records:
+            return
+        key = (str(period), str(interval))
+        with cls._MACRO_LOCK:
+            current = cls._SNAPSHOT_CACHE.get(key, allow_stale=True) or []
+            merged = {row["ticker"]: row for row in current}
+            merged.update({row["ticker"]: row for row in records})
+            rows = sorted(merged.values(), key=lambda r: order.get(r["ticker"], len(order)))
+            cls._SNAPSHOT_CACHE.set(key, rows)
+            cls._set_fast_cache(f"macro::{period}:{interval}", rows)
+
+    def _fetch_macro_snapshot(self, period: str, interval: str) -> List[Dict[str, Any]]:
+        key = (str(period), str(interval))
+        fast_key = f"macro::{period}:{interval}"
+
+        # Prepare Ticker List
+        ticker_meta = YahooWrapper._macro_ticker_meta()
         requested = list(ticker_meta.keys())
+        order = {sym: i for i, sym in enumerate(requested)}
         # Filter out "known bad" symbols to speed up batch processing
         flat_list = [s for s in requested if not YahooWrapper._is_bad(s)]
 
         results: List[Dict[str, Any]] = []
         missing: List[str] = []
+        late = False
+        unavailable = False
 
-        def process_download_frame(data: pd.DataFrame, symbols: List[str]) -> None:
-            nonlocal results, missing
-            if data is None or data.empty:
-                missing.extend(symbols)
-                return
-
-            is_multi = isinstance(data.columns, pd.MultiIndex)
+        try:
+            # Chunks of 20 run concurrently; each gets _MACRO_CHUNK_DEADLINE from the
+            # moment a worker starts it. Whatever lands in time is returned now and
+            # stragglers are merged into the cache when they finish.
+            deadline = YahooWrapper._MACRO_CHUNK_DEADLINE
+            started: Dict[int, float] = {}
+
+            def _run(idx: int, chunk: List[str]) -> pd.DataFrame:
+                started[idx] = time.monotonic()
+                return YahooWrapper._download_macro_chunk(chunk, period, interval)
+
+            executor = YahooWrapper._macro_executor()
+            chunks = YahooWrapper._chunk(flat_list, YahooWrapper._MACRO_CHUNK_SIZE)
+            futures = {executor.submit(_run, idx, chunk): chunk for idx, chunk in enumerate(chunks)}
+            index = {fut: idx for idx, fut in enumerate(futures)}
+            done: List[concurrent.futures.Future] = []
+            not_done: List[concurrent.futures.Future] = []
+            pending = set(futures)
+            while pending:
+                now = time.monotonic()
+                expired = {f for f in pending if index[f] in started and now - started[index[f]] >= deadline}
+                not_done.extend(expired)
+                pending -= expired
+                if not pending:
+                    break
+                running = [started[index[f]] + deadline - now for f in pending if index[f] in started]
+                finished, _ = concurrent.futures.wait(
+                    pending,
+                    timeout=min(running) if running else deadline,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                done.extend(finished)
+                pending -= finished
+                if not finished and not running and not any(index[f] in started for f in pending):
+                    # No worker picked anything up within a full deadline; leave the rest late
+                    not_done.extend(pending)
+                    break
+            for fut in done:
+                try:
+                    records, chunk_missing = YahooWrapper._macro_records(fut.result(), futures[fut], ticker_meta)
+                except UpstreamUnavailable:
+                    # Rejected without a request; says nothing about the symbols
+                    unavailable = True
+                    records, chunk_missing = [], []
+                except Exception:
+                    records, chunk_missing = [], list(futures[fut])
+                results.extend(records)
+                missing.extend(chunk_missing)
 
-            for sym in symbols:
-                meta = ticker_meta.get(sym, {"name": sym, "category": "Other", "subcategory": ""})
+            def _on_late(fut: concurrent.futures.Future, chunk: List[str]) -> None:
                 try:
-                    if is_multi:
-                        if sym not in data["Close"].columns:
-                            missing.append(sym)
-                            continue
-                        
-                        closes = data["Close"][sym].dropna()
-                        # Optional columns
-                        highs = data["High"][sym].dropna() if "High" in data else pd.Series(dtype=float)
-                        lows = data["Low"][sym].dropna() if "Low" in data else pd.Series(dtype=float)
-                        vols = data["Volume"][sym].dropna() if "Volume" in data else pd.Series(dtype=float)
-                    else:
-                        closes = data.get("Close", pd.Series(dtype=float)).dropna()
-                        highs = data.get("High", pd.Series(dtype=float)).dropna()
-                        lows = data.get("Low", pd.Series(dtype=float)).dropna()
-                        vols = data.get("Volume", pd.Series(dtype=float)).dropna()
-
-                    if closes.empty:
-                        missing.append(sym)
-                        continue
-
-                    current = float(closes.iloc[-1])
-                    start = float(closes.iloc[0])
-                    change = current - start
-                    pct = (change / start) * 100 if start != 0 else 0.0
-
-                    h_val = float(highs.max()) if not highs.empty else current
-                    l_val = float(lows.min()) if not lows.empty else current
-                    v_val = float(vols.iloc[-1]) if not vols.empty else 0.0
-
-                    results.append({
-                        "ticker": sym,
-                        "name": meta.get("name", sym),
-                        "category": meta.get("category", "Other"),
-                        "subcategory": meta.get("subcategory", ""),
-                        "price": float(current),
-                        "change": float(change),
-                        "pct": float(pct),
-                        "high": float(h_val),
-                        "low": float(l_val),
-                        "volume": int(v_val),
-                        "history": closes.tolist(),
-                    })
+                    records, chunk_missing = YahooWrapper._macro_records(fut.result(), chunk, ticker_meta)
                 except Exception:
-                    missing.append(sym)
+                    return
+                YahooWrapper._merge_macro_records(period, interval, records, order)
+                if YahooWrapper._upstream_available():
+                    for m in chunk_missing:
+                        YahooWrapper._mark_bad(m)
 
-        try:
-            # --- PERFORMANCE FIX: Smaller chunks + Always Cache ---
-            # Breaking into chunks of 20 avoids the "10s timeout" if one ticker is bad
-            for chunk in YahooWrapper._chunk(flat_list, 20):
-                d = YahooWrapper._silent_download(
-                    chunk,
-                    period=period,
-                    interval=interval,
-                    progress=False,
-                    group_by="column",
-                    auto_adjust=True,
-                    threads=True
-                )
-                process_download_frame(d, chunk)
+            for fut in not_done:
+                late = True
+                fut.add_done_callback(lambda f, chunk=futures[fut]: _on_late(f, chunk))
 
         except Exception:
             # Return old cache if everything explodes
-            cached = YahooWrapper._SNAPSHOT_CACHE.get(key)
-            if cached: return cached[1]
+            cached = YahooWrapper._SNAPSHOT_CACHE.get(key, allow_stale=True)
+            if cached: return cached
             # Don't return empty yet, let the next block handle caching failure
-        
-        # Mark persistently missing symbols as bad
+
+        results.sort(key=lambda r: order.get(r["ticker"], len(order)))
+
+        # Mark persistently missing symbols as bad, unless Yahoo itself is down
         YahooWrapper._LAST_MISSING = sorted(set(missing))
-        for m in YahooWrapper._LAST_MISSING:
-            YahooWrapper._mark_bad(m)
+        upstream_ok = YahooWrapper._upstream_available()
+        if upstream_ok:
+            for m in YahooWrapper._LAST_MISSING:
+                YahooWrapper._mark_bad(m)
+        if (unavailable or not upstream_ok) and not results:
+            stale = YahooWrapper._SNAPSHOT_CACHE.get(key, allow_stale=True)
+            if stale:
+                return stale
 
         # --- CRITICAL FIX: Cache result even if empty ---
         # If we don't cache empty results, the app will retry the download
@@ -541,11 +886,18 @@ class YahooWrapper:
         # We cache it for at least 15 seconds to give the UI breathing room.
         
         if results:
-            YahooWrapper._SNAPSHOT_CACHE[key] = (YahooWrapper._now(), results)
-            YahooWrapper._set_fast_cache(fast_key, results)
+            with YahooWrapper._MACRO_LOCK:
+                # A late chunk may already have merged a fuller snapshot
+                current = YahooWrapper._SNAPSHOT_CACHE.get(key, allow_stale=True) or []
+                if late and current:
+                    have = {row["ticker"] for row in results}
+                    results = results + [row for row in current if row["ticker"] not in have]
+                    results.sort(key=lambda r: order.get(r["ticker"], len(order)))
+                # Partial snapshots expire quickly in case the stragglers never land
+                YahooWrapper._SNAPSHOT_CACHE.set(key, results, ttl=15 if late else None)
+                YahooWrapper._set_fast_cache(fast_key, results)
         else:
             # Cache failure for 15s to stop the refresh loop from hanging
-            fake_ts = YahooWrapper._now() - YahooWrapper._SNAPSHOT_TTL_SECONDS + 15
-            YahooWrapper._SNAPSHOT_CACHE[key] = (fake_ts, [])
+            YahooWrapper._SNAPSHOT_CACHE.set(key, [], ttl=15)
 
         return results
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+try:
+    from zoneinfo import ZoneInfo
+except Exception:
+    ZoneInfo = None
+
+from modules.client_mgr.toolkit_payloads import TOOLKIT_INTERVAL, TOOLKIT_PERIOD
+from modules.market_data.yfinance_client import YahooWrapper
+
+
+BENCHMARK_TICKER = "SPY"
+MARKET_TZ = "America/New_York"
+
+# Under the 60s detailed-quote TTL so dashboard reads stay warm while prices move
+MARKET_HOURS_SECONDS = 45
+OFF_HOURS_SECONDS = 900
+
+
+def is_market_hours(now: Optional[datetime] = None) -> bool:
+    """US equity regular session (Mon-Fri 09:30-16:00 New York time)."""
+    if now is None:
+        now = datetime.now(ZoneInfo(MARKET_TZ)) if ZoneInfo else datetime.now()
+    elif ZoneInfo and now.tzinfo is not None:
+        now = now.astimezone(ZoneInfo(MARKET_TZ))
+    if now.weekday() >= 5:
+        return False
+    minutes = now.hour * 60 + now.minute
+    return 9 * 60 + 30 <= minutes < 16 * 60
+
+
+def held_tickers(clients: Iterable[Dict[str, Any]]) -> List[str]:
+    """Union of holdings tickers across every account of every client."""
+    tickers = set()
+    for client in clients or []:
+        for account in (client or {}).get("accounts") or []:
+            holdings = account.get("holdings") or account.get("holdings_map") or {}
+            for sym, qty in holdings.items():
+                sym = str(sym or "").strip().upper()
+                try:
+                    if sym and float(qty or 0.0) != 0.0:
+                        tickers.add(sym)
+                except (TypeError, ValueError):
+                    continue
+    return sorted(tickers)
+
+
+def _load_clients() -> List[Dict[str, Any]]:
+    from modules.client_store import DbClientStore
+
+    return DbClientStore().fetch_all_clients()
+
+
+class PrefetchScheduler:
+    """
+    Background loop that keeps the shared market data caches warm.
+
+    Each cycle prices the union of client holdings plus the benchmark for the
+    dashboard intervals, refreshes the macro snapshot and queues ticker
+    metadata. The cycle repeats every MARKET_HOURS_SECONDS during the US
+    session and every OFF_HOURS_SECONDS otherwise.
+    """
+
+    def __init__(
+        self,
+        intervals: Sequence[str] = ("1M",),
+        client_loader: Callable[[], List[Dict[str, Any]]] = _load_clients,
+        yahoo: Optional[YahooWrapper] = None,
+        market_seconds: float = MARKET_HOURS_SECONDS,
+        off_hours_seconds: float = OFF_HOURS_SECONDS,
+        market_hours: Callable[[], bool] = is_market_hours,
+    ):
+        self.intervals = tuple(intervals)
+        self._client_loader = client_loader
+        self._yahoo = yahoo or YahooWrapper()
+        self.market_seconds = float(market_seconds)
+        self.off_hours_seconds = float(off_hours_seconds)
+        self._market_hours = market_hours
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._status: Dict[str, Any] = {
+            "running": False,
+            "cycles": 0,
+            "errors": 0,
+            "last_run": None,
+            "last_duration_ms": None,
+            "last_error": None,
+            "tickers": 0,
+            "next_delay_seconds": None,
+        }
+
+    def universe(self) -> List[str]:
+        try:
+            held = held_tickers(self._client_loader())
+        except Exception as exc:
+            logging.warning("Prefetch could not load clients: %s", exc)
+            held = []
+        return sorted(set(held) | {BENCHMARK_TICKER})
+
+    def next_delay(self) -> float:
+        return self.market_seconds if self._market_hours() else self.off_hours_seconds
+
+    def run_once(self) -> Dict[str, Any]:
+        """Runs one warm-up cycle synchronously and returns its summary."""
+        started = time.perf_counter()
+        tickers = self.universe()
+        warmed: Dict[str, int] = {}
+        errors: List[str] = []
+
+        for interval in self.intervals:
+            period = TOOLKIT_PERIOD.get(interval, "1y")
+            bar_interval = TOOLKIT_INTERVAL.get(interval, "1d")
+            try:
+                quotes = self._yahoo.get_detailed_quotes(tickers, period=period, interval=bar_interval)
+                warmed[interval] = len(quotes)
+            except Exception as exc:
+                errors.append(f"quotes {interval}: {exc}")
+
+        try:
+            # Macro dashboard and the shell ticker strip read this snapshot
+            warmed["macro"] = len(self._yahoo.get_macro_snapshot(period="1d", interval="15m") or [])
+        except Exception as exc:
+            errors.append(f"macro: {exc}")
+
+        YahooWrapper.refresh_metadata_async(tickers)
+
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        with self._lock:
+            self._status["cycles"] += 1
+            self._status["last_run"] = int(time.time())
+            self._status["last_duration_ms"] = duration_ms
+            self._status["tickers"] = len(tickers)
+            if errors:
+                self._status["errors"] += len(errors)
+                self._status["last_error"] = errors[-1]
+        return {"tickers": len(tickers), "warmed": warmed, "errors": errors, "duration_ms": duration_ms}
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:
+                with self._lock:
+                    self._status["errors"] += 1
+                    self._status["last_error"] = str(exc)
+            delay = self.next_delay()
+            with self._lock:
+                self._status["next_delay_seconds"] = delay
+            self._stop.wait(delay)
+
+    def start(self) -> bool:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="market-prefetch", daemon=True)
+            self._status["running"] = True
+            self._thread.start()
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._lock:
+            self._status["running"] = False
+            self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._status)
+        data["intervals"] = list(self.intervals)
+        data["market_hours"] = bool(self._market_hours())
+        return data
+
+
+_SCHEDULER: Optional[PrefetchScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def prefetch_enabled() -> bool:
+    return os.getenv("CLEAR_PREFETCH", "1") != "0"
+
+
+def get_scheduler() -> PrefetchScheduler:
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = PrefetchScheduler()
+        return _SCHEDULER
+
+
+def start_prefetch() -> Optional[PrefetchScheduler]:
+    """Starts the process-wide scheduler unless CLEAR_PREFETCH=0."""
+    if not prefetch_enabled():
+        return None
+    scheduler = get_scheduler()
+    scheduler.start()
+    return scheduler
+
+
+def stop_prefetch(timeout: float = 5.0) -> None:
+    with _SCHEDULER_LOCK:
+        scheduler = _SCHEDULER
+    if scheduler is not None:
+        scheduler.stop(timeout)
+
+
+def prefetch_status() -> Dict[str, Any]:
+    with _SCHEDULER_LOCK:
+        scheduler = _SCHEDULER
+    if scheduler is None:
+        return {"running": False, "enabled": prefetch_enabled()}
+    data = scheduler.status()
+    data["enabled"] = prefetch_enabled()
+    return data
@@ -9,6 +9,7 @@ from modules.reporting.engine import (
     ReportEngine,
     report_health_check,
 )
+from modules.view_models import client_list_valuation
 
 
 def main() -> int:
@@ -20,6 +21,11 @@ def main() -> int:
     parser.add_argument("--model-id", default="llama3", help="Local model ID.")
     parser.add_argument("--live-prices", action="store_true", help="Enable live price lookups.")
     parser.add_argument("--health-check", action="store_true", help="Run report engine health check.")
+    parser.add_argument(
+        "--portfolio-values",
+        action="store_true",
+        help="Print every client's market value (one batch over all accounts).",
+    )
     args = parser.parse_args()
 
     if args.health_check:
@@ -27,6 +33,16 @@ def main() -> int:
         print(payload)
         return 0
 
+    if args.portfolio_values:
+        clients = DataHandler.load_clients()
+        result = client_list_valuation(clients)
+        for client in clients:
+            print(f"{client.client_id}  {client.name:<32}  {result.clients.get(str(client.client_id), 0.0):>16,.2f}")
+        summary = result.summary()
+        phases = "  ".join(f"{name}={ms:.1f}ms" for name, ms in summary["timings_ms"].items())
+        print(f"accounts={summary['accounts']} positions={summary['positions']} tickers={summary['tickers']}  {phases}")
+        return 0
+
     if not args.client_id:
         print("Missing --client-id.")
         return 2
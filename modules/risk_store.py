@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from datetime import timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from core import database, models
+from modules.client_mgr.risk_batch import RiskBatchRun
+from modules.client_store import _session_scope
+
+
+class RiskResultStore:
+    """
+    Persists batch risk runs and serves the latest numbers to dashboards.
+
+    Reads assume the table exists (create_db_and_tables makes it at API
+    start-up); only save_run creates it, for a first run from the CLI.
+    run_at is stored as naive UTC and read back as aware UTC.
+    """
+
+    def __init__(self, db: Optional[Session] = None):
+        self._db = db
+
+    def ensure_schema(self) -> None:
+        bind = self._db.get_bind() if self._db is not None else database.engine
+        models.RiskResult.__table__.create(bind=bind, checkfirst=True)
+
+    def save_run(self, run: RiskBatchRun) -> int:
+        self.ensure_schema()
+        with _session_scope(self._db) as db:
+            db.add_all(
+                models.RiskResult(
+                    run_id=run.run_id,
+                    run_at=run.run_at.astimezone(timezone.utc).replace(tzinfo=None),
+                    client_uid=str(row["client_id"]),
+                    account_uid=None if row["account_id"] is None else str(row["account_id"]),
+                    scope=row["scope"],
+                    interval=run.interval,
+                    benchmark=run.benchmark,
+                    points=int(row.get("points") or 0),
+                    metrics=row.get("metrics") or {},
+                    error=row.get("error"),
+                )
+                for row in run.rows
+            )
+            db.commit()
+        return len(run.rows)
+
+    def latest_run_id(self, interval: Optional[str] = None) -> Optional[str]:
+        with _session_scope(self._db) as db:
+            query = db.query(models.RiskResult.run_id)
+            if interval:
+                query = query.filter(models.RiskResult.interval == str(interval).upper())
+            row = query.order_by(models.RiskResult.run_at.desc(), models.RiskResult.id.desc()).first()
+            return row[0] if row else None
+
+    def latest_results(
+        self,
+        interval: Optional[str] = None,
+        client_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Rows of the newest run (for interval when given), optionally for one client."""
+        run_id = self.latest_run_id(interval)
+        if run_id is None:
+            return []
+        with _session_scope(self._db) as db:
+            query = db.query(models.RiskResult).filter(models.RiskResult.run_id == run_id)
+            if client_id is not None:
+                query = query.filter(models.RiskResult.client_uid == str(client_id))
+            return [self._result_to_dict(row) for row in query.order_by(models.RiskResult.id).all()]
+
+    def latest_result(
+        self,
+        client_id: Any,
+        account_id: Any = None,
+        interval: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Newest stored metrics for a client (account_id None) or one of its accounts."""
+        with _session_scope(self._db) as db:
+            query = db.query(models.RiskResult).filter(models.RiskResult.client_uid == str(client_id))
+            if account_id is None:
+                query = query.filter(models.RiskResult.account_uid.is_(None))
+            else:
+                query = query.filter(models.RiskResult.account_uid == str(account_id))
+            if interval:
+                query = query.filter(models.RiskResult.interval == str(interval).upper())
+            row = query.order_by(models.RiskResult.run_at.desc(), models.RiskResult.id.desc()).first()
+            return self._result_to_dict(row) if row is not None else None
+
+    def _result_to_dict(self, row: models.RiskResult) -> Dict[str, Any]:
+        return {
+            "run_id": row.run_id,
+            "run_at": row.run_at.replace(tzinfo=timezone.utc).isoformat() if row.run_at else None,
+            "client_id": row.client_uid,
+            "account_id": row.account_uid,
+            "scope": row.scope,
+            "interval": row.interval,
+            "benchmark": row.benchmark,
+            "points": int(row.points or 0),
+            "metrics": dict(row.metrics or {}),
+            "error": row.error,
+        }
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from sqlalchemy.orm import Session
 from core.models import Client, Account
 
 from modules.client_mgr.toolkit import FinancialToolkit, TOOLKIT_INTERVAL, TOOLKIT_PERIOD
 from modules.client_mgr.regime import RegimeModels
-from modules.client_mgr.valuation import ValuationEngine
+from modules.client_mgr.valuation import BatchValuation, HistorySeries, ValuationEngine
 from modules.client_mgr.holdings import normalize_ticker
 from modules.client_mgr.client_model import Client as ClientPayload
+from modules.client_mgr.compute_context import ComputeContext
+from modules.client_mgr.covariance import panel_covariance
+from modules.client_mgr.risk_batch import DEFAULT_BENCHMARK, RiskBatchRun, run_risk_batch
+from modules.client_mgr.stress import position_quantities, resolve_scenarios, run_stress_test
+from modules.market_data.price_panel import PricePanel, load_price_panel
+from modules.risk_store import RiskResultStore
 
 
 def _holdings_count(holdings: Dict[str, float]) -> int:
@@ -202,8 +209,83 @@ def client_detail(client: Client) -> Dict[str, Any]:
     }
 
 
-def list_clients(clients: Iterable[Client]) -> List[Dict[str, Any]]:
-    return [client_summary(client) for client in clients]
+def list_clients(clients: Iterable[Client], values: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    rows = [client_summary(client) for client in clients]
+    if values is not None:
+        for row in rows:
+            row["market_value"] = float(values.get(str(row["client_id"]), 0.0))
+    return rows
+
+
+def client_list_valuation(clients: Iterable[Client], valuation: Optional[ValuationEngine] = None) -> BatchValuation:
+    """Market value of every client's accounts, priced from one union of tickers."""
+    engine = valuation or ValuationEngine()
+    return engine.value_accounts(
+        (_client_identifier(client), _account_identifier(account), _account_holdings(account))
+        for client in clients
+        for account in _client_accounts(client)
+    )
+
+
+def client_risk_batch(
+    clients: Iterable[Client],
+    interval: str = "1M",
+    workers: Optional[int] = None,
+    panel: Optional[PricePanel] = None,
+    run_id: Optional[str] = None,
+) -> RiskBatchRun:
+    """Risk metrics for every client and account, computed on a process pool."""
+    return run_risk_batch(
+        (
+            (_client_identifier(client), _account_identifier(account), _account_holdings(account))
+            for client in clients
+            for account in _client_accounts(client)
+        ),
+        interval=interval,
+        workers=workers,
+        panel=panel,
+        run_id=run_id,
+    )
+
+
+def client_stress_test(
+    clients: Iterable[Client],
+    scenarios: Optional[Iterable[str]] = None,
+    custom: Optional[Iterable[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Scenario P&L for every account, client and sector from stored prices; raises ValueError on bad scenarios."""
+    clients = list(clients)
+    labels: Dict[Any, str] = {}
+    accounts = []
+    for client in clients:
+        client_id = _client_identifier(client)
+        labels[client_id] = _client_label(client)
+        for account in _client_accounts(client):
+            account_id = _account_identifier(account)
+            labels[account_id] = _account_label(account)
+            accounts.append(
+                (client_id, account_id, position_quantities(_account_holdings(account), _account_lots(account)))
+            )
+    result = run_stress_test(accounts, resolve_scenarios(scenarios, custom))
+    return result.to_payload(labels)
+
+
+def _stored_risk(client: Any, account: Any, interval: str, db: Optional[Session]) -> Optional[Dict[str, Any]]:
+    """Latest batch-job metrics for the dashboard scope, read on the caller's session."""
+    if db is None:
+        return None
+    try:
+        account_id = _account_identifier(account) if account is not None else None
+        return RiskResultStore(db).latest_result(_client_identifier(client), account_id, interval)
+    except Exception:
+        return None
+
+
+def _nonzero(qty: Any) -> bool:
+    try:
+        return float(qty or 0.0) != 0.0
+    except Exception:
+        return False
 
 
 def _aggregate_holdings(accounts: Iterable[Account]) -> Dict[str, float]:
@@ -232,36 +314,49 @@ def _aggregate_manual_holdings(accounts: Iterable[Account]) -> List[Dict[str, An
     return manual
 
 
-def _history_payload(dates: List[Any], values: List[float]) -> List[Dict[str, Any]]:
-    if not values:
+def _history_payload(dates: Sequence[Any], values: Sequence[float]) -> List[Dict[str, Any]]:
+    if not len(values):
         return []
-    series = []
-    for idx, value in enumerate(values):
-        ts = None
-        if idx < len(dates):
-            try:
-                ts = int(getattr(dates[idx], "timestamp")())
-            except Exception:
-                ts = None
-        series.append({"ts": ts, "value": float(value or 0.0)})
-    return series
+    return HistorySeries.from_lists(dates, values).to_points()
 
 
 def _regime_window_payload(
-    dates: List[Any], values: List[float], interval: str
+    dates: Sequence[Any], values: Sequence[float], interval: str
 ) -> Dict[str, Any]:
-    if not values:
+    if not len(values):
         return {"interval": interval, "series": []}
     window = RegimeModels.INTERVAL_POINTS.get(interval, 21) + 1
-    window_values = values[-window:] if len(values) > window else values
-    window_dates = dates[-len(window_values) :] if dates else []
     return {
         "interval": interval,
-        "series": _history_payload(window_dates, window_values),
+        "series": HistorySeries.from_lists(dates, values).tail(window).to_points(),
     }
 
 
-def portfolio_dashboard(client: Client, interval: str = "1M") -> Dict[str, Any]:
+def _dashboard_panel(holdings: Dict[str, float], interval: str, benchmark: str) -> Optional[PricePanel]:
+    """One close matrix shared by the valuation, risk and regime payloads of a render."""
+    tickers = []
+    for raw, qty in (holdings or {}).items():
+        try:
+            if float(qty or 0.0) == 0.0:
+                continue
+        except Exception:
+            continue
+        ticker = normalize_ticker(raw)
+        if ticker:
+            tickers.append(ticker)
+    if not tickers:
+        return None
+    try:
+        return load_price_panel(
+            tickers + [benchmark],
+            period=TOOLKIT_PERIOD.get(interval, "1y"),
+            interval=TOOLKIT_INTERVAL.get(interval, "1d"),
+        )
+    except Exception:
+        return None
+
+
+def portfolio_dashboard(client: Client, interval: str = "1M", db: Optional[Session] = None) -> Dict[str, Any]:
     valuation = ValuationEngine()
     accounts = _client_accounts(client)
     holdings = _aggregate_holdings(accounts)
@@ -269,42 +364,54 @@ def portfolio_dashboard(client: Client, interval: str = "1M") -> Dict[str, Any]:
     manual_entries = _aggregate_manual_holdings(accounts)
     warnings: List[str] = []
 
+    ctx = ComputeContext(f"portfolio_dashboard[{_client_label(client)} {interval}]")
+    client_obj = ClientPayload.from_dict(client) if isinstance(client, dict) else client
+    with ctx.stage("toolkit"):
+        toolkit = FinancialToolkit(client_obj)
+    with ctx.stage("panel"):
+        panel = _dashboard_panel(holdings, interval, toolkit.benchmark_ticker)
+    period = TOOLKIT_PERIOD.get(interval, "1y")
+    bar_interval = TOOLKIT_INTERVAL.get(interval, "1d")
+
     total_value = 0.0
     enriched: Dict[str, Any] = {}
     if holdings:
-        total_value, enriched = valuation.calculate_portfolio_value(
-            holdings,
-            history_period=TOOLKIT_PERIOD.get(interval, "1y"),
-            history_interval=TOOLKIT_INTERVAL.get(interval, "1d"),
-        )
+        with ctx.stage("valuation"):
+            total_value, enriched = ctx.valuation(valuation, holdings, period, bar_interval, panel=panel)
     else:
         warnings.append("No holdings available for valuation.")
 
     manual_total, manual_holdings = valuation.calculate_manual_holdings_value(manual_entries)
-    history_dates, history_values = valuation.generate_portfolio_history_series(
-        enriched_data=enriched,
-        holdings=holdings,
-        interval=interval,
-        lot_map=lots,
-    )
-    client_obj = ClientPayload.from_dict(client) if isinstance(client, dict) else client
-    toolkit = FinancialToolkit(client_obj)
-    risk_payload = toolkit.build_risk_dashboard_payload(
-        holdings=holdings,
-        interval=interval,
-        label=_client_label(client),
-        scope="Portfolio",
-    )
-    regime_payload = toolkit.build_regime_snapshot_payload(
-        holdings=holdings,
-        lot_map=lots,
-        interval=interval,
-        label=_client_label(client),
-        scope="Portfolio",
-    )
-    regime_payload["window"] = _regime_window_payload(
-        history_dates, history_values, interval
-    )
+    with ctx.stage("history"):
+        history = ctx.history(valuation, holdings, lots, period, bar_interval, panel=panel)
+    with ctx.stage("risk"):
+        risk_payload = toolkit.build_risk_dashboard_payload(
+            holdings=holdings,
+            interval=interval,
+            label=_client_label(client),
+            scope="Portfolio",
+            panel=panel,
+            context=ctx,
+        )
+        risk_payload["batch"] = _stored_risk(client, None, interval, db)
+    with ctx.stage("factors"):
+        risk_payload["factors"] = toolkit.build_factor_payload(
+            holdings=holdings,
+            label=_client_label(client),
+            scope="Portfolio",
+            context=ctx,
+        )
+    with ctx.stage("regime"):
+        regime_payload = toolkit.build_regime_snapshot_payload(
+            holdings=holdings,
+            lot_map=lots,
+            interval=interval,
+            label=_client_label(client),
+            scope="Portfolio",
+            panel=panel,
+            context=ctx,
+        )
+    regime_payload["window"] = _regime_window_payload(history.timestamps, history.values, interval)
 
     holdings_list = sorted(
         enriched.values(),
@@ -333,7 +440,7 @@ def portfolio_dashboard(client: Client, interval: str = "1M") -> Dict[str, Any]:
     gainers = movers[:5]
     losers = list(reversed(movers[-5:])) if len(movers) > 5 else []
 
-    return {
+    payload = {
         "client": client_summary(client),
         "interval": interval,
         "totals": {
@@ -345,7 +452,7 @@ def portfolio_dashboard(client: Client, interval: str = "1M") -> Dict[str, Any]:
         },
         "holdings": holdings_list,
         "manual_holdings": manual_holdings,
-        "history": _history_payload(history_dates, history_values),
+        "history": _history_payload(history.timestamps, history.values),
         "risk": risk_payload,
         "regime": regime_payload,
         "diagnostics": {
@@ -377,50 +484,69 @@ def portfolio_dashboard(client: Client, interval: str = "1M") -> Dict[str, Any]:
         },
         "warnings": warnings,
     }
+    ctx.log()
+    return payload
 
 
-def account_dashboard(client: Client, account: Account, interval: str = "1M") -> Dict[str, Any]:
+def account_dashboard(
+    client: Client,
+    account: Account,
+    interval: str = "1M",
+    db: Optional[Session] = None,
+) -> Dict[str, Any]:
     valuation = ValuationEngine()
     holdings = dict(_account_holdings(account) or {})
     lots = dict(_account_lots(account) or {})
     warnings: List[str] = []
 
+    ctx = ComputeContext(f"account_dashboard[{_account_label(account)} {interval}]")
+    client_obj = ClientPayload.from_dict(client) if isinstance(client, dict) else client
+    with ctx.stage("toolkit"):
+        toolkit = FinancialToolkit(client_obj)
+    with ctx.stage("panel"):
+        panel = _dashboard_panel(holdings, interval, toolkit.benchmark_ticker)
+    period = TOOLKIT_PERIOD.get(interval, "1y")
+    bar_interval = TOOLKIT_INTERVAL.get(interval, "1d")
+
     total_value = 0.0
     enriched: Dict[str, Any] = {}
     if holdings:
-        total_value, enriched = valuation.calculate_portfolio_value(
-            holdings,
-            history_period=TOOLKIT_PERIOD.get(interval, "1y"),
-            history_interval=TOOLKIT_INTERVAL.get(interval, "1d"),
-        )
+        with ctx.stage("valuation"):
+            total_value, enriched = ctx.valuation(valuation, holdings, period, bar_interval, panel=panel)
     else:
         warnings.append("No holdings available for valuation.")
 
     manual_total, manual_holdings = valuation.calculate_manual_holdings_value(_account_manual_holdings(account) or [])
-    history_dates, history_values = valuation.generate_portfolio_history_series(
-        enriched_data=enriched,
-        holdings=holdings,
-        interval=interval,
-        lot_map=lots,
-    )
-    client_obj = ClientPayload.from_dict(client) if isinstance(client, dict) else client
-    toolkit = FinancialToolkit(client_obj)
-    risk_payload = toolkit.build_risk_dashboard_payload(
-        holdings=holdings,
-        interval=interval,
-        label=_account_label(account),
-        scope="Account",
-    )
-    regime_payload = toolkit.build_regime_snapshot_payload(
-        holdings=holdings,
-        lot_map=lots,
-        interval=interval,
-        label=_account_label(account),
-        scope="Account",
-    )
-    regime_payload["window"] = _regime_window_payload(
-        history_dates, history_values, interval
-    )
+    with ctx.stage("history"):
+        history = ctx.history(valuation, holdings, lots, period, bar_interval, panel=panel)
+    with ctx.stage("risk"):
+        risk_payload = toolkit.build_risk_dashboard_payload(
+            holdings=holdings,
+            interval=interval,
+            label=_account_label(account),
+            scope="Account",
+            panel=panel,
+            context=ctx,
+        )
+        risk_payload["batch"] = _stored_risk(client, account, interval, db)
+    with ctx.stage("factors"):
+        risk_payload["factors"] = toolkit.build_factor_payload(
+            holdings=holdings,
+            label=_account_label(account),
+            scope="Account",
+            context=ctx,
+        )
+    with ctx.stage("regime"):
+        regime_payload = toolkit.build_regime_snapshot_payload(
+            holdings=holdings,
+            lot_map=lots,
+            interval=interval,
+            label=_account_label(account),
+            scope="Account",
+            panel=panel,
+            context=ctx,
+        )
+    regime_payload["window"] = _regime_window_payload(history.timestamps, history.values, interval)
 
     holdings_list = sorted(
         enriched.values(),
@@ -449,7 +575,7 @@ def account_dashboard(client: Client, account: Account, interval: str = "1M") ->
     gainers = movers[:5]
     losers = list(reversed(movers[-5:])) if len(movers) > 5 else []
 
-    return {
+    payload = {
         "client": client_summary(client),
         "account": account_detail(account),
         "interval": interval,
@@ -462,7 +588,7 @@ def account_dashboard(client: Client, account: Account, interval: str = "1M") ->
         },
         "holdings": holdings_list,
         "manual_holdings": manual_holdings,
-        "history": _history_payload(history_dates, history_values),
+        "history": _history_payload(history.timestamps, history.values),
         "risk": risk_payload,
         "regime": regime_payload,
         "diagnostics": {
@@ -494,6 +620,8 @@ def account_dashboard(client: Client, account: Account, interval: str = "1M") ->
         },
         "warnings": warnings,
     }
+    ctx.log()
+    return payload
 
 
 def client_patterns(client: Client, interval: str = "1M") -> Dict[str, Any]:
@@ -518,3 +646,43 @@ def account_patterns(client: Client, account: Account, interval: str = "1M") ->
         label=_account_label(account),
         scope="Account",
     )
+
+
+def correlation_heatmap(
+    client: Client,
+    account: Optional[Account] = None,
+    interval: str = "1M",
+    estimator: str = "ledoit_wolf",
+    window: int = 252,
+) -> Dict[str, Any]:
+    """Correlation matrix of the held tickers (client-wide, or one account) for a heatmap."""
+    if account is not None:
+        holdings = dict(_account_holdings(account) or {})
+        scope, label = "Account", _account_label(account)
+    else:
+        holdings = _aggregate_holdings(_client_accounts(client))
+        scope, label = "Portfolio", _client_label(client)
+    payload: Dict[str, Any] = {"scope": scope, "label": label, "interval": interval, "estimator": estimator}
+    tickers = sorted(
+        {normalize_ticker(t) for t, qty in holdings.items() if normalize_ticker(t) and _nonzero(qty)}
+    )
+    if not tickers:
+        payload["error"] = "No holdings available for a correlation matrix."
+        return payload
+    panel = _dashboard_panel(holdings, interval, DEFAULT_BENCHMARK)
+    estimate = panel_covariance(
+        panel,
+        tickers,
+        TOOLKIT_INTERVAL.get(interval, "1d"),
+        window=window,
+        estimator=estimator,
+        period=TOOLKIT_PERIOD.get(interval, "1y"),
+    )
+    if estimate is None:
+        payload["error"] = "Insufficient market data"
+        return payload
+    payload.update(estimate.heatmap_payload())
+    missing = [t for t in tickers if t not in estimate.tickers]
+    if missing:
+        payload["missing"] = missing
+    return payload
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+
+from modules.client_mgr.valuation import ValuationEngine  # noqa: E402
+from tests.test_lot_history import reference_lot_weighted_history, synthetic_account  # noqa: E402
+
+
+def _best_of(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the lot-weighted history series against the reference loop.")
+    parser.add_argument("--lots", type=int, default=500)
+    parser.add_argument("--tickers", type=int, default=25)
+    parser.add_argument("--days", type=int, default=1260, help="Calendar days of daily history.")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    enriched, holdings, lot_map = synthetic_account(args.lots, args.tickers, args.days)
+    engine = ValuationEngine()
+
+    expected = reference_lot_weighted_history(engine, enriched, holdings, lot_map)
+    actual = engine._generate_lot_weighted_history_series(enriched, holdings, lot_map)
+    identical = actual[0] == expected[0] and np.array_equal(np.array(actual[1]), np.array(expected[1]))
+
+    ref_ms = _best_of(lambda: reference_lot_weighted_history(engine, enriched, holdings, lot_map), args.rounds)
+    vec_ms = _best_of(lambda: engine._generate_lot_weighted_history_series(enriched, holdings, lot_map), args.rounds)
+    print(f"lots={args.lots} tickers={args.tickers} points={len(actual[0])} identical={identical}")
+    print(f"reference:  {ref_ms:8.1f} ms")
+    print(f"vectorized: {vec_ms:8.1f} ms  ({ref_ms / max(vec_ms, 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from modules.client_mgr.valuation import ValuationEngine  # noqa: E402
+from modules.market_data import providers  # noqa: E402
+from modules.market_data.yfinance_client import YahooWrapper  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time portfolio valuation against the offline replay provider.")
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--replay-dir", default=None, help="Recordings dir (default: temporary, synthetic bars).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        providers.set_provider(
+            providers.ReplayProvider(
+                root=args.replay_dir or tmp,
+                latency_ms=args.latency_ms,
+                error_rate=args.error_rate,
+                seed=7,
+            )
+        )
+        holdings = {f"SYN{i:04d}": float(1 + i % 5) for i in range(args.tickers)}
+        engine = ValuationEngine()
+        for round_no in range(1, args.rounds + 1):
+            started = time.perf_counter()
+            total, enriched = engine.calculate_portfolio_value(holdings)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"round {round_no}: {elapsed:8.1f} ms  priced={len(enriched)}  total={total:,.2f}")
+            # Drop the quote caches so each round re-reads the bar store
+            YahooWrapper._DETAILED_CACHE.clear()
+            YahooWrapper._FAST_CACHE.clear()
+        print(f"provider calls={providers.get_provider().stats}")
+        providers.set_provider(None)
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("CLEAR_PREFETCH", "0")
+    main()
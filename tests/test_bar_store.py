@@ -0,0 +1,196 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.market_data import bar_store as bar_store_module
+from modules.market_data.bar_store import BarStore
+
+
+def _daily_frame(symbols, index):
+    data = {}
+    for offset, sym in enumerate(symbols):
+        closes = np.arange(len(index), dtype=float) + 100.0 + offset
+        data[("Open", sym)] = closes
+        data[("High", sym)] = closes + 1.0
+        data[("Low", sym)] = closes - 1.0
+        data[("Close", sym)] = closes
+        data[("Volume", sym)] = np.full(len(index), 1000.0)
+    frame = pd.DataFrame(data, index=index)
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns, names=["Price", "Ticker"])
+    return frame
+
+
+class _FakeDownloader:
+    def __init__(self, index, honor_period=True):
+        self.index = index
+        self.honor_period = honor_period
+        self.scale = 1.0
+        self.calls = []
+
+    def __call__(self, symbols, **kwargs):
+        self.calls.append((list(symbols), kwargs))
+        frame = _daily_frame(symbols, self.index) * self.scale
+        index = frame.index
+        if kwargs.get("start"):
+            frame = frame[index >= pd.Timestamp(kwargs["start"])]
+        elif self.honor_period and kwargs.get("period") in bar_store_module.PERIOD_DAYS:
+            days = bar_store_module.PERIOD_DAYS[kwargs["period"]]
+            frame = frame[index >= index[-1] - pd.Timedelta(days=days - 1)]
+        return frame
+
+
+def test_bar_store_serves_repeat_reads_from_disk(tmp_path):
+    today = pd.Timestamp(datetime.now().date())
+    index = pd.date_range(end=today, periods=200, freq="D")
+    fake = _FakeDownloader(index)
+    store = BarStore(path=str(tmp_path / "bars.db"), downloader=fake)
+
+    first = store.get_frame(["AAPL", "SPY"], period="6mo", interval="1d")
+    assert len(fake.calls) == 1
+    # Daily series are fetched at the base period once and sliced afterwards
+    assert fake.calls[0][1]["period"] == "5y"
+    assert set(first["Close"].columns) == {"AAPL", "SPY"}
+
+    second = store.get_frame(["SPY", "AAPL"], period="6mo", interval="1d")
+    assert len(fake.calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+    # A fresh store over the same file (e.g. after a restart) needs no download either.
+    reopened = BarStore(path=str(tmp_path / "bars.db"), downloader=fake)
+    reopened.get_frame(["AAPL"], period="6mo", interval="1d")
+    assert len(fake.calls) == 1
+
+
+def test_bar_store_tops_up_only_the_tail(tmp_path, monkeypatch):
+    today = pd.Timestamp(datetime.now().date())
+    index = pd.date_range(end=today - timedelta(days=3), periods=200, freq="D")
+    fake = _FakeDownloader(index)
+    store = BarStore(path=str(tmp_path / "bars.db"), downloader=fake)
+    store.get_frame(["AAPL"], period="6mo", interval="1d")
+
+    fake.index = pd.date_range(end=today, periods=203, freq="D")
+    monkeypatch.setitem(bar_store_module.REFRESH_SECONDS, "1d", -1)
+    frame = store.get_frame(["AAPL"], period="6mo", interval="1d")
+
+    assert len(fake.calls) == 2
+    tail_kwargs = fake.calls[1][1]
+    assert "period" not in tail_kwargs
+    # The tail overlaps the last complete stored bar to detect re-adjustments
+    assert tail_kwargs["start"] == (today - timedelta(days=4)).strftime("%Y-%m-%d")
+    assert frame.index[-1] == today
+    assert store.last_timestamp("AAPL") == today.to_pydatetime()
+    assert store.stats["readjusted"] == 0
+
+
+def test_bar_store_refetches_history_adjusted_on_an_older_basis(tmp_path, monkeypatch):
+    today = pd.Timestamp(datetime.now().date())
+    index = pd.date_range(end=today - timedelta(days=3), periods=200, freq="D")
+    fake = _FakeDownloader(index)
+    store = BarStore(path=str(tmp_path / "bars.db"), downloader=fake)
+    store.get_frame(["AAPL"], period="6mo", interval="1d")
+
+    # A 2:1 split halves every adjusted close upstream
+    fake.index = pd.date_range(end=today, periods=203, freq="D")
+    fake.scale = 0.5
+    monkeypatch.setitem(bar_store_module.REFRESH_SECONDS, "1d", -1)
+    frame = store.get_frame(["AAPL"], period="6mo", interval="1d")
+
+    assert [("start" in kw, kw.get("period")) for _, kw in fake.calls] == [
+        (False, "5y"),
+        (True, None),
+        (False, "5y"),
+    ]
+    assert store.stats["readjusted"] == 1
+    expected = _daily_frame(["AAPL"], fake.index)["Close"]["AAPL"] * 0.5
+    closes = frame["Close"]["AAPL"]
+    np.testing.assert_allclose(closes.to_numpy(), expected.loc[closes.index].to_numpy())
+
+
+def test_bar_store_longer_period_triggers_full_fetch(tmp_path):
+    today = pd.Timestamp(datetime.now().date())
+    fake = _FakeDownloader(pd.date_range(end=today, periods=800, freq="D"))
+    store = BarStore(path=str(tmp_path / "bars.db"), downloader=fake, base_periods={})
+
+    store.get_frame(["AAPL"], period="1mo", interval="1d")
+    frame = store.get_frame(["AAPL"], period="2y", interval="1d")
+    assert [call[1].get("period") for call in fake.calls] == ["1mo", "2y"]
+    assert len(frame) > 700
+
+    store.get_frame(["AAPL"], period="6mo", interval="1d")
+    assert len(fake.calls) == 2
+
+
+def test_bar_store_trims_short_periods_to_sessions(tmp_path):
+    today = pd.Timestamp(datetime.now().date())
+    days = pd.bdate_range(end=today, periods=3)
+    index = pd.DatetimeIndex(
+        [d + pd.Timedelta(minutes=15 * i) for d in days for i in range(4)]
+    )
+    fake = _FakeDownloader(index, honor_period=False)
+    store = BarStore(path=str(tmp_path / "bars.db"), downloader=fake)
+
+    frame = store.get_frame(["AAPL"], period="1d", interval="15m")
+    assert len(frame) == 4
+    assert frame.index.normalize().nunique() == 1
+
+
+def test_bar_store_serves_shorter_windows_and_coarser_bars_from_base(tmp_path):
+    today = pd.Timestamp(datetime.now().date())
+    fake = _FakeDownloader(pd.date_range(end=today, periods=2000, freq="D"))
+    store = BarStore(path=str(tmp_path / "bars.db"), downloader=fake)
+
+    one_month = store.get_frame(["AAPL"], period="1mo", interval="1d")
+    assert [call[1].get("period") for call in fake.calls] == ["5y"]
+    assert len(one_month) <= 32
+
+    yearly = store.get_frame(["AAPL"], period="1y", interval="1d")
+    weekly = store.get_frame(["AAPL"], period="1y", interval="1wk")
+    monthly = store.get_frame(["AAPL"], period="5y", interval="1mo")
+    assert len(fake.calls) == 1
+
+    assert (weekly.index.dayofweek == 0).all()
+    assert 52 <= len(weekly) <= 54
+    assert (monthly.index.day == 1).all()
+    # A weekly bar aggregates the daily bars of its week
+    week = weekly.index[-2]
+    days = yearly[(yearly.index >= week) & (yearly.index < week + pd.Timedelta(days=7))]
+    assert weekly["Close"]["AAPL"].iloc[-2] == days["Close"]["AAPL"].iloc[-1]
+    assert weekly["Open"]["AAPL"].iloc[-2] == days["Open"]["AAPL"].iloc[0]
+    assert weekly["High"]["AAPL"].iloc[-2] == days["High"]["AAPL"].max()
+    assert weekly["Volume"]["AAPL"].iloc[-2] == days["Volume"]["AAPL"].sum()
+
+
+def test_bar_store_stored_frame_never_downloads(tmp_path):
+    today = pd.Timestamp(datetime.now().date())
+    index = pd.date_range(end=today, periods=200, freq="D")
+    fake = _FakeDownloader(index)
+    store = BarStore(path=str(tmp_path / "bars.db"), downloader=fake)
+    assert store.stored_frame(["AAPL"]).empty
+    store.get_frame(["AAPL"], period="6mo", interval="1d")
+    calls = len(fake.calls)
+
+    stored = store.stored_frame(["AAPL", "MSFT"], start=(today - timedelta(days=9)).to_pydatetime())
+    assert len(fake.calls) == calls
+    assert list(stored["Close"].columns) == ["AAPL"]
+    assert len(stored) == 10
+
+
+def test_bar_store_serves_stale_bars_when_download_fails(tmp_path, monkeypatch):
+    today = pd.Timestamp(datetime.now().date())
+    fake = _FakeDownloader(pd.date_range(end=today, periods=200, freq="D"))
+    store = BarStore(path=str(tmp_path / "bars.db"), downloader=fake)
+    store.get_frame(["AAPL"], period="6mo", interval="1d")
+
+    def failing(symbols, **kwargs):
+        raise RuntimeError("rate limited")
+
+    store._downloader = failing
+    monkeypatch.setitem(bar_store_module.REFRESH_SECONDS, "1d", -1)
+    stale = store.get_frame(["AAPL"], period="6mo", interval="1d")
+    assert stale.index[-1] == today
+
+    # Nothing stored to fall back on: the failure reaches the caller
+    with pytest.raises(RuntimeError, match="rate limited"):
+        store.get_frame(["MSFT"], period="6mo", interval="1d")
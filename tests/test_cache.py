@@ -0,0 +1,65 @@
+import numpy as np
+
+from utils.cache import TTLCache, cache_summary, shared_cache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry_and_stale_reads():
+    clock = _Clock()
+    cache = TTLCache("test.ttl", ttl_seconds=10, clock=clock)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    clock.now += 11
+    assert cache.get("k") is None
+    assert "k" not in cache
+    assert cache.get("k", allow_stale=True) == "v"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["expired"] == 1
+    assert stats["stale_hits"] == 1
+
+
+def test_lru_eviction_by_entry_count():
+    cache = TTLCache("test.lru", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" becomes least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_evicted_before_live_ones():
+    clock = _Clock()
+    cache = TTLCache("test.expired", max_entries=2, clock=clock)
+    cache.set("live", 1)
+    cache.set("short", 2, ttl=5)
+    clock.now += 6
+    cache.set("new", 3)
+    assert cache.get("live") == 1
+    assert cache.get("new") == 3
+    assert len(cache) == 2
+
+
+def test_byte_bound_evicts_large_values():
+    cache = TTLCache("test.bytes", max_entries=100, max_bytes=10_000)
+    for idx in range(5):
+        cache.set(idx, np.zeros(500))  # 4 KB each
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] <= 10_000
+
+
+def test_shared_cache_registry():
+    cache = shared_cache("test.shared", max_entries=4, ttl_seconds=30)
+    assert shared_cache("test.shared") is cache
+    cache["x"] = 1
+    assert cache_summary()["test.shared"]["entries"] == 1
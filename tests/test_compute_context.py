@@ -0,0 +1,60 @@
+import logging
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from modules import view_models
+from modules.client_mgr.client_model import Account, Client
+from modules.client_mgr.compute_context import ComputeContext, fingerprint
+from modules.client_mgr.toolkit import FinancialToolkit
+from modules.client_mgr.valuation import ValuationEngine
+
+
+def test_memo_computes_each_key_once():
+    ctx = ComputeContext("unit")
+    compute = mock.Mock(return_value=42)
+    assert ctx.memo(("a", 1), compute) == 42
+    assert ctx.memo(("a", 1), compute) == 42
+    assert compute.call_count == 1
+    with ctx.stage("work"):
+        ctx.memo(("b",), lambda: None)
+    data = ctx.breakdown()
+    assert (data["memo_hits"], data["memo_misses"]) == (1, 2)
+    assert list(data["stages_ms"]) == ["work"]
+    assert fingerprint({"B": 1, "A": 2}) == fingerprint({"A": 2, "B": 1})
+
+
+def _enriched(holdings, **kwargs):
+    dates = [d.strftime("%Y-%m-%d") for d in pd.bdate_range("2024-01-01", periods=30)]
+    enriched = {
+        t: {"ticker": t, "quantity": q, "price": 10.0, "market_value": 10.0 * q, "pct": 0.0,
+            "history": list(np.linspace(9.0, 10.0, 30)), "history_dates": dates}
+        for t, q in holdings.items()
+    }
+    return sum(e["market_value"] for e in enriched.values()), enriched
+
+
+def test_portfolio_dashboard_values_and_fetches_returns_once(caplog):
+    acc = Account(account_name="Primary")
+    acc.holdings = {"AAA": 3.0}
+    client = Client(name="Nova")
+    client.accounts = [acc]
+    idx = pd.bdate_range("2024-01-01", periods=30)
+    rets = pd.Series(np.linspace(-0.01, 0.01, 30), index=idx)
+
+    with mock.patch.object(view_models, "_dashboard_panel", return_value=None), \
+            mock.patch.object(ValuationEngine, "calculate_portfolio_value", side_effect=_enriched) as value, \
+            mock.patch.object(
+                FinancialToolkit,
+                "_get_portfolio_and_benchmark_returns",
+                return_value=(rets, rets, "test"),
+            ) as returns, \
+            caplog.at_level(logging.INFO, logger="modules.client_mgr.compute_context"):
+        payload = view_models.portfolio_dashboard(client, "1M")
+
+    assert value.call_count == 1
+    assert returns.call_count == 1
+    assert payload["totals"]["market_value"] == 30.0
+    assert payload["history"]
+    assert "regime" in caplog.text and "portfolio_dashboard[Nova 1M]" in caplog.text
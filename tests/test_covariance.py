@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.client_mgr import covariance
+from modules.client_mgr.covariance import RollingCovariance, estimate_covariance, panel_covariance
+from modules.market_data.price_panel import PricePanel
+
+
+def _returns(days=300, assets=4, seed=5):
+    rng = np.random.default_rng(seed)
+    base = np.eye(assets) * 0.6 + 0.4
+    return rng.multivariate_normal(np.full(assets, 1e-4), base * 1e-4, size=days)
+
+
+def _ledoit_wolf_reference(x):
+    n, p = x.shape
+    centered = x - x.mean(axis=0)
+    sample = centered.T @ centered / n
+    mu = np.trace(sample) / p
+    target = mu * np.eye(p)
+    delta = np.sum((sample - target) ** 2)
+    beta = sum(np.sum((np.outer(row, row) - sample) ** 2) for row in centered) / n ** 2
+    shrinkage = min(beta, delta) / delta
+    return shrinkage * target + (1 - shrinkage) * sample
+
+
+def test_sample_and_ledoit_wolf_match_reference():
+    x = _returns()
+    np.testing.assert_allclose(estimate_covariance(x, "sample"), np.cov(x, rowvar=False))
+    np.testing.assert_allclose(estimate_covariance(x, "ledoit_wolf"), _ledoit_wolf_reference(x))
+    with pytest.raises(ValueError):
+        estimate_covariance(x, "bogus")
+
+
+def test_ewma_matches_recursion():
+    x = _returns(days=120)
+    lam = 0.94
+    centered = x - x.mean(axis=0)
+    expected = centered.T @ centered / (len(x) - 1)
+    for row in x:
+        expected = lam * expected + (1 - lam) * np.outer(row, row)
+    np.testing.assert_allclose(estimate_covariance(x, "ewma", lam=lam), expected)
+
+
+def test_incremental_sync_matches_one_shot_window():
+    x = _returns(days=700)
+    frame = pd.DataFrame(x, index=pd.date_range("2022-01-03", periods=len(x), freq="B"), columns=list("ABCD"))
+    state = RollingCovariance(list("ABCD"), window=100)
+    state.sync(frame.iloc[:350])
+    assert state.sync(frame.iloc[:350]) == 0
+    for end in range(351, len(frame) + 1, 37):
+        state.sync(frame.iloc[:end])
+    state.sync(frame)
+    for estimator in ("sample", "ledoit_wolf"):
+        np.testing.assert_allclose(
+            state.estimate(estimator).matrix,
+            estimate_covariance(x[-100:], estimator),
+            atol=1e-12,
+        )
+
+
+def test_sync_revises_provisional_row_and_waits_out_gaps():
+    x = _returns(days=200)
+    index = pd.date_range("2022-01-03", periods=len(x), freq="B")
+    frame = pd.DataFrame(x, index=index, columns=list("ABCD"))
+    state = RollingCovariance(list("ABCD"), window=80)
+
+    partial = frame.iloc[:150].copy()
+    partial.iloc[-1] = 0.03
+    partial.iloc[-1, 2] = np.nan
+    state.sync(frame.iloc[:149])
+    # A trailing gap row is not applied, so last_ts stays on the last complete row
+    state.sync(partial)
+    assert state.last_ts == index[148]
+    partial.iloc[-1, 2] = 0.03
+    state.sync(partial)
+    assert state.last_ts == index[149]
+    # The bar closes with its final values
+    state.sync(frame)
+    np.testing.assert_allclose(state.estimate("sample").matrix, estimate_covariance(x[-80:], "sample"), atol=1e-12)
+    assert state.count == len(x)
+
+
+def test_concurrent_syncs_apply_each_row_once():
+    import threading
+
+    x = _returns(days=120)
+    index = pd.date_range("2022-01-03", periods=len(x), freq="B")
+    frame = pd.DataFrame(x, index=index, columns=list("ABCD"))
+    state = RollingCovariance(list("ABCD"), window=60)
+    # Rows at or before last_ts are ignored by a timestamped extend
+    assert state.extend(x[:10], index[:10]) == 10
+    assert state.extend(x[5:12], index[5:12]) == 2
+    assert state.count == 12
+
+    state = RollingCovariance(list("ABCD"), window=60)
+    threads = [
+        threading.Thread(target=state.sync, args=(frame.iloc[: 60 + (i % 3)],))
+        for i in range(24)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    state.sync(frame)
+    assert state.count == len(x)
+    np.testing.assert_allclose(state.estimate("sample").matrix, estimate_covariance(x[-60:], "sample"), atol=1e-12)
+
+
+def test_panel_covariance_reuses_state_and_heatmap(monkeypatch):
+    monkeypatch.setattr(covariance, "_COVARIANCE_CACHE", covariance.shared_cache("test.covariance", max_entries=4))
+    x = _returns(days=150, assets=3)
+    prices = 100.0 * np.cumprod(1.0 + np.vstack([np.zeros((1, 3)), x]), axis=0)
+    panel = PricePanel(pd.date_range("2024-01-01", periods=151, freq="B"), ["AAA", "BBB", "CCC"], prices)
+
+    first = panel_covariance(panel, ["bbb", "aaa", "ZZZ"], "1d", window=60)
+    assert first.tickers == ["AAA", "BBB"]
+    assert panel_covariance(panel, ["AAA", "BBB"], "1d", window=60) is first
+    assert panel_covariance(panel, ["AAA", "BBB"], "1d", window=60, estimator="sample") is not first
+    # A panel over another period never shares the rolling state
+    short = panel.window(panel.index[120])
+    other = panel_covariance(short, ["AAA", "BBB"], "1d", window=60, period="1mo")
+    assert other.observations < first.observations
+
+    heatmap = first.heatmap_payload()
+    assert heatmap["tickers"] == ["AAA", "BBB"]
+    assert heatmap["correlation"][0][0] == 1.0
+    assert heatmap["correlation"][0][1] == heatmap["correlation"][1][0]
+    assert 0.0 <= heatmap["shrinkage"] <= 1.0
+    assert panel_covariance(panel, ["ZZZ"], "1d") is None
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.client_mgr import factors as factors_module
+from modules.client_mgr.factors import (
+    FACTOR_TICKERS,
+    FACTORS,
+    RollingFactorRegression,
+    factor_payload,
+    factor_returns,
+    fit_loadings,
+)
+from modules.market_data.price_panel import PricePanel
+
+
+def _panel(days=400, assets=6, seed=2):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range("2023-01-02", periods=days)
+    etf_returns = rng.normal(0.0003, 0.01, size=(days, len(FACTOR_TICKERS)))
+    etf_values = 100.0 * np.cumprod(1.0 + etf_returns, axis=0)
+    factor = factor_returns(PricePanel(index, FACTOR_TICKERS, etf_values)).to_numpy()
+    loadings = rng.normal(0.0, 0.5, size=(assets, factor.shape[1]))
+    asset_returns = factor @ loadings.T + rng.normal(0.0, 0.001, size=(days - 1, assets))
+    asset_values = 100.0 * np.cumprod(1.0 + np.vstack([np.zeros((1, assets)), asset_returns]), axis=0)
+    names = [f"S{i}" for i in range(assets)]
+    panel = PricePanel(index, FACTOR_TICKERS + names, np.hstack([etf_values, asset_values]))
+    return panel, names, loadings
+
+
+def test_factor_set_covers_styles_and_sectors():
+    assert {"market", "size", "value", "momentum", "Technology", "Utilities"} <= set(FACTORS)
+    assert FACTORS["Technology"] == ("XLK", "SPY")
+
+
+def test_batched_fit_matches_per_asset_lstsq():
+    rng = np.random.default_rng(5)
+    f = rng.normal(size=(200, 4))
+    y = f @ rng.normal(size=(4, 5)) + rng.normal(scale=0.1, size=(200, 5))
+    y[:50, 3] = np.nan  # later listing: solved as its own group
+    f[10, 2] = np.nan  # dropped for every asset
+    alpha, loadings, r_squared, obs = fit_loadings(y, f, ridge=0.0)
+    rows = np.isfinite(f).all(axis=1)
+    for col in range(5):
+        mask = rows & np.isfinite(y[:, col])
+        x = np.column_stack([np.ones(mask.sum()), f[mask]])
+        coef = np.linalg.lstsq(x, y[mask, col], rcond=None)[0]
+        assert alpha[col] == pytest.approx(coef[0])
+        np.testing.assert_allclose(loadings[col], coef[1:])
+        assert obs[col] == mask.sum()
+    assert (r_squared > 0.9).all()
+
+    # The default fit adds ridge * centered sum of squares to each factor's diagonal
+    _, ridged, _, _ = fit_loadings(y, f)
+    mask = rows & np.isfinite(y[:, 0])
+    x = np.column_stack([np.ones(mask.sum()), f[mask]])
+    centered = f[mask] - f[mask].mean(axis=0)
+    penalty = np.diag(np.r_[0.0, factors_module.FACTOR_RIDGE * (centered * centered).sum(axis=0)])
+    expected = np.linalg.solve(x.T @ x + penalty, x.T @ y[mask, 0])
+    np.testing.assert_allclose(ridged[0], expected[1:], rtol=1e-8)
+
+
+def test_ridge_tames_collinear_sector_spreads():
+    rng = np.random.default_rng(11)
+    sectors = rng.normal(size=(250, 3))
+    # The last spread is (almost) minus the sum of the others, as sector spreads are
+    sectors[:, 2] = -sectors[:, 0] - sectors[:, 1] + rng.normal(scale=1e-4, size=250)
+    y = sectors[:, :1] + rng.normal(scale=0.5, size=(250, 1))
+    _, ols, _, _ = fit_loadings(y, sectors, ridge=0.0)
+    _, ridged, _, _ = fit_loadings(y, sectors)
+    assert np.abs(ridged).max() < 2.0 < np.abs(ols).max()
+
+
+def test_rolling_regression_matches_window_refit():
+    rng = np.random.default_rng(8)
+    f = rng.normal(size=(300, 3))
+    y = f @ np.array([[0.5], [1.0], [-0.3]]) + rng.normal(scale=0.05, size=(300, 1))
+    index = pd.bdate_range("2022-01-03", periods=300)
+    state = RollingFactorRegression(["a", "b", "c"], columns=1, window=60, ridge=0.0)
+    state.sync(pd.DataFrame(f[:200], index=index[:200], columns=["a", "b", "c"]), pd.DataFrame(y[:200], index=index[:200]))
+    for end in (201, 250, 300):
+        state.sync(pd.DataFrame(f[:end], index=index[:end], columns=["a", "b", "c"]), pd.DataFrame(y[:end], index=index[:end]))
+    assert state.count == 300
+    for end in (120, 300):
+        x = np.column_stack([np.ones(60), f[end - 60:end]])
+        expected = np.linalg.lstsq(x, y[end - 60:end], rcond=None)[0]
+        label, coef = next(entry for entry in state.history if entry[0] == index[end - 1])
+        np.testing.assert_allclose(coef, expected, rtol=1e-6, atol=1e-9)
+    np.testing.assert_allclose(state.loadings(), expected, rtol=1e-6, atol=1e-9)
+
+
+def test_rolling_regression_revises_provisional_row_with_ridge():
+    rng = np.random.default_rng(9)
+    f = rng.normal(size=(150, 3))
+    y = f @ np.array([[0.5], [1.0], [-0.3]]) + rng.normal(scale=0.05, size=(150, 1))
+    index = pd.bdate_range("2022-01-03", periods=150)
+    frame = pd.DataFrame(f, index=index, columns=["a", "b", "c"])
+    state = RollingFactorRegression(["a", "b", "c"], columns=1, window=60)
+    partial = pd.DataFrame(y, index=index)
+    partial.iloc[-1, 0] = 0.4
+    state.sync(frame, partial)
+    # The last bar is revised to its final value
+    state.sync(frame, pd.DataFrame(y, index=index))
+    assert state.count == 150
+    assert state.history[-1][0] == index[-1]
+    alpha, loadings, _, _ = fit_loadings(y[-60:], f[-60:])
+    np.testing.assert_allclose(state.loadings()[1:, 0], loadings[0], rtol=1e-6)
+    assert state.loadings()[0, 0] == pytest.approx(alpha[0], abs=1e-9)
+
+
+def test_concurrent_rolling_regression_syncs_apply_each_row_once():
+    import threading
+
+    rng = np.random.default_rng(4)
+    f = rng.normal(size=(120, 3))
+    y = f @ np.array([[0.2], [0.8], [-0.5]]) + rng.normal(scale=0.05, size=(120, 1))
+    index = pd.bdate_range("2022-01-03", periods=120)
+    frame = pd.DataFrame(f, index=index, columns=["a", "b", "c"])
+    ys = pd.DataFrame(y, index=index)
+    state = RollingFactorRegression(["a", "b", "c"], columns=1, window=60)
+    threads = [
+        threading.Thread(target=state.sync, args=(frame.iloc[: 80 + (i % 3)], ys.iloc[: 80 + (i % 3)]))
+        for i in range(24)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    state.sync(frame, ys)
+    assert state.count == 120
+    assert [label for label, _ in state.history] == list(index[-len(state.history):])
+    reference = RollingFactorRegression(["a", "b", "c"], columns=1, window=60)
+    reference.sync(frame, ys)
+    np.testing.assert_allclose(state.loadings(), reference.loadings(), atol=1e-9)
+
+
+def test_factor_payload_recovers_loadings_and_reuses_cache(monkeypatch):
+    monkeypatch.setattr(factors_module, "_FACTOR_CACHE", factors_module.shared_cache("test.factors", max_entries=8))
+    panel, names, loadings = _panel()
+    holdings = {names[0]: 10, names[1]: 5, "SPY": 3}
+    payload = factor_payload(holdings, exclude=["SPY"], panel=panel)
+    assert [row["ticker"] for row in payload["holdings"]] == names[:2]
+    fitted = np.array([list(row["loadings"].values()) for row in payload["holdings"]])
+    np.testing.assert_allclose(fitted, loadings[:2], atol=0.05)
+    assert payload["exposure"]["coverage"] == pytest.approx(1.0)
+    assert len(payload["rolling"]) == factors_module.ROLLING_POINTS
+
+    model = factors_module.panel_factor_model(panel, [names[1], names[0]])
+    assert factors_module.panel_factor_model(panel, names[:2]) is model
+    assert factor_payload({"ZZZ": 1}, panel=panel)["error"] == "Insufficient market data"
+
+
+def test_dashboard_factors_read_stored_bars_and_warm_missing(monkeypatch):
+    def no_download(*args, **kwargs):
+        raise AssertionError("dashboard render downloaded factor bars")
+
+    queued = []
+    monkeypatch.setattr(factors_module, "load_price_panel", no_download)
+    monkeypatch.setattr(factors_module, "stored_factor_panel", lambda tickers: (None, list(FACTOR_TICKERS)))
+    monkeypatch.setattr(factors_module, "warm_factor_bars", lambda symbols: queued.append(list(symbols)) or len(symbols))
+    payload = factor_payload({"AAPL": 3})
+    assert payload["error"] == "Factor history is loading; refresh shortly."
+    assert queued == [list(FACTOR_TICKERS)]
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from modules.market_data.frame_ops import close_panel, summarize_columns, weighted_value_series
+
+
+def _frame(symbols, rows=30, seed=7):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2024-01-01", periods=rows, freq="D")
+    data = {}
+    for sym in symbols:
+        closes = 100 + rng.normal(0, 1, rows).cumsum()
+        data[("Close", sym)] = closes
+        data[("High", sym)] = closes + 1
+        data[("Low", sym)] = closes - 1
+        data[("Volume", sym)] = rng.integers(100, 1000, rows).astype(float)
+    frame = pd.DataFrame(data, index=index)
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns, names=["Price", "Ticker"])
+    return frame
+
+
+def test_summarize_columns_matches_per_symbol_loop():
+    symbols = ["AAA", "BBB", "CCC", "GONE"]
+    frame = _frame(symbols[:3])
+    frame.loc[frame.index[:3], ("Close", "BBB")] = np.nan
+    frame.loc[frame.index[-2:], ("Volume", "CCC")] = np.nan
+
+    stats, histories, missing = summarize_columns(frame, symbols)
+
+    assert missing == ["GONE"]
+    for sym in symbols[:3]:
+        closes = frame["Close"][sym].dropna()
+        row = stats.loc[sym]
+        assert row["price"] == closes.iloc[-1]
+        assert row["start"] == closes.iloc[0]
+        assert np.isclose(row["pct"], (closes.iloc[-1] - closes.iloc[0]) / closes.iloc[0] * 100)
+        assert row["high"] == frame["High"][sym].max()
+        assert row["low"] == frame["Low"][sym].min()
+        assert row["volume"] == frame["Volume"][sym].dropna().iloc[-1]
+        assert histories[sym] == closes.tolist()
+
+    summed, _, _ = summarize_columns(frame, ["AAA"], volume="sum")
+    assert summed.loc["AAA", "volume"] == frame["Volume"]["AAA"].sum()
+
+
+def test_summarize_columns_handles_large_universe():
+    symbols = [f"S{i:04d}" for i in range(2000)]
+    stats, histories, missing = summarize_columns(_frame(symbols, rows=10), symbols)
+    assert len(stats) == 2000
+    assert not missing
+    assert len(histories["S1999"]) == 10
+
+
+def test_weighted_value_series_matches_series_addition():
+    frame = _frame(["AAA", "BBB", "SPY"])
+    frame.loc[frame.index[5], ("Close", "BBB")] = np.nan
+    close = close_panel(frame)
+    holdings = {"aaa": 2.0, "BBB": 3.0, "SPY": 5.0, "ZZZ": 1.0}
+
+    result = weighted_value_series(close, holdings, exclude=["SPY"])
+    expected = close["AAA"] * 2.0 + close["BBB"] * 3.0
+    pd.testing.assert_series_equal(result, expected, check_names=False)
+    assert np.isnan(result.iloc[5])
+    assert weighted_value_series(close, {"ZZZ": 1.0}) is None
@@ -7,6 +7,7 @@ from modules.client_mgr.client_model import Account
 from modules.client_mgr.holdings import (
     build_lot_entry,
     compute_weighted_avg_cost,
+    nearest_prices,
     select_nearest_price,
 )
 
@@ -74,6 +75,19 @@ class TestHoldingsLots(unittest.TestCase):
         price = select_nearest_price(series, target)
         self.assertEqual(price, 105.0)
 
+    def test_nearest_prices_matches_scalar_lookup(self):
+        base = datetime(2024, 1, 1, 10, 0, 0)
+        stamps = [base + timedelta(minutes=7 * i) for i in range(50)]
+        values = [100.0 + i for i in range(50)]
+        targets = [base + timedelta(minutes=m) for m in (-30, 0, 3, 4, 100, 171, 500)]
+        bulk = nearest_prices(stamps, values, targets)
+        expected = [select_nearest_price(list(zip(stamps, values)), t) for t in targets]
+        self.assertEqual(list(bulk), expected)
+
+        capped = nearest_prices(stamps, values, targets, max_gap=timedelta(minutes=10))
+        self.assertTrue(capped[-1] != capped[-1])  # NaN past the gap
+        self.assertEqual(capped[1], 100.0)
+
     def test_persistence_round_trip_preserves_lots(self):
         acct = Account(
             account_id="acct-1",
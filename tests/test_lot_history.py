@@ -0,0 +1,257 @@
+"""
+Equivalence checks for the vectorized lot-weighted history series.
+
+reference_lot_weighted_history is the original per-date/per-lot loop, kept
+verbatim as the behavioural spec (scripts/lot_history_benchmark.py times
+against it).
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from modules.client_mgr.valuation import ValuationEngine
+
+
+def reference_lot_weighted_history(
+    self,
+    enriched_data: Dict[str, Any],
+    holdings: Dict[str, float],
+    lot_map: Optional[Dict[str, List[Dict[str, Any]]]],
+) -> Tuple[List[datetime], List[float]]:
+    if not lot_map:
+        return [], []
+
+    series_by_ticker: Dict[str, Dict[datetime, float]] = {}
+    all_dates: set[datetime] = set()
+
+    for raw_ticker, info in enriched_data.items():
+        prices = info.get("history", []) or []
+        dates = info.get("history_dates", []) or []
+        if not prices or not dates or len(prices) != len(dates):
+            continue
+
+        parsed_dates: List[datetime] = []
+        for d in dates:
+            ts = self._parse_timestamp(d)
+            if ts is None:
+                parsed_dates = []
+                break
+            parsed_dates.append(ts)
+
+        if not parsed_dates or len(parsed_dates) != len(prices):
+            continue
+
+        ticker = self._normalize_ticker(raw_ticker)
+        series = {}
+        for ts, price in zip(parsed_dates, prices):
+            try:
+                series[ts] = float(price or 0.0)
+            except Exception:
+                series[ts] = 0.0
+        series_by_ticker[ticker] = series
+        all_dates.update(parsed_dates)
+
+    if not series_by_ticker or not all_dates:
+        return [], []
+
+    sorted_dates = sorted(all_dates)
+    earliest_date = sorted_dates[0]
+
+    lots_by_ticker: Dict[str, List[Tuple[datetime, float]]] = {}
+    for raw_ticker, lots in (lot_map or {}).items():
+        ticker = self._normalize_ticker(raw_ticker)
+        entries: List[Tuple[datetime, float]] = []
+        for lot in lots or []:
+            if not isinstance(lot, dict):
+                continue
+            try:
+                qty = float(lot.get("qty", 0.0) or 0.0)
+            except Exception:
+                qty = 0.0
+            ts = self._parse_timestamp(lot.get("timestamp"))
+            if ts is None:
+                ts = earliest_date
+            entries.append((ts, qty))
+        if entries:
+            entries.sort(key=lambda x: x[0])
+            lots_by_ticker[ticker] = entries
+
+    holdings_map: Dict[str, float] = {}
+    for raw_ticker, qty in (holdings or {}).items():
+        ticker = self._normalize_ticker(raw_ticker)
+        try:
+            holdings_map[ticker] = holdings_map.get(ticker, 0.0) + float(qty or 0.0)
+        except Exception:
+            holdings_map[ticker] = holdings_map.get(ticker, 0.0)
+
+    # Forward-fill prices per ticker to honor real timestamps
+    price_paths: Dict[str, List[Optional[float]]] = {}
+    for ticker, series in series_by_ticker.items():
+        last_price = None
+        path: List[Optional[float]] = []
+        for dt in sorted_dates:
+            if dt in series:
+                last_price = series.get(dt, 0.0)
+            path.append(last_price)
+        price_paths[ticker] = path
+
+    out: List[float] = []
+    kept_dates: List[datetime] = []
+    for idx, dt in enumerate(sorted_dates):
+        total = 0.0
+        any_price = False
+        for ticker in series_by_ticker.keys():
+            price = price_paths.get(ticker, [None])[idx]
+            if price is None:
+                continue
+            any_price = True
+            if ticker in lots_by_ticker:
+                qty = 0.0
+                for ts, q in lots_by_ticker[ticker]:
+                    if ts <= dt:
+                        qty += q
+                    else:
+                        break
+            else:
+                qty = holdings_map.get(ticker, 0.0)
+            total += price * qty
+        if any_price:
+            out.append(total)
+            kept_dates.append(dt)
+
+    return kept_dates, out
+
+
+
+def synthetic_account(
+    n_lots: int = 500,
+    n_tickers: int = 25,
+    days: int = 1260,
+    seed: int = 11,
+) -> Tuple[Dict[str, Any], Dict[str, float], Dict[str, List[Dict[str, Any]]]]:
+    """enriched_data/holdings/lot_map for a daily-history account with n_lots lots."""
+    rng = random.Random(seed)
+    end = datetime(2025, 6, 30)
+    enriched: Dict[str, Any] = {}
+    lot_map: Dict[str, List[Dict[str, Any]]] = {}
+    holdings: Dict[str, float] = {}
+    for i in range(n_tickers):
+        ticker = f"T{i:03d}"
+        # Staggered listings and occasional gaps so the grid needs forward-fill
+        start = rng.randint(0, days // 4)
+        dates = [end - timedelta(days=days - d) for d in range(start, days) if rng.random() > 0.05]
+        price = 50.0 + i
+        history = []
+        for _ in dates:
+            price *= 1.0 + rng.gauss(0.0, 0.01)
+            history.append(round(price, 4))
+        enriched[ticker] = {
+            "history": history,
+            "history_dates": [d.strftime("%Y-%m-%d %H:%M:%S") for d in dates],
+        }
+        holdings[ticker] = float(rng.randint(1, 100))
+    tickers = sorted(enriched)
+    for n in range(n_lots):
+        ticker = tickers[n % len(tickers)]
+        stamp = end - timedelta(days=rng.randint(0, days + 30), hours=rng.randint(0, 23))
+        lot_map.setdefault(ticker, []).append({
+            "qty": round(rng.uniform(-5.0, 20.0), 3),
+            "timestamp": stamp.strftime("%Y-%m-%dT%H:%M:%S") if n % 17 else "LEGACY",
+        })
+    return enriched, holdings, lot_map
+
+
+def _assert_same(enriched, holdings, lot_map):
+    engine = ValuationEngine()
+    expected = reference_lot_weighted_history(engine, enriched, holdings, lot_map)
+    actual = engine._generate_lot_weighted_history_series(enriched, holdings, lot_map)
+    assert actual[0] == expected[0]
+    np.testing.assert_array_equal(np.array(actual[1]), np.array(expected[1]))
+
+
+def test_matches_reference_on_synthetic_account():
+    enriched, holdings, lot_map = synthetic_account(n_lots=500, n_tickers=20, days=400)
+    _assert_same(enriched, holdings, lot_map)
+
+
+def test_matches_reference_on_edge_cases():
+    enriched = {
+        "aaa": {
+            "history": [10.0, None, "12.5", 13.0],
+            "history_dates": ["2024-01-02", "2024-01-03 00:00:00", "2024-01-04T00:00:00", "2024-01-04"],
+        },
+        # Alias of AAA: its series wins, but its dates still join the grid
+        "AAA ": {"history": [20.0, 21.0], "history_dates": ["2024-01-05", "2024-01-01"]},
+        "BBB": {"history": [5.0, 6.0], "history_dates": ["01/03/24 00:00:00", "2024-01-08"]},
+        "CCC": {"history": [1.0], "history_dates": ["not a date"]},
+        "DDD": {"history": [1.0, 2.0], "history_dates": ["2024-01-01"]},
+        "EEE": {"history": [7.0, float("nan")], "history_dates": ["2024-01-06", "2024-01-07"]},
+    }
+    holdings = {"BBB": 3, "bbb": "2", "EEE": "x"}
+    lot_map = {
+        "aaa": [
+            {"qty": 2, "timestamp": "2024-01-04"},
+            {"qty": "1.5", "timestamp": None},
+            "junk",
+            {"qty": None, "timestamp": "2024-01-02T00:00:00Z"},
+            {"qty": 4, "timestamp": "2024-01-04"},
+        ],
+        "ZZZ": [{"qty": 1, "timestamp": "2024-01-01"}],
+        "EEE": ["junk"],
+    }
+    _assert_same(enriched, holdings, lot_map)
+
+
+def test_matches_reference_with_timezone_aware_history():
+    enriched = {
+        "AAA": {
+            "history": [1.0, 2.0, 3.0],
+            "history_dates": ["2024-01-02T00:00:00+00:00", "2024-01-03T00:00:00+00:00", "2024-01-04T00:00:00+00:00"],
+        }
+    }
+    lot_map = {"AAA": [{"qty": 1, "timestamp": "2024-01-03T00:00:00+00:00"}]}
+    _assert_same(enriched, {"AAA": 1}, lot_map)
+
+
+def test_randomized_accounts_match_reference():
+    for seed in range(5):
+        enriched, holdings, lot_map = synthetic_account(n_lots=60, n_tickers=6, days=90, seed=seed)
+        _assert_same(enriched, holdings, lot_map)
+
+
+def test_index_aligned_fallback_matches_loop():
+    enriched = {
+        "AAA": {"history": [1.5, None, 2.25, 3.0], "quantity": "2"},
+        "BBB": {"history": [10.0, 11.0, 12.0]},
+        "CCC": {"history": []},
+        "DDD": {"history": [None]},
+    }
+    holdings = {"BBB": 0.5, "DDD": 4}
+    expected = []
+    for idx in range(3):
+        total = 0.0
+        for hist, qty in (([1.5, 2.25, 3.0], 2.0), ([10.0, 11.0, 12.0], 0.5), ([], 4.0)):
+            try:
+                total += hist[idx] * qty
+            except Exception:
+                pass
+        expected.append(total)
+    engine = ValuationEngine()
+    series = engine.portfolio_history(enriched, holdings)
+    assert series.timestamps.size == 0
+    assert series.values.tolist() == expected
+    assert engine.generate_portfolio_history_series(enriched, holdings) == ([], expected)
+    assert engine.generate_synthetic_portfolio_history(enriched, holdings) == expected
+    assert series.to_points()[0] == {"ts": None, "value": expected[0]}
+
+
+def test_history_points_match_datetime_timestamps():
+    enriched, holdings, lot_map = synthetic_account(n_lots=40, n_tickers=4, days=60)
+    series = ValuationEngine().portfolio_history(enriched, holdings, lot_map=lot_map)
+    dates, values = series.to_lists()
+    expected = [{"ts": int(d.timestamp()), "value": float(v or 0.0)} for d, v in zip(dates, values)]
+    assert series.to_points() == expected
+    tail = series.tail(5)
+    assert tail.to_lists() == (dates[-5:], values[-5:])
@@ -0,0 +1,82 @@
+import threading
+import time
+from unittest import mock
+
+import pandas as pd
+
+from modules.market_data.yfinance_client import YahooWrapper
+from utils.cache import TTLCache
+
+
+MACRO = {"Test": {"Group": {f"M{i:02d}": f"Macro {i}" for i in range(6)}}}
+
+
+def _frame(symbols):
+    index = pd.date_range("2024-01-02 09:30", periods=3, freq="15min")
+    data = {}
+    for sym in symbols:
+        for field in ("Open", "High", "Low", "Close", "Volume"):
+            data[(field, sym)] = [10.0, 11.0, 12.0]
+    frame = pd.DataFrame(data, index=index)
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns, names=["Price", "Ticker"])
+    return frame
+
+
+def test_macro_snapshot_returns_partial_and_merges_late_chunks():
+    release = threading.Event()
+    calls = []
+
+    def download(chunk, period, interval):
+        calls.append(list(chunk))
+        if "M04" in chunk:
+            release.wait(5)
+        return _frame(chunk)
+
+    snapshots = TTLCache("test.snapshots", ttl_seconds=60)
+    with mock.patch.object(YahooWrapper, "MACRO_TICKERS", MACRO), \
+            mock.patch.object(YahooWrapper, "_MACRO_CHUNK_SIZE", 2), \
+            mock.patch.object(YahooWrapper, "_MACRO_CHUNK_DEADLINE", 0.3), \
+            mock.patch.object(YahooWrapper, "_SNAPSHOT_CACHE", snapshots), \
+            mock.patch.object(YahooWrapper, "_FAST_CACHE", TTLCache("test.fast")), \
+            mock.patch.object(YahooWrapper, "_BAD_SYMBOL_UNTIL", TTLCache("test.bad")), \
+            mock.patch.object(YahooWrapper, "_download_macro_chunk", side_effect=download):
+        started = time.time()
+        partial = YahooWrapper().get_macro_snapshot(period="1d", interval="15m")
+        assert time.time() - started < 3
+        assert len(calls) == 3
+        assert [row["ticker"] for row in partial] == ["M00", "M01", "M02", "M03"]
+        # The slow chunk is not treated as missing.
+        assert YahooWrapper.get_last_missing_symbols() == []
+
+        release.set()
+        deadline = time.time() + 5
+        while time.time() < deadline and len(snapshots.get(("1d", "15m"), allow_stale=True) or []) < 6:
+            time.sleep(0.01)
+        merged = snapshots.get(("1d", "15m"))
+        assert [row["ticker"] for row in merged] == [f"M{i:02d}" for i in range(6)]
+        assert merged[-1]["price"] == 12.0
+        assert merged[-1]["name"] == "Macro 5"
+
+
+def test_macro_snapshot_deadline_applies_per_chunk():
+    import concurrent.futures
+
+    def download(chunk, period, interval):
+        time.sleep(0.2)
+        return _frame(chunk)
+
+    # One worker: chunks run back to back, well past a single shared 0.3s deadline
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    try:
+        with mock.patch.object(YahooWrapper, "MACRO_TICKERS", MACRO), \
+                mock.patch.object(YahooWrapper, "_MACRO_CHUNK_SIZE", 2), \
+                mock.patch.object(YahooWrapper, "_MACRO_CHUNK_DEADLINE", 0.3), \
+                mock.patch.object(YahooWrapper, "_MACRO_EXECUTOR", executor), \
+                mock.patch.object(YahooWrapper, "_SNAPSHOT_CACHE", TTLCache("test.snapshots", ttl_seconds=60)), \
+                mock.patch.object(YahooWrapper, "_FAST_CACHE", TTLCache("test.fast")), \
+                mock.patch.object(YahooWrapper, "_BAD_SYMBOL_UNTIL", TTLCache("test.bad")), \
+                mock.patch.object(YahooWrapper, "_download_macro_chunk", side_effect=download):
+            snapshot = YahooWrapper().get_macro_snapshot(period="1d", interval="15m")
+    finally:
+        executor.shutdown(wait=True)
+    assert [row["ticker"] for row in snapshot] == [f"M{i:02d}" for i in range(6)]
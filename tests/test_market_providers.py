@@ -0,0 +1,80 @@
+import os
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from modules.client_mgr.valuation import ValuationEngine
+from modules.market_data import providers
+from modules.market_data.finnhub_client import FinnhubWrapper
+from modules.market_data.providers import ProviderError, ReplayProvider, record_frame
+from modules.market_data.yfinance_client import YahooWrapper
+from utils.cache import TTLCache
+
+
+@pytest.fixture()
+def replay(tmp_path):
+    provider = ReplayProvider(root=str(tmp_path), seed=1)
+    providers.set_provider(provider)
+    try:
+        yield provider
+    finally:
+        providers.set_provider(None)
+
+
+def test_replay_download_is_deterministic_and_shaped_like_yfinance(replay):
+    frame = replay.download(["AAPL", "MSFT"], period="6mo", interval="1d")
+    assert list(frame.columns.names) == ["Price", "Ticker"]
+    assert set(frame["Close"].columns) == {"AAPL", "MSFT"}
+    assert 120 <= len(frame) <= 135
+
+    again = ReplayProvider(root=replay.root).download(["AAPL"], period="6mo", interval="1d")
+    pd.testing.assert_series_equal(frame["Close"]["AAPL"], again["Close"]["AAPL"])
+
+    tail = replay.download(["AAPL"], start=frame.index[-5].strftime("%Y-%m-%d"), interval="1d")
+    assert len(tail) == 5
+
+
+def test_replay_serves_recorded_bars_and_metadata(tmp_path):
+    index = pd.date_range("2024-01-01", periods=3, freq="D")
+    recorded = pd.DataFrame(
+        {(field, "XYZ"): [1.0, 2.0, 3.0] for field in providers.OHLCV_FIELDS},
+        index=index,
+    )
+    recorded.columns = pd.MultiIndex.from_tuples(recorded.columns)
+    assert record_frame(recorded, str(tmp_path), "1d") == ["XYZ"]
+    with open(os.path.join(tmp_path, "metadata.json"), "w", encoding="utf-8") as handle:
+        handle.write('{"XYZ": {"shortName": "Xyz Corp", "sector": "Tech"}}')
+
+    provider = ReplayProvider(root=str(tmp_path), synthetic=False)
+    frame = provider.download("XYZ", start="2024-01-01", interval="1d")
+    assert frame["Close"]["XYZ"].tolist() == [1.0, 2.0, 3.0]
+    assert provider.download("NOPE", period="1mo", interval="1d").empty
+    assert provider.ticker_info("xyz")["shortName"] == "Xyz Corp"
+    quote = provider.quote("XYZ")
+    assert quote["c"] == 3.0 and quote["d"] == 1.0
+
+
+def test_replay_injects_errors_and_latency(tmp_path):
+    flaky = ReplayProvider(root=str(tmp_path), error_rate=1.0)
+    with pytest.raises(ProviderError):
+        flaky.download(["AAPL"], period="1mo", interval="1d")
+    assert flaky.stats == {"calls": 1, "errors": 1}
+
+    slow = ReplayProvider(root=str(tmp_path), latency_ms=30)
+    with mock.patch.object(providers.time, "sleep") as sleep:
+        slow.quote("AAPL")
+    sleep.assert_called_once_with(0.03)
+
+
+def test_valuation_runs_offline_through_replay(replay):
+    with mock.patch.object(YahooWrapper, "_DETAILED_CACHE", TTLCache("test.detailed")), \
+            mock.patch.object(YahooWrapper, "_FAST_CACHE", TTLCache("test.fast")), \
+            mock.patch.object(YahooWrapper, "_META_CACHE", TTLCache("test.meta")), \
+            mock.patch.object(YahooWrapper, "refresh_metadata_async"):
+        total, enriched = ValuationEngine().calculate_portfolio_value({"AAPL": 2, "SPY": 1})
+        assert YahooWrapper.bar_store().path == os.path.join(replay.root, "market_bars.db")
+
+    assert sorted(enriched) == ["AAPL", "SPY"]
+    assert total == pytest.approx(2 * enriched["AAPL"]["price"] + enriched["SPY"]["price"])
+    assert FinnhubWrapper().get_quote("AAPL")["price"] > 0
@@ -0,0 +1,139 @@
+import threading
+import time
+from unittest import mock
+
+import pandas as pd
+
+from modules.market_data.bar_store import FIELDS, BarStore
+from modules.market_data.metadata_store import MetadataStore
+from modules.market_data.yfinance_client import YahooWrapper
+from utils.cache import TTLCache
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_metadata_store_persists_and_flags_stale(tmp_path):
+    path = str(tmp_path / "meta.db")
+    store = MetadataStore(path=path)
+    store.put_many({"aapl": {"name": "Apple", "sector": "Technology", "industry": "Hardware", "mkt_cap": 3e12}})
+
+    reopened = MetadataStore(path=path)
+    meta, fresh = reopened.get_many(["AAPL", "MSFT"])["AAPL"]
+    assert fresh
+    assert meta["name"] == "Apple"
+    assert meta["mkt_cap"] == 3e12
+    assert reopened.stale_symbols(["AAPL", "MSFT"]) == ["MSFT"]
+
+    expired = MetadataStore(path=path, ttl_seconds=-1)
+    assert expired.get_many(["AAPL"])["AAPL"][1] is False
+    assert expired.stale_symbols(["AAPL"]) == ["AAPL"]
+
+
+def test_metadata_store_refreshes_in_background(tmp_path):
+    release = threading.Event()
+    seen = []
+
+    def fetcher(sym):
+        release.wait(5)
+        seen.append(sym)
+        return {"name": sym.title(), "sector": "Tech", "industry": "N/A", "mkt_cap": 1}
+
+    store = MetadataStore(path=str(tmp_path / "meta.db"), fetcher=fetcher)
+    assert store.refresh_async(["aapl", "msft"]) == 2
+    # Already in flight: nothing new is queued.
+    assert store.refresh_async(["AAPL"]) == 0
+    release.set()
+    assert _wait_for(lambda: len(store.get_many(["AAPL", "MSFT"])) == 2)
+    assert sorted(seen) == ["AAPL", "MSFT"]
+    assert store.refresh_async(["AAPL", "MSFT"]) == 0
+
+
+def test_metadata_store_negative_caches_failed_lookups(tmp_path):
+    calls = []
+
+    def fetcher(sym):
+        calls.append(sym)
+        if sym == "ZZZZ":
+            return None
+        return {"name": sym.title(), "sector": "Tech", "industry": "N/A", "mkt_cap": 1}
+
+    store = MetadataStore(path=str(tmp_path / "meta.db"), fetcher=fetcher, max_workers=2)
+    assert store.refresh_async(["aapl", "msft", "nvda", "zzzz"]) == 4
+    assert store.stats["batches"] == 2
+    assert _wait_for(lambda: store.stats["refreshed"] + store.stats["failed"] == 4)
+    assert store.stats["failed"] == 1
+
+    # The miss is remembered, so the unknown symbol is not looked up again.
+    assert store.refresh_async(["ZZZZ", "AAPL"]) == 0
+    assert sorted(calls) == ["AAPL", "MSFT", "NVDA", "ZZZZ"]
+    assert store.summary()["misses"] == 1
+
+    retry = MetadataStore(path=str(tmp_path / "meta.db"), fetcher=fetcher, miss_ttl_seconds=0)
+    assert retry.refresh_async(["ZZZZ"]) == 1
+    assert _wait_for(lambda: retry.stats["failed"] == 1)
+    assert retry.refresh_async(["ZZZZ"]) == 1
+
+
+def test_detailed_quote_does_not_block_on_info(tmp_path):
+    index = pd.date_range(end=pd.Timestamp.now().normalize(), periods=5, freq="D")
+
+    def downloader(symbols, **kwargs):
+        frame = pd.DataFrame(
+            {(field, sym): [10.0] * len(index) for field in FIELDS for sym in symbols},
+            index=index,
+        )
+        frame.columns = pd.MultiIndex.from_tuples(frame.columns, names=["Price", "Ticker"])
+        return frame
+
+    fetcher = mock.Mock(return_value={"name": "Acme", "sector": "Industrials", "industry": "N/A", "mkt_cap": 9})
+    meta_store = MetadataStore(path=str(tmp_path / "meta.db"), fetcher=fetcher)
+    with mock.patch.object(YahooWrapper, "_BAR_STORE", BarStore(path=str(tmp_path / "bars.db"), downloader=downloader)), \
+            mock.patch.object(YahooWrapper, "_METADATA_STORE", meta_store), \
+            mock.patch.object(YahooWrapper, "_DETAILED_CACHE", TTLCache("test.detailed")), \
+            mock.patch.object(YahooWrapper, "_FAST_CACHE", TTLCache("test.fast")), \
+            mock.patch.object(YahooWrapper, "_META_CACHE", TTLCache("test.meta")), \
+            mock.patch.object(YahooWrapper, "_lookup_info", side_effect=AssertionError("blocking .info")):
+        quote = YahooWrapper().get_detailed_quote("ACME", period="5d", interval="1d")
+        assert quote["price"] == 10.0
+        assert quote["name"] == "ACME"
+        assert _wait_for(lambda: "ACME" in meta_store.get_many(["ACME"]))
+        assert YahooWrapper.get_cached_metadata("ACME")["name"] == "Acme"
+
+
+
+def test_cached_quotes_pick_up_metadata_that_arrives_later(tmp_path):
+    index = pd.date_range(end=pd.Timestamp.now().normalize(), periods=5, freq="D")
+
+    def downloader(symbols, **kwargs):
+        frame = pd.DataFrame(
+            {(field, sym): [10.0] * len(index) for field in FIELDS for sym in symbols},
+            index=index,
+        )
+        frame.columns = pd.MultiIndex.from_tuples(frame.columns, names=["Price", "Ticker"])
+        return frame
+
+    meta_store = MetadataStore(path=str(tmp_path / "meta.db"))
+    with mock.patch.object(YahooWrapper, "_BAR_STORE", BarStore(path=str(tmp_path / "bars.db"), downloader=downloader)), \
+            mock.patch.object(YahooWrapper, "_METADATA_STORE", meta_store), \
+            mock.patch.object(YahooWrapper, "_DETAILED_CACHE", TTLCache("test.detailed")), \
+            mock.patch.object(YahooWrapper, "_FAST_CACHE", TTLCache("test.fast")), \
+            mock.patch.object(YahooWrapper, "_META_CACHE", TTLCache("test.meta")):
+        wrapper = YahooWrapper()
+        first = wrapper.get_detailed_quotes(["ACME"], period="5d", interval="1d")["ACME"]
+        assert first["name"] == "ACME" and first["meta_pending"]
+
+        meta_store.put_many({"ACME": {"name": "Acme", "sector": "Industrials", "industry": "N/A", "mkt_cap": 9}})
+        batched = wrapper.get_detailed_quotes(["ACME"], period="5d", interval="1d")["ACME"]
+        single = wrapper.get_detailed_quote("ACME", period="5d", interval="1d")
+        for quote in (batched, single):
+            assert quote["name"] == "Acme"
+            assert quote["sector"] == "Industrials"
+            assert "meta_pending" not in quote
+            assert quote["price"] == 10.0
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from modules import prefetch
+from modules.prefetch import PrefetchScheduler, held_tickers, is_market_hours
+
+
+class _FakeYahoo:
+    def __init__(self):
+        self.quote_calls = []
+        self.macro_calls = 0
+
+    def get_detailed_quotes(self, tickers, period, interval):
+        self.quote_calls.append((list(tickers), period, interval))
+        return {t: {"price": 1.0} for t in tickers}
+
+    def get_macro_snapshot(self, period="1d", interval="15m"):
+        self.macro_calls += 1
+        return [{"ticker": "^GSPC"}]
+
+
+CLIENTS = [
+    {"accounts": [{"holdings": {"aapl": 2.0, "MSFT": 0.0}}, {"holdings": {"NVDA": 1.0}}]},
+    {"accounts": [{"holdings": {"AAPL": 5.0, "TLT": 3.0}}]},
+]
+
+
+def test_held_tickers_union_skips_zero_quantities():
+    assert held_tickers(CLIENTS) == ["AAPL", "NVDA", "TLT"]
+
+
+def test_run_once_warms_union_plus_benchmark(monkeypatch):
+    monkeypatch.setattr(prefetch.YahooWrapper, "refresh_metadata_async", classmethod(lambda cls, syms: 0))
+    fake = _FakeYahoo()
+    scheduler = PrefetchScheduler(intervals=("1M", "1W"), client_loader=lambda: CLIENTS, yahoo=fake)
+
+    summary = scheduler.run_once()
+
+    assert summary["tickers"] == 4
+    assert summary["warmed"] == {"1M": 4, "1W": 4, "macro": 1}
+    assert fake.quote_calls == [
+        (["AAPL", "NVDA", "SPY", "TLT"], "6mo", "1d"),
+        (["AAPL", "NVDA", "SPY", "TLT"], "1mo", "60m"),
+    ]
+    assert fake.macro_calls == 1
+    assert scheduler.status()["cycles"] == 1
+
+
+def test_cadence_adapts_to_market_hours():
+    open_now = PrefetchScheduler(client_loader=list, yahoo=_FakeYahoo(), market_hours=lambda: True)
+    closed = PrefetchScheduler(client_loader=list, yahoo=_FakeYahoo(), market_hours=lambda: False)
+    assert open_now.next_delay() == prefetch.MARKET_HOURS_SECONDS
+    assert closed.next_delay() == prefetch.OFF_HOURS_SECONDS
+
+    assert is_market_hours(datetime(2024, 3, 5, 10, 0))
+    assert not is_market_hours(datetime(2024, 3, 5, 8, 0))
+    assert not is_market_hours(datetime(2024, 3, 9, 11, 0))
+
+
+def test_start_prefetch_respects_env(monkeypatch):
+    monkeypatch.setenv("CLEAR_PREFETCH", "0")
+    assert prefetch.start_prefetch() is None
@@ -0,0 +1,73 @@
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from modules.client_mgr.data import get_portfolio_and_benchmark_returns
+from modules.market_data import price_panel
+from modules.market_data.price_panel import PricePanel, load_price_panel
+
+
+def _frame():
+    idx = pd.date_range("2024-01-01", periods=6, freq="D")
+    close = pd.DataFrame(
+        {
+            "AAA": [10.0, 11.0, np.nan, 12.0, 13.0, 14.0],
+            "SPY": [100.0, 101.0, 102.0, 103.0, 104.0, 105.0],
+        },
+        index=idx,
+    )
+    return pd.concat({"Close": close, "Volume": close * 0 + 5}, axis=1)
+
+
+def test_panel_views_and_cached_returns():
+    panel = PricePanel.from_frame(_frame())
+    assert panel.tickers == ["AAA", "SPY"]
+    assert panel.values.dtype == np.float64
+    assert np.shares_memory(panel.column("AAA"), panel.values)
+    assert np.shares_memory(panel.frame().to_numpy(), panel.values)
+
+    filled = panel.filled()
+    assert filled[2, 0] == 11.0
+    returns = panel.returns()
+    assert returns is panel.returns()
+    assert returns.shape == (5, 2)
+    assert returns[2, 0] == 12.0 / 11.0 - 1.0
+    np.testing.assert_allclose(panel.log_returns(), np.log1p(returns))
+
+    tail = panel.window(3)
+    assert len(tail) == 3
+    assert np.shares_memory(tail.values, panel.values)
+
+
+def test_resample_keeps_last_row_per_bucket():
+    panel = PricePanel.from_frame(_frame())
+    weekly = panel.resample("W-SUN")
+    # 2024-01-01 is a Monday: Jan 1-6 fall in one week ending Sunday the 7th
+    assert len(weekly) == 1
+    assert weekly.index[0] == pd.Timestamp("2024-01-06")
+    assert weekly.values[0].tolist() == [14.0, 105.0]
+
+
+def test_returns_builder_matches_frame_math():
+    panel = PricePanel.from_frame(_frame())
+    port, bench, _ = get_portfolio_and_benchmark_returns(
+        {"AAA": 2.0}, "SPY", period="1mo", interval="1d", panel=panel
+    )
+    close = _frame()["Close"]
+    expected = (close["AAA"] * 2.0).pct_change().dropna()
+    pd.testing.assert_series_equal(port, expected, check_names=False, check_freq=False)
+    pd.testing.assert_series_equal(bench, close["SPY"].pct_change().dropna(), check_names=False, check_freq=False)
+
+
+def test_load_price_panel_reads_once_per_key():
+    price_panel._PANEL_CACHE.clear()
+    with mock.patch.object(price_panel.YahooWrapper, "get_history_frame", return_value=_frame()) as hist:
+        first = load_price_panel(["spy", "AAA"], "1mo", "1d")
+        second = load_price_panel(["AAA", "SPY"], "1mo", "1d")
+    assert first is second
+    assert hist.call_count == 1
+    quotes = first.quotes(["AAA"])
+    assert quotes["AAA"]["price"] == 14.0
+    assert quotes["AAA"]["history"] == [10.0, 11.0, 12.0, 13.0, 14.0]
+    price_panel._PANEL_CACHE.clear()
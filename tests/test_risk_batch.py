@@ -0,0 +1,152 @@
+import os
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.database import Base
+from modules.client_mgr.calculations import compute_risk_metrics
+from modules.client_mgr.data import get_portfolio_and_benchmark_returns
+from modules.client_mgr.risk_batch import risk_jobs, run_risk_batch
+from modules.market_data.price_panel import PricePanel
+from modules.risk_store import RiskResultStore
+from modules import view_models
+from web_api.app import app
+from web_api.routes import tools as tools_routes
+from web_api.routes.clients import get_db
+
+
+def _panel(days=120, seed=7):
+    rng = np.random.default_rng(seed)
+    tickers = ["AAA", "BBB", "CCC", "SPY"]
+    steps = rng.normal(0.0004, 0.012, size=(days, len(tickers)))
+    values = 100.0 * np.exp(np.cumsum(steps, axis=0))
+    values[5, 1] = np.nan
+    index = pd.date_range("2024-01-01", periods=days, freq="B")
+    return PricePanel(index, tickers, values)
+
+
+BOOK = [
+    ("c1", "a1", {"AAA": 10, "BBB": 5}),
+    ("c1", "a2", {"CCC": 3}),
+    ("c2", "a3", {"BBB": 7, "CCC": 1}),
+    ("c3", "a4", {"ZZZ": 4}),
+]
+
+
+def test_jobs_roll_accounts_up_to_clients():
+    jobs = risk_jobs(BOOK)
+    assert [(c, a) for c, a, _ in jobs] == [
+        ("c1", None), ("c1", "a1"), ("c1", "a2"),
+        ("c2", None), ("c2", "a3"),
+        ("c3", None), ("c3", "a4"),
+    ]
+    assert jobs[0][2] == {"AAA": 10.0, "BBB": 5.0, "CCC": 3.0}
+
+
+def test_batch_matches_interactive_metrics():
+    panel = _panel()
+    run = run_risk_batch(BOOK, interval="1M", workers=1, panel=panel)
+    rows = {(r["client_id"], r["account_id"]): r for r in run.rows}
+
+    returns, bench, _ = get_portfolio_and_benchmark_returns(
+        {"AAA": 10.0, "BBB": 5.0, "CCC": 3.0}, "SPY", period="6mo", interval="1d", panel=panel
+    )
+    expected = compute_risk_metrics(returns, bench, 0.04)
+    client_row = rows[("c1", None)]
+    assert client_row["scope"] == "client"
+    assert client_row["points"] == len(returns)
+    for key, value in expected.items():
+        assert client_row["metrics"][key] == pytest.approx(value, nan_ok=True)
+    models = client_row["metrics"]["multi_model"]
+    assert models["risk_profile"] in ("Conservative", "Moderate", "Aggressive")
+    assert models["regime"]["model"] == "Markov"
+    assert models["regime"]["samples"] == len(returns)
+
+    assert rows[("c3", "a4")]["error"] == "No overlapping price series"
+    summary = run.summary()
+    assert summary["clients"] == 3
+    assert summary["accounts"] == 4
+    assert summary["errors"] == 2
+    assert summary["tickers"] == 4
+
+
+def test_process_pool_matches_inline_run():
+    panel = _panel()
+    inline = run_risk_batch(BOOK, workers=1, panel=panel)
+    pooled = run_risk_batch(BOOK, workers=2, panel=panel)
+    assert pooled.workers == 2
+    assert pooled.rows == inline.rows
+
+
+def _session_local(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'risk.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_store_serves_latest_run(tmp_path):
+    session_local = _session_local(tmp_path)
+    panel = _panel()
+    first = run_risk_batch(BOOK, workers=1, panel=panel)
+    second = run_risk_batch(BOOK[:1], workers=1, panel=panel)
+    db = session_local()
+    try:
+        store = RiskResultStore(db)
+        assert store.latest_result("c1") is None
+        assert store.save_run(first) == 7
+        assert store.save_run(second) == 2
+        rows = store.latest_results()
+        assert {r["run_id"] for r in rows} == {second.run_id}
+        # Stored as naive UTC, served as the aware timestamp the run carried
+        assert rows[0]["run_at"] == second.run_at.isoformat()
+        assert store.latest_result("c2")["run_id"] == first.run_id
+        stored = store.latest_result("c1", "a1", interval="1m")
+        assert stored["metrics"] == second.rows[1]["metrics"]
+        assert store.latest_results(interval="1Y") == []
+        # Dashboards read the stored row on the request's session only
+        assert view_models._stored_risk({"client_id": "c2"}, None, "1M", db)["run_id"] == first.run_id
+        assert view_models._stored_risk({"client_id": "c2"}, None, "1M", None) is None
+    finally:
+        db.close()
+
+
+def _override_db(monkeypatch, session_local):
+    def override_get_db():
+        db = session_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+
+
+def test_risk_batch_routes(tmp_path, monkeypatch):
+    session_local = _session_local(tmp_path)
+    _override_db(monkeypatch, session_local)
+    os.environ["CLEAR_WEB_API_KEY"] = "test_key"
+    client = TestClient(app, headers={"X-API-Key": "test_key"})
+    panel = _panel()
+
+    def _batch(clients, interval="1M", workers=None, run_id=None):
+        return run_risk_batch(BOOK, interval=interval, workers=1, panel=panel, run_id=run_id)
+
+    assert client.get("/api/tools/risk-batch").json()["results"] == []
+    assert client.post("/api/tools/risk-batch", json={"interval": "2Y"}).status_code == 400
+    with mock.patch.object(tools_routes, "client_risk_batch", side_effect=_batch) as batch:
+        response = client.post("/api/tools/risk-batch", json={"interval": "3M"})
+    # Queued: the response carries only the run id; the job runs after it is sent
+    assert response.status_code == 202
+    queued = response.json()
+    assert queued["status"] == "queued"
+    assert queued["interval"] == "3M"
+    assert batch.call_args.kwargs["run_id"] == queued["run_id"]
+
+    data = client.get("/api/tools/risk-batch", params={"client_id": "c2"}).json()
+    assert data["run_id"] == queued["run_id"]
+    assert [(r["scope"], r["account_id"]) for r in data["results"]] == [("client", None), ("account", "a3")]
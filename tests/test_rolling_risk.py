@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.client_mgr import calculations
+from modules.client_mgr.rolling_risk import RollingRiskBook, RollingRiskState
+
+
+def _returns(n=400, seed=3):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2023-01-02", periods=n, freq="B")
+    return pd.Series(rng.normal(0.0003, 0.013, size=n), index=index)
+
+
+def test_streaming_matches_full_array_metrics():
+    returns = _returns()
+    state = RollingRiskState(window=120)
+    assert state.sync(returns) == len(returns)
+
+    ann = calculations.annualization_factor_from_index(returns)
+    metrics = state.metrics()
+    assert state.ann_factor == pytest.approx(ann)
+    assert metrics["mean_annual"] == pytest.approx(returns.mean() * ann)
+    assert metrics["vol_annual"] == pytest.approx(returns.std(ddof=1) * np.sqrt(ann))
+    assert metrics["max_drawdown"] == pytest.approx(calculations.calculate_max_drawdown(returns))
+    np.testing.assert_allclose(metrics["vol_forecast"], calculations.ewma_vol_forecast(returns, lam=0.94, steps=6))
+    for level, var_key, cvar_key in ((0.95, "var_95", "cvar_95"), (0.99, "var_99", "cvar_99")):
+        var, cvar = calculations.calculate_var_cvar(returns.iloc[-120:], level)
+        assert metrics[var_key] == pytest.approx(var)
+        assert metrics[cvar_key] == pytest.approx(cvar)
+
+
+def test_sync_feeds_only_new_bars():
+    returns = _returns()
+    state = RollingRiskState(window=60)
+    state.sync(returns.iloc[:300])
+    assert state.sync(returns.iloc[:300]) == 0
+    assert state.sync(returns) == 100
+
+    full = RollingRiskState(window=60)
+    full.sync(returns)
+    assert state.metrics() == pytest.approx(full.metrics())
+
+
+def test_sync_revises_partial_last_bar():
+    returns = _returns()
+    partial = returns.iloc[:300].copy()
+    partial.iloc[-1] = 0.05
+    state = RollingRiskState(window=60)
+    state.sync(partial)
+    # The session closes: the same bar arrives with its final value
+    assert state.sync(returns.iloc[:300]) == 0
+    assert state.sync(returns) == 100
+
+    full = RollingRiskState(window=60)
+    full.sync(returns)
+    assert state.count == full.count
+    assert state.metrics() == pytest.approx(full.metrics())
+
+
+def test_checkpoint_round_trip(tmp_path):
+    returns = _returns()
+    path = str(tmp_path / "rolling.json")
+    book = RollingRiskBook(path=path, window=50)
+    partial = returns.iloc[:250].copy()
+    partial.iloc[-1] = -0.04
+    book.sync("p1", partial)
+    assert book.checkpoint()
+
+    restored = RollingRiskBook(path=path, window=50)
+    assert restored.restore() == 1
+    state = restored.sync("p1", returns)
+    live = book.sync("p1", returns)
+    assert state.count == live.count == len(returns)
+    assert state.metrics() == pytest.approx(live.metrics())
+
+
+def test_book_drops_least_recent_series():
+    returns = _returns(n=20)
+    book = RollingRiskBook(path=None, max_entries=2)
+    book.sync("a", returns)
+    book.sync("b", returns)
+    book.sync("a", returns)
+    book.sync("c", returns)
+    assert book.get("b") is None
+    assert book.get("a") is not None
+    assert not book.checkpoint()
+
+
+def test_covered_state_serves_batch_risk_metrics():
+    returns = _returns(n=200)
+    bench = pd.Series(np.random.default_rng(8).normal(0.0002, 0.01, size=200), index=returns.index)
+    book = RollingRiskBook(path=None, window=50)
+    state = book.reset("p1", returns.iloc[:180], window=400)
+    assert state.covers(returns.iloc[:180])
+    state = book.sync("p1", returns)
+    assert state.covers(returns)
+
+    expected = calculations.compute_risk_metrics(returns, bench, 0.04)
+    served = state.risk_metrics(returns, bench, 0.04)
+    assert list(served) == list(expected)
+    assert served == pytest.approx(expected)
+
+    # A moved window start, or bars past the VaR window, need a rebuild
+    assert not state.covers(returns.iloc[1:])
+    assert not book.reset("p2", returns, window=10).covers(returns)
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from modules.market_data.singleflight import SingleFlight, flight_group, singleflight_summary
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    executions = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_fetch(value):
+        executions.append(value)
+        started.set()
+        release.wait(timeout=5)
+        return {"value": value}
+
+    results = []
+
+    def caller():
+        results.append(flight.do(("AAPL", "1mo", "1d"), slow_fetch, 42))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait(timeout=5)
+    followers = [threading.Thread(target=caller) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(timeout=5)
+
+    assert executions == [42]
+    assert len(results) == 5
+    assert all(result is results[0] for result in results)
+    stats = flight.stats()
+    assert stats["calls"] == 5
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["inflight"] == 0
+
+
+def test_errors_propagate_and_do_not_stick():
+    flight = SingleFlight("test")
+
+    def boom():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", boom)
+    assert flight.do("key", lambda: "ok") == "ok"
+    assert flight.stats()["errors"] == 1
+
+
+def test_flight_groups_are_shared_by_name():
+    assert flight_group("unit-test") is flight_group("unit-test")
+    assert "unit-test" in singleflight_summary()
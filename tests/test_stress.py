@@ -0,0 +1,168 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.database import Base
+from modules.client_mgr import stress as stress_module
+from modules.client_mgr.stress import (
+    HISTORICAL_SCENARIOS,
+    StressInputs,
+    custom_scenario,
+    load_stress_inputs,
+    position_quantities,
+    resolve_scenarios,
+    run_stress_test,
+    scenario_catalog,
+    shock_matrix,
+)
+from modules.market_data.bar_store import BarStore
+from modules.market_data.metadata_store import MetadataStore
+from modules.market_data.price_panel import PricePanel
+from modules.market_data.yfinance_client import YahooWrapper
+from web_api.app import app
+from web_api.routes.clients import get_db
+
+
+def _inputs(seed=4):
+    # Stored history starts in 2019: COVID and 2022 are covered, 2008 is not
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range("2019-01-02", "2023-06-30")
+    tickers = ["AAA", "BBB", "CCC", "SPY"]
+    market = rng.normal(0.0003, 0.01, size=len(index))
+    steps = np.column_stack(
+        [1.5 * market, 0.5 * market, np.zeros_like(market), market]
+    ) + rng.normal(0.0, 0.002, size=(len(index), 4))
+    values = 100.0 * np.cumprod(1.0 + steps, axis=0)
+    values[: len(index) // 2, 2] = np.nan  # CCC listed mid-2021, flat since
+    panel = PricePanel(index, tickers, values)
+    sectors = {"AAA": "Technology", "BBB": "Utilities", "CCC": "Technology"}
+    return StressInputs(["AAA", "BBB", "CCC"], panel, "SPY", sectors), panel
+
+
+BOOK = [
+    ("c1", "a1", {"AAA": 10, "BBB": 5}),
+    ("c1", "a2", {"CCC": 3}),
+    ("c2", "a3", {"BBB": 7, "CCC": 1, "ZZZ": 4}),
+]
+
+
+def test_shocks_use_stored_windows_then_beta_fallback():
+    inputs, panel = _inputs()
+    assert inputs.betas[0] == pytest.approx(1.5, abs=0.1)
+    assert inputs.betas[1] == pytest.approx(0.5, abs=0.1)
+
+    scenarios = list(HISTORICAL_SCENARIOS.values())
+    shocks, realized = shock_matrix(scenarios, inputs)
+    frame = panel.frame(filled=True)
+    covid = frame.loc[:"2020-03-23"].iloc[-1] / frame.loc[:"2020-02-19"].iloc[-1] - 1.0
+    np.testing.assert_allclose(shocks[1, :2], covid[["AAA", "BBB"]])
+    # CCC has no bars before the COVID window: beta times the stored SPY move
+    assert not realized[1, 2]
+    assert shocks[1, 2] == pytest.approx(inputs.betas[2] * covid["SPY"])
+    # Nothing stored for 2008: beta times the scenario's S&P 500 move
+    assert not realized[0].any()
+    np.testing.assert_allclose(shocks[0], np.maximum(inputs.betas * -0.5678, -1.0))
+
+    custom = custom_scenario({"market": -0.1, "sectors": {"Technology": -0.2}, "tickers": {"ccc": -1.0}})
+    shocks, realized = shock_matrix([custom], inputs)
+    np.testing.assert_allclose(shocks[0], [inputs.betas[0] * -0.1 - 0.2, inputs.betas[1] * -0.1, -1.0])
+    assert not realized.any()
+
+
+def test_stress_pnl_matches_position_loop():
+    inputs, _ = _inputs()
+    scenarios = resolve_scenarios(["covid_2020", "rates_2022"], [{"name": "Tech", "sectors": {"technology": -0.3}}])
+    result = run_stress_test(BOOK, scenarios, inputs=inputs)
+    shocks, _ = shock_matrix(scenarios, inputs)
+    price = dict(zip(inputs.tickers, inputs.prices))
+    shock = {t: shocks[:, i] for i, t in enumerate(inputs.tickers)}
+
+    expected = {}
+    for client_id, account_id, quantities in BOOK:
+        pnl = sum(qty * price[t] * shock[t] for t, qty in quantities.items() if t in price)
+        expected[account_id] = pnl
+        np.testing.assert_allclose(result.account_pnl[result.book.account_ids.index(account_id)], pnl)
+    np.testing.assert_allclose(result.client_pnl[result.client_ids.index("c1")], expected["a1"] + expected["a2"])
+    assert result.unpriced == ["ZZZ"]
+
+    payload = result.to_payload({"c1": "Client One", "a1": "Brokerage"})
+    assert [s["key"] for s in payload["scenarios"]] == ["covid_2020", "rates_2022", "custom_1"]
+    assert payload["accounts"][0]["label"] == "Brokerage"
+    tech = next(row for row in payload["sectors"] if row["sector"] == "Technology")
+    assert tech["pnl_pct"]["custom_1"] == pytest.approx(-0.3)
+    assert sum(row["pnl"]["covid_2020"] for row in payload["sectors"]) == pytest.approx(
+        payload["scenarios"][0]["pnl"]
+    )
+
+
+def test_stored_windows_are_realized_and_labelled(tmp_path, monkeypatch):
+    _, panel = _inputs()
+    frame = panel.frame(filled=False)
+    frame.columns = pd.MultiIndex.from_product([["Close"], frame.columns], names=["Price", "Ticker"])
+
+    def download(symbols, **kwargs):
+        return frame.loc[:, (slice(None), list(symbols))]
+
+    store = BarStore(path=str(tmp_path / "bars.db"), downloader=download)
+    store.get_frame(["AAA", "BBB", "CCC", "SPY"], period="5y", interval="1d")
+    monkeypatch.setattr(YahooWrapper, "_BAR_STORE", store)
+    monkeypatch.setattr(YahooWrapper, "_METADATA_STORE", MetadataStore(path=str(tmp_path / "meta.db")))
+    stress_module._INPUT_CACHE.clear()
+
+    inputs = load_stress_inputs(["aaa", "BBB", "CCC"])
+    closes = frame["Close"]
+    covid = closes.loc[:"2020-03-23"].iloc[-1] / closes.loc[:"2020-02-19"].iloc[-1] - 1.0
+    moves, market = inputs.window_moves("2020-02-19", "2020-03-23")
+    np.testing.assert_allclose(moves[:2], covid[["AAA", "BBB"]])
+    assert market == pytest.approx(covid["SPY"])
+
+    result = run_stress_test([("c1", "a1", {"AAA": 10, "BBB": 5}), ("c1", "a2", {"CCC": 3})], inputs=inputs)
+    methods = {s["key"]: (s["method"], s["coverage"]) for s in result.to_payload()["scenarios"]}
+    assert methods["gfc_2008"] == ("beta_mapped", 0.0)
+    assert methods["covid_2020"][0] == "mixed"
+    assert methods["rates_2022"] == ("historical", pytest.approx(1.0))
+
+    catalog = {s["key"]: s["method"] for s in scenario_catalog()}
+    assert catalog == {"gfc_2008": "beta_mapped", "covid_2020": "historical", "rates_2022": "historical"}
+    stress_module._INPUT_CACHE.clear()
+
+
+def test_quantities_and_scenario_validation():
+    lots = {"bbb": [{"qty": 2}, {"qty": 3.5}], "AAA": [{"qty": 99}]}
+    assert position_quantities({"aaa": 4, "CCC": 0}, lots) == {"AAA": 4.0, "BBB": 5.5}
+    with pytest.raises(ValueError):
+        custom_scenario({"market": -1.5})
+    with pytest.raises(ValueError):
+        resolve_scenarios(["dotcom_2000"])
+    assert [s.key for s in resolve_scenarios()] == list(HISTORICAL_SCENARIOS)
+
+
+def test_stress_routes(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stress.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    os.environ["CLEAR_WEB_API_KEY"] = "test_key"
+    client = TestClient(app, headers={"X-API-Key": "test_key"})
+
+    listed = client.get("/api/tools/stress/scenarios").json()["scenarios"]
+    assert [s["key"] for s in listed] == list(HISTORICAL_SCENARIOS)
+    assert all(s["method"] in ("historical", "beta_mapped") for s in listed)
+    assert client.post("/api/tools/stress", json={"scenarios": ["nope"]}).status_code == 400
+    assert client.post("/api/tools/stress", json={"client_id": "missing"}).status_code == 404
+    data = client.post("/api/tools/stress", json={"custom": [{"name": "Down 10", "market": -0.1}]}).json()
+    assert data["scenarios"][0]["name"] == "Down 10"
+    assert data["accounts"] == []
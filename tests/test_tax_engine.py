@@ -1,12 +1,138 @@
+import random
 import tempfile
+import time
 import unittest
 from datetime import datetime, timedelta
 import json
+from typing import Any, Dict, List
 
 from modules.client_mgr.client_model import Account, Client
 from modules.client_mgr.tax import TaxEngine
 
 
+# The per-lot loop TaxEngine used before the columnar path, kept as the spec
+def reference_account_tax(
+    self,
+    account: Account,
+    price_map: Dict[str, Any],
+    client_tax_profile: Dict[str, Any],
+) -> Dict[str, Any]:
+    settings = account.tax_settings or {}
+    rules = self._get_rules_for_account(account, client_tax_profile or {})
+    rates = rules.get("rates", {}) if isinstance(rules, dict) else {}
+    long_term_days = int(rules.get("long_term_days", 365) or 365)
+    apply_withholding = bool(rules.get("apply_withholding_to_gains", False))
+
+    tax_exempt = bool(settings.get("tax_exempt", False))
+    account_ccy = settings.get("account_currency", "USD") or "USD"
+
+    totals = {
+        "short_term": 0.0,
+        "long_term": 0.0,
+        "unknown_term": 0.0
+    }
+    tax_total = 0.0
+    warnings: List[str] = []
+
+    if not account.lots:
+        warnings.append("No lot history; tax estimates require lots.")
+
+    for raw_ticker, lots in (account.lots or {}).items():
+        ticker = str(raw_ticker).strip().upper()
+        info = price_map.get(ticker, {}) if isinstance(price_map, dict) else {}
+        price = float(info.get("price", 0.0) or 0.0)
+        if price <= 0:
+            warnings.append(f"Missing price for {ticker}")
+            continue
+        for lot in lots or []:
+            if not isinstance(lot, dict):
+                continue
+            qty = float(lot.get("qty", 0.0) or 0.0)
+            basis = float(lot.get("basis", 0.0) or 0.0)
+            gain = (price - basis) * qty
+            ts = self._parse_timestamp(lot.get("timestamp"))
+            if ts is None:
+                totals["unknown_term"] += gain
+                continue
+            holding_days = (datetime.now() - ts).days
+            if holding_days >= long_term_days:
+                totals["long_term"] += gain
+            else:
+                totals["short_term"] += gain
+
+    if tax_exempt:
+        tax_total = 0.0
+    else:
+        short_rate = rates.get("short_term")
+        long_rate = rates.get("long_term")
+        ordinary_rate = rates.get("ordinary_income")
+        withhold_rate = rates.get("withholding_default") if apply_withholding else None
+
+        def _rate(val, fallback):
+            if val is None:
+                return fallback
+            try:
+                return float(val)
+            except Exception:
+                return fallback
+
+        short_rate = _rate(short_rate, ordinary_rate)
+        long_rate = _rate(long_rate, ordinary_rate)
+
+        if short_rate is not None:
+            tax_total += totals["short_term"] * (short_rate / 100.0)
+        if long_rate is not None:
+            tax_total += totals["long_term"] * (long_rate / 100.0)
+        if withhold_rate is not None:
+            tax_total += (totals["short_term"] + totals["long_term"]) * (float(withhold_rate) / 100.0)
+
+    total_gain = totals["short_term"] + totals["long_term"] + totals["unknown_term"]
+    effective_rate = (tax_total / total_gain * 100.0) if total_gain != 0 else None
+
+    if rates and all(rates.get(k) is None for k in rates.keys()):
+        warnings.append("Tax rates missing for jurisdiction.")
+
+    return {
+        "currency": account_ccy,
+        "total_unrealized": total_gain,
+        "estimated_tax": tax_total if tax_total != 0 else (0.0 if tax_exempt else None),
+        "effective_rate": effective_rate,
+        "by_term": totals,
+        "warnings": warnings,
+        "jurisdiction": (settings.get("jurisdiction") or client_tax_profile.get("tax_country") or "DEFAULT"),
+    }
+
+
+def _random_book(n_accounts: int, lots_per_account: int, seed: int = 3):
+    rng = random.Random(seed)
+    now = datetime.now()
+    tickers = [f"T{i:03d}" for i in range(60)]
+    prices = {t: {"price": round(rng.uniform(5, 500), 2)} for t in tickers[:-3]}
+    jurisdictions = ["", "US", "CA", "XX"]
+    accounts = []
+    for a in range(n_accounts):
+        account = Account(account_name=f"A{a}")
+        account.tax_settings["jurisdiction"] = jurisdictions[a % len(jurisdictions)]
+        account.tax_settings["tax_exempt"] = a % 11 == 5
+        for n in range(lots_per_account if a % 13 else 0):
+            ticker = tickers[rng.randrange(len(tickers))]
+            # Keep ages away from the 365-day boundary so the old per-lot now() cannot flip a term
+            days = rng.choice([rng.randint(0, 360), rng.randint(370, 3000)])
+            stamp = (now - timedelta(days=days, hours=rng.randint(0, 23))).strftime("%Y-%m-%dT%H:%M:%S")
+            if n % 29 == 3:
+                stamp = "LEGACY"
+            elif n % 31 == 4:
+                stamp = None
+            account.lots.setdefault(ticker, []).append({
+                "qty": round(rng.uniform(0.5, 200), 3),
+                "basis": round(rng.uniform(5, 500), 2) if n % 17 else None,
+                "timestamp": stamp,
+            })
+        account.lots.setdefault(tickers[0], []).append("junk")
+        accounts.append(account)
+    return accounts, prices
+
+
 class TestTaxEngine(unittest.TestCase):
     def _build_rules_file(self):
         rules = {
@@ -68,6 +194,44 @@ class TestTaxEngine(unittest.TestCase):
         result = engine.estimate_client_unrealized_tax(client, prices)
         self.assertAlmostEqual(result["total_unrealized"], 40.0, places=6)
 
+    def _multi_rules_file(self):
+        rules = {
+            "DEFAULT": {"long_term_days": 365, "rates": {"short_term": 30.0, "long_term": 15.0}},
+            "US": {
+                "long_term_days": 365,
+                "rates": {"short_term": None, "long_term": 20.0, "ordinary_income": 37.0, "withholding_default": 2.5},
+                "apply_withholding_to_gains": True,
+            },
+            "CA": {"long_term_days": 365, "rates": {"short_term": None, "long_term": None}},
+        }
+        tmp = tempfile.NamedTemporaryFile(delete=False, mode="w", encoding="ascii")
+        json.dump(rules, tmp)
+        tmp.close()
+        return tmp.name
+
+    def test_columnar_matches_per_lot_loop(self):
+        engine = TaxEngine(rules_path=self._multi_rules_file())
+        accounts, prices = _random_book(40, 60)
+        profile = {"tax_country": "US"}
+        results = engine.estimate_accounts_unrealized_tax([(acc, profile) for acc in accounts], prices)
+        for account, result in zip(accounts, results):
+            self.assertEqual(result, reference_account_tax(engine, account, prices, profile))
+
+        client = Client(name="Book")
+        client.tax_profile["tax_country"] = "US"
+        client.accounts = accounts[:5]
+        rollup = engine.estimate_clients_unrealized_tax([client], prices)[client.client_id]
+        self.assertEqual(rollup, engine.estimate_client_unrealized_tax(client, prices))
+
+    def test_columnar_handles_large_books_quickly(self):
+        engine = TaxEngine(rules_path=self._multi_rules_file())
+        accounts, prices = _random_book(200, 500)
+        started = time.perf_counter()
+        results = engine.estimate_accounts_unrealized_tax([(acc, {}) for acc in accounts], prices)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(len(results), 200)
+        self.assertLess(elapsed, 2.0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -126,6 +126,39 @@ class ToolkitMetricsTests(unittest.TestCase):
             self.assertEqual(toolkit._selected_interval, "3M")
             mocked.assert_called_once()
 
+    def test_risk_dashboard_refresh_reads_rolling_state(self):
+        from modules.client_mgr import toolkit_payloads
+        from modules.client_mgr.rolling_risk import RollingRiskBook
+
+        rng = np.random.default_rng(11)
+        index = pd.date_range(datetime(2025, 1, 2, 9, 30), periods=120, freq="60min")
+        returns = pd.Series(rng.normal(0.0, 0.004, size=120), index=index)
+        bench = pd.Series(rng.normal(0.0, 0.003, size=120), index=index)
+        toolkit = FinancialToolkit(Client())
+        book = RollingRiskBook(path=None)
+
+        def build(series):
+            with mock.patch.object(toolkit, "_get_portfolio_and_benchmark_returns", return_value=(series, bench.loc[series.index], "")), \
+                    mock.patch.object(toolkit_payloads, "forward_var_payload", return_value={}), \
+                    mock.patch.object(toolkit_payloads, "ROLLING_RISK", book):
+                return toolkit.build_risk_dashboard_payload({"AAA": 1}, "1W", "Test")
+
+        with mock.patch.object(toolkit, "_compute_risk_metrics", wraps=toolkit._compute_risk_metrics) as batch:
+            build(returns.iloc[:118])
+            self.assertEqual(batch.call_count, 1)
+            # A refresh with new bars is served from the running state
+            payload = build(returns)
+            self.assertEqual(batch.call_count, 1)
+            # The window start moved on: rebuilt through the batch path
+            build(returns.iloc[1:])
+            self.assertEqual(batch.call_count, 2)
+
+        expected = toolkit._compute_risk_metrics(returns, bench, risk_free_annual=0.04)
+        for key, value in expected.items():
+            self.assertAlmostEqual(payload["metrics"][key], value, places=9)
+        self.assertEqual(payload["metrics"]["points"], 120)
+        self.assertEqual(payload["rolling"]["points"], 120)
+
 
 if __name__ == "__main__":
     unittest.main()
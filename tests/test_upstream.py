@@ -0,0 +1,156 @@
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from modules.market_data.yfinance_client import YahooWrapper
+from utils.upstream import (
+    CircuitBreaker,
+    TokenBucket,
+    Upstream,
+    UpstreamUnavailable,
+    get_upstream,
+    guarded_request,
+    patient,
+    reset_upstreams,
+    upstream_summary,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def test_token_bucket_refills_at_rate():
+    clock = _Clock()
+    bucket = TokenBucket(rate=2.0, burst=2, clock=clock)
+    assert bucket.try_acquire()[0]
+    assert bucket.try_acquire()[0]
+    ok, wait = bucket.try_acquire()
+    assert not ok
+    assert wait == pytest.approx(0.5)
+    assert not bucket.acquire(timeout=0.1, sleep=lambda s: None)
+    clock.now += 0.5
+    assert bucket.try_acquire()[0]
+
+
+def test_breaker_opens_then_half_opens_once():
+    clock = _Clock()
+    breaker = CircuitBreaker("t", failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure("boom")
+    assert breaker.state == "closed"
+    breaker.record_failure("boom")
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial in flight
+    breaker.record_failure("still down")
+    assert breaker.state == "open"
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    stats = breaker.stats()
+    assert stats["opened"] == 2
+    assert stats["rejected"] == 2
+
+
+def test_upstream_fails_fast_while_open_and_counts_5xx():
+    clock = _Clock()
+    upstream = Upstream("svc", rate=100, burst=100, failure_threshold=2, reset_timeout=30, clock=clock)
+    fn = mock.Mock(return_value=_Response(503))
+    upstream.call(fn)
+    upstream.call(fn)
+    with pytest.raises(UpstreamUnavailable) as exc:
+        upstream.call(fn)
+    assert exc.value.reason == "circuit open"
+    assert fn.call_count == 2
+    assert not upstream.available()
+
+    # 4xx other than 429 is the caller's problem, not the upstream's
+    clock.now += 30
+    upstream.call(mock.Mock(return_value=_Response(404)))
+    assert upstream.available()
+
+
+def test_throttling_does_not_trip_breaker():
+    clock = _Clock()
+    upstream = Upstream("svc", rate=0.001, burst=1, failure_threshold=1, max_wait=0.0, clock=clock)
+    upstream.call(lambda: "ok")
+    with pytest.raises(UpstreamUnavailable) as exc:
+        upstream.call(lambda: "ok")
+    assert exc.value.reason == "rate limited"
+    stats = upstream.stats()
+    assert stats["state"] == "closed"
+    assert stats["throttled"] == 1
+
+
+def test_patient_calls_wait_for_a_token():
+    upstream = Upstream("svc", rate=20.0, burst=1, max_wait=0.0)
+    upstream.call(lambda: "ok")
+    with pytest.raises(UpstreamUnavailable):
+        upstream.call(lambda: "ok")
+    with patient(1.0):
+        assert upstream.call(lambda: "ok") == "ok"
+    # The override ends with the block
+    with pytest.raises(UpstreamUnavailable):
+        upstream.call(lambda: "ok")
+
+
+def test_guarded_request_keys_by_host():
+    reset_upstreams()
+    try:
+        get = mock.Mock(return_value=_Response(200))
+        guarded_request(get, "https://feeds.example.com/rss", timeout=8)
+        get.assert_called_once_with("https://feeds.example.com/rss", timeout=8)
+        summary = upstream_summary()
+        assert summary["feeds.example.com"]["calls"] == 1
+        assert summary["feeds.example.com"]["successes"] == 1
+    finally:
+        reset_upstreams()
+
+
+def test_detailed_quote_serves_stale_cache_while_yahoo_open():
+    reset_upstreams()
+    key = ("STALEQ", "1d", "15m")
+    YahooWrapper._DETAILED_CACHE.set(key, {"ticker": "STALEQ", "price": 1.0}, ttl=0)
+    YahooWrapper._BAD_SYMBOL_UNTIL.pop("STALEQ")
+    breaker = get_upstream("yahoo").breaker
+    try:
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure("down")
+        with mock.patch.object(YahooWrapper, "get_history_frame", return_value=pd.DataFrame()):
+            quote = YahooWrapper()._fetch_detailed_quote("STALEQ", "1d", "15m")
+        assert quote["price"] == 1.0
+        assert not YahooWrapper._is_bad("STALEQ")
+    finally:
+        YahooWrapper._DETAILED_CACHE.pop(key)
+        reset_upstreams()
+
+
+def test_throttled_history_download_does_not_mark_symbol_bad(tmp_path):
+    from modules.market_data.bar_store import BarStore
+
+    def throttled(symbols, **kwargs):
+        raise UpstreamUnavailable("yahoo", "rate limited")
+
+    reset_upstreams()
+    YahooWrapper._BAD_SYMBOL_UNTIL.pop("THROTQ")
+    store = BarStore(path=str(tmp_path / "bars.db"), downloader=throttled)
+    with mock.patch.object(YahooWrapper, "_BAR_STORE", store):
+        quote = YahooWrapper()._fetch_detailed_quote("THROTQ", "1d", "15m")
+    assert quote == {"error": "yahoo unavailable: rate limited", "throttled": True}
+    assert not YahooWrapper._is_bad("THROTQ")
@@ -1,7 +1,36 @@
+import os
+import tempfile
 import unittest
 from datetime import datetime, timedelta
+from unittest import mock
 
-from modules.client_mgr.valuation import ValuationEngine
+import numpy as np
+import pandas as pd
+
+from modules.client_mgr.valuation import IncrementalValuation, ValuationEngine
+from modules.market_data.bar_store import BarStore
+from modules.market_data.metadata_store import MetadataStore
+from modules.market_data.yfinance_client import YahooWrapper
+from utils.cache import TTLCache
+
+
+def _fake_download(calls):
+    def _download(symbols, **kwargs):
+        calls.append(list(symbols))
+        index = pd.date_range(end=pd.Timestamp(datetime.now().date()), periods=20, freq="D")
+        data = {}
+        for sym in symbols:
+            if sym == "BAD":
+                continue
+            closes = np.linspace(10.0, 20.0, len(index))
+            for field in ("Open", "High", "Low", "Close"):
+                data[(field, sym)] = closes
+            data[("Volume", sym)] = np.full(len(index), 100.0)
+        frame = pd.DataFrame(data, index=index)
+        if data:
+            frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+        return frame
+    return _download
 
 
 class TestValuationEngine(unittest.TestCase):
@@ -44,6 +73,189 @@ class TestValuationEngine(unittest.TestCase):
         self.assertEqual(values[0], 100.0)
         self.assertEqual(values[1], 220.0)
 
+    def test_batched_portfolio_value_chunks_downloads(self):
+        calls = []
+        tickers = [f"T{i:02d}" for i in range(45)]
+        holdings = {t.lower(): 2.0 for t in tickers}
+        with tempfile.TemporaryDirectory() as tmp:
+            store = BarStore(path=os.path.join(tmp, "bars.db"), downloader=_fake_download(calls))
+            meta_store = MetadataStore(path=os.path.join(tmp, "meta.db"))
+            meta_store.put_many({"T01": {"name": "One", "sector": "Energy", "mkt_cap": 7}})
+            meta_cache = TTLCache("test.meta")
+            meta_cache.set("T00", {"name": "Zero", "sector": "Tech", "mkt_cap": 5})
+            with mock.patch.object(YahooWrapper, "_BAR_STORE", store), \
+                    mock.patch.object(YahooWrapper, "_METADATA_STORE", meta_store), \
+                    mock.patch.object(YahooWrapper, "_DETAILED_CACHE", TTLCache("test.detailed")), \
+                    mock.patch.object(YahooWrapper, "_FAST_CACHE", TTLCache("test.fast")), \
+                    mock.patch.object(YahooWrapper, "_META_CACHE", meta_cache), \
+                    mock.patch.object(YahooWrapper, "refresh_metadata_async") as refresh:
+                total, enriched = ValuationEngine().calculate_portfolio_value(holdings)
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sorted(enriched.keys()), tickers)
+        self.assertAlmostEqual(total, 45 * 2.0 * 20.0, places=6)
+        self.assertEqual(enriched["T00"]["name"], "Zero")
+        self.assertEqual(enriched["T00"]["sector"], "Tech")
+        self.assertEqual(enriched["T01"]["sector"], "Energy")
+        self.assertEqual(enriched["T02"]["sector"], "N/A")
+        self.assertEqual(enriched["T05"]["quantity"], 2.0)
+        self.assertEqual(len(enriched["T05"]["history"]), 20)
+        refresh.assert_called_once()
+
+    def test_bulk_historical_prices_download_once_per_ticker(self):
+        calls = []
+        index = pd.bdate_range("2022-01-03", "2023-12-29")
+
+        def _download(ticker, **kwargs):
+            calls.append((ticker, kwargs["interval"]))
+            window = index[(index >= pd.Timestamp(kwargs["start"])) & (index < pd.Timestamp(kwargs["end"]))]
+            frame = pd.DataFrame({("Close", ticker): np.arange(len(window), dtype=float) + 1.0}, index=window)
+            frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+            return frame
+
+        lots = {
+            "aapl": [
+                {"qty": 1.0, "basis": 0.0, "timestamp": (index[i]).strftime("%Y-%m-%dT%H:%M:%S")}
+                for i in range(0, 400, 2)
+            ] + [{"qty": 1.0, "basis": 0.0, "timestamp": "2022-01-08T00:00:00"}],  # Saturday
+            "MSFT": [
+                {"qty": 1.0, "basis": 0.0, "timestamp": (index[i]).strftime("%Y-%m-%d")}
+                for i in range(100)
+            ] + [{"qty": 2.0, "basis": 50.0, "timestamp": "2023-01-03T00:00:00"}],
+        }
+        provider = mock.Mock()
+        provider.download.side_effect = _download
+        with mock.patch("modules.client_mgr.valuation.get_provider", return_value=provider):
+            summary = ValuationEngine().backfill_lot_basis(lots)
+
+        self.assertEqual(sorted(calls), [("AAPL", "1d"), ("MSFT", "1d")])
+        self.assertEqual(summary, {"tickers": 2, "updated": 301, "unresolved": 0, "throttled": 0})
+        aapl_first = pd.Timestamp(lots["aapl"][0]["timestamp"])
+        aapl_fourth = pd.Timestamp(lots["aapl"][3]["timestamp"])
+        # Prices follow the bar ordinal, so the gap between two lots equals their bar distance
+        self.assertEqual(
+            lots["aapl"][3]["basis"] - lots["aapl"][0]["basis"],
+            float(len(index[(index > aapl_first) & (index <= aapl_fourth)])),
+        )
+        self.assertEqual(lots["aapl"][-1]["basis"], lots["aapl"][2]["basis"])  # Sat -> Fri close
+        self.assertEqual(lots["aapl"][0]["source"], "HISTORICAL")
+        self.assertEqual(lots["MSFT"][-1]["basis"], 50.0)
+
+    def test_throttled_tickers_are_reported_apart_from_missing_ones(self):
+        from utils.upstream import UpstreamUnavailable
+
+        index = pd.bdate_range("2023-01-02", periods=30)
+
+        def _download(ticker, **kwargs):
+            if ticker == "MSFT":
+                raise UpstreamUnavailable("yahoo", "rate limited")
+            if ticker == "GONE":
+                return pd.DataFrame()
+            frame = pd.DataFrame({("Close", ticker): np.full(len(index), 5.0)}, index=index)
+            frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+            return frame
+
+        lots = {
+            t: [{"qty": 1.0, "basis": 0.0, "timestamp": "2023-01-10T00:00:00"}]
+            for t in ("AAPL", "MSFT", "GONE")
+        }
+        provider = mock.Mock()
+        provider.download.side_effect = _download
+        with mock.patch("modules.client_mgr.valuation.get_provider", return_value=provider):
+            summary = ValuationEngine().backfill_lot_basis(lots)
+        self.assertEqual(summary, {"tickers": 3, "updated": 1, "unresolved": 1, "throttled": 1})
+        self.assertEqual(lots["MSFT"][0]["basis"], 0.0)
+
+        engine = ValuationEngine()
+        throttled_quote = {"ticker": "MSFT", "error": "Market data throttled for MSFT", "throttled": True}
+        priced = {"ticker": "AAPL", "price": 5.0, "change": 0.0, "pct": 0.0, "history": []}
+        with mock.patch.object(engine, "get_detailed_data", side_effect=lambda t, *a: priced if t == "AAPL" else throttled_quote), \
+                mock.patch.object(engine.yahoo, "get_detailed_quotes", return_value={}):
+            result = engine.value_accounts([("c1", "a1", {"AAPL": 2, "MSFT": 3})])
+        # MSFT is left unpriced and reported, not valued at a zero price quote
+        self.assertEqual(set(result.quotes), {"AAPL"})
+        self.assertEqual(result.throttled, ["MSFT"])
+        self.assertEqual(result.summary()["throttled"], ["MSFT"])
+        self.assertEqual(result.accounts["a1"], 10.0)
+
+    def test_incremental_valuation_reprices_only_changed_quotes(self):
+        def _quote(price, stamp="2024-01-02 00:00:00"):
+            return {"price": price, "change": 0.0, "pct": 0.0, "history": [price], "history_dates": [stamp]}
+
+        quotes = {"AAA": _quote(10.0), "BBB": _quote(20.0), "CCC": _quote(30.0)}
+        engine = ValuationEngine()
+        book = IncrementalValuation(engine)
+        fetched = []
+
+        def _fetch(tickers, *args, **kwargs):
+            fetched.append(list(tickers))
+            return {t: quotes[t] for t in tickers}
+
+        with mock.patch.object(engine, "fetch_quotes", side_effect=_fetch):
+            total, enriched = book.update({"aaa": 1, "BBB": 2})
+            self.assertEqual(total, 50.0)
+            self.assertEqual(book.stats["repriced"], 2)
+
+            quotes["BBB"] = _quote(21.0, "2024-01-03 00:00:00")
+            total, enriched = book.update({"AAA": 1, "BBB": 2})
+            self.assertEqual(total, 52.0)
+            self.assertEqual(book.stats["repriced"], 3)
+            self.assertEqual(book.stats["unchanged"], 1)
+
+            # Quantity change, removal and a new ticker in one tick
+            total, enriched = book.update({"BBB": 3, "CCC": 1}, quotes={})
+            self.assertEqual(fetched[-1], ["CCC"])
+            self.assertEqual(list(enriched), ["BBB", "CCC"])
+            self.assertEqual(book.stats["removed"], 1)
+
+        self.assertEqual(total, 3 * 21.0 + 30.0)
+        self.assertEqual(book.resync(), total)
+
+    def test_client_manager_prunes_books_of_removed_accounts(self):
+        from modules.client_mgr.client_model import Account, Client
+        from modules.client_mgr.manager import ClientManager
+
+        kept = Client(client_id="c1", accounts=[Account(account_id="a1"), Account(account_id="a2")])
+        gone = Client(client_id="c2", accounts=[Account(account_id="a3")])
+        with mock.patch("modules.client_mgr.manager.DataHandler.load_clients", return_value=[kept, gone]):
+            manager = ClientManager()
+        engine = ValuationEngine()
+        manager._valuation_engine = engine
+        for aid in ("a1", "a2", "a3"):
+            manager._list_valuations[aid] = IncrementalValuation(engine)
+        manager._list_val_cache = {"c1": {"ts": 0}, "c2": {"ts": 0}}
+
+        manager.clients.remove(gone)
+        kept.accounts.pop()
+        manager._prune_list_caches()
+
+        self.assertEqual(set(manager._list_valuations), {"a1"})
+        self.assertEqual(set(manager._list_val_cache), {"c1"})
+
+    def test_value_accounts_prices_ticker_union_once(self):
+        quotes = {"AAA": {"price": 1.1}, "BBB": {"price": 2.3}, "CCC": {"price": 0.7}}
+        accounts = [
+            ("c1", "a1", {"aaa": 3, "BBB": 1.5}),
+            ("c1", "a2", {"CCC": 10}),
+            ("c2", "a3", {"BBB": 4, "AAA": 0.25}),
+        ]
+        engine = ValuationEngine()
+        fetch = mock.Mock(side_effect=lambda tickers, *a, **k: {t: quotes[t] for t in tickers})
+        with mock.patch.object(engine, "fetch_quotes", fetch):
+            result = engine.value_accounts(accounts)
+            singles = {acc: engine.calculate_portfolio_value(h)[0] for _, acc, h in accounts}
+            books = {}
+            via_books = engine.value_accounts(accounts, books=books)
+
+        self.assertEqual(fetch.call_args_list[0].args[0], ["AAA", "BBB", "CCC"])
+        self.assertEqual(result.accounts, singles)
+        self.assertEqual(result.clients, {"c1": singles["a1"] + singles["a2"], "c2": singles["a3"]})
+        self.assertEqual(result.positions, 5)
+        self.assertEqual(result.summary()["tickers"], 3)
+        self.assertEqual(set(result.timings), {"collect", "fetch", "price", "fan_out", "total"})
+        self.assertEqual(via_books.accounts, singles)
+        self.assertEqual(sorted(books), ["a1", "a2", "a3"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,86 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.client_mgr.var_engine import VaREngine, forward_var_payload
+from modules.market_data.price_panel import PricePanel
+
+
+def _book(days=500, assets=3, seed=11):
+    rng = np.random.default_rng(seed)
+    cov = np.array([[1.0, 0.4, 0.2], [0.4, 1.0, 0.3], [0.2, 0.3, 1.0]])[:assets, :assets] * 1e-4
+    returns = rng.multivariate_normal(np.full(assets, 2e-4), cov, size=days)
+    values = np.array([100_000.0, 50_000.0, 25_000.0])[:assets]
+    return returns, values
+
+
+def test_parametric_matches_closed_form():
+    returns, values = _book(assets=1)
+    engine = VaREngine(returns, values)
+    mu = returns[:, 0].mean() * values[0]
+    sd = returns[:, 0].std(ddof=1) * values[0]
+    z = NormalDist().inv_cdf(0.01)
+    result = engine.parametric(0.99, horizon=10)
+    assert result.var == pytest.approx(10 * mu + z * sd * np.sqrt(10))
+    assert result.cvar < result.var
+    assert result.var_pct == pytest.approx(result.var / values[0])
+
+
+def test_monte_carlo_converges_to_parametric():
+    returns, values = _book()
+    engine = VaREngine(returns, values)
+    pnl = engine.monte_carlo_pnl((1, 10), paths=200_000, seed=3)
+    for horizon in (1, 10):
+        expected = engine.parametric(0.95, horizon).var
+        assert np.quantile(pnl[horizon], 0.05) == pytest.approx(expected, rel=0.05)
+
+
+def test_simulation_is_seeded_and_chunk_size_independent():
+    returns, values = _book()
+    engine = VaREngine(returns, values)
+    small = engine.monte_carlo_pnl((1,), paths=5_000, seed=9, chunk_size=700)
+    large = engine.monte_carlo_pnl((1,), paths=5_000, seed=9, chunk_size=5_000)
+    np.testing.assert_allclose(small[1], large[1], rtol=1e-4)
+    again = engine.monte_carlo_pnl((1,), paths=5_000, seed=9, chunk_size=700)
+    np.testing.assert_array_equal(small[1], again[1])
+    fat = engine.monte_carlo_pnl((1,), paths=50_000, seed=9, dist="t", df=4)
+    normal = engine.monte_carlo_pnl((1,), paths=50_000, seed=9)
+    assert np.quantile(fat[1], 0.001) < np.quantile(normal[1], 0.001)
+
+
+def test_filtered_historical_scenarios_and_bootstrap():
+    returns, values = _book()
+    engine = VaREngine(returns, values)
+    pnl = engine.historical_pnl((1, 10), paths=20_000, seed=1)
+    assert pnl[1].shape == (len(returns),)
+    assert pnl[10].shape == (20_000,)
+    results = {(r.method, r.horizon): r for r in engine.run(methods=("historical",), confidences=(0.99,), paths=20_000, seed=1)}
+    assert results[("historical", 10)].var < results[("historical", 1)].var < 0
+
+
+def test_forward_var_payload_from_panel():
+    returns, _ = _book(days=120)
+    prices = 100.0 * np.cumprod(1.0 + np.vstack([np.zeros((1, 3)), returns]), axis=0)
+    panel = PricePanel(pd.date_range("2024-01-01", periods=121, freq="B"), ["AAA", "BBB", "SPY"], prices)
+    payload = forward_var_payload(panel, {"aaa": 10, "BBB": 5, "SPY": 3}, exclude=["SPY"], paths=2_000)
+    assert payload["assets"] == 2
+    assert payload["value"] == pytest.approx(10 * prices[-1, 0] + 5 * prices[-1, 1])
+    assert {(row["method"], row["horizon"]) for row in payload["rows"]} == {
+        (method, horizon) for method in ("parametric", "historical", "monte_carlo") for horizon in (1, 10)
+    }
+    assert forward_var_payload(panel, {"ZZZ": 1})["error"] == "Insufficient market data"
+
+
+def test_forward_var_payload_resamples_intraday_panels_to_days():
+    returns, _ = _book(days=140)
+    prices = 100.0 * np.cumprod(1.0 + np.vstack([np.zeros((1, 3)), returns * 0.3]), axis=0)
+    days = pd.bdate_range("2024-01-01", periods=21)
+    index = pd.DatetimeIndex([d + pd.Timedelta(hours=9 + h) for d in days for h in range(7)])[: len(prices)]
+    panel = PricePanel(index, ["AAA", "BBB", "SPY"], prices[: len(index)])
+    payload = forward_var_payload(panel, {"AAA": 10, "BBB": 5}, paths=2_000, estimator=None, interval="60m")
+    assert payload["horizon_unit"] == "days"
+    assert payload["source_interval"] == "60m"
+    # One observation per session, not per hourly bar
+    assert payload["observations"] == len(days) - 1
@@ -198,6 +198,12 @@ def test_diagnostics_endpoint():
     assert "orphans" in payload
     assert "holdings" in payload["orphans"]
     assert "lots" in payload["orphans"]
+    assert "singleflight" in payload["market_data"]
+    assert "bar_store" in payload["market_data"]
+    assert "metadata_store" in payload["market_data"]
+    assert "prefetch" in payload["market_data"]
+    assert payload["market_data"]["provider"]["name"] in ("live", "replay")
+    assert "yahoo.detailed_quotes" in payload["caches"]["caches"]
 
 
 def test_intel_summary_endpoint_stubbed():
@@ -1,4 +1,6 @@
 import os
+from unittest import mock
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -8,6 +10,7 @@ from core.database import Base
 from core import models
 from web_api.app import app
 from web_api.routes.clients import get_db
+from modules.client_mgr.valuation import ValuationEngine
 
 DATABASE_URL = "sqlite:///./test.db"
 
@@ -94,6 +97,39 @@ def test_get_clients_with_accounts(client):
     assert found_client["accounts_count"] == 1
 
 
+def test_get_clients_with_batch_values(client):
+    client.post(
+        "/api/clients",
+        json={"client_id": "valued_client", "name": "Valued", "risk_profile": "Medium", "accounts": []},
+    )
+    for idx, holdings in enumerate(({"AAA": 2}, {"aaa": 1, "BBB": 3})):
+        client.post(
+            "/api/clients/valued_client/accounts",
+            json={
+                "account_id": f"valued_{idx}",
+                "account_name": f"Acct {idx}",
+                "account_type": "Taxable",
+                "holdings": holdings,
+            },
+        )
+
+    fetched = []
+
+    def _fetch(self, tickers, *args, **kwargs):
+        fetched.append(list(tickers))
+        return {t: {"price": {"AAA": 10.0, "BBB": 5.0}[t]} for t in tickers}
+
+    with mock.patch.object(ValuationEngine, "fetch_quotes", _fetch):
+        response = client.get("/api/clients?values=true")
+    assert response.status_code == 200
+    data = response.json()
+    row = next(c for c in data["clients"] if c["name"] == "Valued")
+    assert row["market_value"] == 2 * 10.0 + 10.0 + 3 * 5.0
+    assert fetched == [["AAA", "BBB"]]
+    assert data["valuation"]["tickers"] == 2
+    assert "fetch" in data["valuation"]["timings_ms"]
+
+
 def test_create_account_without_id(client):
     client_id = "test_client_4"
     client.post(
@@ -78,3 +78,44 @@ def test_normalize_lots_requires_confirm(client):
     test_client, _ = client
     resp = test_client.post("/api/maintenance/normalize-lots", json={"confirm": False})
     assert resp.status_code == 400
+
+
+def test_backfill_lot_basis_requires_confirm(client):
+    test_client, _ = client
+    resp = test_client.post("/api/maintenance/backfill-lot-basis", json={"confirm": False})
+    assert resp.status_code == 400
+
+
+def test_backfill_lot_basis_groups_lots_across_accounts(client, monkeypatch):
+    import modules.client_store as client_store
+
+    test_client, session_local = client
+    monkeypatch.setattr(client_store, "SessionLocal", session_local)
+    store = client_store.DbClientStore()
+    lot = {"qty": 1.0, "basis": 0.0, "timestamp": "2023-03-01T00:00:00"}
+    for name in ("A", "B"):
+        store.create_client({
+            "name": name,
+            "accounts": [{"account_name": "Main", "account_type": "Brokerage", "holdings": {"AAPL": 1.0}, "lots": {"AAPL": [dict(lot)]}}],
+        })
+
+    seen = {}
+
+    def _fake_prices(self, requests, throttled=None):
+        seen.update({t: len(list(v)) for t, v in requests.items()})
+        return {t: [123.0] * seen[t] for t in requests}
+
+    monkeypatch.setattr(maintenance_routes.ValuationEngine, "get_historical_prices", _fake_prices)
+    resp = test_client.post("/api/maintenance/backfill-lot-basis", json={"confirm": True})
+    assert resp.status_code == 200
+    payload = resp.json()
+    assert seen == {"AAPL": 2}
+    assert payload["updated_lots"] == 2
+    assert payload["throttled_lots"] == 0
+    assert payload["updated_accounts"] == 2
+    bases = [
+        account["lots"]["AAPL"][0]["basis"]
+        for c in store.fetch_all_clients()
+        for account in c["accounts"]
+    ]
+    assert bases == [123.0, 123.0]
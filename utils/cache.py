@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """Approximate in-memory size of a cached value (bytes)."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True, deep=False)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if _depth >= 4:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v, _depth + 1) for v in value)
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and entry/byte bounds.
+
+    Expired entries stay readable with allow_stale=True until they are evicted,
+    so callers can fall back to old data when a refresh fails. Eviction drops
+    expired entries first, then the least recently used ones.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = estimate_size,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._clock = clock
+        self._lock = threading.RLock()
+        # key -> (stored_at, expires_at, size, value)
+        self._data: "OrderedDict[Hashable, Tuple[float, Optional[float], int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stale_hits": 0, "expired": 0, "evictions": 0, "sets": 0}
+
+    # -------------------------------
+    # Dict-style access
+    # -------------------------------
+
+    def get(self, key: Hashable, default: Any = None, allow_stale: bool = False) -> Any:
+        entry = self.get_entry(key, allow_stale=allow_stale)
+        return default if entry is None else entry[1]
+
+    def get_entry(self, key: Hashable, allow_stale: bool = False) -> Optional[Tuple[float, Any]]:
+        """Returns (stored_at, value) or None."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            stored_at, expires_at, _, value = entry
+            if expires_at is not None and self._clock() >= expires_at:
+                if not allow_stale:
+                    self._stats["expired"] += 1
+                    self._stats["misses"] += 1
+                    return None
+                self._stats["stale_hits"] += 1
+            else:
+                self._stats["hits"] += 1
+            self._data.move_to_end(key)
+            return stored_at, value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl is None else ttl
+        now = self._clock()
+        size = int(self._sizeof(value)) if self.max_bytes else 0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (now, (now + ttl) if ttl is not None else None, size, value)
+            self._bytes += size
+            self._stats["sets"] += 1
+            self._enforce_bounds()
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[1] is None or self._clock() < entry[1])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            return iter(list(self._data.keys()))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self._bytes -= entry[2]
+            return entry[3]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def timestamps(self) -> List[float]:
+        with self._lock:
+            return [entry[0] for entry in self._data.values()]
+
+    # -------------------------------
+    # Bounds + stats
+    # -------------------------------
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            now = self._clock()
+            expired = [k for k, e in self._data.items() if e[1] is not None and now >= e[1]]
+            for key in expired:
+                self._bytes -= self._data.pop(key)[2]
+            self._stats["evictions"] += len(expired)
+            return len(expired)
+
+    def _over_bounds(self) -> bool:
+        if len(self._data) > self.max_entries:
+            return True
+        return bool(self.max_bytes) and self._bytes > self.max_bytes and len(self._data) > 1
+
+    def _enforce_bounds(self) -> None:
+        if not self._over_bounds():
+            return
+        self.purge_expired()
+        while self._over_bounds():
+            _, entry = self._data.popitem(last=False)
+            self._bytes -= entry[2]
+            self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._stats)
+            data["entries"] = len(self._data)
+            data["max_entries"] = self.max_entries
+            if self.max_bytes:
+                data["bytes"] = self._bytes
+                data["max_bytes"] = self.max_bytes
+            data["ttl_seconds"] = self.ttl_seconds
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 4) if lookups else 0.0
+        return data
+
+
+_REGISTRY: Dict[str, TTLCache] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def shared_cache(
+    name: str,
+    max_entries: int = 1024,
+    ttl_seconds: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+) -> TTLCache:
+    """Returns the process-wide cache registered under name, creating it once."""
+    with _REGISTRY_LOCK:
+        cache = _REGISTRY.get(name)
+        if cache is None:
+            cache = TTLCache(name, max_entries=max_entries, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+            _REGISTRY[name] = cache
+        return cache
+
+
+def cache_summary() -> Dict[str, Dict[str, Any]]:
+    with _REGISTRY_LOCK:
+        caches = dict(_REGISTRY)
+    return {name: cache.stats() for name, cache in sorted(caches.items())}
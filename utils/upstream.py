@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import contextlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Raised instead of calling an upstream whose breaker is open or whose rate budget is spent."""
+
+    def __init__(self, name: str, reason: str, retry_after: Optional[float] = None):
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+        hint = f" (retry in {retry_after:.0f}s)" if retry_after else ""
+        super().__init__(f"{name} unavailable: {reason}{hint}")
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst; each call spends one."""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = max(0.001, float(rate))
+        self.burst = max(1, int(burst))
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> Tuple[bool, float]:
+        """Takes a token if one is available; otherwise returns the wait until the next one."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True, 0.0
+            return False, (1.0 - self._tokens) / self.rate
+
+    def acquire(self, timeout: float = 0.0, sleep: Callable[[float], None] = time.sleep) -> bool:
+        """Waits up to timeout seconds for a token."""
+        deadline = self._clock() + max(0.0, timeout)
+        while True:
+            ok, wait = self.try_acquire()
+            if ok:
+                return True
+            remaining = deadline - self._clock()
+            if wait > remaining:
+                return False
+            sleep(wait)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker for one upstream.
+
+    failure_threshold consecutive failures open the circuit; after
+    reset_timeout seconds one trial call is let through (half-open) and its
+    outcome either closes the circuit or re-opens it for another period.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_inflight = False
+        self._stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self._last_error: Optional[str] = None
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_inflight = False
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._current_state() != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def allow(self) -> bool:
+        """True when a call may proceed; half-open admits one trial at a time."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_inflight:
+                self._trial_inflight = True
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def release_trial(self) -> None:
+        """Gives back a half-open trial slot without judging the upstream."""
+        with self._lock:
+            self._trial_inflight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._stats["successes"] += 1
+            self._failures = 0
+            self._state = self.CLOSED
+            self._trial_inflight = False
+
+    def record_failure(self, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._stats["failures"] += 1
+            self._failures += 1
+            self._last_error = error
+            state = self._current_state()
+            if state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if state != self.OPEN:
+                    self._stats["opened"] += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_inflight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._stats)
+            data["state"] = self._current_state()
+            data["consecutive_failures"] = self._failures
+            data["last_error"] = self._last_error
+        data["retry_after"] = round(self.retry_after(), 1)
+        return data
+
+
+def _response_failed(result: Any) -> bool:
+    """429 and 5xx responses mean the upstream is struggling, not that the request was bad."""
+    status = getattr(result, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+# Token wait for background and bulk work, which would rather queue than fail
+BULK_MAX_WAIT = 30.0
+
+_PATIENCE = threading.local()
+
+
+@contextlib.contextmanager
+def patient(max_wait: float = BULK_MAX_WAIT) -> Iterator[None]:
+    """Lets upstream calls made on this thread wait up to max_wait seconds for a token."""
+    previous = getattr(_PATIENCE, "max_wait", None)
+    _PATIENCE.max_wait = float(max_wait)
+    try:
+        yield
+    finally:
+        _PATIENCE.max_wait = previous
+
+
+class Upstream:
+    """
+    Rate limiter plus circuit breaker guarding one upstream host.
+
+    call() spends a token (waiting at most max_wait seconds, or longer inside
+    patient()) and runs fn only while the breaker admits it; otherwise
+    UpstreamUnavailable is raised at once so callers can serve cached data.
+    Throttling is not a failure.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 5.0,
+        burst: int = 10,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_wait: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.max_wait = float(max_wait)
+        self.bucket = TokenBucket(rate, burst, clock=clock)
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout, clock=clock)
+        self._stats = {"calls": 0, "throttled": 0}
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """False while the breaker is open (a half-open trial may still run)."""
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def call(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        is_failure: Callable[[Any], bool] = _response_failed,
+        **kwargs: Any,
+    ) -> Any:
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(self.name, "circuit open", self.breaker.retry_after())
+        wait = getattr(_PATIENCE, "max_wait", None)
+        if not self.bucket.acquire(self.max_wait if wait is None else max(self.max_wait, wait)):
+            self.breaker.release_trial()
+            with self._lock:
+                self._stats["throttled"] += 1
+            raise UpstreamUnavailable(self.name, "rate limited")
+        with self._lock:
+            self._stats["calls"] += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            self.breaker.record_failure(str(exc) or type(exc).__name__)
+            raise
+        if is_failure(result):
+            status = getattr(result, "status_code", None)
+            self.breaker.record_failure(f"HTTP {status}" if status is not None else "empty response")
+        else:
+            self.breaker.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._stats)
+        data.update(self.breaker.stats())
+        data["rate"] = self.bucket.rate
+        data["burst"] = self.bucket.burst
+        data["tokens"] = round(self.bucket.available(), 2)
+        return data
+
+
+# name -> Upstream kwargs; anything else gets DEFAULT_LIMITS
+UPSTREAM_LIMITS: Dict[str, Dict[str, Any]] = {
+    # One call is a whole yf.download batch, so keep the call rate modest
+    "yahoo": {"rate": 4.0, "burst": 8},
+    # Finnhub free tier: 60 calls/minute
+    "finnhub": {"rate": 1.0, "burst": 30},
+    # OpenSky polling cadence is governed by OPENSKY_MIN_REFRESH; this only caps bursts
+    "opensky": {"rate": 1.0, "burst": 10, "reset_timeout": 120.0},
+    "gdelt": {"rate": 0.5, "burst": 3, "reset_timeout": 60.0},
+}
+DEFAULT_LIMITS: Dict[str, Any] = {"rate": 2.0, "burst": 5}
+
+_REGISTRY: Dict[str, Upstream] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_upstream(name: str) -> Upstream:
+    """Returns the process-wide guard registered under name, creating it once."""
+    key = str(name or "unknown").strip().lower()
+    with _REGISTRY_LOCK:
+        upstream = _REGISTRY.get(key)
+        if upstream is None:
+            upstream = Upstream(key, **UPSTREAM_LIMITS.get(key, DEFAULT_LIMITS))
+            _REGISTRY[key] = upstream
+        return upstream
+
+
+def upstream_for_url(url: str) -> Upstream:
+    return get_upstream(urlparse(str(url)).hostname or "unknown")
+
+
+def guarded_request(
+    fn: Callable[..., Any],
+    url: str,
+    *args: Any,
+    upstream: Optional[str] = None,
+    **kwargs: Any,
+) -> Any:
+    """
+    Runs fn(url, ...) (requests.get/post) through the guard for upstream,
+    or for url's host when no name is given.
+    """
+    guard = get_upstream(upstream) if upstream else upstream_for_url(url)
+    return guard.call(fn, url, *args, **kwargs)
+
+
+def reset_upstreams() -> None:
+    with _REGISTRY_LOCK:
+        _REGISTRY.clear()
+
+
+def upstream_summary() -> Dict[str, Dict[str, Any]]:
+    with _REGISTRY_LOCK:
+        upstreams = dict(_REGISTRY)
+    return {name: upstream.stats() for name, upstream in sorted(upstreams.items())}
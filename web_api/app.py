@@ -6,7 +6,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from core.db_management import create_db_and_tables
+from modules.client_mgr.rolling_risk import ROLLING_RISK
 from modules.client_store import bootstrap_clients_from_json
+from modules.prefetch import start_prefetch, stop_prefetch
 from web_api.routes import build_router
 
 try:
@@ -21,7 +23,13 @@ except Exception:
 async def lifespan(app: FastAPI):
     create_db_and_tables()
     bootstrap_clients_from_json()
-    yield
+    ROLLING_RISK.restore()
+    start_prefetch()
+    try:
+        yield
+    finally:
+        stop_prefetch()
+        ROLLING_RISK.checkpoint()
 
 
 app = FastAPI(title="Clear Web API", version="0.1.0", lifespan=lifespan)
@@ -9,9 +9,15 @@ from modules.client_mgr.data_handler import DataHandler
 from core.database import SessionLocal
 from core import models
 from modules.client_store import DbClientStore
+from modules.prefetch import prefetch_status
+from modules.market_data.providers import get_provider
 from modules.market_data.registry import build_feed_registry, summarize_feed_registry
+from modules.market_data.singleflight import singleflight_summary
 from modules.market_data.trackers import GlobalTrackers
+from modules.market_data.yfinance_client import YahooWrapper
+from utils.cache import cache_summary
 from utils.system import SystemHost
+from utils.upstream import upstream_summary
 
 
 def feed_status() -> Dict[str, object]:
@@ -100,6 +106,47 @@ def tracker_status() -> Dict[str, object]:
     }
 
 
+def provider_status() -> Dict[str, object]:
+    provider = get_provider()
+    data: Dict[str, object] = {"name": getattr(provider, "name", "unknown")}
+    for attr in ("root", "latency_ms", "error_rate", "stats"):
+        if hasattr(provider, attr):
+            data[attr] = getattr(provider, attr)
+    return data
+
+
+def market_data_status() -> Dict[str, object]:
+    return {
+        "provider": provider_status(),
+        "bar_store": YahooWrapper.bar_store().summary(),
+        "metadata_store": YahooWrapper.metadata_store().summary(),
+        "prefetch": prefetch_status(),
+        "singleflight": singleflight_summary(),
+    }
+
+
+def cache_status() -> Dict[str, object]:
+    caches = cache_summary()
+    return {
+        "caches": caches,
+        "totals": {
+            "entries": sum(int(c.get("entries", 0) or 0) for c in caches.values()),
+            "hits": sum(int(c.get("hits", 0) or 0) for c in caches.values()),
+            "misses": sum(int(c.get("misses", 0) or 0) for c in caches.values()),
+            "evictions": sum(int(c.get("evictions", 0) or 0) for c in caches.values()),
+        },
+    }
+
+
+def upstream_status() -> Dict[str, object]:
+    upstreams = upstream_summary()
+    return {
+        "upstreams": upstreams,
+        "open": sorted(name for name, info in upstreams.items() if info.get("state") == "open"),
+        "half_open": sorted(name for name, info in upstreams.items() if info.get("state") == "half_open"),
+    }
+
+
 def client_counts() -> Dict[str, int]:
     store = DbClientStore()
     clients = store.fetch_all_clients()
@@ -13,7 +13,9 @@ from modules.view_models import (
     account_detail,
     account_patterns,
     client_detail,
+    client_list_valuation,
     client_patterns,
+    correlation_heatmap,
     list_clients,
     portfolio_dashboard,
 )
@@ -46,10 +48,18 @@ def _find_account_payload(client_payload: Dict[str, Any], account_ref: Any) -> O
 
 
 @router.get("/api/clients")
-def clients_index(_auth: None = Depends(require_api_key), db: Session = Depends(get_db)):
+def clients_index(
+    values: bool = Query(False, description="Include each client's market value (batch-priced)."),
+    _auth: None = Depends(require_api_key),
+    db: Session = Depends(get_db),
+):
     store = DbClientStore(db)
     clients = store.fetch_all_clients()
-    payload = {"clients": list_clients(clients)}
+    if values:
+        valuation = client_list_valuation(clients)
+        payload = {"clients": list_clients(clients, values=valuation.clients), "valuation": valuation.summary()}
+    else:
+        payload = {"clients": list_clients(clients)}
     warnings = validate_payload(payload, required_keys=("clients",), warnings=[])
     if not payload["clients"]:
         warnings.append("No clients available.")
@@ -180,7 +190,7 @@ def client_dashboard_view(
     client_payload = store.fetch_client(client_id)
     if client_payload is None:
         raise HTTPException(status_code=404, detail="Client not found")
-    payload = portfolio_dashboard(client_payload, interval=interval)
+    payload = portfolio_dashboard(client_payload, interval=interval, db=db)
     warnings = list(payload.get("warnings", []) or [])
     warnings = validate_payload(
         payload,
@@ -197,6 +207,45 @@ def client_dashboard_view(
     )
 
 
+@router.get("/api/clients/{client_id}/correlation")
+def client_correlation_view(
+    client_id: str,
+    interval: str = Query("1M", pattern="^(1W|1M|3M|6M|1Y)$"),
+    estimator: str = Query("ledoit_wolf", pattern="^(sample|ewma|ledoit_wolf)$"),
+    window: int = Query(252, ge=10, le=2520),
+    account_id: Optional[str] = Query(None, description="Limit to one account's holdings."),
+    _auth: None = Depends(require_api_key),
+    db: Session = Depends(get_db)
+):
+    store = DbClientStore(db)
+    client_payload = store.fetch_client(client_id)
+    if client_payload is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    account_payload = None
+    if account_id is not None:
+        account_payload = _find_account_payload(client_payload, account_id)
+        if account_payload is None:
+            raise HTTPException(status_code=404, detail="Account not found")
+    payload = correlation_heatmap(
+        client_payload,
+        account_payload,
+        interval=interval,
+        estimator=estimator,
+        window=window,
+    )
+    warnings = validate_payload(payload, required_keys=("scope", "interval", "estimator"), warnings=[])
+    if payload.get("error"):
+        warnings.append("Correlation heatmap returned error.")
+    if payload.get("missing"):
+        warnings.append(f"No price history for: {', '.join(payload['missing'])}.")
+    return attach_meta(
+        payload,
+        route="/api/clients/{client_id}/correlation",
+        source="database",
+        warnings=warnings,
+    )
+
+
 @router.post("/api/clients/{client_id}/accounts")
 def account_create(
     client_id: str,
@@ -265,7 +314,7 @@ def account_dashboard_view(
     account_payload = _find_account_payload(client_payload, account_id)
     if account_payload is None:
         raise HTTPException(status_code=404, detail="Account not found")
-    payload = account_dashboard(client_payload, account_payload, interval=interval)
+    payload = account_dashboard(client_payload, account_payload, interval=interval, db=db)
     warnings = list(payload.get("warnings", []) or [])
     warnings = validate_payload(
         payload,
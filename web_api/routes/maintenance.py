@@ -10,7 +10,8 @@ from pydantic import BaseModel
 from modules.client_mgr.data_handler import DataHandler
 from core import models
 from core.database import SessionLocal
-from modules.client_store import bootstrap_clients_from_json
+from modules.client_mgr.valuation import ValuationEngine
+from modules.client_store import DbClientStore, bootstrap_clients_from_json
 from web_api.auth import require_api_key
 from web_api.view_model import attach_meta, validate_payload
 
@@ -21,6 +22,10 @@ class MaintenanceConfirmPayload(BaseModel):
     confirm: bool = False
 
 
+class BackfillLotsPayload(MaintenanceConfirmPayload):
+    overwrite: bool = False
+
+
 @router.post("/api/maintenance/normalize-lots")
 def normalize_lot_timestamps(
     payload: MaintenanceConfirmPayload = Body(default_factory=MaintenanceConfirmPayload),
@@ -118,3 +123,61 @@ def cleanup_orphans(
         source="maintenance",
         warnings=warnings,
     )
+
+
+@router.post("/api/maintenance/backfill-lot-basis")
+def backfill_lot_basis(
+    payload: BackfillLotsPayload = Body(default_factory=BackfillLotsPayload),
+    _auth: None = Depends(require_api_key),
+):
+    if not payload.confirm:
+        raise HTTPException(status_code=400, detail="confirm=true required.")
+    store = DbClientStore()
+    accounts = []
+    lots_by_ticker: Dict[str, list] = {}
+    for client in store.fetch_all_clients():
+        for account in client.get("accounts") or []:
+            lots = account.get("lots") or {}
+            if not lots:
+                continue
+            before = {t: [lot.get("basis") for lot in entries] for t, entries in lots.items()}
+            accounts.append((client.get("client_id"), account.get("account_id"), lots, before))
+            for ticker, entries in lots.items():
+                lots_by_ticker.setdefault(ticker, []).extend(entries)
+
+    # Lots are grouped across every account so each ticker is downloaded once
+    try:
+        summary = ValuationEngine().backfill_lot_basis(lots_by_ticker, overwrite=payload.overwrite)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Backfill failed: {exc}")
+
+    updated_accounts = 0
+    for client_id, account_id, lots, before in accounts:
+        after = {t: [lot.get("basis") for lot in entries] for t, entries in lots.items()}
+        if after == before:
+            continue
+        store.update_account(client_id, account_id, {"lots": lots})
+        updated_accounts += 1
+
+    result: Dict[str, Any] = {
+        "tickers": summary["tickers"],
+        "updated_lots": summary["updated"],
+        "unresolved_lots": summary["unresolved"],
+        "throttled_lots": summary["throttled"],
+        "updated_accounts": updated_accounts,
+    }
+    warnings = validate_payload(
+        result,
+        required_keys=("tickers", "updated_lots", "unresolved_lots", "updated_accounts"),
+        warnings=[],
+    )
+    if summary["unresolved"]:
+        warnings.append(f"{summary['unresolved']} lot(s) had no historical price near their timestamp.")
+    if summary["throttled"]:
+        warnings.append(f"{summary['throttled']} lot(s) were skipped while market data was rate limited; retry later.")
+    return attach_meta(
+        result,
+        route="/api/maintenance/backfill-lot-basis",
+        source="maintenance",
+        warnings=warnings,
+    )
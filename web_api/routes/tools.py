@@ -1,22 +1,53 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+import logging
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from modules.client_store import DbClientStore
+from modules.risk_store import RiskResultStore
+from modules.client_mgr.stress import scenario_catalog
+from modules.view_models import client_risk_batch, client_stress_test
 
 from web_api.diagnostics import (
+    cache_status,
     client_counts,
     duplicate_account_summary,
     feed_status,
+    market_data_status,
     news_cache_info,
     orphaned_counts,
     report_cache_info,
     system_snapshot,
     tracker_status,
+    upstream_status,
 )
 from web_api.auth import require_api_key
+from web_api.routes.clients import get_db
 from web_api.view_model import attach_meta, validate_payload
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+_RISK_INTERVALS = ("1W", "1M", "3M", "6M", "1Y")
+
+
+class RiskBatchPayload(BaseModel):
+    interval: str = "1M"
+    workers: Optional[int] = Field(default=None, ge=1)
+
+
+class StressPayload(BaseModel):
+    scenarios: Optional[List[str]] = None
+    custom: Optional[List[Dict[str, Any]]] = None
+    client_id: Optional[str] = None
+
 
 @router.get("/api/tools/diagnostics")
 def diagnostics(_auth: None = Depends(require_api_key)):
@@ -26,6 +57,9 @@ def diagnostics(_auth: None = Depends(require_api_key)):
         "metrics": system.get("metrics"),
         "feeds": feed_status(),
         "trackers": tracker_status(),
+        "market_data": market_data_status(),
+        "caches": cache_status(),
+        "upstreams": upstream_status(),
         "intel": {
             "news_cache": news_cache_info(),
         },
@@ -49,3 +83,118 @@ def diagnostics(_auth: None = Depends(require_api_key)):
         source="diagnostics",
         warnings=warnings,
     )
+
+
+def _risk_batch_job(bind: Engine, run_id: str, interval: str, workers: Optional[int]) -> None:
+    """Loads the book, runs the batch and stores it on its own session, after the response."""
+    db = Session(bind=bind)
+    try:
+        clients = DbClientStore(db).fetch_all_clients()
+        run = client_risk_batch(clients, interval=interval, workers=workers, run_id=run_id)
+        RiskResultStore(db).save_run(run)
+        summary = run.summary()
+        logger.info(
+            "Risk batch %s stored: %s client(s), %s account(s), %s error(s) in %sms",
+            run_id,
+            summary["clients"],
+            summary["accounts"],
+            summary["errors"],
+            summary["timings_ms"].get("total"),
+        )
+    except Exception:
+        logger.exception("Risk batch %s failed", run_id)
+    finally:
+        db.close()
+
+
+@router.post("/api/tools/risk-batch", status_code=202)
+def run_risk_batch(
+    background_tasks: BackgroundTasks,
+    payload: RiskBatchPayload = Body(default_factory=RiskBatchPayload),
+    _auth: None = Depends(require_api_key),
+    db: Session = Depends(get_db),
+):
+    interval = str(payload.interval or "1M").upper()
+    if interval not in _RISK_INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be one of {', '.join(_RISK_INTERVALS)}")
+    # The panel load and process pool outlive the request; GET serves the run once stored
+    run_id = uuid.uuid4().hex
+    background_tasks.add_task(_risk_batch_job, db.get_bind(), run_id, interval, payload.workers)
+    result = {"run_id": run_id, "status": "queued", "interval": interval, "workers": payload.workers}
+    warnings = validate_payload(result, required_keys=("run_id", "status"), warnings=[])
+    return attach_meta(
+        result,
+        route="/api/tools/risk-batch",
+        source="risk_batch",
+        warnings=warnings,
+    )
+
+
+@router.get("/api/tools/risk-batch")
+def latest_risk_batch(
+    interval: Optional[str] = Query(None, description="Toolkit interval of the run (1W..1Y)."),
+    client_id: Optional[str] = Query(None, description="Only this client's rows."),
+    _auth: None = Depends(require_api_key),
+    db: Session = Depends(get_db),
+):
+    rows = RiskResultStore(db).latest_results(interval=interval, client_id=client_id)
+    payload = {
+        "run_id": rows[0]["run_id"] if rows else None,
+        "run_at": rows[0]["run_at"] if rows else None,
+        "results": rows,
+    }
+    warnings = validate_payload(payload, required_keys=("results",), warnings=[])
+    if not rows:
+        warnings.append("Risk batch: no stored run.")
+    return attach_meta(
+        payload,
+        route="/api/tools/risk-batch",
+        source="risk_batch",
+        warnings=warnings,
+    )
+
+
+@router.get("/api/tools/stress/scenarios")
+def stress_scenarios(_auth: None = Depends(require_api_key)):
+    payload = {"scenarios": scenario_catalog()}
+    return attach_meta(
+        payload,
+        route="/api/tools/stress/scenarios",
+        source="stress",
+        warnings=[],
+    )
+
+
+@router.post("/api/tools/stress")
+def run_stress(
+    payload: StressPayload = Body(default_factory=StressPayload),
+    _auth: None = Depends(require_api_key),
+    db: Session = Depends(get_db),
+):
+    store = DbClientStore(db)
+    if payload.client_id:
+        client = store.fetch_client(payload.client_id)
+        if client is None:
+            raise HTTPException(status_code=404, detail="Client not found")
+        clients = [client]
+    else:
+        clients = store.fetch_all_clients()
+    try:
+        result = client_stress_test(clients, scenarios=payload.scenarios, custom=payload.custom)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    warnings = validate_payload(result, required_keys=("scenarios", "clients", "accounts", "sectors"), warnings=[])
+    if result["unpriced"]:
+        warnings.append(f"Stress: no stored price for {', '.join(result['unpriced'])}.")
+    for scenario in result["scenarios"]:
+        if scenario["method"] in ("beta_mapped", "mixed"):
+            warnings.append(
+                f"Stress: {scenario['name']} uses beta-mapped market moves for "
+                f"{1.0 - scenario['coverage']:.0%} of exposure without stored history."
+            )
+    return attach_meta(
+        result,
+        route="/api/tools/stress",
+        source="stress",
+        warnings=warnings,
+    )